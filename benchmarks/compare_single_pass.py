@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+A/B comparison of the two-stage pipeline and the single-pass mode.
+
+Classifies the same documents twice in one process: once with separate triage
+and specialist calls (arm A) and once with ``SINGLE_PASS_GROUPS`` set to the
+requested groups (arm B). The OCR step runs once and is shared through the
+checkpoint store, so the arms differ only in the classification calls.
+
+For each arm the report gives errors, Gemini calls, prompt and output tokens,
+estimated cost and classification latency (excluding OCR). Accuracy is the
+agreement of B with a reference on the group, the document type, the number,
+the emission date and every leaf of ``metadados_documento``. The reference is
+arm A, or the results in ``--labels`` (a JSON list as written by
+``agentic-classify --output``, matched on ``localizacao_ficheiro``).
+
+    python benchmarks/compare_single_pass.py --groups DOCUMENTOS_BANCARIOS \\
+        DOCUMENTOS_RH --labels verificados.json documentos/*.pdf
+
+By default both arms run against a fresh in-memory checkpoint store so neither
+reuses earlier results; ``--reuse-checkpoints`` keeps the configured store.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import sys
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any
+
+SOURCE_DIR = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(SOURCE_DIR))
+
+from agentic_document_classifier import agents  # noqa: E402
+from agentic_document_classifier.checkpoints import (  # noqa: E402
+    MemoryCheckpointStore,
+    set_checkpoint_store,
+)
+from agentic_document_classifier.metrics import (  # noqa: E402
+    DocumentMetrics,
+    MetricsCollector,
+    add_metrics_hook,
+    remove_metrics_hook,
+)
+
+COMPARED_FIELDS = (
+    "grupo_documento",
+    "tipo_documento",
+    "numero_documento",
+    "data_emissao",
+)
+_CLASSIFICATION_STAGES = ("triage", "specialist", "single_pass")
+
+
+@dataclass
+class ArmReport:
+    name: str
+    documents: int = 0
+    errors: int = 0
+    calls: int = 0
+    prompt_tokens: int = 0
+    output_tokens: int = 0
+    estimated_cost_usd: float = 0.0
+    classification_seconds: float = 0.0
+    agreement: dict[str, float] = field(default_factory=dict)
+    agreement_by_group: dict[str, float] = field(default_factory=dict)
+
+
+def _leaves(value: Any, prefix: str) -> dict[str, Any]:
+    if isinstance(value, dict):
+        leaves: dict[str, Any] = {}
+        for key, item in value.items():
+            leaves.update(_leaves(item, f"{prefix}.{key}"))
+        return leaves
+    if isinstance(value, list):
+        leaves = {}
+        for index, item in enumerate(value):
+            leaves.update(_leaves(item, f"{prefix}[{index}]"))
+        return leaves
+    return {prefix: value}
+
+
+def _comparable(result: dict[str, Any]) -> dict[str, Any]:
+    values = {name: result.get(name) for name in COMPARED_FIELDS}
+    values.update(_leaves(result.get("metadados_documento") or {}, "metadados"))
+    return values
+
+
+def compare(
+    results: list[dict[str, Any]], reference: list[dict[str, Any]]
+) -> tuple[dict[str, float], dict[str, float], list[str]]:
+    """Agreement per field and per reference group, plus the disagreements."""
+    matches: Counter[str] = Counter()
+    totals: Counter[str] = Counter()
+    group_matches: Counter[str] = Counter()
+    group_totals: Counter[str] = Counter()
+    differences: list[str] = []
+
+    for result, expected in zip(results, reference):
+        if "erro" in expected:
+            continue
+        group = str(expected.get("grupo_documento"))
+        actual_values = _comparable(result)
+        all_equal = True
+        for name, value in _comparable(expected).items():
+            # Metadata leaves are pooled so every group has the same columns.
+            column = "metadados" if name.startswith("metadados") else name
+            totals[column] += 1
+            if actual_values.get(name) == value:
+                matches[column] += 1
+            else:
+                all_equal = False
+                differences.append(
+                    f"{expected.get('localizacao_ficheiro')}: {name} "
+                    f"{actual_values.get(name)!r} != {value!r}"
+                )
+        group_totals[group] += 1
+        group_matches[group] += all_equal
+
+    agreement = {name: matches[name] / totals[name] for name in totals}
+    by_group = {name: group_matches[name] / group_totals[name] for name in group_totals}
+    return agreement, by_group, differences
+
+
+def _summarise(name: str, metrics: list[DocumentMetrics], errors: int) -> ArmReport:
+    report = ArmReport(name=name, documents=len(metrics), errors=errors)
+    for document in metrics:
+        for stage in document.stages:
+            if stage.stage not in _CLASSIFICATION_STAGES:
+                continue
+            report.calls += stage.calls
+            report.prompt_tokens += stage.prompt_tokens
+            report.output_tokens += stage.output_tokens
+            report.estimated_cost_usd += stage.estimated_cost_usd
+            report.classification_seconds += stage.wall_time
+    return report
+
+
+async def _run_arm(
+    name: str,
+    paths: list[str],
+    groups: frozenset[agents.DocumentGroup],
+    concurrency: int,
+) -> tuple[list[dict[str, Any]], ArmReport]:
+    agents.SINGLE_PASS_GROUPS = groups
+    collector = MetricsCollector()
+    add_metrics_hook(collector)
+    try:
+        results = await agents.aclassify_many(paths, max_concurrency=concurrency)
+    finally:
+        remove_metrics_hook(collector)
+
+    dumped = [result.model_dump(mode="json") for result in results]
+    errors = sum("erro" in result for result in dumped)
+    return dumped, _summarise(name, collector.drain(), errors)
+
+
+async def _run_arms(
+    paths: list[str], groups: frozenset[agents.DocumentGroup], concurrency: int
+) -> tuple[tuple[list[dict[str, Any]], ArmReport], ...]:
+    # One event loop for both arms: the aio Gemini client is bound to its loop.
+    return (
+        await _run_arm("two-stage", paths, frozenset(), concurrency),
+        await _run_arm("single-pass", paths, groups, concurrency),
+    )
+
+
+def _load_labels(path: str, paths: list[str]) -> list[dict[str, Any]]:
+    labels = {
+        item["localizacao_ficheiro"]: item
+        for item in json.loads(Path(path).read_text(encoding="utf-8"))
+    }
+    missing = [document for document in paths if document not in labels]
+    if missing:
+        raise SystemExit(f"No label for {len(missing)} documents, e.g. {missing[0]}")
+    return [labels[document] for document in paths]
+
+
+def _print_report(arms: list[ArmReport], differences: list[str], limit: int) -> None:
+    print(
+        f"{'arm':<12} {'docs':>5} {'errors':>6} {'calls':>6} {'prompt tok':>11} "
+        f"{'output tok':>11} {'cost USD':>9} {'class. s':>9}"
+    )
+    for arm in arms:
+        print(
+            f"{arm.name:<12} {arm.documents:>5} {arm.errors:>6} {arm.calls:>6} "
+            f"{arm.prompt_tokens:>11} {arm.output_tokens:>11} "
+            f"{arm.estimated_cost_usd:>9.4f} {arm.classification_seconds:>9.1f}"
+        )
+
+    for arm in arms:
+        if not arm.agreement:
+            continue
+        print(f"\nAgreement of {arm.name} with the reference:")
+        for name, ratio in arm.agreement.items():
+            print(f"  {name:<20} {ratio:7.1%}")
+        for group, ratio in sorted(arm.agreement_by_group.items()):
+            print(f"  {group:<28} {ratio:7.1%} of documents fully equal")
+
+    if differences:
+        print(
+            f"\nFirst {min(limit, len(differences))} of {len(differences)} differences:"
+        )
+        for line in differences[:limit]:
+            print(f"  {line}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    _ = parser.add_argument("files", nargs="+", help="PDF files to classify")
+    _ = parser.add_argument(
+        "--groups",
+        nargs="+",
+        default=["ALL"],
+        help="Groups classified in a single pass in arm B (default: ALL)",
+    )
+    _ = parser.add_argument(
+        "--labels", help="Verified results to compare both arms against"
+    )
+    _ = parser.add_argument(
+        "--concurrency", type=int, default=16, help="Documents in flight (default: 16)"
+    )
+    _ = parser.add_argument(
+        "--reuse-checkpoints",
+        action="store_true",
+        help="Use the configured checkpoint store instead of a fresh one",
+    )
+    _ = parser.add_argument(
+        "--show-differences",
+        type=int,
+        default=20,
+        help="Number of field differences to list (default: 20)",
+    )
+    _ = parser.add_argument("--json", help="Write the report to this JSON file")
+    args = parser.parse_args()
+
+    groups = agents._parse_single_pass_groups(",".join(args.groups))
+    if not groups:
+        raise SystemExit("No specialist group selected for the single-pass arm")
+    if not args.reuse_checkpoints:
+        set_checkpoint_store(MemoryCheckpointStore())
+
+    (two_stage, arm_a), (single_pass, arm_b) = asyncio.run(
+        _run_arms(args.files, groups, args.concurrency)
+    )
+
+    differences: list[str] = []
+    if args.labels:
+        reference = _load_labels(args.labels, args.files)
+        arm_a.agreement, arm_a.agreement_by_group, _ = compare(two_stage, reference)
+    else:
+        reference = two_stage
+    arm_b.agreement, arm_b.agreement_by_group, differences = compare(
+        single_pass, reference
+    )
+
+    _print_report([arm_a, arm_b], differences, args.show_differences)
+    if args.json:
+        report = {
+            "groups": sorted(group.value for group in groups),
+            "arms": [asdict(arm_a), asdict(arm_b)],
+            "differences": differences,
+        }
+        Path(args.json).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,521 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Gemini ``generateContent`` endpoint.
+
+The server answers the OCR, triage and specialist calls made by the classifier
+with canned but schema-valid responses, after a configurable latency and with
+configurable error rates. Point the classifier at it with ``GEMINI_BASE_URL``:
+
+    python benchmarks/fake_gemini.py --port 8089 --latency-scale 0.1
+    GEMINI_BASE_URL=http://127.0.0.1:8089 GOOGLE_API_KEY=fake agentic-classify doc.pdf
+
+The stage of a request is recognised from its generation config: plain text
+output is OCR, a JSON schema with ``tipo_documento`` is a specialist, a schema
+wrapping a union in ``resultado`` is a single-pass call (timed as a specialist)
+and any other JSON schema is triage. Structured responses are generated from the
+``responseSchema`` sent with the request, so they stay valid when the output
+models change.
+
+Batch jobs (``models/<model>:batchGenerateContent`` with inline requests and
+``batches/<id>``) are emulated too: a job stays pending for ``--batch-latency``
+seconds and then succeeds with one canned response per request, each failing
+with the configured error rate. This is what ``agentic-classify --batch-mode``
+is tested against.
+
+The document group is read from a ``benchmark-group: <GROUP>`` marker in the
+PDF (see ``run_benchmarks.write_synthetic_pdf``) and carried through the OCR
+markdown and triage JSON to the later stages. Documents without a marker get a
+group derived from a hash of their content.
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+DOCUMENT_GROUPS = (
+    "DOCUMENTOS_COMERCIAIS",
+    "DOCUMENTOS_ADUANEIROS",
+    "DOCUMENTOS_FRETE",
+    "DOCUMENTOS_FISCAIS",
+    "DOCUMENTOS_BANCARIOS",
+    "DOCUMENTOS_RH",
+    "OUTROS_DOCUMENTOS",
+)
+STAGES = ("ocr", "triage", "specialist")
+# Output model of each group, matched against schema titles in single-pass calls.
+_GROUP_OUTPUT_TITLES = {
+    "DOCUMENTOS_COMERCIAIS": "InvoiceOutput",
+    "DOCUMENTOS_ADUANEIROS": "CustomsOutput",
+    "DOCUMENTOS_FRETE": "FreightOutput",
+    "DOCUMENTOS_FISCAIS": "TaxesOutput",
+    "DOCUMENTOS_BANCARIOS": "BankingOutput",
+    "DOCUMENTOS_RH": "HrOutput",
+}
+
+_GROUP_PATTERN = re.compile(
+    "|".join(re.escape(group) for group in DOCUMENT_GROUPS).encode()
+)
+# Stops at quotes and backslashes when the path is echoed inside a JSON payload.
+_PATH_PATTERN = re.compile(r'Localização original do ficheiro: ([^\s"\\]+)')
+_CHARS_PER_TOKEN = 4
+
+
+@dataclass
+class Latency:
+    """A latency distribution parsed from ``fixed:S``, ``uniform:A:B`` or
+    ``lognormal:MEDIAN:SIGMA`` (seconds)."""
+
+    kind: str
+    a: float
+    b: float = 0.0
+
+    @classmethod
+    def parse(cls, spec: str) -> Latency:
+        kind, *values = spec.split(":")
+        numbers = [float(value) for value in values]
+        expected = {"fixed": 1, "uniform": 2, "lognormal": 2}.get(kind)
+        if expected is None or len(numbers) != expected:
+            raise argparse.ArgumentTypeError(f"invalid latency spec: {spec!r}")
+        return cls(kind, *numbers)
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            return self.a
+        if self.kind == "uniform":
+            return rng.uniform(self.a, self.b)
+        return self.a * rng.lognormvariate(0.0, self.b)
+
+    def __str__(self) -> str:
+        if self.kind == "fixed":
+            return f"fixed:{self.a:g}"
+        return f"{self.kind}:{self.a:g}:{self.b:g}"
+
+
+@dataclass
+class FakeGeminiConfig:
+    latency: dict[str, Latency] = field(
+        default_factory=lambda: {
+            "ocr": Latency("lognormal", 4.0, 0.5),
+            "triage": Latency("lognormal", 2.0, 0.4),
+            "specialist": Latency("lognormal", 2.5, 0.4),
+        }
+    )
+    latency_scale: float = 1.0
+    error_rate: float = 0.0
+    throttle_rate: float = 0.0
+    retry_after: float = 1.0
+    batch_latency: float = 5.0
+    seed: int | None = None
+
+
+@dataclass
+class _Counters:
+    requests: dict[str, int] = field(default_factory=lambda: dict.fromkeys(STAGES, 0))
+    errors: int = 0
+    throttled: int = 0
+    batches: int = 0
+
+
+# ============================================================================
+# Canned responses
+# ============================================================================
+
+
+def sample_from_schema(schema: dict[str, Any], overrides: dict[str, Any]) -> Any:
+    """Build a minimal value matching a Gemini ``Schema`` dict.
+
+    Top-level object properties named in ``overrides`` take the given values.
+    """
+    options = schema.get("any_of") or schema.get("anyOf")
+    if options:
+        return sample_from_schema(options[0], {})
+
+    kind = str(schema.get("type", "STRING")).upper()
+    if kind == "OBJECT":
+        properties: dict[str, Any] = schema.get("properties", {})
+        return {
+            name: (
+                overrides[name]
+                if name in overrides
+                else sample_from_schema(subschema, {})
+            )
+            for name, subschema in properties.items()
+        }
+    if kind == "ARRAY":
+        return [sample_from_schema(schema.get("items", {}), {})]
+    if kind == "INTEGER":
+        return 2024
+    if kind == "NUMBER":
+        return 1234.5
+    if kind == "BOOLEAN":
+        return True
+    if schema.get("enum"):
+        return schema["enum"][0]
+    return "2024-01-31" if "data" in str(schema.get("title", "")).lower() else "X"
+
+
+def _document_group(data: bytes) -> str:
+    match = _GROUP_PATTERN.search(data)
+    if match is not None:
+        return match.group().decode()
+    digest = hashlib.blake2b(data, digest_size=8).digest()
+    return DOCUMENT_GROUPS[digest[0] % len(DOCUMENT_GROUPS)]
+
+
+def _request_parts(body: dict[str, Any]) -> tuple[bytes, str]:
+    """Inline binary data and concatenated text of the request contents."""
+    data = b""
+    texts: list[str] = []
+    for content in body.get("contents", []):
+        for part in content.get("parts", []):
+            if "inlineData" in part:
+                # The SDK sends URL-safe base64 without padding.
+                encoded: str = part["inlineData"].get("data", "")
+                data += base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4))
+            if "text" in part:
+                texts.append(part["text"])
+    return data, "\n".join(texts)
+
+
+def request_stage(body: dict[str, Any]) -> str:
+    generation_config = body.get("generationConfig", {})
+    if generation_config.get("responseMimeType") != "application/json":
+        return "ocr"
+    properties = (generation_config.get("responseSchema") or {}).get("properties", {})
+    if "tipo_documento" in properties or "resultado" in properties:
+        return "specialist"
+    return "triage"
+
+
+def canned_response(stage: str, body: dict[str, Any]) -> str:
+    data, text = _request_parts(body)
+    group = _document_group(data + text.encode())
+    path_match = _PATH_PATTERN.search(text)
+    path = path_match.group(1) if path_match else "documento.pdf"
+
+    if stage == "ocr":
+        return (
+            f"# Documento de teste\n\nbenchmark-group: {group}\n\n"
+            "| Descrição | Valor |\n| --- | --- |\n| Total | 1234,50 |\n"
+        )
+
+    schema = body["generationConfig"].get("responseSchema") or {"type": "OBJECT"}
+    overrides: dict[str, Any] = {
+        "localizacao_ficheiro": path,
+        "grupo_documento": group,
+        "conteudo": text,
+    }
+    wrapped = schema.get("properties", {}).get("resultado")
+    if wrapped is not None:
+        # Single pass: answer with the group's output, or triage for the rest.
+        options = wrapped.get("anyOf") or wrapped.get("any_of") or [wrapped]
+        title = _GROUP_OUTPUT_TITLES.get(group)
+        option = next((o for o in options if o.get("title") == title), options[-1])
+        result = {"resultado": sample_from_schema(option, overrides)}
+        return json.dumps(result, ensure_ascii=False)
+    return json.dumps(sample_from_schema(schema, overrides), ensure_ascii=False)
+
+
+def canned_candidate(text: str, raw_size: int) -> dict[str, Any]:
+    """A ``GenerateContentResponse`` payload carrying ``text``."""
+    prompt_tokens = raw_size // _CHARS_PER_TOKEN
+    output_tokens = len(text) // _CHARS_PER_TOKEN
+    return {
+        "candidates": [
+            {
+                "content": {"role": "model", "parts": [{"text": text}]},
+                "finishReason": "STOP",
+            }
+        ],
+        "usageMetadata": {
+            "promptTokenCount": prompt_tokens,
+            "candidatesTokenCount": output_tokens,
+            "totalTokenCount": prompt_tokens + output_tokens,
+        },
+        "modelVersion": "fake-gemini",
+    }
+
+
+@dataclass
+class _BatchJob:
+    name: str
+    model: str
+    display_name: str
+    requests: list[dict[str, Any]]
+    created_at: float
+    ready_at: float
+    output: list[dict[str, Any]] | None = None
+
+
+# ============================================================================
+# HTTP server
+# ============================================================================
+
+
+class FakeGeminiServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, address: tuple[str, int], config: FakeGeminiConfig) -> None:
+        super().__init__(address, _Handler)
+        self.config = config
+        self.counters = _Counters()
+        self._rng = random.Random(config.seed)
+        self._lock = threading.Lock()
+        self._batches: dict[str, _BatchJob] = {}
+        self._batch_lock = threading.Lock()
+
+    def draw(self, stage: str) -> tuple[float, float]:
+        """Return (latency, outcome roll) for one request."""
+        with self._lock:
+            self.counters.requests[stage] += 1
+            latency = self.config.latency[stage].sample(self._rng)
+            return latency * self.config.latency_scale, self._rng.random()
+
+    def create_batch(self, model: str, batch: dict[str, Any]) -> _BatchJob:
+        requests = batch.get("inputConfig", {}).get("requests", {}).get("requests", [])
+        now = time.time()
+        with self._lock:
+            self.counters.batches += 1
+            job = _BatchJob(
+                name=f"batches/fake-{self.counters.batches}",
+                model=model,
+                display_name=batch.get("displayName", ""),
+                requests=requests,
+                created_at=now,
+                ready_at=now + self.config.batch_latency * self.config.latency_scale,
+            )
+            self._batches[job.name] = job
+        return job
+
+    def batch(self, name: str) -> _BatchJob | None:
+        """Look up a job, running its requests once its latency has elapsed."""
+        job = self._batches.get(name)
+        if job is None or time.time() < job.ready_at:
+            return job
+
+        with self._batch_lock:
+            if job.output is None:
+                job.output = self._run_batch(job)
+        return job
+
+    def _run_batch(self, job: _BatchJob) -> list[dict[str, Any]]:
+        output: list[dict[str, Any]] = []
+        for item in job.requests:
+            request: dict[str, Any] = item.get("request", {})
+            stage = request_stage(request)
+            _, roll = self.draw(stage)
+            entry: dict[str, Any] = {"metadata": item.get("metadata", {})}
+            if roll < self.config.error_rate:
+                self.counters.errors += 1
+                entry["error"] = {"code": 503, "message": "Batch item failed (fake)."}
+            else:
+                raw_size = len(json.dumps(request))
+                entry["response"] = canned_candidate(
+                    canned_response(stage, request), raw_size
+                )
+            output.append(entry)
+        return output
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host!s}:{port}"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: FakeGeminiServer
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _send_json(
+        self,
+        status: int,
+        payload: dict[str, Any],
+        headers: dict[str, str] | None = None,
+    ) -> None:
+        content = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        _ = self.wfile.write(content)
+
+    def _send_error(
+        self, status: int, message: str, headers: dict[str, str] | None = None
+    ) -> None:
+        error = {"code": status, "message": message, "status": "FAKE_GEMINI_ERROR"}
+        self._send_json(status, {"error": error}, headers)
+
+    def _send_batch(self, job: _BatchJob) -> None:
+        metadata: dict[str, Any] = {
+            "model": job.model,
+            "displayName": job.display_name,
+            "createTime": _timestamp(job.created_at),
+            "state": "BATCH_STATE_PENDING",
+        }
+        if job.output is not None:
+            metadata["state"] = "BATCH_STATE_SUCCEEDED"
+            metadata["endTime"] = _timestamp(job.ready_at)
+            metadata["output"] = {"inlinedResponses": {"inlinedResponses": job.output}}
+        self._send_json(200, {"name": job.name, "metadata": metadata})
+
+    def do_GET(self) -> None:
+        path = self.path.split("?")[0].rstrip("/")
+        if path == "/stats":
+            counters = self.server.counters
+            self._send_json(
+                200,
+                {
+                    "requests": counters.requests,
+                    "errors": counters.errors,
+                    "throttled": counters.throttled,
+                    "batches": counters.batches,
+                },
+            )
+            return
+        if "/batches/" in path:
+            job = self.server.batch("batches/" + path.rsplit("/batches/", 1)[1])
+            if job is not None:
+                self._send_batch(job)
+                return
+        self._send_error(404, f"Not found: {self.path}")
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw_body = self.rfile.read(length)
+        path = self.path.split("?")[0]
+        if path.endswith(":batchGenerateContent"):
+            model = path.rsplit("/models/", 1)[-1].split(":", 1)[0]
+            body = json.loads(raw_body or b"{}")
+            self._send_batch(
+                self.server.create_batch(f"models/{model}", body.get("batch", {}))
+            )
+            return
+        if not path.endswith(":generateContent"):
+            # Context caching and other endpoints are not emulated; the
+            # classifier falls back to inline prompts.
+            self._send_error(404, f"Not emulated: {self.path}")
+            return
+
+        body: dict[str, Any] = json.loads(raw_body or b"{}")
+        stage = request_stage(body)
+        latency, roll = self.server.draw(stage)
+        time.sleep(latency)
+
+        config = self.server.config
+        if roll < config.throttle_rate:
+            self.server.counters.throttled += 1
+            self._send_error(
+                429,
+                "Resource has been exhausted (fake).",
+                {"Retry-After": f"{config.retry_after:g}"},
+            )
+            return
+        if roll < config.throttle_rate + config.error_rate:
+            self.server.counters.errors += 1
+            self._send_error(503, "The model is overloaded (fake).")
+            return
+
+        text = canned_response(stage, body)
+        self._send_json(200, canned_candidate(text, len(raw_body)))
+
+
+def _timestamp(seconds: float) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(seconds))
+
+
+def add_server_arguments(parser: argparse.ArgumentParser) -> None:
+    defaults = FakeGeminiConfig()
+    for stage in STAGES:
+        latency = defaults.latency[stage]
+        _ = parser.add_argument(
+            f"--{stage}-latency",
+            type=Latency.parse,
+            default=latency,
+            help=(
+                f"{stage} latency: fixed:S, uniform:A:B or lognormal:MEDIAN:SIGMA "
+                f"(default: {latency})"
+            ),
+        )
+    _ = parser.add_argument(
+        "--latency-scale",
+        type=float,
+        default=1.0,
+        help="Multiply every sampled latency by this factor (default: 1.0)",
+    )
+    _ = parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of requests answered with 503 (default: 0)",
+    )
+    _ = parser.add_argument(
+        "--throttle-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of requests answered with 429 (default: 0)",
+    )
+    _ = parser.add_argument(
+        "--retry-after",
+        type=float,
+        default=1.0,
+        help="Retry-After seconds sent with 429 responses (default: 1)",
+    )
+    _ = parser.add_argument(
+        "--batch-latency",
+        type=float,
+        default=5.0,
+        help="Seconds a batch job stays pending before it succeeds (default: 5)",
+    )
+    _ = parser.add_argument("--seed", type=int, help="Random seed")
+
+
+def config_from_arguments(args: argparse.Namespace) -> FakeGeminiConfig:
+    return FakeGeminiConfig(
+        latency={stage: getattr(args, f"{stage}_latency") for stage in STAGES},
+        latency_scale=args.latency_scale,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        retry_after=args.retry_after,
+        batch_latency=args.batch_latency,
+        seed=args.seed,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    _ = parser.add_argument("--host", default="127.0.0.1")
+    _ = parser.add_argument(
+        "--port", type=int, default=0, help="Port to listen on (default: any free)"
+    )
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    server = FakeGeminiServer((args.host, args.port), config_from_arguments(args))
+    # The benchmark runner reads the URL from the first line of output.
+    print(server.url, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
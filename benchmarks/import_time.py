@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Start-up time of the ``agentic-classify`` entry point and the package.
+
+Each scenario runs in a fresh interpreter, ``--repeat`` times, and the report
+gives the median and minimum wall time. Scenarios:
+
+- ``python``: an empty interpreter, the floor for everything else
+- ``version`` / ``help``: ``agentic-classify --version`` and ``--help``
+- ``package``: ``import agentic_document_classifier``
+- ``agents``: ``import agentic_document_classifier.agents``, what a worker
+  imports before its first document
+
+The ``version``, ``help`` and ``package`` scenarios must not import the model
+stack (google-genai, pydantic, pypdf, httpx); the report lists the heavy
+modules each scenario loaded and the run fails (exit code 1) if one of them
+did. ``--max-ms`` also fails the run when the median of ``version`` or ``help``
+exceeds the budget.
+
+    python benchmarks/import_time.py --repeat 20 --max-ms 300
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import textwrap
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+SOURCE_DIR = Path(__file__).resolve().parent.parent / "src"
+
+HEAVY_MODULES = ("google.genai", "pydantic", "pypdf", "httpx")
+_CLI = (
+    "import sys; sys.argv = ['agentic-classify', {flag!r}]\n"
+    "from agentic_document_classifier.cli.classify_documents import main\n"
+    "main()"
+)
+# name -> (code, must stay lightweight)
+SCENARIOS: dict[str, tuple[str, bool]] = {
+    "python": ("pass", False),
+    "version": (_CLI.format(flag="--version"), True),
+    "help": (_CLI.format(flag="--help"), True),
+    "package": ("import agentic_document_classifier", True),
+    "agents": ("import agentic_document_classifier.agents", False),
+}
+_MODULES_MARKER = "\n__modules__"
+
+
+@dataclass
+class ImportTimeResult:
+    name: str
+    median_ms: float
+    min_ms: float
+    heavy_modules: list[str]
+    lightweight: bool
+
+    @property
+    def failed(self) -> bool:
+        return self.lightweight and bool(self.heavy_modules)
+
+
+def _run(code: str, env: dict[str, str]) -> subprocess.CompletedProcess[str]:
+    return subprocess.run(
+        [sys.executable, "-c", code], env=env, capture_output=True, text=True
+    )
+
+
+def _loaded_heavy_modules(code: str, env: dict[str, str]) -> list[str]:
+    probe = (
+        "import sys, json\n"
+        "try:\n"
+        f"{textwrap.indent(code, '    ')}\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        f"sys.stderr.write({_MODULES_MARKER!r} + json.dumps(sorted(sys.modules)))\n"
+    )
+    stderr = _run(probe, env).stderr
+    modules: list[str] = json.loads(stderr.rpartition(_MODULES_MARKER)[2])
+    return sorted(
+        {
+            heavy
+            for heavy in HEAVY_MODULES
+            for module in modules
+            if module == heavy or module.startswith(f"{heavy}.")
+        }
+    )
+
+
+def measure(name: str, repeat: int, env: dict[str, str]) -> ImportTimeResult:
+    code, lightweight = SCENARIOS[name]
+    timings: list[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        completed = _run(code, env)
+        timings.append((time.perf_counter() - start) * 1000)
+        if completed.returncode != 0:
+            raise SystemExit(f"Scenario {name} failed:\n{completed.stderr}")
+
+    return ImportTimeResult(
+        name=name,
+        median_ms=statistics.median(timings),
+        min_ms=min(timings),
+        heavy_modules=_loaded_heavy_modules(code, env),
+        lightweight=lightweight,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    _ = parser.add_argument(
+        "--scenarios",
+        nargs="+",
+        choices=list(SCENARIOS),
+        default=list(SCENARIOS),
+        help="Scenarios to run (default: all)",
+    )
+    _ = parser.add_argument(
+        "--repeat", type=int, default=10, help="Runs per scenario (default: 10)"
+    )
+    _ = parser.add_argument(
+        "--max-ms",
+        type=float,
+        help="Fail when the median of the version or help scenario exceeds this",
+    )
+    _ = parser.add_argument("--json", type=Path, help="Write results to this file")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [str(SOURCE_DIR), env.get("PYTHONPATH")])
+    )
+    # --version must work without credentials.
+    env.pop("GOOGLE_API_KEY", None)
+
+    results = [measure(name, args.repeat, env) for name in args.scenarios]
+
+    print(f"{'scenario':<10} {'median ms':>10} {'min ms':>8}  heavy modules")
+    for result in results:
+        heavy = ", ".join(result.heavy_modules) or "-"
+        flag = "  ✗ must stay lightweight" if result.failed else ""
+        print(
+            f"{result.name:<10} {result.median_ms:>10.1f} {result.min_ms:>8.1f}  "
+            f"{heavy}{flag}"
+        )
+
+    if args.json:
+        args.json.write_text(
+            json.dumps([asdict(result) for result in results], indent=2),
+            encoding="utf-8",
+        )
+
+    failures = [result.name for result in results if result.failed]
+    if args.max_ms is not None:
+        failures += [
+            result.name
+            for result in results
+            if result.name in ("version", "help") and result.median_ms > args.max_ms
+        ]
+    if failures:
+        print(f"\nFailed: {', '.join(sorted(set(failures)))}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
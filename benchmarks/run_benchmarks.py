@@ -0,0 +1,469 @@
+#!/usr/bin/env python3
+"""
+Offline throughput benchmarks for the classification pipeline.
+
+Generates synthetic PDFs, starts the fake Gemini server (``fake_gemini.py``) and
+classifies the documents with each requested scenario:
+
+- ``cli``: ``agentic-classify --processes N`` (``Pool.map``)
+- ``stream``: ``agentic-classify --stream --processes N`` (``imap_unordered``)
+- ``async``: ``aclassify_many`` in a single process with ``max_concurrency=C``
+
+Every scenario runs in a fresh subprocess with an in-memory checkpoint store, so
+no results are reused between scenarios. The report gives documents per second,
+per-document latency percentiles (from the pipeline metrics) and peak RSS.
+
+    python benchmarks/run_benchmarks.py --documents 200 --processes 4 8 \\
+        --concurrency 32 128 --latency-scale 0.1 --json results.json
+
+Pass ``--baseline`` with the JSON of an earlier run to fail (exit code 1) when a
+scenario's throughput drops by more than ``--max-regression``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from fake_gemini import DOCUMENT_GROUPS, STAGES, add_server_arguments
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+SOURCE_DIR = BENCHMARKS_DIR.parent / "src"
+
+_CLI_COMMAND = (
+    "from agentic_document_classifier.cli.classify_documents import main; main()"
+)
+_RSS_SAMPLE_SECONDS = 0.05
+
+
+@dataclass
+class ScenarioResult:
+    name: str
+    documents: int
+    errors: int
+    seconds: float
+    docs_per_second: float
+    p50: float
+    p95: float
+    p99: float
+    peak_rss_mib: float
+    peak_total_rss_mib: float | None
+
+
+# ============================================================================
+# Synthetic documents
+# ============================================================================
+
+
+def write_synthetic_pdf(path: Path, group: str, pages: int, nonce: str) -> None:
+    """Write a small valid PDF whose pages carry a ``benchmark-group`` marker."""
+    objects: list[bytes] = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"",  # Pages, filled in below
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_numbers: list[int] = []
+    for page in range(pages):
+        text = f"benchmark-group: {group} page {page + 1} nonce {nonce}"
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode()
+        objects.append(
+            b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+        )
+        content_number = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>"
+            % content_number
+        )
+        page_numbers.append(len(objects))
+    kids = b" ".join(b"%d 0 R" % number for number in page_numbers)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, pages)
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets: list[int] = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref_offset = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        output += b"%010d 00000 n \n" % offset
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1,
+        xref_offset,
+    )
+    path.write_bytes(output)
+
+
+def generate_corpus(
+    directory: Path, documents: int, max_pages: int, run: str
+) -> list[str]:
+    paths: list[str] = []
+    for index in range(documents):
+        group = DOCUMENT_GROUPS[index % len(DOCUMENT_GROUPS)]
+        pages = index % max_pages + 1
+        path = directory / f"doc_{index:05d}.pdf"
+        write_synthetic_pdf(path, group, pages, f"{run}-{index}")
+        paths.append(str(path))
+    return paths
+
+
+# ============================================================================
+# Measurement
+# ============================================================================
+
+
+def _process_tree_rss(root: int) -> int:
+    """Total RSS in bytes of ``root`` and its descendants (Linux only)."""
+    children: dict[int, list[int]] = {}
+    rss: dict[int, int] = {}
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    for entry in os.scandir("/proc"):
+        if not entry.name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry.name}/stat", "rb") as handle:
+                fields = handle.read().rsplit(b")", 1)[1].split()
+        except OSError:
+            continue
+        pid = int(entry.name)
+        children.setdefault(int(fields[1]), []).append(pid)
+        rss[pid] = int(fields[21]) * page_size
+
+    total = 0
+    pending = [root]
+    while pending:
+        pid = pending.pop()
+        total += rss.get(pid, 0)
+        pending.extend(children.get(pid, []))
+    return total
+
+
+def _run_measured(
+    command: list[str], env: dict[str, str], log_path: Path
+) -> tuple[float, int, float, int | None]:
+    """Run ``command``; return (seconds, exit code, peak RSS MiB, peak tree RSS)."""
+    sample_tree = Path("/proc/self/stat").exists()
+    peak_tree = 0
+    with open(log_path, "wb") as log:
+        start = time.perf_counter()
+        process = subprocess.Popen(
+            command, env=env, stdout=subprocess.DEVNULL, stderr=log
+        )
+        done = threading.Event()
+
+        def _sample() -> None:
+            nonlocal peak_tree
+            while not done.wait(_RSS_SAMPLE_SECONDS):
+                peak_tree = max(peak_tree, _process_tree_rss(process.pid))
+
+        sampler = threading.Thread(target=_sample, daemon=True)
+        if sample_tree:
+            sampler.start()
+        _, status, usage = os.wait4(process.pid, 0)
+        seconds = time.perf_counter() - start
+        done.set()
+        process.returncode = os.waitstatus_to_exitcode(status)
+
+    # ru_maxrss is in KiB on Linux and bytes on macOS.
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return (
+        seconds,
+        process.returncode,
+        usage.ru_maxrss / divisor,
+        peak_tree if sample_tree else None,
+    )
+
+
+def _document_latencies(metrics_path: Path) -> tuple[list[float], int]:
+    latencies: list[float] = []
+    errors = 0
+    if not metrics_path.exists():
+        return latencies, errors
+    with open(metrics_path, encoding="utf-8") as handle:
+        for line in handle:
+            record = json.loads(line)
+            if record["event"] != "document":
+                continue
+            latencies.append(record["wall_time"])
+            errors += record["error"] is not None
+    return latencies, errors
+
+
+def _percentiles(values: list[float]) -> tuple[float, float, float]:
+    if not values:
+        return 0.0, 0.0, 0.0
+    if len(values) == 1:
+        return values[0], values[0], values[0]
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return cuts[49], cuts[94], cuts[98]
+
+
+def run_scenario(
+    name: str,
+    command: list[str],
+    files: list[str],
+    env: dict[str, str],
+    workdir: Path,
+) -> ScenarioResult:
+    metrics_path = workdir / f"{name}.metrics.jsonl"
+    log_path = workdir / f"{name}.log"
+    command = [*command, "--metrics-jsonl", str(metrics_path), "--", *files]
+
+    seconds, exit_code, peak_rss, peak_tree = _run_measured(command, env, log_path)
+    if exit_code != 0:
+        log_tail = log_path.read_text(encoding="utf-8", errors="replace")[-2000:]
+        raise RuntimeError(f"Scenario {name} exited with {exit_code}:\n{log_tail}")
+
+    latencies, errors = _document_latencies(metrics_path)
+    p50, p95, p99 = _percentiles(latencies)
+    return ScenarioResult(
+        name=name,
+        documents=len(files),
+        errors=errors + len(files) - len(latencies),
+        seconds=seconds,
+        docs_per_second=len(files) / seconds,
+        p50=p50,
+        p95=p95,
+        p99=p99,
+        peak_rss_mib=peak_rss,
+        peak_total_rss_mib=peak_tree / 2**20 if peak_tree is not None else None,
+    )
+
+
+# ============================================================================
+# Runner
+# ============================================================================
+
+
+def _start_fake_server(args: argparse.Namespace) -> tuple[subprocess.Popen[str], str]:
+    command = [
+        sys.executable,
+        str(BENCHMARKS_DIR / "fake_gemini.py"),
+        *(f"--{stage}-latency={getattr(args, f'{stage}_latency')}" for stage in STAGES),
+        f"--latency-scale={args.latency_scale}",
+        f"--error-rate={args.error_rate}",
+        f"--throttle-rate={args.throttle_rate}",
+        f"--retry-after={args.retry_after}",
+    ]
+    if args.seed is not None:
+        command.append(f"--seed={args.seed}")
+
+    server = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    assert server.stdout is not None
+    url = server.stdout.readline().strip()
+    if not url:
+        server.kill()
+        raise RuntimeError("The fake Gemini server did not start.")
+    return server, url
+
+
+def _scenario_env(url: str) -> dict[str, str]:
+    env = dict(os.environ)
+    env.update(
+        GEMINI_BASE_URL=url,
+        GOOGLE_API_KEY="benchmark",
+        CHECKPOINT_BACKEND="memory",
+        PYTHONPATH=os.pathsep.join(
+            filter(None, [str(SOURCE_DIR), os.environ.get("PYTHONPATH")])
+        ),
+    )
+    env.pop("GEMINI_CONTEXT_CACHE", None)
+    env.pop("DEBUG", None)
+    return env
+
+
+def _scenarios(args: argparse.Namespace) -> list[tuple[str, list[str]]]:
+    """Scenario names and commands; the document paths are appended later."""
+    scenarios: list[tuple[str, list[str]]] = []
+    cli = [sys.executable, "-c", _CLI_COMMAND]
+    for processes in args.processes:
+        if "cli" in args.modes:
+            scenarios.append(
+                (f"cli-p{processes}", [*cli, "--processes", str(processes)])
+            )
+        if "stream" in args.modes:
+            scenarios.append(
+                (
+                    f"stream-p{processes}",
+                    [*cli, "--stream", "--processes", str(processes)],
+                )
+            )
+    if "async" in args.modes:
+        for concurrency in args.concurrency:
+            scenarios.append(
+                (
+                    f"async-c{concurrency}",
+                    [
+                        sys.executable,
+                        str(Path(__file__).resolve()),
+                        "--async-worker",
+                        "--concurrency",
+                        str(concurrency),
+                    ],
+                )
+            )
+    return scenarios
+
+
+def _print_report(results: list[ScenarioResult]) -> None:
+    header = (
+        f"{'scenario':<14} {'docs':>5} {'errors':>6} {'docs/s':>8} "
+        f"{'p50 s':>7} {'p95 s':>7} {'p99 s':>7} {'RSS MiB':>8} {'tree MiB':>9}"
+    )
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        tree = (
+            f"{result.peak_total_rss_mib:9.1f}"
+            if result.peak_total_rss_mib is not None
+            else f"{'-':>9}"
+        )
+        print(
+            f"{result.name:<14} {result.documents:>5} {result.errors:>6} "
+            f"{result.docs_per_second:>8.2f} {result.p50:>7.2f} {result.p95:>7.2f} "
+            f"{result.p99:>7.2f} {result.peak_rss_mib:>8.1f} {tree}"
+        )
+
+
+def _regressions(
+    results: list[ScenarioResult], baseline_path: Path, max_regression: float
+) -> list[str]:
+    baseline = {
+        entry["name"]: entry
+        for entry in json.loads(baseline_path.read_text(encoding="utf-8"))["results"]
+    }
+    messages: list[str] = []
+    for result in results:
+        previous = baseline.get(result.name)
+        if previous is None:
+            continue
+        floor = previous["docs_per_second"] * (1 - max_regression)
+        if result.docs_per_second < floor:
+            messages.append(
+                f"{result.name}: {result.docs_per_second:.2f} docs/s, "
+                f"baseline {previous['docs_per_second']:.2f} docs/s"
+            )
+    return messages
+
+
+def _async_worker(args: argparse.Namespace) -> None:
+    from agentic_document_classifier import aclassify_many
+    from agentic_document_classifier.metrics import (
+        JsonLinesMetricsExporter,
+        add_metrics_hook,
+    )
+
+    add_metrics_hook(JsonLinesMetricsExporter(args.metrics_jsonl))
+    _ = asyncio.run(aclassify_many(args.files, max_concurrency=args.concurrency[0]))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Offline throughput benchmarks against a fake Gemini server",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    _ = parser.add_argument(
+        "--documents", type=int, default=100, help="Synthetic documents per scenario"
+    )
+    _ = parser.add_argument(
+        "--max-pages", type=int, default=5, help="Pages per document cycle 1..N"
+    )
+    _ = parser.add_argument(
+        "--modes",
+        nargs="+",
+        choices=("cli", "stream", "async"),
+        default=["cli", "stream", "async"],
+    )
+    _ = parser.add_argument(
+        "--processes", type=int, nargs="+", default=[1, 4, 8], help="CLI process counts"
+    )
+    _ = parser.add_argument(
+        "--concurrency",
+        type=int,
+        nargs="+",
+        default=[16, 64],
+        help="aclassify_many concurrency limits",
+    )
+    _ = parser.add_argument("--json", type=Path, help="Write results to this file")
+    _ = parser.add_argument(
+        "--baseline", type=Path, help="Compare throughput with an earlier --json file"
+    )
+    _ = parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=0.1,
+        help="Allowed throughput drop against --baseline (default: 0.1)",
+    )
+    add_server_arguments(parser)
+
+    # Internal: run aclassify_many in a scenario subprocess.
+    _ = parser.add_argument(
+        "--async-worker", action="store_true", help=argparse.SUPPRESS
+    )
+    _ = parser.add_argument("--metrics-jsonl", help=argparse.SUPPRESS)
+    _ = parser.add_argument("files", nargs="*", help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+    if args.async_worker:
+        _async_worker(args)
+        return
+
+    server, url = _start_fake_server(args)
+    results: list[ScenarioResult] = []
+    try:
+        with tempfile.TemporaryDirectory(prefix="ag_classifier_bench_") as directory:
+            workdir = Path(directory)
+            env = _scenario_env(url)
+            for name, command in _scenarios(args):
+                # A fresh corpus per scenario keeps dedup and checkpoints out of
+                # the measurement.
+                corpus_dir = workdir / name
+                corpus_dir.mkdir()
+                files = generate_corpus(
+                    corpus_dir,
+                    args.documents,
+                    args.max_pages,
+                    f"{name}-{time.time_ns()}",
+                )
+                print(f"▶ {name}", file=sys.stderr)
+                results.append(run_scenario(name, command, files, env, workdir))
+    finally:
+        server.terminate()
+        _ = server.wait()
+
+    print()
+    _print_report(results)
+
+    if args.json:
+        payload = {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "documents": args.documents,
+            "latency_scale": args.latency_scale,
+            "results": [asdict(result) for result in results],
+        }
+        _ = args.json.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+        print(f"\n💾 Results saved to: {args.json}")
+
+    if args.baseline:
+        regressions = _regressions(results, args.baseline, args.max_regression)
+        if regressions:
+            print("\n❌ Throughput regressions:")
+            for message in regressions:
+                print(f"  {message}")
+            sys.exit(1)
+        print("\n✅ No throughput regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Per-call cost of turning a response model into the request's Gemini schema.
+
+google-genai converts ``GenerateContentConfig.response_schema`` on every call.
+For each output model this compares what the SDK does with the pydantic class
+(JSON schema generation, ``$defs`` inlining, validation into a `Schema`) with
+what it does with the cached `Schema` from
+`agentic_document_classifier.schemas.response_schema`, and reports the time
+saved per call. Both paths must produce the same wire schema; the run fails
+(exit code 1) if they differ.
+
+    python benchmarks/schema_overhead.py --repeat 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from google import genai  # noqa: E402
+from google.genai import _transformers as genai_transformers  # noqa: E402
+
+from agentic_document_classifier.schemas import (  # noqa: E402
+    output_models,
+    response_schema,
+)
+
+
+@dataclass
+class SchemaOverheadResult:
+    model: str
+    class_ms: float
+    cached_ms: float
+    saved_ms: float
+    identical: bool
+
+
+def _median_ms(call: Callable[[], Any], repeat: int) -> float:
+    timings: list[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        _ = call()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    _ = parser.add_argument(
+        "--repeat", type=int, default=100, help="Calls per model (default: 100)"
+    )
+    _ = parser.add_argument("--json", type=Path, help="Write results to this file")
+    args = parser.parse_args()
+    repeat: int = args.repeat  # pyright: ignore[reportAny]
+
+    # No request is sent; the client only selects the API-mode checks.
+    client = genai.Client(api_key="benchmark")
+    results: list[SchemaOverheadResult] = []
+    for model in output_models():
+        schema = response_schema(model)
+        from_class = genai_transformers.t_schema(client, model)
+        from_cache = genai_transformers.t_schema(client, schema)
+        class_ms = _median_ms(
+            lambda: genai_transformers.t_schema(client, model), repeat
+        )
+        cached_ms = _median_ms(
+            lambda: genai_transformers.t_schema(client, schema), repeat
+        )
+        results.append(
+            SchemaOverheadResult(
+                model=model.__name__,
+                class_ms=class_ms,
+                cached_ms=cached_ms,
+                saved_ms=class_ms - cached_ms,
+                identical=from_class is not None
+                and from_cache is not None
+                and from_class.model_dump(exclude_none=True)
+                == from_cache.model_dump(exclude_none=True),
+            )
+        )
+
+    print(f"{'model':<16} {'class ms':>9} {'cached ms':>10} {'saved ms':>9}")
+    for result in results:
+        flag = "" if result.identical else "  ✗ schemas differ"
+        print(
+            f"{result.model:<16} {result.class_ms:>9.2f} {result.cached_ms:>10.2f} "
+            f"{result.saved_ms:>9.2f}{flag}"
+        )
+
+    if args.json:
+        args.json.write_text(
+            json.dumps([asdict(result) for result in results], indent=2),
+            encoding="utf-8",
+        )
+
+    if not all(result.identical for result in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,10 +9,35 @@ __version__ = "0.4.1"
 __author__ = "Agentic Document Classifier Team"
 __description__ = "Intelligent document classification system using AI agents"
 
-from .agents import classify_document
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .agents import aclassify_document, aclassify_many, classify_document
+    from .batch import classify_batch
+
+# The pipeline (google-genai and the pydantic models) is imported on first use,
+# so that `agentic-classify --version` and `--help` start without it.
+_LAZY_EXPORTS = {
+    "classify_document": "agents",
+    "aclassify_document": "agents",
+    "aclassify_many": "agents",
+    "classify_batch": "batch",
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _LAZY_EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(f".{_LAZY_EXPORTS[name]}", __name__), name)
+    globals()[name] = value
+    return value
 
 
 __all__ = [
     "classify_document",
+    "aclassify_document",
+    "aclassify_many",
+    "classify_batch",
     "__version__",
 ]
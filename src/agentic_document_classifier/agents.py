@@ -2,24 +2,72 @@
 Gemini-powered agents for document classification using direct Google AI API access.
 """
 
+import asyncio
+import contextvars
+import functools
 import hashlib
+import io
+import json
+import mmap
 import os
-from enum import Enum
+import sqlite3
+import time
+from collections.abc import Awaitable, Callable, Iterable, Iterator, Mapping
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
 from pathlib import Path
-from typing import TypeVar
+from typing import TYPE_CHECKING, Any, TypeVar, Union
 
+import httpx
 from google import genai
+from google.genai import errors as genai_errors
 from google.genai import types as genai_types
-from pydantic import BaseModel, Field, ValidationError
-
-from .prompts import load_prompt
-
+from pydantic import BaseModel, Field, ValidationError, create_model
+
+from .checkpoints import get_checkpoint_store
+from .content_budget import (
+    SPECIALIST_CONTENT_TOKENS,
+    TRIAGE_CONTENT_TOKENS,
+    specialist_excerpt,
+    triage_excerpt,
+)
+from .context_cache import get_prompt_context_cache, is_missing_cache_error
+from .metrics import (
+    record_checkpoint_hit,
+    record_escalation,
+    record_local_result,
+    record_reask,
+    record_repair,
+    record_usage,
+    track_document,
+    track_stage,
+)
+from .models import DocumentGroup, ErrorOutput, TriageOutput, TriageResponse
+from .page_split import SPLIT_MAX_CONCURRENCY, PageChunk, split_pages, split_pdf
+from .preclassifier import preclassify
+from .prompts import load_prompt, prompt_hash
+from .rate_limit import (
+    acall_with_retry,
+    call_with_retry,
+    estimate_pdf_tokens,
+    estimate_text_tokens,
+)
+from .repair import repair_enum_values, repair_json, validation_error_summary
+from .routing import DEFAULT_MODEL_NAME, model_tiers, policy_key
+from .schemas import response_schema
+from .text_layer import extract_text_pages, pages_to_markdown
 
 DEBUG = os.environ.get("DEBUG", "").lower() in ("true", "1", "yes")
 T = TypeVar("T", bound=BaseModel)
+R = TypeVar("R")
 
-DEFAULT_MODEL_NAME = os.environ.get("GEMINI_MODEL", "gemini-2.5-flash")
 GOOGLE_API_KEY = os.environ.get("GOOGLE_API_KEY")
+# Alternative API endpoint, e.g. a proxy or the fake server in benchmarks/
+GEMINI_BASE_URL = os.environ.get("GEMINI_BASE_URL")
+DEFAULT_MAX_CONCURRENCY = int(os.environ.get("GEMINI_MAX_CONCURRENCY", "64"))
+# Times an invalid structured answer that cannot be repaired locally is asked
+# again, with its validation errors, before escalating or failing the document.
+REASK_BUDGET = int(os.environ.get("GEMINI_REASK_BUDGET", "1"))
 
 # Lazy initialization of CLIENT - only when needed
 CLIENT: genai.Client | None = None
@@ -33,1067 +81,1370 @@ def _get_client() -> genai.Client:
             raise EnvironmentError(
                 "GOOGLE_API_KEY environment variable is required for Gemini API usage."
             )
-        CLIENT = genai.Client(api_key=GOOGLE_API_KEY)  # pyright: ignore[reportConstantRedefinition]
+        http_options = (
+            genai_types.HttpOptions(base_url=GEMINI_BASE_URL)
+            if GEMINI_BASE_URL
+            else None
+        )
+        CLIENT = genai.Client(  # pyright: ignore[reportConstantRedefinition]
+            api_key=GOOGLE_API_KEY, http_options=http_options
+        )
     return CLIENT
 
 
-CHECKPOINT_DIRECTORY = Path("/tmp/ag_classifier")
+def _checkpoint_key(
+    step: int, identifier: str, suffix: str = ".json", variant: str | None = None
+) -> str:
+    name = f"{identifier}_step_{step}"
+    if variant:
+        name = f"{name}_{variant}"
+    return f"{name}{suffix}"
+
 
+def _checkpoint_variant(
+    prompt_digest: str, model_name: str, response_model: type, *settings: object
+) -> str:
+    """
+    Invalidation key for checkpoints that depend on a prompt and a model.
 
-def _checkpoint_path(step: int, identifier: str, suffix: str = ".json") -> Path:
-    return CHECKPOINT_DIRECTORY / f"{identifier}_step_{step}{suffix}"
+    Changing the prompt text, the Gemini model (or routing policy), the output
+    schema name or one of ``settings``, such as the content budget, yields a
+    different key, so stale checkpoints are ignored instead of reused.
+    """
+    digest = hashlib.sha256()
+    parts = (model_name, response_model.__name__, prompt_digest, *map(str, settings))
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+
+def _load_checkpoint(key: str) -> str | None:
+    try:
+        return get_checkpoint_store().get(key)
+    except (OSError, sqlite3.Error) as error:
+        if DEBUG:
+            print(f"Failed to load checkpoint {key}: {error}")
+        return None
 
 
-def _store_checkpoint(path: Path, payload: str) -> None:
+def _store_checkpoint(key: str, payload: str) -> None:
     try:
-        path.parent.mkdir(parents=True, exist_ok=True)
-        with path.open("w", encoding="utf-8") as file_handle:
-            _ = file_handle.write(payload)
-    except OSError as error:
+        get_checkpoint_store().put(key, payload)
+    except (OSError, sqlite3.Error) as error:
         if DEBUG:
-            print(f"Failed to store checkpoint {path}: {error}")
+            print(f"Failed to store checkpoint {key}: {error}")
 
 
 # ============================================================================
-# Data Models
+# Specialist Prompt Configuration
 # ============================================================================
 
 
-# Definição do Enum para os grupos de documentos permitidos
-class DocumentGroup(str, Enum):
+class _SpecialistConfig(Mapping[DocumentGroup, tuple[str, type[BaseModel]]]):
     """
-    Enumeração para os grupos de documentos predefinidos.
+    Prompt name and output model per document group.
+
+    Each group's models module is imported the first time its entry is read;
+    membership tests and iteration over the groups import nothing.
     """
 
-    DOCUMENTOS_COMERCIAIS = "DOCUMENTOS_COMERCIAIS"
-    DOCUMENTOS_ADUANEIROS = "DOCUMENTOS_ADUANEIROS"
-    DOCUMENTOS_FRETE = "DOCUMENTOS_FRETE"
-    DOCUMENTOS_FISCAIS = "DOCUMENTOS_FISCAIS"
-    DOCUMENTOS_BANCARIOS = "DOCUMENTOS_BANCARIOS"
-    DOCUMENTOS_RH = "DOCUMENTOS_RH"
-    OUTROS_DOCUMENTOS = "OUTROS_DOCUMENTOS"
-
-
-class ErrorOutput(BaseModel):
-    localizacao_ficheiro: str = Field(description="Ecoado da entrada.")
-    erro: str = Field(description="Descrição do erro.")
-    grupo_documento: str | None = Field(
-        default=None,
-        description="O valor recebido no campo grupo_documento da entrada.",
-    )
-    notas_triagem: str | None = Field(
-        default=None, description="Nota explicativa sobre a falha na triagem."
-    )
-    notas_classificacao: str | None = Field(
-        default=None, description="Nota explicativa sobre a falha na classificação."
-    )
+    def __init__(self, entries: dict[DocumentGroup, tuple[str, str, str]]) -> None:
+        self._entries = entries
+        self._loaded: dict[DocumentGroup, tuple[str, type[BaseModel]]] = {}
+
+    def __getitem__(self, group: DocumentGroup) -> tuple[str, type[BaseModel]]:
+        if group not in self._loaded:
+            prompt_filename, module_name, model_name = self._entries[group]
+            module = import_module(f"{__package__}.models.{module_name}")
+            self._loaded[group] = (prompt_filename, getattr(module, model_name))
+        return self._loaded[group]
+
+    def __contains__(self, group: object) -> bool:
+        return group in self._entries
+
+    def __iter__(self) -> Iterator[DocumentGroup]:
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+SPECIALIST_AGENT_CONFIG = _SpecialistConfig(
+    {
+        DocumentGroup.DOCUMENTOS_BANCARIOS: (
+            "banking_classifier_prompt",
+            "banking",
+            "BankingOutput",
+        ),
+        DocumentGroup.DOCUMENTOS_ADUANEIROS: (
+            "customs_classifier_prompt",
+            "customs",
+            "CustomsOutput",
+        ),
+        DocumentGroup.DOCUMENTOS_COMERCIAIS: (
+            "invoice_classifier_prompt",
+            "invoice",
+            "InvoiceOutput",
+        ),
+        DocumentGroup.DOCUMENTOS_FISCAIS: (
+            "taxes_classifier_prompt",
+            "taxes",
+            "TaxesOutput",
+        ),
+        DocumentGroup.DOCUMENTOS_FRETE: (
+            "freight_classifier_prompt",
+            "freight",
+            "FreightOutput",
+        ),
+        DocumentGroup.DOCUMENTOS_RH: ("hr_classifier_prompt", "hr", "HrOutput"),
+    }
+)
+
+
+def _parse_single_pass_groups(value: str) -> frozenset[DocumentGroup]:
+    names = {name.strip().upper() for name in value.split(",") if name.strip()}
+    if names == {"ALL"}:
+        return frozenset(SPECIALIST_AGENT_CONFIG)
+
+    groups: set[DocumentGroup] = set()
+    for name in names:
+        try:
+            group = DocumentGroup(name)
+        except ValueError:
+            raise ValueError(f"Unknown document group in SINGLE_PASS_GROUPS: {name}")
+        if group in SPECIALIST_AGENT_CONFIG:
+            groups.add(group)
+    return frozenset(groups)
+
+
+# Groups classified by a single triage+specialist call (see `_run_single_pass`).
+# Empty by default: every document goes through separate triage and specialist calls.
+SINGLE_PASS_GROUPS = _parse_single_pass_groups(os.environ.get("SINGLE_PASS_GROUPS", ""))
 
 
 # ============================================================================
-# Triage Agent Data Models
+# Document Loading
 # ============================================================================
 
 
-class TriageOutput(BaseModel):
-    localizacao_ficheiro: str = Field(
-        ..., description="Localização original do ficheiro."
-    )
-    grupo_documento: DocumentGroup = Field(
-        ..., description="Grupo ao qual o documento foi atribuído."
-    )
-    numero_documento: str = Field(
-        ..., description="Código único que identifica o documento específico."
-    )
-    data_emissao: str = Field(
-        ...,
-        description="Data em que o documento foi criado, emitido ou a data de referência (Formato yyyy-MM-dd).",
-    )
-    hora_emissao: str | None = Field(
-        None, description="Hora de emissão do documento (Opcional, Formato HH:mm)."
-    )
-    notas_triagem: str = Field(
-        ...,
-        description="Notas que justificam a escolha da categoria (Texto livre, Português Europeu).",
-    )
-    conteudo: str = Field(..., description="Conteúdo do ficheiro em formato Markdown.")
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class _PdfDocument:
+    """
+    A PDF memory-mapped once and shared by every step that needs its bytes.
+
+    The identifier is a BLAKE2b digest computed chunk by chunk over the mapping,
+    so hashing does not copy the file onto the heap. `read` copies the bytes only
+    when a step actually has to upload them.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._file = path.open("rb")
+        self.size = os.fstat(self._file.fileno()).st_size
+        # Zero-length files cannot be memory-mapped.
+        self._mapping = (
+            mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            if self.size
+            else None
+        )
+        self.identifier = f"{self._digest()}{self.size}"
+
+    def _digest(self) -> str:
+        digest = hashlib.blake2b(digest_size=16)
+        if self._mapping is not None:
+            with memoryview(self._mapping) as view:
+                for offset in range(0, self.size, _HASH_CHUNK_SIZE):
+                    digest.update(view[offset : offset + _HASH_CHUNK_SIZE])
+        return digest.hexdigest()
+
+    def read(self) -> bytes:
+        return self._mapping[:] if self._mapping is not None else b""
+
+    def stream(self) -> mmap.mmap | io.BytesIO:
+        """A seekable binary stream over the mapping, without copying it."""
+        if self._mapping is None:
+            return io.BytesIO()
+        _ = self._mapping.seek(0)
+        return self._mapping
+
+    def close(self) -> None:
+        if self._mapping is not None:
+            self._mapping.close()
+        self._file.close()
+
+    def __enter__(self) -> "_PdfDocument":
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.close()
+
+
+def file_identifier(path: str) -> str:
+    """
+    Content identifier of a PDF, as used for checkpoints and deduplication.
+
+    Two files with the same bytes always share an identifier, whatever their paths.
+    """
+    with _PdfDocument(Path(path)) as document:
+        return document.identifier
 
 
 # ============================================================================
-# Banking Agent
+# Gemini Helpers
 # ============================================================================
-class TipoDocumentoBancario(str, Enum):
-    EXTRACTO_BANCARIO = "EXTRACTO_BANCARIO"
-    COMPROVATIVO_TRANSFERENCIA_BANCARIA = "COMPROVATIVO_TRANSFERENCIA_BANCARIA"
-    COMPROVATIVO_TRANSFERENCIA_ATM = "COMPROVATIVO_TRANSFERENCIA_ATM"
-    COMPROVATIVO_TRANSFERENCIA_MULTICAIXA_EXPRESS = (
-        "COMPROVATIVO_TRANSFERENCIA_MULTICAIXA_EXPRESS"
-    )
-    COMPROVATIVO_PAGAMENTO = "COMPROVATIVO_PAGAMENTO"
-    OUTRO_DOCUMENTO_BANCARIO = "OUTRO_DOCUMENTO_BANCARIO"
 
 
-class MetadadosComunsBancario(BaseModel):
-    numero_operacao: str = Field(
-        ...,
-        description="Identificador único da operação ou documento interno do banco (ex: número de transacção, número de registo do movimento).",
-    )
-    entidade_emissora: str = Field(
-        ...,
-        description="Nome do banco ou instituição financeira que emitiu o documento.",
-    )
-    nome_ordenante: str = Field(
-        ..., description="Nome completo ou razão social do cliente/titular da conta."
-    )
-    iban_ordenante: str | None = Field(
-        ...,
-        description="Número de Identificação Bancária Internacional (IBAN) da conta do cliente.",
-    )
-    numero_conta_ordenante: str = Field(
-        ...,
-        description="Número da conta bancária do cliente (pode ser um formato interno do banco, diferente do IBAN).",
-    )
-    observacoes: str | None = Field(
-        default=None,
-        description="Quaisquer observações, notas ou descrições adicionais relevantes encontradas no corpo do documento.",
-    )
+def _extract_response_text(response: genai_types.GenerateContentResponse) -> str:
+    """
+    Extract textual content from a Gemini response object.
+    """
+    text = getattr(response, "text", None)
+    if text:
+        return text
 
+    for candidate in getattr(response, "candidates", []):
+        content = getattr(candidate, "content", None)
+        if not content:
+            continue
+        for part in getattr(content, "parts", []):
+            part_text = getattr(part, "text", None)
+            if part_text:
+                return part_text
 
-class MetadadosExtractoBancario(BaseModel):
-    entidade_emissora: str = Field(
-        ...,
-        description="Nome do banco ou instituição financeira que emitiu o documento.",
-    )
-    nome_cliente: str = Field(
-        ..., description="Nome completo ou razão social do cliente/titular da conta."
-    )
-    numero_conta: str = Field(
-        ...,
-        description="Número da conta bancária do cliente (pode ser um formato interno do banco, diferente do IBAN).",
-    )
-    observacoes: str | None = Field(
-        default=None,
-        description="Quaisquer observações, notas ou descrições adicionais relevantes encontradas no corpo do documento.",
-    )
-    saldo_inicial: float = Field(
-        ..., description="O saldo da conta no início do período do extracto."
-    )
-    saldo_final: float = Field(
-        ..., description="O saldo da conta no final do período do extracto."
-    )
-    periodo_referencia_inicio: str = Field(
-        ...,
-        description='A data de início do intervalo de datas a que o extracto se refere. Formato: "yyyy-MM-dd".',
-    )
-    periodo_referencia_fim: str = Field(
-        ...,
-        description='A data de fim do intervalo de datas a que o extracto se refere. Formato: "yyyy-MM-dd".',
-    )
+    raise ValueError("Gemini response did not contain any textual content.")
 
 
-class MetadadosComprovativoTransferenciaBancaria(MetadadosComunsBancario):
-    nome_beneficiario: str = Field(
-        ..., description="Nome do beneficiário da transferência."
-    )
-    iban_beneficiario: str = Field(..., description="IBAN da conta do beneficiário.")
-    montante: float = Field(..., description="O montante total transferido.")
-    moeda: str = Field(
-        ...,
-        description='Moeda da transferência. Formato: Código de moeda (ex: "AOA", "USD", "EUR").',
-    )
-    referencia_transaccao: str = Field(
-        ..., description="Código único de identificação da transacção bancária."
-    )
-    finalidade_transferencia: str | None = Field(
-        default=None,
-        description="Descrição da finalidade da transferência, se mencionada.",
-    )
+def _cached_prompt(client: genai.Client, model: str, system_prompt: str) -> str | None:
+    cache = get_prompt_context_cache()
+    if cache is None:
+        return None
+    return cache.cached_content_name(client, model, system_prompt)
 
 
-class MetadadosComprovativoTransferenciaATM(MetadadosComunsBancario):
-    numero_caixa: str = Field(
-        ..., description="Número da caixa (ATM) onde foi realizada a transferência."
-    )
-    montante: float = Field(..., description="O montante total transferido.")
-    iban_destino: str = Field(..., description="IBAN da conta de destino dos fundos.")
-    referencia_transaccao: str | None = Field(
-        default=None,
-        description="Referência ou código da transacção gerada pelo terminal.",
-    )
-    movimento_cartao: str | None = Field(
-        default=None, description="Número do movimento do cartão, se disponível."
-    )
+async def _acached_prompt(
+    client: genai.Client, model: str, system_prompt: str
+) -> str | None:
+    cache = get_prompt_context_cache()
+    if cache is None:
+        return None
+    return await cache.acached_content_name(client, model, system_prompt)
 
 
-class MetadadosComprovativoTransferenciaMulticaixaExpress(MetadadosComunsBancario):
-    telefone_beneficiario: str | None = Field(
-        default=None,
-        description='Número de telefone do beneficiário da transferência Multicaixa Express. Formato: Numérico (ex: "923123456").',
-    )
-    montante: float = Field(..., description="O montante total transferido.")
+def _forget_cached_prompt(model: str, system_prompt: str) -> None:
+    cache = get_prompt_context_cache()
+    if cache is not None:
+        cache.invalidate(model, system_prompt)
 
 
-class MetadadosComprovativoPagamento(MetadadosComunsBancario):
-    montante: float = Field(..., description="O montante total pago.")
-    entidade_pagamento: str | None = Field(
-        default=None, description="Nome da entidade ou empresa que recebeu o pagamento."
-    )
-    referencia_pagamento: str = Field(
-        ...,
-        description="Uma referência única para o pagamento (ex: número de fatura, referência de entidade).",
-    )
-    tipo_pagamento: str | None = Field(
-        default=None,
-        description='Descrição do tipo de pagamento ou serviço pago (ex: "Água", "Eletricidade", "Telecomunicações", "Imposto").',
-    )
+def _escalating(models: tuple[str, ...], attempt: Callable[[str], R]) -> R:
+    """
+    Return ``attempt(model)`` for the first of ``models`` whose answer is usable.
+
+    An unusable answer (`RuntimeError` or `ValueError`: empty, or not matching
+    the schema) is asked of the next model instead; the last model's error
+    propagates. API errors are retried by `call_with_retry` and never escalate.
+    """
+    for model in models[:-1]:
+        try:
+            return attempt(model)
+        except (RuntimeError, ValueError) as error:
+            _record_escalation(model, error)
+    return attempt(models[-1])
 
 
-class MetadadosOutroDocumentoBancario(MetadadosComunsBancario):
-    tipo_documento_especifico: str = Field(
-        ...,
-        description='Uma descrição textual mais detalhada do tipo de documento (ex: "Aviso de Débito por Comissão", "Confirmação de Alteração Contratual", "Carta Informativa").',
-    )
+async def _aescalating(
+    models: tuple[str, ...], attempt: Callable[[str], Awaitable[R]]
+) -> R:
+    """
+    Async counterpart of `_escalating`.
+    """
+    for model in models[:-1]:
+        try:
+            return await attempt(model)
+        except (RuntimeError, ValueError) as error:
+            _record_escalation(model, error)
+    return await attempt(models[-1])
 
 
-class BankingOutput(BaseModel):
-    localizacao_ficheiro: str = Field(
-        description="O caminho ou identificador da origem do documento digital (ecoado da entrada)."
-    )
-    grupo_documento: str = Field(
-        description='O grupo a que o documento pertence. Para este contexto, será sempre "DOCUMENTOS_BANCARIOS" (ecoado da entrada).'
-    )
-    numero_documento: str = Field(
-        description="Um código identificador do documento processado, que pode ser o numero_documento da entrada ou um identificador atribuído durante o processamento."
-    )
-    data_emissao: str = Field(
-        description='A data em que o documento foi criado, emitido, ou a data principal a que a informação do documento se refere (ecoado da entrada ou extraído se a entrada não o fornecer e estiver presente no conteúdo). Formato: "yyyy-MM-dd".'
-    )
-    hora_emissao: str | None = Field(
-        default=None,
-        description='A hora de emissão do documento (ecoado da entrada ou extraído se a entrada não o fornecer e estiver presente no conteúdo). Omitir se não estiver presente. Formato: "HH:mm".',
-    )
-    notas_triagem: str | None = Field(
-        default=None,
-        description="Notas explicativas com uma descrição do conteúdo do documento ou observações da triagem (ecoado da entrada).",
-    )
-    tipo_documento: TipoDocumentoBancario = Field(
-        description="A classificação final do tipo de documento bancário."
-    )
-    notas_classificacao: str = Field(
-        description="Justificação detalhada para a classificação do documento, redigida em português europeu (pré-acordo de 1990)."
-    )
-    metadados_documento: (
-        MetadadosExtractoBancario
-        | MetadadosComprovativoTransferenciaBancaria
-        | MetadadosComprovativoTransferenciaATM
-        | MetadadosComprovativoTransferenciaMulticaixaExpress
-        | MetadadosComprovativoPagamento
-        | MetadadosOutroDocumentoBancario
-    ) = Field(
-        description="Um objeto que contém metadados específicos extraídos do conteúdo do documento."
-    )
+def _record_escalation(model: str, error: Exception) -> None:
+    record_escalation()
+    if DEBUG:
+        print(f"Unusable answer from {model}, escalating: {error}")
 
 
-# ============================================================================
-# Customs Agent Data Models
-# ============================================================================
-class TipoDocumentoAduaneiro(str, Enum):
-    DOCUMENTO_UNICO_PROVISORIO = "DOCUMENTO_UNICO_PROVISORIO"
-    DOCUMENTO_UNICO = "DOCUMENTO_UNICO"
-    NOTA_VALOR = "NOTA_VALOR"
-    NOTA_LIQUIDACAO = "NOTA_LIQUIDACAO"
-    RECIBO = "RECIBO"
-    NOTA_DESALFANDEGAMENTO = "NOTA_DESALFANDEGAMENTO"
-    OUTRO_DOCUMENTO_ADUANEIRO = "OUTRO_DOCUMENTO_ADUANEIRO"
-
-
-class MetadadosComunsAduaneiro(BaseModel):
-    nif_importador: str | None = Field(
-        default=None, description="NIF do importador. Formato: Cadeia numérica."
-    )
-    nome_importador: str | None = Field(
-        default=None, description="Nome do importador. Formato: Texto livre."
-    )
-    entidade_emissora: str | None = Field(
-        default=None,
-        description="Entidade que emitiu o documento. Formato: Texto livre.",
-    )
-    observacoes: str | None = Field(
-        default=None, description="Observações gerais. Formato: Texto livre."
+def _structured_config(
+    system_prompt: str,
+    response_model: type[BaseModel],
+    cached_content: str | None = None,
+) -> genai_types.GenerateContentConfig:
+    # A cached content already carries the system prompt; sending both is rejected.
+    return genai_types.GenerateContentConfig(
+        system_instruction=None if cached_content else system_prompt,
+        cached_content=cached_content,
+        response_mime_type="application/json",
+        response_schema=response_schema(response_model),
+        temperature=0.2,
     )
 
 
-class MetadadosDocumentoUnicoProvisorio(MetadadosComunsAduaneiro):
-    numero_licenca: str = Field(
-        ..., description="Número da licença. (Actualiza numero_documento de topo)."
-    )
-    data_licenciamento: str = Field(
-        ..., description='Data de licenciamento. Formato: "yyyy-MM-dd".'
-    )
-    valor: float | None = Field(default=None, description="Valor associado ao DUP.")
+def _validate_structured_payload(payload: str, response_model: type[T]) -> T:
+    try:
+        return response_model.model_validate_json(payload)
+    except ValidationError as error:
+        if DEBUG:
+            print("Failed to parse structured response:")
+            print(payload)
+        raise RuntimeError(
+            f"Failed to validate Gemini response for {response_model.__name__}: {error}"
+        ) from error
 
 
-class MetadadosDocumentoUnico(MetadadosComunsAduaneiro):
-    referencia_registo: str = Field(
-        ...,
-        description='Referência de registo aduaneiro. Extraída ou construída no formato "yyyy R NNNN[NN]". Se o conteudo apresentar uma "Customs Reference" (ou etiqueta similar) apenas com o padrão "R NNNN[NN]", o ano (yyyy) deve ser prefixado a partir da data_emissao do documento fornecida na entrada.',
-    )
-    origem_mercadoria: str = Field(..., description="País de origem.")
-    total_facturado: float = Field(..., description="Valor total facturado.")
-    manifesto: str = Field(..., description="Número do manifesto.")
-    moeda: str | None = Field(default=None, description='Código da moeda (ex: "USD").')
-    numero_licenca: str | None = Field(
-        default=None, description="Número da licença (18 dígitos numéricos)."
-    )
-    taxa_cambio: float | None = Field(default=None, description="Taxa de câmbio.")
+def _validate_structured_data(data: Any, response_model: type[T]) -> T:
+    """
+    Like `_validate_structured_payload`, for a payload that is already parsed.
 
+    Enum near-misses in ``data`` are repaired (see `repair_enum_values`).
+    """
+    try:
+        return response_model.model_validate(data)
+    except ValidationError as error:
+        failure = error
+    if repair_enum_values(data, failure):
+        try:
+            result = response_model.model_validate(data)
+        except ValidationError as error:
+            failure = error
+        else:
+            record_repair()
+            return result
 
-class MetadadosNotaValor(BaseModel):
-    entidade_emissora: str | None = Field(
-        default=None,
-        description="Entidade que emitiu o documento. Formato: Texto livre.",
-    )
-    observacoes: str | None = Field(
-        default=None, description="Observações gerais. Formato: Texto livre."
-    )
-    referencia_registo: str = Field(
-        ...,
-        description='Extraída _exclusivamente_ do localizacao_ficheiro, no formato "yyyy R NNNN[NN]".',
-    )
-    valor_factura: float = Field(..., description="Valor da factura.")
-    valor_aduaneiro: float = Field(..., description="Valor aduaneiro definido.")
-    frete_externo: float = Field(..., description="Valor do frete.")
+    if DEBUG:
+        print("Failed to parse structured response:")
+        print(data)
+    raise RuntimeError(
+        f"Failed to validate Gemini response for {response_model.__name__}: {failure}"
+    ) from failure
 
 
-class MetadadosNotaLiquidacaoAduaneiro(MetadadosComunsAduaneiro):
-    referencia_registo: str = Field(
-        ...,
-        description="Referência de registo aduaneiro no formato 'yyyy R NNNN[NN]', fortemente esperada.",
-    )
-    prazo_limite_pagamento: str = Field(
-        ..., description='Data limite para pagamento. Formato: "yyyy-MM-dd".'
-    )
-    total_a_pagar: float = Field(..., description="Valor total a pagar.")
-    rupe: str = Field(..., description="Referência Única de Pagamento ao Estado.")
+def _repair_structured_payload(
+    payload: str, response_model: type[T]
+) -> tuple[T, str] | None:
+    """The result of the locally repaired ``payload`` and its JSON, or None."""
+    try:
+        data = repair_json(payload)
+    except ValueError:
+        return None
+    try:
+        result = response_model.model_validate(data)
+    except ValidationError as error:
+        if not repair_enum_values(data, error):
+            return None
+        try:
+            result = response_model.model_validate(data)
+        except ValidationError:
+            return None
 
+    record_repair()
+    if DEBUG:
+        print(f"Repaired invalid response for {response_model.__name__}")
+    return result, json.dumps(data, ensure_ascii=False)
 
-class MetadadosReciboAduaneiro(MetadadosComunsAduaneiro):
-    referencia_registo: str = Field(
-        ...,
-        description="Referência de registo aduaneiro no formato 'yyyy R NNNN[NN]', fortemente esperada.",
-    )
-    numero_recibo: str = Field(..., description="Número do recibo.")
-    valor_total_liquidado: float = Field(..., description="Valor total pago.")
-    rupe: str = Field(..., description="RUPE liquidada.")
 
+def _validate_or_repair(payload: str, response_model: type[T]) -> tuple[T, str]:
+    """
+    Validate ``payload``, repairing it locally when it is invalid (see `repair`).
 
-class MetadadosNotaDesalfandegamento(MetadadosComunsAduaneiro):
-    referencia_registo: str = Field(
-        ...,
-        description="Referência de registo aduaneiro no formato 'yyyy R NNNN[NN]', fortemente esperada.",
-    )
-    data_desalfandegamento: str = Field(
-        ..., description='Data de desalfandegamento. Formato: "yyyy-MM-dd".'
+    Returns:
+        The result and the payload to checkpoint: the repaired JSON when a
+        repair was needed
+    """
+    try:
+        return _validate_structured_payload(payload, response_model), payload
+    except RuntimeError:
+        repaired = _repair_structured_payload(payload, response_model)
+        if repaired is None:
+            raise
+        return repaired
+
+
+def _reask_message(user_message: str, error: RuntimeError) -> str:
+    cause = error.__cause__
+    details = (
+        validation_error_summary(cause)
+        if isinstance(cause, ValidationError)
+        else str(error)
     )
-    referencia_liquidacao: str | None = Field(
-        default=None, description="Referência à liquidação (pode ser RUPE)."
+    return (
+        f"{user_message}\n\n"
+        "A resposta anterior não respeita o esquema de saída:\n"
+        f"{details}\n\n"
+        "Responde de novo com o JSON completo e válido."
     )
 
 
-class MetadadosOutroDocumentoAduaneiro(MetadadosComunsAduaneiro):
-    tipo_documento_especifico: str = Field(
-        ..., description='Descrição textual do tipo (ex: "Licença de Exportação").'
-    )
+def _with_reasks(
+    user_message: str,
+    generate: Callable[[str], str],
+    parse: Callable[[str], tuple[R, str]],
+) -> tuple[R, str]:
+    """
+    ``parse(generate(user_message))``, asking again while the answer is invalid.
 
+    An answer ``parse`` rejects with a `RuntimeError` is asked again with its
+    validation errors appended to ``user_message``, up to ``REASK_BUDGET`` times.
+    """
+    message = user_message
+    for _ in range(REASK_BUDGET):
+        try:
+            return parse(generate(message))
+        except RuntimeError as error:
+            record_reask()
+            if DEBUG:
+                print(f"Invalid response, asking again: {error}")
+            message = _reask_message(user_message, error)
+    return parse(generate(message))
 
-class CustomsOutput(BaseModel):
-    localizacao_ficheiro: str = Field(
-        ...,
-        description="O caminho ou identificador da origem do documento digital (ecoado da entrada).",
-    )
-    grupo_documento: str = Field(
-        ..., description='Sempre "DOCUMENTOS_ADUANEIROS" (ecoado da entrada).'
-    )
-    numero_documento: str = Field(
-        ...,
-        description="Identificador único do documento. Ecoado da entrada, excepto para DOCUMENTO_UNICO_PROVISORIO e NOTA_VALOR, onde é substituído conforme instruções específicas.",
-    )
-    data_emissao: str = Field(
-        ...,
-        description='Data de emissão do documento da entrada (ecoada). Formato: "yyyy-MM-dd".',
-    )
-    hora_emissao: str | None = Field(
-        default=None,
-        description='Hora de emissão da entrada (ecoada). Omitir se não presente/nula. Formato: "HH:mm".',
-    )
-    notas_triagem: str = Field(
-        ..., description="Notas da triagem da entrada (ecoadas)."
-    )
-    tipo_documento: TipoDocumentoAduaneiro = Field(
-        ..., description="A classificação final."
-    )
-    notas_classificacao: str = Field(
-        ...,
-        description="Justificação detalhada para a classificação, em português europeu (pré-AO1990).",
-    )
 
-    metadados_documento: (
-        MetadadosDocumentoUnicoProvisorio
-        | MetadadosDocumentoUnico
-        | MetadadosNotaValor
-        | MetadadosNotaLiquidacaoAduaneiro
-        | MetadadosReciboAduaneiro
-        | MetadadosNotaDesalfandegamento
-        | MetadadosOutroDocumentoAduaneiro
-    ) = Field(..., description="Metadados específicos extraídos.")
+async def _awith_reasks(
+    user_message: str,
+    generate: Callable[[str], Awaitable[str]],
+    parse: Callable[[str], tuple[R, str]],
+) -> tuple[R, str]:
+    """
+    Async counterpart of `_with_reasks`.
+    """
+    message = user_message
+    for _ in range(REASK_BUDGET):
+        try:
+            return parse(await generate(message))
+        except RuntimeError as error:
+            record_reask()
+            if DEBUG:
+                print(f"Invalid response, asking again: {error}")
+            message = _reask_message(user_message, error)
+    return parse(await generate(message))
 
 
-# ============================================================================
-# Freight Agent Data Models
-# ============================================================================
+def _generate_structured_payload(
+    system_prompt: str,
+    user_message: str,
+    response_model: type[BaseModel],
+    model: str = DEFAULT_MODEL_NAME,
+) -> str:
+    """
+    Invoke the Gemini model requesting JSON output shaped by a Pydantic model.
 
+    A call rejected because the cached system prompt expired or was deleted is
+    made once more, with a recreated cache or the prompt inline.
+    """
+    client = _get_client()
 
-class TipoDocumentoFrete(str, Enum):
-    CARTA_DE_PORTE = "CARTA_DE_PORTE"
-    CONHECIMENTO_DE_EMBARQUE = "CONHECIMENTO_DE_EMBARQUE"
-    CERTIFICADO_DE_EMBARQUE = "CERTIFICADO_DE_EMBARQUE"
-    OUTRO_DOCUMENTO_DE_FRETE = "OUTRO_DOCUMENTO_DE_FRETE"
+    def generate(cached_content: str | None) -> Any:
+        config = _structured_config(system_prompt, response_model, cached_content)
+        return call_with_retry(
+            lambda: client.models.generate_content(
+                model=model, config=config, contents=[user_message]
+            ),
+            estimate_text_tokens(system_prompt, user_message),
+        )
 
+    cached_content = _cached_prompt(client, model, system_prompt)
+    try:
+        response = generate(cached_content)
+    except genai_errors.APIError as error:
+        if cached_content is None or not is_missing_cache_error(error):
+            raise
+        _forget_cached_prompt(model, system_prompt)
+        response = generate(_cached_prompt(client, model, system_prompt))
+    record_usage(response, model)
+    return _extract_response_text(response)
 
-class MetadadosComunsFrete(BaseModel):
-    fornecedor: str = Field(
-        ...,
-        description='Nome ou identificação do fornecedor da mercadoria (pode aparecer no conteúdo como "Shipper" ou "Vendor").',
-    )
-    nome_consignatario: str = Field(..., description="Nome do consignatário.")
-    nif_consignatario: str = Field(
-        ..., description="Número de Identificação Fiscal do consignatário."
-    )
-    observacoes: str | None = Field(
-        default=None, description="Observações gerais presentes no documento."
-    )
 
+async def _agenerate_structured_payload(
+    system_prompt: str,
+    user_message: str,
+    response_model: type[BaseModel],
+    model: str = DEFAULT_MODEL_NAME,
+) -> str:
+    """
+    Async counterpart of `_generate_structured_payload` using the aio Gemini client.
+    """
+    client = _get_client()
 
-class MetadadosCartaDePorte(MetadadosComunsFrete):
-    aeroporto_origem: str = Field(
-        ...,
-        description="Código IATA ou nome do aeroporto de onde a carga foi expedida.",
-    )
-    aeroporto_destino: str = Field(
-        ...,
-        description="Código IATA ou nome do aeroporto para onde a carga se destina.",
-    )
-    numero_voo: str = Field(
-        ..., description="Identificador do voo em que a carga foi transportada."
-    )
-    nome_companhia_aerea: str = Field(
-        ..., description="Nome da companhia aérea responsável pelo transporte."
-    )
-    peso_bruto: float = Field(
-        ..., description="Peso total da mercadoria, incluindo embalagens."
-    )
-    numero_volumes: int = Field(
-        ..., description="Quantidade de volumes ou pacotes no embarque."
-    )
-    numero_viagem: str = Field(
-        ...,
-        description="Número da viagem (pode ser um identificador adicional ao número de voo ou um número de rotação).",
-    )
+    async def generate(cached_content: str | None) -> Any:
+        config = _structured_config(system_prompt, response_model, cached_content)
+        return await acall_with_retry(
+            lambda: client.aio.models.generate_content(
+                model=model, config=config, contents=[user_message]
+            ),
+            estimate_text_tokens(system_prompt, user_message),
+        )
 
+    cached_content = await _acached_prompt(client, model, system_prompt)
+    try:
+        response = await generate(cached_content)
+    except genai_errors.APIError as error:
+        if cached_content is None or not is_missing_cache_error(error):
+            raise
+        # The cache lock may be held by a thread creating a cache.
+        await asyncio.to_thread(_forget_cached_prompt, model, system_prompt)
+        response = await generate(await _acached_prompt(client, model, system_prompt))
+    record_usage(response, model)
+    return _extract_response_text(response)
 
-class MetadadosConhecimentoDeEmbarque(MetadadosComunsFrete):
-    nome_navio: str = Field(
-        ..., description="Nome da embarcação que transporta a carga."
-    )
-    porto_origem: str = Field(
-        ..., description="Nome do porto de onde a carga foi expedida."
-    )
-    porto_destino: str = Field(
-        ..., description="Nome do porto para onde a carga se destina."
-    )
-    numero_contentor: str = Field(
-        ..., description="Identificação do contentor de transporte."
-    )
-    numero_selo: str = Field(
-        ..., description="Número do selo de segurança do contentor."
-    )
-    peso_liquido: float = Field(..., description="Peso da mercadoria sem embalagem.")
-    peso_bruto: float = Field(
-        ..., description="Peso total da mercadoria, incluindo embalagens."
+
+def _invoke_structured_model(
+    system_prompt: str,
+    user_message: str,
+    response_model: type[T],
+    models: tuple[str, ...] = (DEFAULT_MODEL_NAME,),
+) -> tuple[T, str]:
+    """
+    Invoke the Gemini model requesting JSON output and validate it against a Pydantic model.
+
+    An invalid answer is repaired locally or asked again (see `_with_reasks`);
+    an empty or still invalid one escalates to the next of ``models`` (see
+    `routing`).
+    """
+
+    def attempt(model: str) -> tuple[T, str]:
+        return _with_reasks(
+            user_message,
+            lambda message: _generate_structured_payload(
+                system_prompt, message, response_model, model
+            ),
+            lambda payload: _validate_or_repair(payload, response_model),
+        )
+
+    return _escalating(models, attempt)
+
+
+async def _ainvoke_structured_model(
+    system_prompt: str,
+    user_message: str,
+    response_model: type[T],
+    models: tuple[str, ...] = (DEFAULT_MODEL_NAME,),
+) -> tuple[T, str]:
+    """
+    Async counterpart of `_invoke_structured_model` using the aio Gemini client.
+    """
+
+    async def attempt(model: str) -> tuple[T, str]:
+        return await _awith_reasks(
+            user_message,
+            lambda message: _agenerate_structured_payload(
+                system_prompt, message, response_model, model
+            ),
+            lambda payload: _validate_or_repair(payload, response_model),
+        )
+
+    return await _aescalating(models, attempt)
+
+
+def _read_text_layer(
+    document: _PdfDocument,
+) -> tuple[list[str | None], list[PageChunk]] | None:
+    """
+    Pages of the PDF's embedded text layer and chunks of its pages without
+    text, or None when the whole document needs OCR.
+    """
+    pages, quality = extract_text_pages(document.stream())
+    if DEBUG and quality is not None:
+        print(
+            f"Text layer: {quality.pages_with_text}/{quality.pages} pages with text, "
+            f"{quality.characters_per_page:.0f} chars/page, "
+            f"sane glyphs {quality.sane_ratio:.2%} -> "
+            + ("using local extraction" if pages else "falling back to Gemini OCR")
+        )
+    if pages is None:
+        return None
+
+    missing = [number for number, text in enumerate(pages, start=1) if text is None]
+    chunks: list[PageChunk] = []
+    if missing:
+        chunks = split_pages(document.stream(), missing) or []
+        if len(chunks) != len(missing):
+            return None
+    return pages, chunks
+
+
+def _merge_text_layer(
+    pages: list[str | None], chunks: list[PageChunk], parts: list[str]
+) -> str:
+    converted = {chunk.first_page: part for chunk, part in zip(chunks, parts)}
+    if not converted:
+        record_local_result()
+    return pages_to_markdown(
+        [
+            text if text is not None else converted[number]
+            for number, text in enumerate(pages, start=1)
+        ]
     )
-    cubagem: float = Field(
-        ..., description="Volume da carga, geralmente em metros cúbicos (m³)."
+
+
+def _text_layer_markdown(document: _PdfDocument) -> str | None:
+    """
+    Markdown from the PDF's embedded text layer, or None when it needs OCR.
+
+    Pages without text are converted with Gemini OCR on their own.
+    """
+    text_layer = _read_text_layer(document)
+    if text_layer is None:
+        return None
+    pages, chunks = text_layer
+    return _merge_text_layer(pages, chunks, _ocr_chunks(document.path, chunks))
+
+
+async def _atext_layer_markdown(document: _PdfDocument) -> str | None:
+    """
+    Async counterpart of `_text_layer_markdown`.
+    """
+    text_layer = await asyncio.to_thread(_read_text_layer, document)
+    if text_layer is None:
+        return None
+    pages, chunks = text_layer
+    return _merge_text_layer(pages, chunks, await _aocr_chunks(document.path, chunks))
+
+
+def _ocr_request(
+    pdf_bytes: bytes, original_path: Path, chunk: PageChunk | None = None
+) -> tuple[genai_types.GenerateContentConfig, list[genai_types.Part | str], int]:
+    prompt = load_prompt("ocr_prompt")
+    config = genai_types.GenerateContentConfig(
+        system_instruction=prompt, response_mime_type="text/plain"
+    )
+    instruction = "Converte o documento em markdown."
+    if chunk is not None:
+        instruction = (
+            f"Converte em markdown as páginas {chunk.first_page} a "
+            f"{chunk.last_page} do documento."
+        )
+    contents: list[genai_types.Part | str] = [
+        genai_types.Part.from_bytes(data=pdf_bytes, mime_type="application/pdf"),
+        f"""{instruction}
+            Localização original do ficheiro: {original_path}""",
+    ]
+    estimated_tokens = estimate_text_tokens(prompt) + estimate_pdf_tokens(pdf_bytes)
+    return config, contents, estimated_tokens
+
+
+def _ocr_markdown(response: genai_types.GenerateContentResponse) -> str:
+    markdown = _extract_response_text(response)
+
+    if not markdown:
+        raise RuntimeError("Gemini OCR step returned empty content.")
+
+    return markdown
+
+
+def _generate_ocr_markdown(
+    model: str,
+    config: genai_types.GenerateContentConfig,
+    contents: list[genai_types.Part | str],
+    estimated_tokens: int,
+    extract: Callable[[genai_types.GenerateContentResponse], str],
+) -> str:
+    client = _get_client()
+    response = call_with_retry(
+        lambda: client.models.generate_content(
+            model=model, config=config, contents=contents
+        ),
+        estimated_tokens,
     )
-    numero_viagem: str = Field(..., description="Número da viagem do navio.")
+    record_usage(response, model)
+    return extract(response)
 
 
-class MetadadosCertificadoDeEmbarque(MetadadosComunsFrete):
-    awb_bl: str = Field(
-        ...,
-        description="Número do Air Waybill ou Bill of Lading associado ao certificado.",
+async def _agenerate_ocr_markdown(
+    model: str,
+    config: genai_types.GenerateContentConfig,
+    contents: list[genai_types.Part | str],
+    estimated_tokens: int,
+    extract: Callable[[genai_types.GenerateContentResponse], str],
+) -> str:
+    client = _get_client()
+    response = await acall_with_retry(
+        lambda: client.aio.models.generate_content(
+            model=model, config=config, contents=contents
+        ),
+        estimated_tokens,
     )
-    dup: str = Field(..., description="Número do Documento Único Provisório (DUP).")
+    record_usage(response, model)
+    return extract(response)
+
+
+def _split_for_ocr(document: _PdfDocument) -> list[PageChunk] | None:
+    chunks = split_pdf(document.stream())
+    if DEBUG and chunks is not None:
+        print(f"Split into {len(chunks)} page chunks for parallel OCR")
+    return chunks
 
 
-class MetadadosOutroDocumentoDeFrete(MetadadosComunsFrete):
-    tipo_documento_especifico: str | None = Field(
-        default=None,
-        description='Uma descrição textual do tipo de documento (ex: "Aviso de Chegada").',
+def _ocr_checkpoint_variant() -> str:
+    return _checkpoint_variant(
+        prompt_hash("ocr_prompt"), policy_key(model_tiers("ocr")), str
     )
 
 
-class FreightOutput(BaseModel):
-    localizacao_ficheiro: str = Field(
-        description="O caminho ou identificador da origem do documento digital (ecoado da entrada)."
+def _ocr_checkpoint_key(file_identifier: str) -> str:
+    return _checkpoint_key(
+        1, file_identifier, suffix=".md", variant=_ocr_checkpoint_variant()
     )
-    grupo_documento: str = Field(
-        description='O grupo a que o documento pertence. Para este contexto, será sempre "DOCUMENTOS_FRETE" (ecoado da entrada).'
+
+
+def _ocr_chunk_checkpoint_key(chunk: PageChunk) -> str:
+    # Keyed by page content, so identical pages are shared across documents.
+    return _ocr_checkpoint_key(f"pages-{chunk.digest}")
+
+
+def _load_ocr_chunk_checkpoint(chunk: PageChunk) -> str | None:
+    markdown = _load_checkpoint(_ocr_chunk_checkpoint_key(chunk))
+    if markdown is not None:
+        record_checkpoint_hit()
+    return markdown
+
+
+def _join_ocr_chunks(parts: list[str]) -> str:
+    # A blank page may legitimately come back empty; the document may not.
+    markdown = "\n\n".join(part.strip() for part in parts if part.strip())
+    if not markdown:
+        raise RuntimeError("Gemini OCR step returned empty content.")
+    return markdown
+
+
+def _ocr_chunk(original_path: Path, chunk: PageChunk) -> str:
+    markdown = _load_ocr_chunk_checkpoint(chunk)
+    if markdown is not None:
+        return markdown
+
+    config, contents, estimated_tokens = _ocr_request(
+        chunk.write(), original_path, chunk
     )
-    numero_documento: str = Field(
-        description="Um código único que identifica o documento específico (ecoado da entrada ou extraído/refinado do conteúdo)."
+    markdown = _escalating(
+        model_tiers("ocr"),
+        lambda model: _generate_ocr_markdown(
+            model, config, contents, estimated_tokens, _extract_response_text
+        ),
     )
-    data_emissao: str = Field(
-        description='A data em que o documento foi criado, emitido, ou a data a que a informação principal do documento se refere (ecoada da entrada ou extraída/refinada do conteúdo). Formato: "yyyy-MM-dd".'
+    _store_checkpoint(_ocr_chunk_checkpoint_key(chunk), markdown)
+    return markdown
+
+
+async def _aocr_chunk(original_path: Path, chunk: PageChunk) -> str:
+    markdown = _load_ocr_chunk_checkpoint(chunk)
+    if markdown is not None:
+        return markdown
+
+    config, contents, estimated_tokens = await asyncio.to_thread(
+        lambda: _ocr_request(chunk.write(), original_path, chunk)
     )
-    hora_emissao: str | None = Field(
-        default=None,
-        description='A hora de emissão do documento (ecoada da entrada ou extraída). Formato: "HH:mm".',
+    markdown = await _aescalating(
+        model_tiers("ocr"),
+        lambda model: _agenerate_ocr_markdown(
+            model, config, contents, estimated_tokens, _extract_response_text
+        ),
     )
-    notas_triagem: str = Field(
-        description="Notas explicativas com uma descrição do conteúdo do documento ou observações da triagem (ecoado da entrada)."
+    _store_checkpoint(_ocr_chunk_checkpoint_key(chunk), markdown)
+    return markdown
+
+
+def _ocr_chunks(original_path: Path, chunks: list[PageChunk]) -> list[str]:
+    """Markdown of each chunk, converted concurrently."""
+    if not chunks:
+        return []
+    workers = min(SPLIT_MAX_CONCURRENCY, len(chunks))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # Each worker runs in a copy of the current context so usage and
+        # retries are recorded against the OCR stage.
+        futures = [
+            executor.submit(
+                contextvars.copy_context().run, _ocr_chunk, original_path, chunk
+            )
+            for chunk in chunks
+        ]
+        return [future.result() for future in futures]
+
+
+async def _aocr_chunks(original_path: Path, chunks: list[PageChunk]) -> list[str]:
+    """Async counterpart of `_ocr_chunks`."""
+    semaphore = asyncio.Semaphore(SPLIT_MAX_CONCURRENCY)
+
+    async def _bounded(chunk: PageChunk) -> str:
+        async with semaphore:
+            return await _aocr_chunk(original_path, chunk)
+
+    return list(await asyncio.gather(*(_bounded(chunk) for chunk in chunks)))
+
+
+def _generate_markdown_from_pdf(document: _PdfDocument) -> str:
+    """
+    Convert a PDF document to Markdown using the Gemini API.
+
+    Large documents are split into page chunks converted concurrently (see
+    `page_split`).
+    """
+    chunks = _split_for_ocr(document)
+    if chunks is not None:
+        return _join_ocr_chunks(_ocr_chunks(document.path, chunks))
+
+    config, contents, estimated_tokens = _ocr_request(document.read(), document.path)
+    return _escalating(
+        model_tiers("ocr"),
+        lambda model: _generate_ocr_markdown(
+            model, config, contents, estimated_tokens, _ocr_markdown
+        ),
     )
-    tipo_documento: TipoDocumentoFrete = Field(
-        description="A classificação final do tipo de documento de frete."
+
+
+async def _agenerate_markdown_from_pdf(document: _PdfDocument) -> str:
+    """
+    Async counterpart of `_generate_markdown_from_pdf`.
+    """
+    chunks = await asyncio.to_thread(_split_for_ocr, document)
+    if chunks is not None:
+        return _join_ocr_chunks(await _aocr_chunks(document.path, chunks))
+
+    config, contents, estimated_tokens = await asyncio.to_thread(
+        lambda: _ocr_request(document.read(), document.path)
     )
-    notas_classificacao: str = Field(
-        description="Justificação detalhada para a classificação do documento."
+    return await _aescalating(
+        model_tiers("ocr"),
+        lambda model: _agenerate_ocr_markdown(
+            model, config, contents, estimated_tokens, _ocr_markdown
+        ),
     )
-    metadados_documento: (
-        MetadadosCartaDePorte
-        | MetadadosConhecimentoDeEmbarque
-        | MetadadosCertificadoDeEmbarque
-        | MetadadosOutroDocumentoDeFrete
-    ) = Field(
-        description="Um objecto que contém metadados específicos extraídos do conteúdo do documento."
+
+
+def _document_message(original_path: str, content: str) -> str:
+    return (
+        f"Localização original do ficheiro: {original_path}\n\n"
+        "Conteúdo do documento em Markdown:\n"
+        f"{content}"
     )
 
 
-# ============================================================================
-# HR Agent Data Models
-# ============================================================================
+def _triage_request(original_path: str, markdown_content: str) -> tuple[str, str]:
+    prompt = load_prompt("triage_prompt")
+    # Long documents are cut to the triage content budget (see `content_budget`).
+    user_message = _document_message(original_path, triage_excerpt(markdown_content))
+    return prompt, user_message
+
+
+def _with_content(
+    triage_response: TriageResponse, markdown_content: str
+) -> TriageOutput:
+    return TriageOutput(**dict(triage_response), conteudo=markdown_content)
+
+
+def _run_triage(
+    original_path: str,
+    markdown_content: str,
+) -> tuple[TriageOutput, str]:
+    """
+    Run triage and attach the content locally.
 
+    Returns the triage result and the model's payload, which holds only the
+    `TriageResponse` fields.
+    """
+    prompt, user_message = _triage_request(original_path, markdown_content)
+    triage_response, payload = _invoke_structured_model(
+        prompt, user_message, TriageResponse, model_tiers("triage")
+    )
+    return _with_content(triage_response, markdown_content), payload
 
-class HrDocumentType(str, Enum):
-    FOLHA_REMUNERACAO = "FOLHA_REMUNERACAO"
-    FOLHA_REMUNERACAO_INSS = "FOLHA_REMUNERACAO_INSS"
-    OUTRO_DOCUMENTO = "OUTRO_DOCUMENTO"
 
+def _local_triage(original_path: str, markdown_content: str) -> TriageOutput | None:
+    """
+    Triage result predicted locally by the pre-classifier, or None.
 
-class MetadadosFolhaRemuneracao(BaseModel):
-    mes_referencia: str = Field(
-        description="Mês e ano de referência. Formato de saída: 'yyyy-MM'."
-    )
-    nome_contribuinte: str = Field(
-        description="Nome ou designação social completa da entidade empregadora."
-    )
-    nif_contribuinte: str = Field(
-        description="Número de Identificação Fiscal (NIF) da entidade contribuinte."
+    Only confident predictions of groups with a specialist qualify: the
+    specialist extracts the document number and date the local result lacks.
+    """
+    prediction = preclassify(markdown_content)
+    if prediction is None or prediction.group not in SPECIALIST_AGENT_CONFIG:
+        return None
+    return TriageOutput(
+        localizacao_ficheiro=original_path,
+        grupo_documento=prediction.group,
+        numero_documento="",
+        data_emissao="",
+        notas_triagem=prediction.triage_notes(),
+        conteudo=markdown_content,
     )
 
 
-class MetadadosFolhaRemuneracaoINSS(MetadadosFolhaRemuneracao):
-    inscricao_inss: str = Field(
-        description="Número de inscrição da entidade contribuinte no Instituto Nacional de Segurança Social (INSS)."
+async def _arun_triage(
+    original_path: str,
+    markdown_content: str,
+) -> tuple[TriageOutput, str]:
+    prompt, user_message = _triage_request(original_path, markdown_content)
+    triage_response, payload = await _ainvoke_structured_model(
+        prompt, user_message, TriageResponse, model_tiers("triage")
     )
+    return _with_content(triage_response, markdown_content), payload
 
 
-class HrOutput(BaseModel):
-    localizacao_ficheiro: str = Field(description="Ecoado da entrada.")
-    grupo_documento: str = Field(description="Ecoado da entrada.")
-    numero_documento: str = Field(description="Ecoado da entrada.")
-    data_emissao: str = Field(description="Ecoado do campo data_emissao da entrada.")
-    hora_emissao: str = Field(description="Ecoado do campo hora_emissao da entrada.")
-    notas_triagem: str = Field(description="Ecoado da entrada.")
-    notas_classificacao: str = Field(
-        description="Justificação da classificação, em Português Europeu pré-1990. Obrigatório."
-    )
+def _specialist_request(
+    triage_result: TriageOutput,
+) -> tuple[str, str, type[BaseModel]]:
+    config = SPECIALIST_AGENT_CONFIG.get(triage_result.grupo_documento)
+    if not config:
+        raise ValueError(
+            f"No specialist configuration for document group {triage_result.grupo_documento}"
+        )
 
-    tipo_documento: HrDocumentType
-    metadados_documento: (
-        MetadadosFolhaRemuneracao | MetadadosFolhaRemuneracaoINSS | None
+    prompt_filename, response_model = config
+    prompt = load_prompt(prompt_filename)
+    content = specialist_excerpt(triage_result.conteudo, response_model)
+    if content is not triage_result.conteudo:
+        triage_result = triage_result.model_copy(update={"conteudo": content})
+    # Compact JSON: the content is the bulk of the message and is sent only here.
+    user_message = (
+        "Classifica este documento de acordo com o resultado da triagem.\n\n"
+        "Resultado da triagem em JSON:\n"
+        f"{triage_result.model_dump_json()}"
     )
+    return prompt, user_message, response_model
 
 
-# ============================================================================
-# Invoice Agent Data Models
-# ============================================================================
-
-
-class InvoiceDocumentType(str, Enum):
-    FACTURA_PRO_FORMA = "FACTURA_PRO_FORMA"
-    FACTURA_RECIBO = "FACTURA_RECIBO"
-    FACTURA = "FACTURA"
-    FACTURA_GLOBAL = "FACTURA_GLOBAL"
-    FACTURA_GENERICA = "FACTURA_GENERICA"
-    NOTA_DEBITO = "NOTA_DEBITO"
-    NOTA_CREDITO = "NOTA_CREDITO"
-    RECIBO = "RECIBO"
-    OUTRO_DOCUMENTO = "OUTRO_DOCUMENTO"
+def _run_specialist_classification(
+    triage_result: TriageOutput,
+) -> tuple[BaseModel, str]:
+    prompt, user_message, response_model = _specialist_request(triage_result)
+    models = model_tiers("specialist", triage_result.grupo_documento)
+    return _invoke_structured_model(prompt, user_message, response_model, models)
 
 
-class MetadadosComunsFactura(BaseModel):
-    nif_emitente: str = Field(
-        ...,
-        description="Número de identificação fiscal da entidade que emitiu o documento.",
-    )
-    nome_emitente: str = Field(
-        ..., description="Nome da entidade que emitiu o documento."
-    )
-    nif_cliente: str = Field(
-        ..., description="Número de identificação fiscal do cliente."
-    )
-    nome_cliente: str = Field(..., description="Nome do cliente.")
-    meio_pagamento: str = Field(..., description="Forma de pagamento.")
-    moeda: str = Field(
-        ...,
-        description="Código da moeda utilizada nos valores do documento (ISO 4217).",
+async def _arun_specialist_classification(
+    triage_result: TriageOutput,
+) -> tuple[BaseModel, str]:
+    prompt, user_message, response_model = _specialist_request(triage_result)
+    models = model_tiers("specialist", triage_result.grupo_documento)
+    return await _ainvoke_structured_model(prompt, user_message, response_model, models)
+
+
+def _ordered_groups(groups: frozenset[DocumentGroup]) -> list[DocumentGroup]:
+    return [group for group in SPECIALIST_AGENT_CONFIG if group in groups]
+
+
+@functools.lru_cache(maxsize=None)
+def _single_pass_model(groups: frozenset[DocumentGroup]) -> type[BaseModel]:
+    """Response schema of a single-pass call: one of the groups' outputs or triage."""
+    members = tuple(
+        SPECIALIST_AGENT_CONFIG[group][1] for group in _ordered_groups(groups)
+    ) + (TriageResponse,)
+    return create_model(
+        "SinglePassOutput",
+        resultado=(
+            Union[members],  # pyright: ignore[reportInvalidTypeArguments]
+            Field(
+                description="Resultado da classificação especializada ou, para os restantes grupos, da triagem."
+            ),
+        ),
     )
-    total_sem_iva: float = Field(..., description="Valor total do documento sem IVA.")
-    iva: float = Field(..., description="Valor total do IVA.")
-    total: float = Field(..., description="Valor total do documento.")
-    observacoes: str = Field(..., description="Observações adicionais.")
 
 
-class MetadadosProformaFactura(MetadadosComunsFactura):
-    validade: str = Field(
-        ..., description="Data de validade da proforma., formato=yyyy-MM-dd"
-    )
+def _single_pass_prompt(groups: frozenset[DocumentGroup]) -> str:
+    ordered = _ordered_groups(groups)
+    sections = [
+        load_prompt("single_pass_prompt").replace(
+            "{grupos}", ", ".join(f"`{group.value}`" for group in ordered)
+        ),
+        f"# Triagem\n\n{load_prompt('triage_prompt')}",
+    ]
+    for group in ordered:
+        prompt_filename, _ = SPECIALIST_AGENT_CONFIG[group]
+        sections.append(
+            f"# Classificação Especializada: {group.value}\n\n"
+            f"{load_prompt(prompt_filename)}"
+        )
+    return "\n\n---\n\n".join(sections)
 
 
-class MetadadosGlobalGenerica(MetadadosComunsFactura):
-    periodo_referencia_inicio: str = Field(
-        ..., description="Data de início do período de referência."
-    )
-    periodo_referencia_fim: str = Field(
-        ..., description="Data de fim do período de referência."
+def _single_pass_request(
+    original_path: str, markdown_content: str, groups: frozenset[DocumentGroup]
+) -> tuple[str, str, type[BaseModel]]:
+    response_model = _single_pass_model(groups)
+    # The specialists' budget: the call extracts their fields too.
+    user_message = _document_message(
+        original_path, specialist_excerpt(markdown_content, response_model)
     )
+    return _single_pass_prompt(groups), user_message, response_model
 
 
-class MetadadosNotaCredito(MetadadosComunsFactura):
-    motivo: str = Field(..., description="Motivo da nota de crédito.")
-    documento_origem: DocumentGroup = Field(
-        ..., description="Documento de origem da nota de crédito."
-    )
+def _parse_single_pass(
+    payload: str, groups: frozenset[DocumentGroup], markdown_content: str
+) -> BaseModel:
+    """
+    Validate a single-pass payload against the output model of its group.
 
+    The group the model chose decides the output model, so a specialist result
+    that fails its schema is reported instead of being read as a triage result.
+    Triage results get the content attached. Malformed JSON and enum near-misses
+    are repaired locally, so checkpoints hold the payload as received.
+    """
+    try:
+        data = json.loads(payload)
+    except json.JSONDecodeError as error:
+        try:
+            data = repair_json(payload)
+        except ValueError:
+            raise RuntimeError(
+                f"Failed to parse single-pass response: {error}"
+            ) from error
+        record_repair()
+
+    result = data.get("resultado", data) if isinstance(data, dict) else data
+    if isinstance(result, dict) and "tipo_documento" in result:
+        group = next(
+            (group for group in groups if group.value == result.get("grupo_documento")),
+            None,
+        )
+        if group is not None:
+            response_model = SPECIALIST_AGENT_CONFIG[group][1]
+            return _validate_structured_data(result, response_model)
 
-class MetadadosNotaDebito(MetadadosComunsFactura):
-    descricao: str = Field(..., description="Descrição da nota de débito.")
+    triage_response = _validate_structured_data(result, TriageResponse)
+    return _with_content(triage_response, markdown_content)
 
 
-class DetalheRecibo(BaseModel):
-    documento: str = Field(
-        ..., description="Identificador do documento (ex: factura) que está a ser pago."
-    )
-    facturado: float = Field(
-        ..., description="Valor total do documento original que estava pendente."
-    )
-    pago: float = Field(
-        ...,
-        description="Valor efectivamente pago referente a esse documento específico neste recibo.",
+def _run_single_pass(
+    original_path: str, markdown_content: str, groups: frozenset[DocumentGroup]
+) -> tuple[BaseModel, str]:
+    prompt, user_message, response_model = _single_pass_request(
+        original_path, markdown_content, groups
     )
 
+    def attempt(model: str) -> tuple[BaseModel, str]:
+        return _with_reasks(
+            user_message,
+            lambda message: _generate_structured_payload(
+                prompt, message, response_model, model
+            ),
+            lambda payload: (
+                _parse_single_pass(payload, groups, markdown_content),
+                payload,
+            ),
+        )
 
-class MetadadosRecibo(MetadadosComunsFactura):
-    detalhes: list[DetalheRecibo] = Field(..., description="Detalhes dos pagamentos.")
+    return _escalating(model_tiers("single_pass"), attempt)
 
 
-class InvoiceOutput(BaseModel):
-    localizacao_ficheiro: str = Field(description="Ecoado da entrada.")
-    grupo_documento: str = Field(description="Ecoado da entrada.")
-    numero_documento: str = Field(description="Ecoado da entrada.")
-    data_emissao: str = Field(description="Ecoado do campo data_emissao da entrada.")
-    hora_emissao: str = Field(description="Ecoado do campo hora_emissao da entrada.")
-    notas_triagem: str = Field(description="Ecoado da entrada.")
-    notas_classificacao: str = Field(
-        description="Justificação da classificação, em Português Europeu pré-1990. Obrigatório."
-    )
-    tipo_documento: InvoiceDocumentType
-    metadados_documento: (
-        MetadadosComunsFactura
-        | MetadadosProformaFactura
-        | MetadadosGlobalGenerica
-        | MetadadosNotaDebito
-        | MetadadosNotaCredito
-        | MetadadosRecibo
+async def _arun_single_pass(
+    original_path: str, markdown_content: str, groups: frozenset[DocumentGroup]
+) -> tuple[BaseModel, str]:
+    prompt, user_message, response_model = _single_pass_request(
+        original_path, markdown_content, groups
     )
 
+    async def attempt(model: str) -> tuple[BaseModel, str]:
+        return await _awith_reasks(
+            user_message,
+            lambda message: _agenerate_structured_payload(
+                prompt, message, response_model, model
+            ),
+            lambda payload: (
+                _parse_single_pass(payload, groups, markdown_content),
+                payload,
+            ),
+        )
 
-# ============================================================================
-# Taxes Agent Data Models
-# ============================================================================
-
+    return await _aescalating(model_tiers("single_pass"), attempt)
 
-class TipoDocumentoFiscal(str, Enum):
-    NOTA_LIQUIDACAO = "NOTA_LIQUIDACAO"
-    GUIA_PAGAMENTO_INSS = "GUIA_PAGAMENTO_INSS"
-    RECIBO_PAGAMENTO = "RECIBO_PAGAMENTO"
-    COMPROVATIVO_LIQUIDACAO = "COMPROVATIVO_LIQUIDACAO"
-    OUTRO_DOCUMENTO_FISCAL = "OUTRO_DOCUMENTO_FISCAL"
 
+# ============================================================================
+# Pipeline Steps
+# ============================================================================
 
-class ImpostoValor(str, Enum):
-    IMPOSTO_RENDIMENTO_TRABALHO_GRUPO_A = "IMPOSTO_RENDIMENTO_TRABALHO_GRUPO_A"
-    IMPOSTO_RENDIMENTO_TRABALHO_GRUPO_B = "IMPOSTO_RENDIMENTO_TRABALHO_GRUPO_B"
-    IMPOSTO_INDUTRIAL = "IMPOSTO_INDUTRIAL"
-    IMPOSTO_INDUSTRIAL_RETENCAO_FONTE = "IMPOSTO_INDUSTRIAL_RETENCAO_FONTE"
-    IMPOSTO_VALOR_ACRESCENTADO = "IMPOSTO_VALOR_ACRESCENTADO"
-    IMPOSTO_SELO = "IMPOSTO_SELO"
 
+def _debug_step_header(title: str) -> None:
+    if DEBUG:
+        print(f"\n{'=' * 60}")
+        print(title)
+        print(f"{'=' * 60}")
 
-class MetadadosComunsImposto(BaseModel):
-    nif_contribuinte: str = Field(
-        ...,
-        description="Número de Identificação Fiscal (NIF) do contribuinte ou entidade associada ao documento.",
-    )
-    nome_contribuinte: str = Field(
-        ..., description="Nome do contribuinte ou entidade associada ao documento."
-    )
-    entidade_emissora: str = Field(
-        ...,
-        description='A entidade que emitiu o documento (ex: "AGT", "INSS", nome do banco para um recibo).',
-    )
-    observacoes: str | None = Field(
-        default=None, description="Observações gerais presentes no documento."
-    )
 
+def _load_ocr_checkpoint(file_identifier: str) -> str | None:
+    markdown_content = _load_checkpoint(_ocr_checkpoint_key(file_identifier))
+    if markdown_content is None:
+        return None
 
-class MetadadosNotaLiquidacao(MetadadosComunsImposto):
-    documento_associado: str = Field(
-        ...,
-        description="Referência ao documento principal ou processo ao qual a nota de liquidação está associada.",
-    )
-    data_limite_pagamento: str = Field(
-        ...,
-        description='Data até à qual o pagamento deve ser efetuado. Formato: "yyyy-MM-dd".',
-    )
-    valor_total: float = Field(
-        ..., description="O montante total que está a ser liquidado ou é devido."
-    )
-    periodo_tributacao_mes: str | None = Field(
-        default=None,
-        description="Mês do período de tributação a que a liquidação se refere.",
-    )
-    referencia_pagamento: str = Field(
-        ...,
-        description="Código ou referência utilizada para efectuar o pagamento da guia.",
-    )
-    periodo_tributacao_ano: int = Field(
-        ..., description="Ano do período de tributação a que a liquidação se refere."
-    )
-    imposto: ImpostoValor = Field(..., description="Tipo do imposto liquidado.")
+    record_checkpoint_hit()
+    if DEBUG:
+        print("Loaded OCR result from checkpoint")
+    return markdown_content
 
 
-class MetadadosGuiaPagamentoINSS(MetadadosComunsImposto):
-    inscricao_inss: str = Field(
-        ..., description="Número de inscrição do contribuinte no INSS."
-    )
-    data_limite_pagamento: str | None = Field(
-        ...,
-        description='Data até à qual o pagamento deve ser efectuado (frequentemente referida como "Vencimento" no documento). Formato: "yyyy-MM-dd".',
-    )
-    valor_total: float | None = Field(
-        ..., description="Valor total das contribuições devidas ao INSS."
-    )
-    referencia_pagamento: str = Field(
-        ...,
-        description="Código ou referência utilizada para efectuar o pagamento da guia.",
-    )
-    periodo_tributacao_mes: str | None = Field(
-        default=None,
-        description="Mês do período de tributação a que a liquidação se refere.",
-    )
-    periodo_tributacao_ano: int = Field(
-        ..., description="Ano do período de tributação a que a liquidação se refere."
-    )
+def _finish_ocr_step(file_identifier: str, markdown_content: str, fresh: bool) -> None:
+    if fresh:
+        _store_checkpoint(_ocr_checkpoint_key(file_identifier), markdown_content)
+        if DEBUG:
+            print(f"OCR completed. Content length: {len(markdown_content)} characters")
+            print(f"First 200 chars: {markdown_content[:200]}...")
 
+    if DEBUG:
+        print(f"Using OCR content. Content length: {len(markdown_content)} characters")
 
-class MetadadosReciboPagamento(MetadadosComunsImposto):
-    documento_associado: str = Field(
-        ...,
-        description="Referência ao documento principal ou processo ao qual a nota de liquidação está associada.",
-    )
-    data_limite_pagamento: str = Field(
-        ...,
-        description='Data até à qual o pagamento deve ser efetuado. Formato: "yyyy-MM-dd".',
-    )
-    valor_total: float = Field(
-        ..., description="O montante total que está a ser liquidado ou é devido."
-    )
-    periodo_tributacao_mes: str | None = Field(
-        default=None,
-        description="Mês do período de tributação a que a liquidação se refere.",
-    )
-    periodo_tributacao_ano: int = Field(
-        ..., description="Ano do período de tributação a que a liquidação se refere."
-    )
-    imposto: ImpostoValor = Field(..., description="Tipo do imposto liquidado.")
-    data_pagamento: str | None = Field(
-        default=None,
-        description='A data em que o pagamento foi registado. Formato: "yyyy-MM-dd".',
-    )
-    referencia_pagamento: str = Field(
-        ...,
-        description="Referência Única de Pagamento ao Estado ou outra referência associada ao pagamento efectuado.",
-    )
-    forma_pagamento: str = Field(
-        ...,
-        description='Como o pagamento foi efetuado (ex: "Transferência Bancária", "Multicaixa", "Numerário").',
-    )
+    print("Step 1: OCR Processing ✓")
 
 
-class MetadadosComprovativoLiquidacao(MetadadosComunsImposto):
-    valor_total: float = Field(
-        ..., description="O montante total que está a ser liquidado ou é devido."
-    )
-    periodo_tributacao_mes: str | None = Field(
-        default=None,
-        description="Mês do período de tributação a que a liquidação se refere.",
-    )
-    periodo_tributacao_ano: int = Field(
-        ..., description="Ano do período de tributação a que a liquidação se refere."
+def _triage_checkpoint_key(file_identifier: str) -> str:
+    variant = _checkpoint_variant(
+        prompt_hash("triage_prompt"),
+        policy_key(model_tiers("triage")),
+        TriageResponse,
+        TRIAGE_CONTENT_TOKENS,
     )
-    imposto: ImpostoValor = Field(..., description="Tipo do imposto liquidado.")
+    return _checkpoint_key(2, file_identifier, variant=variant)
 
 
-class MetadadosOutroDocumentoFiscal(MetadadosComunsImposto):
-    tipo_documento_especifico: str | None = Field(
-        default=None,
-        description='Uma descrição textual do tipo de documento (ex: "Declaração de IRS", "Certidão de Dívida e Não Dívida", "Notificação Fiscal").',
-    )
-
+def _load_triage_checkpoint(
+    file_identifier: str, markdown_content: str
+) -> TriageOutput | None:
+    step_2_key = _triage_checkpoint_key(file_identifier)
+    payload = _load_checkpoint(step_2_key)
+    if payload is None:
+        return None
 
-class TaxesOutput(BaseModel):
-    localizacao_ficheiro: str = Field(
-        description="O caminho ou identificador da origem do documento digital (ecoado da entrada)."
-    )
-    grupo_documento: str = Field(
-        description='O grupo a que o documento pertence. Para este contexto, será sempre "DOCUMENTOS_FISCAIS" (ecoado da entrada).'
-    )
-    numero_documento: str = Field(
-        description="Identificador único de um documento fiscal (ecoado da entrada ou extraído se relevante)."
-    )
-    data_emissao: str = Field(
-        description='A data em que o documento foi emitido (ecoada da entrada ou extraída). Formato: "yyyy-MM-dd".'
-    )
-    hora_emissao: str | None = Field(
-        default=None,
-        description='A hora de emissão do documento (ecoada da entrada ou extraída). Formato: "HH:mm".',
-    )
-    notas_triagem: str = Field(
-        description="Notas explicativas com uma descrição do conteúdo do documento ou observações da triagem (ecoado da entrada)."
-    )
-    tipo_documento: TipoDocumentoFiscal = Field(
-        description="A classificação final do tipo de documento fiscal."
-    )
-    notas_classificacao: str = Field(
-        description="Justificação detalhada para a classificação do documento, redigida em português europeu (pré-acordo de 1990)."
-    )
-    metadados_documento: (
-        MetadadosNotaLiquidacao
-        | MetadadosGuiaPagamentoINSS
-        | MetadadosReciboPagamento
-        | MetadadosComprovativoLiquidacao
-        | MetadadosOutroDocumentoFiscal
-    ) = Field(
-        description="Um objeto que contém metadados específicos extraídos do conteúdo do documento."
-    )
+    # Checkpoints hold the model's fields only; older ones also carry the
+    # content, which is ignored in favour of the current OCR result.
+    try:
+        triage_response = TriageResponse.model_validate_json(payload)
+    except ValidationError as error:
+        if DEBUG:
+            print(f"Failed to load triage checkpoint {step_2_key}: {error}")
+        return None
 
+    record_checkpoint_hit()
+    if DEBUG:
+        print("Loaded triage classification from checkpoint")
+    return _with_content(triage_response, markdown_content)
 
-# ============================================================================
-# Utilities
-# ============================================================================
 
+def _finish_triage_step(
+    file_identifier: str, triage_result: TriageOutput, triage_json: str | None
+) -> None:
+    if triage_json is not None:
+        _store_checkpoint(_triage_checkpoint_key(file_identifier), triage_json)
 
-# ============================================================================
-# Specialist Prompt Configuration
-# ============================================================================
+    if DEBUG:
+        print(f"Document Group: {triage_result.grupo_documento}")
+        print(f"Document Number: {triage_result.numero_documento}")
+        print(f"Emission Date: {triage_result.data_emissao}")
+        print(f"Triage Notes: {triage_result.notas_triagem[:200]}...")
 
+    print("Step 2: Triage Classification ✓")
 
-SPECIALIST_AGENT_CONFIG: dict[DocumentGroup, tuple[str, type[BaseModel]]] = {
-    DocumentGroup.DOCUMENTOS_BANCARIOS: (
-        "banking_classifier_prompt",
-        BankingOutput,
-    ),
-    DocumentGroup.DOCUMENTOS_ADUANEIROS: (
-        "customs_classifier_prompt",
-        CustomsOutput,
-    ),
-    DocumentGroup.DOCUMENTOS_COMERCIAIS: (
-        "invoice_classifier_prompt",
-        InvoiceOutput,
-    ),
-    DocumentGroup.DOCUMENTOS_FISCAIS: ("taxes_classifier_prompt", TaxesOutput),
-    DocumentGroup.DOCUMENTOS_FRETE: ("freight_classifier_prompt", FreightOutput),
-    DocumentGroup.DOCUMENTOS_RH: ("hr_classifier_prompt", HrOutput),
-}
 
+def _local_triage_step(
+    original_path: str, file_identifier: str, markdown_content: str
+) -> TriageOutput | None:
+    triage_result = _local_triage(original_path, markdown_content)
+    if triage_result is None:
+        return None
 
-# ============================================================================
-# Gemini Helpers
-# ============================================================================
+    _debug_step_header("Step 2: Local Triage Classification")
+    with track_stage("triage"):
+        record_local_result()
+        # Not checkpointed: triage checkpoints hold Gemini's decisions only.
+        _finish_triage_step(file_identifier, triage_result, None)
+    return triage_result
 
 
-def _extract_response_text(response: genai_types.GenerateContentResponse) -> str:
-    """
-    Extract textual content from a Gemini response object.
-    """
-    text = getattr(response, "text", None)
-    if text:
-        return text
+def _needs_specialist(triage_result: TriageOutput) -> bool:
+    _debug_step_header(
+        f"Step 3: Specialized Classification - {triage_result.grupo_documento}"
+    )
 
-    for candidate in getattr(response, "candidates", []):
-        content = getattr(candidate, "content", None)
-        if not content:
-            continue
-        for part in getattr(content, "parts", []):
-            part_text = getattr(part, "text", None)
-            if part_text:
-                return part_text
+    if triage_result.grupo_documento not in SPECIALIST_AGENT_CONFIG:
+        # Return triage result for OUTROS_DOCUMENTOS
+        if DEBUG:
+            print("Document classified as OUTROS_DOCUMENTOS, returning triage result")
+        return False
 
-    raise ValueError("Gemini response did not contain any textual content.")
+    return True
 
 
-def _invoke_structured_model(
-    system_prompt: str,
-    user_message: str,
-    response_model: type[T],
-) -> tuple[T, str]:
-    """
-    Invoke the Gemini model requesting JSON output and validate it against a Pydantic model.
-    """
-    client = _get_client()
-    response = client.models.generate_content(
-        model=DEFAULT_MODEL_NAME,
-        config=genai_types.GenerateContentConfig(
-            system_instruction=system_prompt,
-            response_mime_type="application/json",
-            response_schema=response_model,
-            temperature=0.2,
-        ),
-        contents=[user_message],
+def _specialist_checkpoint_key(file_identifier: str, group: DocumentGroup) -> str:
+    prompt_filename, response_model = SPECIALIST_AGENT_CONFIG[group]
+    variant = _checkpoint_variant(
+        prompt_hash(prompt_filename),
+        policy_key(model_tiers("specialist", group)),
+        response_model,
+        SPECIALIST_CONTENT_TOKENS,
     )
+    return _checkpoint_key(3, file_identifier, variant=variant)
 
-    payload = _extract_response_text(response)
 
+def _load_specialist_checkpoint(
+    step_3_key: str, group: DocumentGroup
+) -> BaseModel | None:
+    payload = _load_checkpoint(step_3_key)
+    if payload is None:
+        return None
+
+    _, response_model = SPECIALIST_AGENT_CONFIG[group]
     try:
-        parsed = response_model.model_validate_json(payload)
+        final_result = response_model.model_validate_json(payload)
     except ValidationError as error:
         if DEBUG:
-            print("Failed to parse structured response:")
-            print(payload)
-        raise RuntimeError(
-            f"Failed to validate Gemini response for {response_model.__name__}: {error}"
-        ) from error
+            print(f"Failed to load specialist checkpoint {step_3_key}: {error}")
+        return None
+
+    record_checkpoint_hit()
+    if DEBUG:
+        print("Loaded specialist classification from checkpoint")
+    return final_result
+
+
+def _finish_specialist_step(
+    step_3_key: str, final_result: BaseModel, final_json: str | None
+) -> None:
+    if final_json is not None:
+        _store_checkpoint(step_3_key, final_json)
+
+    if DEBUG:
+        print("Classification completed successfully")
+        if hasattr(final_result, "tipo_documento"):
+            print(f"Document Type: {final_result.tipo_documento}")
+
+    print("Step 3: Specialized Classification ✓")
+
+
+def _single_pass_prompt_digest(groups: frozenset[DocumentGroup]) -> str:
+    # The combined prompt is built from these prompts for this group set, so
+    # their cached hashes identify it without building and hashing ~150 KB per
+    # document, and still follow `reload_prompts`.
+    ordered = _ordered_groups(groups)
+    names = ["single_pass_prompt", "triage_prompt"] + [
+        SPECIALIST_AGENT_CONFIG[group][0] for group in ordered
+    ]
+    digest = hashlib.sha256()
+    for part in [group.value for group in ordered] + list(map(prompt_hash, names)):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _single_pass_checkpoint_key(
+    file_identifier: str, groups: frozenset[DocumentGroup]
+) -> str:
+    variant = _checkpoint_variant(
+        _single_pass_prompt_digest(groups),
+        policy_key(model_tiers("single_pass")),
+        _single_pass_model(groups),
+        SPECIALIST_CONTENT_TOKENS,
+    )
+    return _checkpoint_key(3, file_identifier, variant=variant)
+
+
+def _load_single_pass_checkpoint(
+    step_key: str, groups: frozenset[DocumentGroup], markdown_content: str
+) -> BaseModel | None:
+    payload = _load_checkpoint(step_key)
+    if payload is None:
+        return None
 
-    return parsed, payload
-
-
-def _generate_markdown_from_pdf(pdf_path: Path) -> str:
-    """
-    Convert a PDF document to Markdown using the Gemini API.
-    """
-    prompt = load_prompt("ocr_prompt")
-    client = _get_client()
-
-    response = client.models.generate_content(
-        model=DEFAULT_MODEL_NAME,
-        config=genai_types.GenerateContentConfig(
-            system_instruction=prompt, response_mime_type="text/plain"
-        ),
-        contents=[
-            genai_types.Part.from_bytes(
-                data=pdf_path.read_bytes(), mime_type="application/pdf"
-            ),
-            f"""Converte o documento em markdown.
-                Localização original do ficheiro: {pdf_path}""",
-        ],
-    )
+    try:
+        result = _parse_single_pass(payload, groups, markdown_content)
+    except RuntimeError as error:
+        if DEBUG:
+            print(f"Failed to load single-pass checkpoint {step_key}: {error}")
+        return None
 
-    markdown = _extract_response_text(response)
+    record_checkpoint_hit()
+    if DEBUG:
+        print("Loaded single-pass classification from checkpoint")
+    return result
 
-    if not markdown:
-        raise RuntimeError("Gemini OCR step returned empty content.")
 
-    return markdown
+def _finish_single_pass_step(
+    step_key: str, result: BaseModel, payload: str | None
+) -> None:
+    if payload is not None:
+        _store_checkpoint(step_key, payload)
 
+    if DEBUG:
+        print(f"Document Group: {getattr(result, 'grupo_documento', None)}")
+        if hasattr(result, "tipo_documento"):
+            print(f"Document Type: {result.tipo_documento}")
 
-def _run_triage(
-    original_path: str,
-    markdown_content: str,
-) -> tuple[TriageOutput, str]:
-    prompt = load_prompt("triage_prompt")
-    user_message = (
-        f"Localização original do ficheiro: {original_path}\n\n"
-        "Conteúdo do documento em Markdown:\n"
-        f"{markdown_content}"
-    )
+    print("Step 2+3: Single-Pass Classification ✓")
 
-    return _invoke_structured_model(prompt, user_message, TriageOutput)
 
+def _classification_error(path: str, error: Exception) -> ErrorOutput:
+    error_msg = f"Classification error: {str(error)}"
+    if DEBUG:
+        print(f"\n{'=' * 90}")
+        print(f"ERROR: {error_msg}")
+        print(f"{'=' * 90}")
+        import traceback
 
-def _run_specialist_classification(
-    triage_result: TriageOutput,
-) -> tuple[BaseModel, str]:
-    config = SPECIALIST_AGENT_CONFIG.get(triage_result.grupo_documento)
-    if not config:
-        raise ValueError(
-            f"No specialist configuration for document group {triage_result.grupo_documento}"
-        )
+        traceback.print_exc()
 
-    prompt_filename, response_model = config
-    prompt = load_prompt(prompt_filename)
-    user_message = (
-        "Classifica este documento de acordo com o resultado da triagem.\n\n"
-        "Resultado da triagem em JSON:\n"
-        f"{triage_result.model_dump_json(indent=2)}"
+    return ErrorOutput(
+        localizacao_ficheiro=path,
+        erro=error_msg,
     )
 
-    return _invoke_structured_model(prompt, user_message, response_model)
-
 
 # ============================================================================
 # Main Classification Function
 # ============================================================================
 
 
+if TYPE_CHECKING:
+    from .models.banking import BankingOutput
+    from .models.customs import CustomsOutput
+    from .models.freight import FreightOutput
+    from .models.hr import HrOutput
+    from .models.invoice import InvoiceOutput
+    from .models.taxes import TaxesOutput
+
+# Forward references, so that naming the specialist models imports none of them.
+ClassificationResult = Union[
+    TriageOutput,
+    "BankingOutput",
+    "CustomsOutput",
+    "FreightOutput",
+    "HrOutput",
+    "InvoiceOutput",
+    "TaxesOutput",
+    ErrorOutput,
+]
+
+
 def classify_document(
     path: str,
-) -> (
-    TriageOutput
-    | BankingOutput
-    | CustomsOutput
-    | FreightOutput
-    | HrOutput
-    | InvoiceOutput
-    | TaxesOutput
-    | ErrorOutput
-):
+) -> ClassificationResult:
     """
     Main function to classify a document using programmatic delegation pattern.
 
+    Per-stage metrics are reported to the hooks registered with
+    `metrics.add_metrics_hook`.
+
     Args:
         path: Path to the PDF document
 
     Returns:
         Classification result with structured output
     """
+    with track_document(path) as metrics:
+        result = _classify_document(path)
+        if isinstance(result, ErrorOutput):
+            metrics.error = result.erro
+        return result
+
+
+def _classify_document(path: str) -> ClassificationResult:
     try:
         # ====================================================================
         # Step 1: OCR - Convert PDF to Markdown
         # ====================================================================
-        if DEBUG:
-            print(f"\n{'=' * 60}")
-            print("Step 1: OCR Processing")
-            print(f"{'=' * 60}")
+        _debug_step_header("Step 1: OCR Processing")
 
         pdf_path = Path(path)
         if not pdf_path.exists():
@@ -1102,114 +1453,235 @@ def classify_document(
                 erro=f"File not found: {path}",
             )
 
-        pdf_bytes = pdf_path.read_bytes()
-        file_size = len(pdf_bytes)
-        file_md5 = hashlib.md5(pdf_bytes).hexdigest()
-        file_identifier = f"{file_md5}{file_size}"
+        with track_stage("ocr"), _PdfDocument(pdf_path) as document:
+            file_identifier = document.identifier
+            markdown_content = _load_ocr_checkpoint(file_identifier)
+            fresh_ocr = markdown_content is None
+            if markdown_content is None:
+                markdown_content = _text_layer_markdown(document)
+            if markdown_content is None:
+                markdown_content = _generate_markdown_from_pdf(document)
+            _finish_ocr_step(file_identifier, markdown_content, fresh_ocr)
 
-        step_1_path = _checkpoint_path(1, file_identifier, suffix=".md")
-        if step_1_path.exists():
-            markdown_content = step_1_path.read_text(encoding="utf-8")
-            if DEBUG:
-                print("Loaded OCR result from checkpoint")
-        else:
-            markdown_content = _generate_markdown_from_pdf(pdf_path)
-            _store_checkpoint(step_1_path, markdown_content)
-            if DEBUG:
-                print(
-                    f"OCR completed. Content length: {len(markdown_content)} characters"
+        # ====================================================================
+        # Optional local triage, then optional single pass: triage and
+        # specialist in one call
+        # ====================================================================
+        groups = SINGLE_PASS_GROUPS
+        triage_result = _local_triage_step(path, file_identifier, markdown_content)
+        if groups and triage_result is None:
+            _debug_step_header("Step 2+3: Single-Pass Classification")
+
+            single_pass_key = _single_pass_checkpoint_key(file_identifier, groups)
+            with track_stage("single_pass"):
+                result = _load_single_pass_checkpoint(
+                    single_pass_key, groups, markdown_content
                 )
-                print(f"First 200 chars: {markdown_content[:200]}...")
+                payload: str | None = None
+                if result is None:
+                    result, payload = _run_single_pass(path, markdown_content, groups)
+                _finish_single_pass_step(single_pass_key, result, payload)
 
-        if DEBUG:
-            print(
-                f"Using OCR content. Content length: {len(markdown_content)} characters"
-            )
-
-        print("Step 1: OCR Processing ✓")
+            if not isinstance(result, TriageOutput):
+                return result  # pyright: ignore[reportReturnType]
+            # Triage-only answers (other groups) continue with the specialist.
+            triage_result = result
 
         # ====================================================================
         # Step 2: Triage - Classify document category
         # ====================================================================
-        if DEBUG:
-            print(f"\n{'=' * 60}")
-            print("Step 2: Triage Classification")
-            print(f"{'=' * 60}")
-
-        step_2_path = _checkpoint_path(2, file_identifier)
-        triage_result: TriageOutput | None = None
-        if step_2_path.exists():
-            try:
-                triage_result = TriageOutput.model_validate_json(
-                    step_2_path.read_text(encoding="utf-8")
-                )
-                if DEBUG:
-                    print("Loaded triage classification from checkpoint")
-            except (OSError, ValidationError) as error:
-                if DEBUG:
-                    print(f"Failed to load triage checkpoint {step_2_path}: {error}")
-                triage_result = None
-
         if triage_result is None:
-            triage_result, triage_json = _run_triage(path, markdown_content)
-            _store_checkpoint(step_2_path, triage_json)
+            _debug_step_header("Step 2: Triage Classification")
 
-        if DEBUG and triage_result:
-            print(f"Document Group: {triage_result.grupo_documento}")
-            print(f"Document Number: {triage_result.numero_documento}")
-            print(f"Emission Date: {triage_result.data_emissao}")
-            print(f"Triage Notes: {triage_result.notas_triagem[:200]}...")
-
-        print("Step 2: Triage Classification ✓")
+            with track_stage("triage"):
+                triage_result = _load_triage_checkpoint(
+                    file_identifier, markdown_content
+                )
+                triage_json: str | None = None
+                if triage_result is None:
+                    triage_result, triage_json = _run_triage(path, markdown_content)
+                _finish_triage_step(file_identifier, triage_result, triage_json)
 
         # ====================================================================
         # Step 3: Specialized Classification
         # ====================================================================
-        if DEBUG:
-            print(f"\n{'=' * 60}")
-            print(
-                f"Step 3: Specialized Classification - {triage_result.grupo_documento}"
+        if not _needs_specialist(triage_result):
+            return triage_result
+
+        step_3_key = _specialist_checkpoint_key(
+            file_identifier, triage_result.grupo_documento
+        )
+        with track_stage("specialist"):
+            final_result = _load_specialist_checkpoint(
+                step_3_key, triage_result.grupo_documento
             )
-            print(f"{'=' * 60}")
+            final_json: str | None = None
+            if final_result is None:
+                final_result, final_json = _run_specialist_classification(triage_result)
+            _finish_specialist_step(step_3_key, final_result, final_json)
 
-        if triage_result.grupo_documento not in SPECIALIST_AGENT_CONFIG:
-            # Return triage result for OUTROS_DOCUMENTOS
-            if DEBUG:
-                print(
-                    "Document classified as OUTROS_DOCUMENTOS, returning triage result"
+        return final_result  # pyright: ignore[reportReturnType]
+
+    except (
+        RuntimeError,
+        ValueError,
+        OSError,
+        genai_errors.APIError,
+        httpx.TransportError,
+    ) as e:
+        return _classification_error(path, e)
+
+
+async def aclassify_document(
+    path: str,
+) -> ClassificationResult:
+    """
+    Asynchronous version of `classify_document` built on the aio Gemini client.
+
+    The OCR, triage and specialist calls are awaited instead of blocking, so a
+    single process can keep many documents in flight at once. File reads and
+    hashing run in worker threads to keep the event loop responsive.
+
+    Args:
+        path: Path to the PDF document
+
+    Returns:
+        Classification result with structured output
+    """
+    with track_document(path) as metrics:
+        result = await _aclassify_document(path)
+        if isinstance(result, ErrorOutput):
+            metrics.error = result.erro
+        return result
+
+
+async def _aclassify_document(path: str) -> ClassificationResult:
+    try:
+        _debug_step_header("Step 1: OCR Processing")
+
+        pdf_path = Path(path)
+        if not pdf_path.exists():
+            return ErrorOutput(
+                localizacao_ficheiro=path,
+                erro=f"File not found: {path}",
+            )
+
+        with track_stage("ocr"):
+            document = await asyncio.to_thread(_PdfDocument, pdf_path)
+            try:
+                file_identifier = document.identifier
+                markdown_content = _load_ocr_checkpoint(file_identifier)
+                fresh_ocr = markdown_content is None
+                if markdown_content is None:
+                    markdown_content = await _atext_layer_markdown(document)
+                if markdown_content is None:
+                    markdown_content = await _agenerate_markdown_from_pdf(document)
+            finally:
+                document.close()
+            _finish_ocr_step(file_identifier, markdown_content, fresh_ocr)
+
+        groups = SINGLE_PASS_GROUPS
+        triage_result = _local_triage_step(path, file_identifier, markdown_content)
+        if groups and triage_result is None:
+            _debug_step_header("Step 2+3: Single-Pass Classification")
+
+            single_pass_key = _single_pass_checkpoint_key(file_identifier, groups)
+            with track_stage("single_pass"):
+                result = _load_single_pass_checkpoint(
+                    single_pass_key, groups, markdown_content
+                )
+                payload: str | None = None
+                if result is None:
+                    result, payload = await _arun_single_pass(
+                        path, markdown_content, groups
+                    )
+                _finish_single_pass_step(single_pass_key, result, payload)
+
+            if not isinstance(result, TriageOutput):
+                return result  # pyright: ignore[reportReturnType]
+            triage_result = result
+
+        if triage_result is None:
+            _debug_step_header("Step 2: Triage Classification")
+
+            with track_stage("triage"):
+                triage_result = _load_triage_checkpoint(
+                    file_identifier, markdown_content
                 )
+                triage_json: str | None = None
+                if triage_result is None:
+                    triage_result, triage_json = await _arun_triage(
+                        path, markdown_content
+                    )
+                _finish_triage_step(file_identifier, triage_result, triage_json)
+
+        if not _needs_specialist(triage_result):
             return triage_result
 
-        step_3_path = _checkpoint_path(3, file_identifier)
+        step_3_key = _specialist_checkpoint_key(
+            file_identifier, triage_result.grupo_documento
+        )
+        with track_stage("specialist"):
+            final_result = _load_specialist_checkpoint(
+                step_3_key, triage_result.grupo_documento
+            )
+            final_json: str | None = None
+            if final_result is None:
+                final_result, final_json = await _arun_specialist_classification(
+                    triage_result
+                )
+            _finish_specialist_step(step_3_key, final_result, final_json)
 
-        final_result, final_json = _run_specialist_classification(triage_result)
-        _store_checkpoint(step_3_path, final_json)
+        return final_result  # pyright: ignore[reportReturnType]
 
-        if DEBUG:
-            print("Classification completed successfully")
-            if hasattr(final_result, "tipo_documento"):
-                print(f"Document Type: {final_result.tipo_documento}")
+    except (
+        RuntimeError,
+        ValueError,
+        OSError,
+        genai_errors.APIError,
+        httpx.TransportError,
+    ) as e:
+        return _classification_error(path, e)
 
-        print("Step 3: Specialized Classification ✓")
 
-        return final_result
+async def aclassify_many(
+    paths: Iterable[str],
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+) -> list[ClassificationResult]:
+    """
+    Classify many documents concurrently from a single event loop.
 
-    except (RuntimeError, ValueError, OSError) as e:
-        error_msg = f"Classification error: {str(e)}"
-        if DEBUG:
-            print(f"\n{'=' * 90}")
-            print(f"ERROR: {error_msg}")
-            print(f"{'=' * 90}")
-            import traceback
+    Args:
+        paths: Paths to the PDF documents
+        max_concurrency: Maximum number of documents processed at the same
+            time (``GEMINI_MAX_CONCURRENCY``, default 64). Each document holds
+            one slot from its OCR to its last stage. A document split for OCR
+            converts up to `page_split.SPLIT_MAX_CONCURRENCY` chunks at once
+            within its slot; the shared rate limiter still bounds the rate of
+            all Gemini calls.
 
-            traceback.print_exc()
+    Returns:
+        Classification results in the same order as ``paths``
+    """
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1")
 
-        return ErrorOutput(
-            localizacao_ficheiro=path,
-            erro=error_msg,
-        )
+    semaphore = asyncio.Semaphore(max_concurrency)
 
+    async def _bounded(path: str) -> ClassificationResult:
+        queued_at = time.perf_counter()
+        async with semaphore:
+            with track_document(path, queue_wait=time.perf_counter() - queued_at):
+                return await aclassify_document(path)
 
-# ============================================================================
-# CLI Interface
-# ============================================================================
+    return list(await asyncio.gather(*(_bounded(path) for path in paths)))
+
+
+def __getattr__(name: str) -> Any:
+    # Specialist models used to be defined here; they now live in `models` and
+    # are imported on first access.
+    if name.startswith("__"):
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from . import models
+
+    return getattr(models, name)
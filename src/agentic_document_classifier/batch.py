@@ -0,0 +1,736 @@
+"""
+Gemini Batch API mode for bulk classification.
+
+Batch jobs are billed at a discount and draw from a separate quota, at the price
+of completing within hours instead of seconds. `classify_batch` runs the three
+pipeline steps as batch jobs, one step at a time for every document:
+
+1. OCR: one job with every document that has no OCR checkpoint and no usable
+   text layer
+2. Triage: one job with every document that has no triage checkpoint and is
+   not confidently triaged by the local pre-classifier. With
+   ``SINGLE_PASS_GROUPS``, a single-pass job instead, whose answers for the
+   selected groups are final
+3. Specialists: one job per document group in ``SPECIALIST_AGENT_CONFIG``
+
+Each job uses the first model of its stage's `routing` policy. Requests whose
+answer is unusable (empty, or not matching the schema) are resubmitted in a
+follow-up job with the next model of the policy, as the interactive pipeline
+escalates them.
+
+Requests are split across several jobs when their inline payload would exceed
+``GEMINI_BATCH_MAX_INLINE_BYTES``. A PDF too large to travel inline is uploaded
+through the Files API and referenced by URI, and deleted once its job is done.
+Every result is written to the same checkpoint keys as the interactive
+pipeline, so a later `classify_document` call (or another batch run) reuses
+them. Documents whose batch request failed (an upload or job error, a request
+over the limit on its own, or an answer still unusable after the last model) are
+classified online afterwards with `aclassify_many`, which resumes from the
+stages the batch jobs completed.
+
+When a job is submitted, each of its requests gets a marker checkpoint holding
+the job name. An interrupted run therefore resumes by polling the jobs it had
+already submitted instead of paying for them twice.
+
+Configuration through environment variables:
+
+- ``GEMINI_BATCH_POLL_SECONDS``: delay between job status checks (default 30)
+- ``GEMINI_BATCH_MAX_INLINE_BYTES``: inline payload limit per job
+  (default 18 MiB, below the API's 20 MB request limit)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import json
+import os
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TypeVar
+
+import httpx
+from google import genai
+from google.genai import errors as genai_errors
+from google.genai import types as genai_types
+from pydantic import BaseModel
+
+from .agents import (
+    SINGLE_PASS_GROUPS,
+    SPECIALIST_AGENT_CONFIG,
+    ClassificationResult,
+    DocumentGroup,
+    ErrorOutput,
+    TriageOutput,
+    TriageResponse,
+    _extract_response_text,
+    _get_client,
+    _load_checkpoint,
+    _load_ocr_checkpoint,
+    _load_single_pass_checkpoint,
+    _load_specialist_checkpoint,
+    _load_triage_checkpoint,
+    _local_triage,
+    _merge_text_layer,
+    _ocr_checkpoint_key,
+    _ocr_request,
+    _parse_single_pass,
+    _PdfDocument,
+    _read_text_layer,
+    _single_pass_checkpoint_key,
+    _single_pass_request,
+    _specialist_checkpoint_key,
+    _specialist_request,
+    _store_checkpoint,
+    _structured_config,
+    _triage_checkpoint_key,
+    _triage_request,
+    _validate_or_repair,
+    _with_content,
+    aclassify_many,
+)
+from .checkpoints import get_checkpoint_store
+from .dedup import result_for_path
+from .routing import model_tiers
+
+BATCH_POLL_SECONDS = float(os.environ.get("GEMINI_BATCH_POLL_SECONDS", "30"))
+BATCH_MAX_INLINE_BYTES = int(
+    os.environ.get("GEMINI_BATCH_MAX_INLINE_BYTES", str(18 * 1024 * 1024))
+)
+
+# Marker checkpoints recording the job a request was submitted in.
+_PENDING_SUFFIX = ".batch"
+
+R = TypeVar("R")
+
+_RequestParts = tuple[genai_types.GenerateContentConfig, list[genai_types.Part | str]]
+
+
+@dataclass
+class BatchRequest:
+    """One generateContent request of a batch job.
+
+    ``key`` is the checkpoint key the result is stored under and identifies the
+    request within its job. ``build`` returns the config and contents lazily,
+    so PDFs are only read while their job is being submitted.
+    """
+
+    key: str
+    build: Callable[[], _RequestParts]
+    size: int
+
+
+@dataclass
+class BatchResult:
+    """Outcome of one request of a finished job."""
+
+    key: str | None
+    text: str | None = None
+    error: str | None = None
+
+
+class BatchBackend(ABC):
+    """Submits batch jobs and collects their results."""
+
+    @abstractmethod
+    def submit(
+        self, model: str, requests: list[BatchRequest], display_name: str
+    ) -> str:
+        """Create a job for ``requests`` and return its name."""
+
+    @abstractmethod
+    def poll(self, job_name: str) -> str | None:
+        """None while the job runs; its final state name once it is done."""
+
+    @abstractmethod
+    def results(self, job_name: str) -> list[BatchResult]:
+        """Results of a finished job, in request order."""
+
+    def succeeded(self, state: str) -> bool:
+        return state in ("JOB_STATE_SUCCEEDED", "JOB_STATE_PARTIALLY_SUCCEEDED")
+
+    def upload(self, path: Path, mime_type: str) -> str:
+        """Upload a file too large to send inline and return its URI."""
+        raise RuntimeError(f"{type(self).__name__} cannot upload files")
+
+    def delete_upload(self, uri: str) -> None:
+        """Delete a file returned by `upload` once its job no longer needs it."""
+
+
+class GeminiBatchBackend(BatchBackend):
+    """Batch jobs with inline requests through ``client.batches``.
+
+    Honours ``GEMINI_BASE_URL`` like the interactive client, so it can be
+    pointed at the fake server in ``benchmarks/fake_gemini.py``.
+    """
+
+    _FINAL_STATES = frozenset(
+        {
+            genai_types.JobState.JOB_STATE_SUCCEEDED,
+            genai_types.JobState.JOB_STATE_PARTIALLY_SUCCEEDED,
+            genai_types.JobState.JOB_STATE_FAILED,
+            genai_types.JobState.JOB_STATE_CANCELLED,
+            genai_types.JobState.JOB_STATE_EXPIRED,
+        }
+    )
+
+    def __init__(self, client: genai.Client | None = None) -> None:
+        self._client = client
+        self._jobs: dict[str, genai_types.BatchJob] = {}
+        self._uploads: dict[str, str] = {}
+
+    @property
+    def client(self) -> genai.Client:
+        if self._client is None:
+            self._client = _get_client()
+        return self._client
+
+    def submit(
+        self, model: str, requests: list[BatchRequest], display_name: str
+    ) -> str:
+        inlined: list[genai_types.InlinedRequest] = []
+        for request in requests:
+            config, contents = request.build()
+            inlined.append(
+                genai_types.InlinedRequest(
+                    model=model,
+                    contents=contents,  # pyright: ignore[reportArgumentType]
+                    config=config,
+                    metadata={"key": request.key},
+                )
+            )
+        job = self.client.batches.create(
+            model=model,
+            src=inlined,
+            config=genai_types.CreateBatchJobConfig(display_name=display_name),
+        )
+        if not job.name:
+            raise RuntimeError("Gemini batch API did not return a job name.")
+        return job.name
+
+    def upload(self, path: Path, mime_type: str) -> str:
+        uploaded = self.client.files.upload(
+            file=path, config=genai_types.UploadFileConfig(mime_type=mime_type)
+        )
+        if not uploaded.uri:
+            raise RuntimeError(f"Gemini Files API did not return a URI for {path}")
+        if uploaded.name:
+            self._uploads[uploaded.uri] = uploaded.name
+        return uploaded.uri
+
+    def delete_upload(self, uri: str) -> None:
+        name = self._uploads.pop(uri, None)
+        if name is None:
+            return
+        try:
+            self.client.files.delete(name=name)
+        except (genai_errors.APIError, httpx.TransportError):
+            # Uploads expire on their own after 48 hours.
+            pass
+
+    def poll(self, job_name: str) -> str | None:
+        job = self.client.batches.get(name=job_name)
+        if job.state not in self._FINAL_STATES:
+            return None
+        self._jobs[job_name] = job
+        return job.state.name if job.state else None
+
+    def results(self, job_name: str) -> list[BatchResult]:
+        job = self._jobs.pop(job_name, None) or self.client.batches.get(name=job_name)
+        responses = job.dest.inlined_responses if job.dest else None
+        if responses is None:
+            raise RuntimeError(f"Batch job {job_name} has no inline responses.")
+
+        results: list[BatchResult] = []
+        for inlined in responses:
+            key = (inlined.metadata or {}).get("key")
+            if inlined.error is not None:
+                results.append(
+                    BatchResult(key, error=inlined.error.message or str(inlined.error))
+                )
+                continue
+            if inlined.response is None:
+                results.append(BatchResult(key, error="Batch response is empty"))
+                continue
+            try:
+                text = _extract_response_text(inlined.response)
+            except ValueError:
+                # No text is the model's answer, not a job failure: it is
+                # unusable and escalates like any other unusable answer.
+                text = ""
+            results.append(BatchResult(key, text=text))
+        return results
+
+
+def _pack(requests: list[BatchRequest], max_bytes: int) -> Iterator[list[BatchRequest]]:
+    """Split requests into jobs whose inline payload stays under ``max_bytes``."""
+    pack: list[BatchRequest] = []
+    size = 0
+    for request in requests:
+        if pack and size + request.size > max_bytes:
+            yield pack
+            pack, size = [], 0
+        pack.append(request)
+        size += request.size
+    if pack:
+        yield pack
+
+
+def _delete_checkpoint(key: str) -> None:
+    try:
+        get_checkpoint_store().delete(key)
+    except (OSError, sqlite3.Error):
+        pass
+
+
+class _BatchRun:
+    """Runs the pipeline steps as batch jobs over a set of unique documents."""
+
+    def __init__(self, backend: BatchBackend, poll_interval: float) -> None:
+        self.backend = backend
+        self.poll_interval = poll_interval
+        self.errors: dict[str, str] = {}
+
+    def run_phase(
+        self, name: str, requests: list[BatchRequest], model: str
+    ) -> dict[str, BatchResult]:
+        """Submit (or resume) the jobs for ``requests`` and wait for them."""
+        jobs: dict[str, list[tuple[int, BatchRequest]]] = {}
+        fresh: list[BatchRequest] = []
+        results: dict[str, BatchResult] = {}
+        for request in requests:
+            marker = _load_checkpoint(request.key + _PENDING_SUFFIX)
+            if marker is None and request.size > BATCH_MAX_INLINE_BYTES:
+                # The API rejects the whole job; fail only this request.
+                results[request.key] = BatchResult(
+                    request.key,
+                    error=f"Request of {request.size} bytes exceeds the inline batch "
+                    f"limit of {BATCH_MAX_INLINE_BYTES} bytes",
+                )
+                continue
+            if marker is None:
+                fresh.append(request)
+                continue
+            pending = json.loads(marker)
+            jobs.setdefault(pending["job"], []).append((pending["index"], request))
+
+        for job_name in jobs:
+            print(f"🔁 {name}: resuming batch job {job_name}")
+
+        for pack in _pack(fresh, BATCH_MAX_INLINE_BYTES):
+            job_name = self.backend.submit(model, pack, f"agentic-classifier-{name}")
+            for index, request in enumerate(pack):
+                _store_checkpoint(
+                    request.key + _PENDING_SUFFIX,
+                    json.dumps({"job": job_name, "index": index}),
+                )
+            jobs[job_name] = list(enumerate(pack))
+            print(f"📦 {name}: submitted batch job {job_name} ({len(pack)} requests)")
+
+        for job_name, members in jobs.items():
+            results.update(self._collect(name, job_name, members))
+        return results
+
+    def run_escalating(
+        self,
+        name: str,
+        requests: list[BatchRequest],
+        models: tuple[str, ...],
+        parse: Callable[[str], tuple[R, str]],
+    ) -> tuple[dict[str, tuple[R, str]], dict[str, str]]:
+        """
+        Run ``requests`` on the first of ``models``, then unusable answers on the next.
+
+        ``parse`` returns an answer's result and the text to checkpoint, and
+        raises `RuntimeError` or `ValueError` for an unusable answer. Usable
+        answers are checkpointed under their request key as each tier finishes,
+        before its pending job markers are removed, so an interruption during a
+        later tier does not lose them.
+
+        Returns:
+            Parsed answers with their text, and errors, by request key
+        """
+        parsed: dict[str, tuple[R, str]] = {}
+        errors: dict[str, str] = {}
+        for tier, model in enumerate(models):
+            phase = name if tier == 0 else f"{name}-{model}"
+            by_key = {request.key: request for request in requests}
+            results = self.run_phase(phase, requests, model)
+            requests = []
+            for key, result in results.items():
+                if result.text is None:
+                    errors[key] = result.error or f"Empty {name} response"
+                    continue
+                try:
+                    parsed[key] = parse(result.text)
+                except (RuntimeError, ValueError) as error:
+                    if tier + 1 < len(models):
+                        requests.append(by_key[key])
+                    else:
+                        errors[key] = str(error)
+                else:
+                    _store_checkpoint(key, parsed[key][1])
+            for key in results:
+                _delete_checkpoint(key + _PENDING_SUFFIX)
+            if not requests:
+                break
+            print(
+                f"⬆️  {name}: {len(requests)} unusable answers escalated to "
+                f"{models[tier + 1]}"
+            )
+        return parsed, errors
+
+    def _collect(
+        self, name: str, job_name: str, members: list[tuple[int, BatchRequest]]
+    ) -> dict[str, BatchResult]:
+        state = self.backend.poll(job_name)
+        while state is None:
+            time.sleep(self.poll_interval)
+            state = self.backend.poll(job_name)
+        print(f"🏁 {name}: batch job {job_name} finished with {state}")
+
+        keys = {request.key for _, request in members}
+        if not self.backend.succeeded(state):
+            error = f"Batch job {job_name} ended with {state}"
+            return {key: BatchResult(key, error=error) for key in keys}
+
+        by_index = {index: request.key for index, request in members}
+        collected: dict[str, BatchResult] = {}
+        for position, result in enumerate(self.backend.results(job_name)):
+            # Inline responses echo the request metadata; fall back to order.
+            key = result.key if result.key in keys else by_index.get(position)
+            if key is not None:
+                collected[key] = result
+        for key in keys - collected.keys():
+            error = f"Missing from batch job {job_name}"
+            collected[key] = BatchResult(key, error=error)
+        return collected
+
+
+def _inline_pdf_size(document: _PdfDocument) -> int:
+    # Inline PDFs travel base64-encoded.
+    return document.size * 4 // 3 + 4096
+
+
+def _ocr_batch_request(
+    document: _PdfDocument, key: str, file_uri: str | None = None
+) -> BatchRequest:
+    """The OCR request of ``document``, inline or referencing an uploaded file."""
+    path = document.path
+    if file_uri is not None:
+
+        def build_uploaded() -> _RequestParts:
+            config, contents, _ = _ocr_request(b"", path)
+            contents[0] = genai_types.Part.from_uri(
+                file_uri=file_uri, mime_type="application/pdf"
+            )
+            return config, contents
+
+        return BatchRequest(key=key, build=build_uploaded, size=4096)
+
+    def build() -> _RequestParts:
+        with _PdfDocument(path) as reopened:
+            config, contents, _ = _ocr_request(reopened.read(), path)
+        return config, contents
+
+    return BatchRequest(key=key, build=build, size=_inline_pdf_size(document))
+
+
+def _structured_batch_request(
+    key: str, system_prompt: str, user_message: str, response_model: type[BaseModel]
+) -> BatchRequest:
+    def build() -> _RequestParts:
+        return _structured_config(system_prompt, response_model), [user_message]
+
+    size = len(system_prompt.encode("utf-8")) + len(user_message.encode("utf-8"))
+    return BatchRequest(key=key, build=build, size=size)
+
+
+def _ocr_text(text: str) -> tuple[str, str]:
+    if not text:
+        raise RuntimeError("Gemini OCR step returned empty content.")
+    return text, text
+
+
+def _run_ocr(run: _BatchRun, documents: dict[str, str]) -> None:
+    requests: dict[str, BatchRequest] = {}
+    owners: dict[str, str] = {}
+    uploads: list[str] = []
+    try:
+        _prepare_ocr(run, documents, requests, owners, uploads)
+        _, errors = run.run_escalating(
+            "ocr", list(requests.values()), model_tiers("ocr"), _ocr_text
+        )
+    finally:
+        for file_uri in uploads:
+            run.backend.delete_upload(file_uri)
+    for key, error in errors.items():
+        run.errors[owners[key]] = error
+
+
+def _prepare_ocr(
+    run: _BatchRun,
+    documents: dict[str, str],
+    requests: dict[str, BatchRequest],
+    owners: dict[str, str],
+    uploads: list[str],
+) -> None:
+    for identifier, path in documents.items():
+        if _load_ocr_checkpoint(identifier) is not None:
+            continue
+        key = _ocr_checkpoint_key(identifier)
+        with _PdfDocument(Path(path)) as document:
+            # Documents with pages that need OCR go to the batch job whole.
+            text_layer = _read_text_layer(document)
+            if text_layer is not None and not text_layer[1]:
+                _store_checkpoint(key, _merge_text_layer(text_layer[0], [], []))
+                continue
+            file_uri = None
+            pending = _load_checkpoint(key + _PENDING_SUFFIX) is not None
+            if not pending and _inline_pdf_size(document) > BATCH_MAX_INLINE_BYTES:
+                try:
+                    file_uri = run.backend.upload(document.path, "application/pdf")
+                except (
+                    RuntimeError,
+                    OSError,
+                    genai_errors.APIError,
+                    httpx.TransportError,
+                ) as error:
+                    run.errors[identifier] = f"Upload of a large PDF failed: {error}"
+                    continue
+                uploads.append(file_uri)
+            requests[key] = _ocr_batch_request(document, key, file_uri)
+        owners[key] = identifier
+
+
+def _run_triage(
+    run: _BatchRun, documents: dict[str, str]
+) -> tuple[dict[str, TriageOutput], dict[str, BaseModel]]:
+    """
+    Triage results, and the final results of single-pass answers, by identifier.
+    """
+    triage: dict[str, TriageOutput] = {}
+    final: dict[str, BaseModel] = {}
+    single_pass: dict[str, tuple[str, str]] = {}
+    requests: list[BatchRequest] = []
+    owners: dict[str, tuple[str, str]] = {}
+    for identifier, path in documents.items():
+        if identifier in run.errors:
+            continue
+        markdown = _load_ocr_checkpoint(identifier)
+        if markdown is None:
+            run.errors[identifier] = "OCR result missing from checkpoints"
+            continue
+        local = _local_triage(path, markdown)
+        if local is not None:
+            triage[identifier] = local
+            continue
+        if SINGLE_PASS_GROUPS:
+            single_pass[identifier] = (path, markdown)
+            continue
+        cached = _load_triage_checkpoint(identifier, markdown)
+        if cached is not None:
+            triage[identifier] = cached
+            continue
+        key = _triage_checkpoint_key(identifier)
+        prompt, user_message = _triage_request(path, markdown)
+        requests.append(
+            _structured_batch_request(key, prompt, user_message, TriageResponse)
+        )
+        owners[key] = (identifier, markdown)
+
+    parsed, errors = run.run_escalating(
+        "triage",
+        requests,
+        model_tiers("triage"),
+        functools.partial(_validate_or_repair, response_model=TriageResponse),
+    )
+    for key, (triage_response, _) in parsed.items():
+        identifier, markdown = owners[key]
+        triage[identifier] = _with_content(triage_response, markdown)
+    for key, error in errors.items():
+        run.errors[owners[key][0]] = error
+
+    for identifier, result in _run_single_pass(run, single_pass).items():
+        if isinstance(result, TriageOutput):
+            # Triage-only answers (other groups) continue with the specialist.
+            triage[identifier] = result
+        else:
+            final[identifier] = result
+    return triage, final
+
+
+def _run_single_pass(
+    run: _BatchRun, documents: dict[str, tuple[str, str]]
+) -> dict[str, BaseModel]:
+    """Single-pass results of ``(path, markdown)`` documents, by identifier."""
+    groups = SINGLE_PASS_GROUPS
+    results: dict[str, BaseModel] = {}
+    requests: list[BatchRequest] = []
+    owners: dict[str, tuple[str, str]] = {}
+    for identifier, (path, markdown) in documents.items():
+        key = _single_pass_checkpoint_key(identifier, groups)
+        cached = _load_single_pass_checkpoint(key, groups, markdown)
+        if cached is not None:
+            results[identifier] = cached
+            continue
+        prompt, user_message, response_model = _single_pass_request(
+            path, markdown, groups
+        )
+        requests.append(
+            _structured_batch_request(key, prompt, user_message, response_model)
+        )
+        owners[key] = (identifier, markdown)
+
+    def parse(payload: str) -> tuple[BaseModel, str]:
+        # Checkpoints hold the payload as received, like the online pipeline.
+        return _parse_single_pass(payload, groups, ""), payload
+
+    parsed, errors = run.run_escalating(
+        "single-pass", requests, model_tiers("single_pass"), parse
+    )
+    for key, (result, _) in parsed.items():
+        identifier, markdown = owners[key]
+        if isinstance(result, TriageOutput):
+            result = result.model_copy(update={"conteudo": markdown})
+        results[identifier] = result
+    for key, error in errors.items():
+        run.errors[owners[key][0]] = error
+    return results
+
+
+def _run_specialists(
+    run: _BatchRun, triage: dict[str, TriageOutput]
+) -> dict[str, BaseModel]:
+    final: dict[str, BaseModel] = {}
+    by_group: dict[DocumentGroup, list[str]] = {}
+    for identifier, triage_result in triage.items():
+        if triage_result.grupo_documento in SPECIALIST_AGENT_CONFIG:
+            by_group.setdefault(triage_result.grupo_documento, []).append(identifier)
+
+    for group, identifiers in by_group.items():
+        requests: list[BatchRequest] = []
+        owners: dict[str, str] = {}
+        response_model = SPECIALIST_AGENT_CONFIG[group][1]
+        for identifier in identifiers:
+            key = _specialist_checkpoint_key(identifier, group)
+            cached = _load_specialist_checkpoint(key, group)
+            if cached is not None:
+                final[identifier] = cached
+                continue
+            prompt, user_message, _ = _specialist_request(triage[identifier])
+            requests.append(
+                _structured_batch_request(key, prompt, user_message, response_model)
+            )
+            owners[key] = identifier
+
+        parsed, errors = run.run_escalating(
+            f"specialist-{group.lower().replace('_', '-')}",
+            requests,
+            model_tiers("specialist", group),
+            functools.partial(_validate_or_repair, response_model=response_model),
+        )
+        for key, (result, _) in parsed.items():
+            final[owners[key]] = result
+        for key, error in errors.items():
+            run.errors[owners[key]] = error
+    return final
+
+
+def classify_batch(
+    paths: Iterable[str],
+    backend: BatchBackend | None = None,
+    poll_interval: float = BATCH_POLL_SECONDS,
+    online_fallback: bool = True,
+) -> list[ClassificationResult]:
+    """
+    Classify documents with Gemini batch jobs instead of interactive calls.
+
+    Files with identical content are classified once. Results already in the
+    checkpoint store are reused and jobs submitted by an interrupted run are
+    resumed rather than resubmitted.
+
+    Args:
+        paths: Paths to the PDF documents
+        backend: Batch backend (a `GeminiBatchBackend` by default)
+        poll_interval: Seconds between job status checks
+        online_fallback: Classify the documents whose batch requests failed
+            with interactive calls instead of reporting them as errors
+
+    Returns:
+        Classification results in the same order as ``paths``
+    """
+    paths = list(paths)
+    run = _BatchRun(backend or GeminiBatchBackend(), poll_interval)
+
+    identifiers: dict[str, str] = {}
+    failures: dict[str, str] = {}
+    documents: dict[str, str] = {}
+    for path in paths:
+        try:
+            with _PdfDocument(Path(path)) as document:
+                identifiers[path] = document.identifier
+        except OSError as error:
+            failures[path] = f"Classification error: {error}"
+            continue
+        documents.setdefault(identifiers[path], path)
+
+    try:
+        _run_ocr(run, documents)
+        triage, final = _run_triage(run, documents)
+        final.update(_run_specialists(run, triage))
+    except (
+        RuntimeError,
+        ValueError,
+        OSError,
+        genai_errors.APIError,
+        httpx.TransportError,
+    ) as error:
+        # A job that cannot be submitted or polled fails the whole run; its
+        # markers stay in place so the next run resumes it.
+        failures.update(
+            (path, f"Classification error: {error}")
+            for path in paths
+            if path not in failures
+        )
+        triage, final = {}, {}
+
+    if online_fallback and run.errors:
+        print(f"🌐 Classifying {len(run.errors)} failed batch requests online")
+        fallback = [documents[identifier] for identifier in run.errors]
+        for path, result in zip(fallback, asyncio.run(aclassify_many(fallback))):
+            final[identifiers[path]] = result
+        run.errors.clear()
+
+    results: list[ClassificationResult] = []
+    for path in paths:
+        identifier = identifiers.get(path)
+        if path in failures or identifier is None:
+            results.append(ErrorOutput(localizacao_ficheiro=path, erro=failures[path]))
+        elif identifier in run.errors:
+            results.append(
+                ErrorOutput(
+                    localizacao_ficheiro=path,
+                    erro=f"Classification error: {run.errors[identifier]}",
+                )
+            )
+        else:
+            result = final.get(identifier) or triage[identifier]
+            reported = result_for_path(result, path)
+            results.append(reported)  # pyright: ignore[reportArgumentType]
+    return results
+
+
+__all__ = [
+    "BATCH_MAX_INLINE_BYTES",
+    "BATCH_POLL_SECONDS",
+    "BatchBackend",
+    "BatchRequest",
+    "BatchResult",
+    "GeminiBatchBackend",
+    "classify_batch",
+]
@@ -0,0 +1,564 @@
+"""
+Checkpoint stores for intermediate classification results.
+
+A checkpoint is a text payload (OCR Markdown or a JSON document) stored under a
+string key. Three backends are available:
+
+- ``directory``: one file per checkpoint in a directory (the historical layout)
+- ``sqlite``: every checkpoint in a single SQLite database file
+- ``memory``: an in-process LRU cache, useful for tests and short-lived workers
+
+All backends support an optional size cap (``max_bytes``), an optional age limit
+(``ttl_seconds``), atomic writes and hit/miss counters, and may be shared by the
+threads of a process. Size eviction removes the least recently used entries
+first; age is counted from the last write. The default store is configured
+through environment variables:
+
+- ``CHECKPOINT_BACKEND``: ``directory`` (default), ``sqlite`` or ``memory``
+- ``CHECKPOINT_LOCATION``: directory or database path
+- ``CHECKPOINT_MAX_BYTES``: maximum total payload size (unbounded when unset)
+- ``CHECKPOINT_TTL_SECONDS``: maximum checkpoint age (unbounded when unset)
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import Iterator
+from dataclasses import dataclass
+from pathlib import Path
+
+DEFAULT_DIRECTORY = Path("/tmp/ag_classifier")
+DEFAULT_SQLITE_PATH = Path("/tmp/ag_classifier.sqlite3")
+
+# Expired entries are swept every this many writes, even if nobody reads them.
+_SWEEP_INTERVAL = 256
+# Size eviction frees space down to this fraction of max_bytes to avoid
+# evicting on every single write once the store is full.
+_EVICTION_TARGET = 0.9
+
+
+@dataclass
+class CheckpointStats:
+    hits: int = 0
+    misses: int = 0
+    writes: int = 0
+    evictions: int = 0
+
+
+class CheckpointStore(ABC):
+    """Base class for checkpoint backends."""
+
+    def __init__(
+        self, max_bytes: int | None = None, ttl_seconds: float | None = None
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.stats = CheckpointStats()
+        self._writes_since_sweep = 0
+        self._stats_lock = threading.Lock()
+
+    def _count(self, counter: str, amount: int = 1) -> None:
+        with self._stats_lock:
+            setattr(self.stats, counter, getattr(self.stats, counter) + amount)
+
+    def get(self, key: str) -> str | None:
+        """Return the payload stored under ``key``, or None if absent or expired."""
+        payload = self._get(key)
+        self._count("misses" if payload is None else "hits")
+        return payload
+
+    def put(self, key: str, payload: str) -> None:
+        """Atomically store ``payload`` under ``key`` and evict entries if needed."""
+        self._put(key, payload)
+        with self._stats_lock:
+            self.stats.writes += 1
+            self._writes_since_sweep += 1
+            sweep = (
+                self.ttl_seconds is not None
+                and self._writes_since_sweep >= _SWEEP_INTERVAL
+            )
+            if sweep:
+                self._writes_since_sweep = 0
+
+        if sweep:
+            self._count("evictions", self._sweep_expired())
+        if self.max_bytes is not None:
+            self._count("evictions", self._evict_to_size(self.max_bytes))
+
+    def _is_expired(self, created_at: float, now: float | None = None) -> bool:
+        if self.ttl_seconds is None:
+            return False
+        return (now if now is not None else time.time()) - created_at > self.ttl_seconds
+
+    @abstractmethod
+    def _get(self, key: str) -> str | None: ...
+
+    @abstractmethod
+    def _put(self, key: str, payload: str) -> None: ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove ``key`` from the store if present."""
+
+    @abstractmethod
+    def keys(self) -> Iterator[str]:
+        """Iterate over the keys currently stored."""
+
+    @abstractmethod
+    def _sweep_expired(self) -> int:
+        """Remove expired entries and return how many were removed."""
+
+    @abstractmethod
+    def _evict_to_size(self, max_bytes: int) -> int:
+        """Evict entries until the store fits in ``max_bytes``; return the count."""
+
+
+class DirectoryCheckpointStore(CheckpointStore):
+    """One file per checkpoint, named after its key, inside ``directory``.
+
+    Writes go to a temporary file that is renamed into place, so readers never
+    see a partial checkpoint. Age is taken from the file modification time and
+    recency of use from its access time, which every read sets.
+    """
+
+    def __init__(
+        self,
+        directory: Path | str = DEFAULT_DIRECTORY,
+        max_bytes: int | None = None,
+        ttl_seconds: float | None = None,
+    ) -> None:
+        super().__init__(max_bytes, ttl_seconds)
+        self.directory = Path(directory)
+        self._lock = threading.Lock()
+        self._total_bytes: int | None = None
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key
+
+    def _get(self, key: str) -> str | None:
+        path = self._path(key)
+        try:
+            modified_at = path.stat().st_mtime
+            if self._is_expired(modified_at):
+                self.delete(key)
+                self._count("evictions")
+                return None
+            payload = path.read_text(encoding="utf-8")
+            # Mark the entry as used without changing its age.
+            os.utime(path, (time.time(), modified_at))
+            return payload
+        except FileNotFoundError:
+            return None
+
+    def _put(self, key: str, payload: str) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        data = payload.encode("utf-8")
+        path = self._path(key)
+
+        file_descriptor, temp_name = tempfile.mkstemp(
+            dir=self.directory, prefix=".tmp-", suffix=".part"
+        )
+        try:
+            with os.fdopen(file_descriptor, "wb") as file_handle:
+                _ = file_handle.write(data)
+            with self._lock:
+                replaced = self._size(key)
+                os.replace(temp_name, path)
+                if self._total_bytes is not None:
+                    self._total_bytes += len(data) - replaced
+        except BaseException:
+            Path(temp_name).unlink(missing_ok=True)
+            raise
+
+    def _size(self, key: str) -> int:
+        try:
+            return self._path(key).stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def _remove(self, key: str) -> None:
+        # Callers hold the lock.
+        size = self._size(key)
+        self._path(key).unlink(missing_ok=True)
+        if self._total_bytes is not None:
+            self._total_bytes -= size
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._remove(key)
+
+    def keys(self) -> Iterator[str]:
+        if not self.directory.is_dir():
+            return
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.startswith(".tmp-"):
+                yield entry.name
+
+    def _entries(self) -> list[tuple[float, float, int, str]]:
+        """``(accessed_at, modified_at, size, key)`` of every checkpoint."""
+        entries: list[tuple[float, float, int, str]] = []
+        for key in self.keys():
+            try:
+                stat = self._path(key).stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_atime, stat.st_mtime, stat.st_size, key))
+        return entries
+
+    def _sweep_expired(self) -> int:
+        now = time.time()
+        removed = 0
+        with self._lock:
+            for _, modified_at, _, key in self._entries():
+                if self._is_expired(modified_at, now):
+                    self._remove(key)
+                    removed += 1
+        return removed
+
+    def _evict_to_size(self, max_bytes: int) -> int:
+        with self._lock:
+            # The running total is only an estimate between scans (other
+            # processes may write to the same directory), so a full scan happens
+            # whenever the estimate says the cap was crossed.
+            if self._total_bytes is not None and self._total_bytes <= max_bytes:
+                return 0
+
+            entries = sorted(self._entries())
+            total = sum(size for _, _, size, _ in entries)
+            removed = 0
+            if total > max_bytes:
+                target = int(max_bytes * _EVICTION_TARGET)
+                for _, _, size, key in entries:
+                    if total <= target:
+                        break
+                    self._path(key).unlink(missing_ok=True)
+                    total -= size
+                    removed += 1
+
+            self._total_bytes = total
+            return removed
+
+
+_SQLITE_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS checkpoints (
+        key TEXT PRIMARY KEY,
+        payload TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        created_at REAL NOT NULL,
+        accessed_at REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS checkpoints_accessed_at ON checkpoints (accessed_at)",
+    """
+    CREATE TABLE IF NOT EXISTS checkpoint_size (
+        id INTEGER PRIMARY KEY CHECK (id = 0),
+        total INTEGER NOT NULL
+    )
+    """,
+    """
+    INSERT OR IGNORE INTO checkpoint_size (id, total)
+    SELECT 0, COALESCE(SUM(size), 0) FROM checkpoints
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS checkpoints_inserted AFTER INSERT ON checkpoints
+    BEGIN
+        UPDATE checkpoint_size SET total = total + NEW.size WHERE id = 0;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS checkpoints_deleted AFTER DELETE ON checkpoints
+    BEGIN
+        UPDATE checkpoint_size SET total = total - OLD.size WHERE id = 0;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS checkpoints_resized
+    AFTER UPDATE OF size ON checkpoints
+    BEGIN
+        UPDATE checkpoint_size SET total = total - OLD.size + NEW.size WHERE id = 0;
+    END
+    """,
+)
+
+
+class SQLiteCheckpointStore(CheckpointStore):
+    """All checkpoints in a single SQLite database.
+
+    Each write is a single transaction, which makes it atomic, and the database
+    runs in WAL mode so several worker processes can share the same file. Size
+    eviction removes the least recently read entries first. Triggers keep the
+    total payload size in the ``checkpoint_size`` table, so checking the cap
+    does not scan the checkpoints.
+    """
+
+    def __init__(
+        self,
+        path: Path | str = DEFAULT_SQLITE_PATH,
+        max_bytes: int | None = None,
+        ttl_seconds: float | None = None,
+    ) -> None:
+        super().__init__(max_bytes, ttl_seconds)
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._connection: sqlite3.Connection | None = None
+        self._connection_pid: int | None = None
+
+    def _connect(self) -> sqlite3.Connection:
+        # Connections must not be shared across fork(), so each process opens
+        # its own on first use.
+        if self._connection is None or self._connection_pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(
+                self.path, timeout=30.0, isolation_level=None, check_same_thread=False
+            )
+            _ = connection.execute("PRAGMA journal_mode=WAL")
+            _ = connection.execute("PRAGMA synchronous=NORMAL")
+            # One transaction, so the total is seeded from the rows written
+            # before the triggers existed and no write is missed in between.
+            _ = connection.execute("BEGIN IMMEDIATE")
+            try:
+                for statement in _SQLITE_SCHEMA:
+                    _ = connection.execute(statement)
+                _ = connection.execute("COMMIT")
+            except BaseException:
+                _ = connection.execute("ROLLBACK")
+                raise
+            self._connection = connection
+            self._connection_pid = os.getpid()
+        return self._connection
+
+    def _get(self, key: str) -> str | None:
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute(
+                "SELECT payload, created_at FROM checkpoints WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            payload, created_at = row
+            now = time.time()
+            if self._is_expired(created_at, now):
+                _ = connection.execute("DELETE FROM checkpoints WHERE key = ?", (key,))
+                self._count("evictions")
+                return None
+
+            _ = connection.execute(
+                "UPDATE checkpoints SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            return str(payload)
+
+    def _put(self, key: str, payload: str) -> None:
+        now = time.time()
+        with self._lock:
+            # An upsert rather than INSERT OR REPLACE: the implicit delete of a
+            # replace does not fire the delete trigger.
+            _ = self._connect().execute(
+                "INSERT INTO checkpoints "
+                "(key, payload, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET payload = excluded.payload, "
+                "size = excluded.size, created_at = excluded.created_at, "
+                "accessed_at = excluded.accessed_at",
+                (key, payload, len(payload.encode("utf-8")), now, now),
+            )
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            _ = self._connect().execute("DELETE FROM checkpoints WHERE key = ?", (key,))
+
+    def keys(self) -> Iterator[str]:
+        with self._lock:
+            rows = self._connect().execute("SELECT key FROM checkpoints").fetchall()
+        for (key,) in rows:
+            yield key
+
+    def _sweep_expired(self) -> int:
+        if self.ttl_seconds is None:
+            return 0
+        with self._lock:
+            cursor = self._connect().execute(
+                "DELETE FROM checkpoints WHERE created_at < ?",
+                (time.time() - self.ttl_seconds,),
+            )
+            return cursor.rowcount
+
+    def _evict_to_size(self, max_bytes: int) -> int:
+        with self._lock:
+            connection = self._connect()
+            (total,) = connection.execute(
+                "SELECT total FROM checkpoint_size WHERE id = 0"
+            ).fetchone()
+            if total <= max_bytes:
+                return 0
+
+            target = int(max_bytes * _EVICTION_TARGET)
+            removed = 0
+            _ = connection.execute("BEGIN IMMEDIATE")
+            try:
+                rows = connection.execute(
+                    "SELECT key, size FROM checkpoints ORDER BY accessed_at"
+                ).fetchall()
+                for key, size in rows:
+                    if total <= target:
+                        break
+                    _ = connection.execute(
+                        "DELETE FROM checkpoints WHERE key = ?", (key,)
+                    )
+                    total -= size
+                    removed += 1
+                _ = connection.execute("COMMIT")
+            except BaseException:
+                _ = connection.execute("ROLLBACK")
+                raise
+            return removed
+
+
+class MemoryCheckpointStore(CheckpointStore):
+    """In-process LRU store. Checkpoints are lost when the process exits."""
+
+    def __init__(
+        self, max_bytes: int | None = None, ttl_seconds: float | None = None
+    ) -> None:
+        super().__init__(max_bytes, ttl_seconds)
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[str, int, float]] = OrderedDict()
+        self._total_bytes = 0
+
+    def _get(self, key: str) -> str | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            payload, _, created_at = entry
+            if self._is_expired(created_at):
+                self._remove(key)
+                self._count("evictions")
+                return None
+
+            self._entries.move_to_end(key)
+            return payload
+
+    def _put(self, key: str, payload: str) -> None:
+        size = len(payload.encode("utf-8"))
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (payload, size, time.time())
+            self._total_bytes += size
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._total_bytes -= entry[1]
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._remove(key)
+
+    def keys(self) -> Iterator[str]:
+        with self._lock:
+            keys = list(self._entries)
+        yield from keys
+
+    def _sweep_expired(self) -> int:
+        now = time.time()
+        with self._lock:
+            expired = [
+                key
+                for key, (_, _, created_at) in self._entries.items()
+                if self._is_expired(created_at, now)
+            ]
+            for key in expired:
+                self._remove(key)
+        return len(expired)
+
+    def _evict_to_size(self, max_bytes: int) -> int:
+        removed = 0
+        with self._lock:
+            if self._total_bytes <= max_bytes:
+                return 0
+            target = int(max_bytes * _EVICTION_TARGET)
+            while self._entries and self._total_bytes > target:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                removed += 1
+        return removed
+
+
+def create_checkpoint_store(
+    backend: str = "directory",
+    location: Path | str | None = None,
+    max_bytes: int | None = None,
+    ttl_seconds: float | None = None,
+) -> CheckpointStore:
+    """Create a checkpoint store for the given backend name.
+
+    Args:
+        backend: ``directory``, ``sqlite`` or ``memory``
+        location: Directory (``directory``) or database file (``sqlite``);
+            ignored by ``memory``
+        max_bytes: Maximum total payload size, or None for no limit
+        ttl_seconds: Maximum checkpoint age in seconds, or None for no limit
+
+    Raises:
+        ValueError: If the backend name is unknown
+    """
+    backend = backend.lower()
+    if backend == "directory":
+        return DirectoryCheckpointStore(
+            location or DEFAULT_DIRECTORY, max_bytes, ttl_seconds
+        )
+    if backend == "sqlite":
+        return SQLiteCheckpointStore(
+            location or DEFAULT_SQLITE_PATH, max_bytes, ttl_seconds
+        )
+    if backend == "memory":
+        return MemoryCheckpointStore(max_bytes, ttl_seconds)
+    raise ValueError(f"Unknown checkpoint backend: {backend}")
+
+
+def _optional_number(name: str) -> float | None:
+    value = os.environ.get(name)
+    return float(value) if value else None
+
+
+_STORE: CheckpointStore | None = None
+
+
+def get_checkpoint_store() -> CheckpointStore:
+    """Get or create the process-wide checkpoint store from the environment."""
+    global _STORE
+    if _STORE is None:
+        max_bytes = _optional_number("CHECKPOINT_MAX_BYTES")
+        _STORE = create_checkpoint_store(
+            os.environ.get("CHECKPOINT_BACKEND", "directory"),
+            os.environ.get("CHECKPOINT_LOCATION") or None,
+            int(max_bytes) if max_bytes is not None else None,
+            _optional_number("CHECKPOINT_TTL_SECONDS"),
+        )
+    return _STORE
+
+
+def set_checkpoint_store(store: CheckpointStore | None) -> None:
+    """Replace the process-wide checkpoint store (None resets to the default)."""
+    global _STORE
+    _STORE = store
+
+
+__all__ = [
+    "CheckpointStats",
+    "CheckpointStore",
+    "DirectoryCheckpointStore",
+    "MemoryCheckpointStore",
+    "SQLiteCheckpointStore",
+    "create_checkpoint_store",
+    "get_checkpoint_store",
+    "set_checkpoint_store",
+]
@@ -1,18 +1,48 @@
 #!/usr/bin/env python3
 
+from __future__ import annotations
+
 import argparse
-import json
 import multiprocessing
+import multiprocessing.pool
 import os
 import sys
+import time
+from collections.abc import Iterable
 from pathlib import Path
+from typing import TYPE_CHECKING, BinaryIO, TextIO
 
+# Only lightweight modules are imported here: `--version`, `--help` and argument
+# validation must not pay for google-genai and the pydantic models. The pipeline
+# is imported by the functions that classify (see `_import_pipeline`).
 from .. import __version__
-from ..agents import ErrorOutput, classify_document as agent_classify
+from ..dedup import (
+    DuplicateGroups,
+    gemini_calls_for,
+    group_duplicates,
+    result_for_path,
+)
+from ..ledger import DEFAULT_LEDGER_PATH, Job, JobLedger, LedgerProgressHook
+from ..metrics import (
+    DocumentMetrics,
+    JsonLinesMetricsExporter,
+    MetricsHook,
+    PrometheusTextfileExporter,
+    add_metrics_hook,
+    emit_document,
+    remove_metrics_hook,
+    track_document,
+)
 from ..pretty_print import pretty_print
 
+if TYPE_CHECKING:
+    from pydantic import BaseModel
+
 
 def classify_document(filename: str):
+    from ..agents import ErrorOutput
+    from ..agents import classify_document as agent_classify
+
     try:
         result = agent_classify(filename)
 
@@ -28,8 +58,247 @@ def classify_document(filename: str):
         return None
 
 
+def _classify_with_metrics(
+    job: tuple[str, float],
+) -> tuple[str, BaseModel | None, DocumentMetrics]:
+    """Classify one file in a worker and return its metrics to the parent."""
+    filename, submitted_at = job
+    queue_wait = max(time.time() - submitted_at, 0.0)
+    with track_document(filename, queue_wait=queue_wait) as metrics:
+        result = classify_document(filename)
+        if result is None and metrics.error is None:
+            metrics.error = "Classification failed"
+    return filename, result, metrics
+
+
+_LEDGERS: dict[str, JobLedger] = {}
+
+
+def _ledger_at(path: str) -> JobLedger:
+    # One ledger connection per worker process for the whole run.
+    if path not in _LEDGERS:
+        _LEDGERS[path] = JobLedger(path)
+    return _LEDGERS[path]
+
+
+def _classify_ledger_job(
+    job: tuple[str, str, float],
+) -> tuple[str, BaseModel | None, DocumentMetrics] | None:
+    """Claim the next pending file of a ledger run in a worker and classify it.
+
+    Returns:
+        None when no pending file is left (other workers took them)
+    """
+    from ..agents import ErrorOutput
+
+    ledger_path, run_id, submitted_at = job
+    ledger = _ledger_at(ledger_path)
+    claimed = ledger.claim(run_id)
+    if claimed is None:
+        return None
+
+    hook = LedgerProgressHook(ledger, claimed)
+    add_metrics_hook(hook)
+    try:
+        with ledger.keep_alive(claimed):
+            filename, result, metrics = _classify_with_metrics(
+                (claimed.path, submitted_at)
+            )
+    finally:
+        remove_metrics_hook(hook)
+
+    if result is None:
+        _ = ledger.fail(claimed, metrics.error or "Classification failed")
+    elif isinstance(result, ErrorOutput):
+        _ = ledger.fail(claimed, result.erro, "ErrorOutput", result.model_dump_json())
+    else:
+        _ = ledger.complete(claimed, type(result).__name__, result.model_dump_json())
+    return filename, result, metrics
+
+
+def _ledger_result(job: Job) -> BaseModel | None:
+    if job.result is None or job.result_model is None:
+        return None
+    from .. import models
+
+    # Recorded results have no document content, hence no `conteudo`.
+    name = "TriageResponse" if job.result_model == "TriageOutput" else job.result_model
+    model: type[BaseModel] = getattr(models, name)
+    return model.model_validate_json(job.result)
+
+
+def _import_pipeline() -> None:
+    """Import the classification pipeline once arguments are validated.
+
+    Done in the parent before any pool is created: forked workers inherit the
+    imported modules instead of each importing them again.
+    """
+    from .. import agents  # noqa: F401  # pyright: ignore[reportUnusedImport]
+
+
+def _jobs(filenames: list[str]) -> list[tuple[str, float]]:
+    submitted_at = time.time()
+    return [(filename, submitted_at) for filename in filenames]
+
+
+def _metrics_hooks(
+    metrics_jsonl: str | None, metrics_prom: str | None
+) -> list[MetricsHook]:
+    hooks: list[MetricsHook] = []
+    if metrics_jsonl:
+        hooks.append(JsonLinesMetricsExporter(metrics_jsonl))
+    if metrics_prom:
+        hooks.append(PrometheusTextfileExporter(metrics_prom))
+    return hooks
+
+
+def _identify(filename: str) -> tuple[str, str]:
+    from ..agents import file_identifier
+
+    try:
+        return filename, file_identifier(filename)
+    except OSError:
+        # Unreadable files are classified on their own so the error is reported.
+        return filename, f"unreadable:{filename}"
+
+
+def _find_duplicates(
+    pool: multiprocessing.pool.Pool, files_to_classify: list[str], dedup: bool
+) -> DuplicateGroups:
+    """Hash every input up front and group identical documents."""
+    if not dedup:
+        return group_duplicates((filename, filename) for filename in files_to_classify)
+    return group_duplicates(pool.imap(_identify, files_to_classify, chunksize=8))
+
+
+def _dedup_report(duplicates: DuplicateGroups, saved_calls: int) -> str | None:
+    if not duplicates.duplicate_count:
+        return None
+    return (
+        f"♻️  {duplicates.duplicate_count} duplicate files reused the results of "
+        f"{len(duplicates.groups)} unique documents ({saved_calls} Gemini calls saved)"
+    )
+
+
+def _redirect_stdout_to_stderr() -> None:
+    # Keeps worker progress messages out of a JSON Lines stream on stdout.
+    sys.stdout = sys.stderr
+
+
+def _stream_results(
+    files_to_classify: list[str],
+    processes: int,
+    output: TextIO,
+    dedup: bool,
+    hooks: list[MetricsHook],
+) -> int:
+    """Classify files and write each result as a JSON line as soon as it is ready.
+
+    Returns:
+        Number of files that could not be classified
+    """
+    from ..agents import ErrorOutput
+
+    initializer = _redirect_stdout_to_stderr if output is sys.stdout else None
+    failures = 0
+    completed = 0
+    saved_calls = 0
+
+    with multiprocessing.Pool(processes=processes, initializer=initializer) as pool:
+        duplicates = _find_duplicates(pool, files_to_classify, dedup)
+
+        for representative, result, metrics in pool.imap_unordered(
+            _classify_with_metrics, _jobs(duplicates.representatives)
+        ):
+            emit_document(metrics, hooks)
+            if result is None:
+                result = ErrorOutput(
+                    localizacao_ficheiro=representative, erro="Classification failed"
+                )
+
+            copies = duplicates.copies_of(representative)
+            saved_calls += gemini_calls_for(metrics) * (len(copies) - 1)
+
+            for filename in copies:
+                if isinstance(result, ErrorOutput):
+                    failures += 1
+
+                _ = output.write(
+                    result_for_path(result, filename).model_dump_json() + "\n"
+                )
+                output.flush()
+
+                completed += 1
+                print(
+                    f"[{completed}/{len(files_to_classify)}] {filename}",
+                    file=sys.stderr,
+                )
+
+    report = _dedup_report(duplicates, saved_calls)
+    if report:
+        print(report, file=sys.stderr)
+
+    return failures
+
+
+def _write_results_json(results: Iterable[BaseModel], output: BinaryIO) -> None:
+    """Write results as an indented JSON array, one model at a time.
+
+    Produces the document ``json.dump([r.model_dump() for r in results],
+    indent=2, ensure_ascii=False)`` would, but each model is encoded straight to
+    UTF-8 bytes by pydantic's compiled serializer: no intermediate dicts for the
+    whole run and no pure-Python indenting encoder.
+    """
+    written = False
+    for result in results:
+        # Nested one level inside the array. JSON strings cannot contain raw
+        # newlines, so every newline is a line break of the indented output.
+        encoded = result.model_dump_json(indent=2).encode("utf-8")
+        _ = output.write(b",\n  " if written else b"[\n  ")
+        _ = output.write(encoded.replace(b"\n", b"\n  "))
+        written = True
+    _ = output.write(b"\n]" if written else b"[]")
+
+
+def _report_results(
+    files_to_classify: list[str],
+    results: list[BaseModel | None],
+    output: str | None,
+    verbose: bool,
+) -> None:
+    for i, result in enumerate(results):
+        if verbose or not output:
+            print(f"\n📄 File {i + 1}: {files_to_classify[i]}")
+            print("-" * 90)
+            if result:
+                metadados_doc = getattr(result, "metadados_documento", None)
+                d = dict(result)
+                if metadados_doc is not None:
+                    metadados_doc = dict(metadados_doc)
+                    del d["metadados_documento"]
+                    pretty_print([d, metadados_doc])
+                else:
+                    pretty_print(d)
+
+            else:
+                print("❌ Classification failed")
+
+    # Save to output file if specified
+    if output:
+        output_path = Path(output)
+        with open(output_path, "wb") as f:
+            _write_results_json((result for result in results if result), f)
+        print(f"\n💾 Results saved to: {output_path}")
+
+
 def main():
     """Main function for CLI usage."""
+    if sys.argv[1:2] == ["serve"]:
+        from .serve import main as serve_main
+
+        serve_main(sys.argv[2:])
+        return
+
     parser = argparse.ArgumentParser(
         description="Classify business documents using AI agents",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -39,6 +308,12 @@ Examples:
   agentic-classify *.pdf
   agentic-classify --processes 8 documents/*.pdf
   agentic-classify --output results.json document1.pdf document2.pdf
+  agentic-classify --stream --output results.jsonl documents/*.pdf
+  agentic-classify --metrics-jsonl metrics.jsonl documents/*.pdf
+  agentic-classify --batch-mode --output results.json documents/*.pdf
+  agentic-classify --ledger --output results.json documents/*.pdf
+  agentic-classify --resume 20250101-220000-a1b2c3 --output results.json
+  agentic-classify serve --socket /run/agentic-classify.sock
         """,
     )
 
@@ -62,14 +337,77 @@ Examples:
         "--output", type=str, help="Output file for results (JSON format)"
     )
 
+    _ = parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Write each result as a JSON line (to stdout or --output) as soon as it completes",
+    )
+
+    _ = parser.add_argument(
+        "--no-dedup",
+        action="store_true",
+        help="Classify every path even when several files have identical content",
+    )
+
+    _ = parser.add_argument(
+        "--batch-mode",
+        action="store_true",
+        help="Run every step as a Gemini batch job (cheaper, completes within hours)",
+    )
+
+    _ = parser.add_argument(
+        "--batch-poll-interval",
+        type=float,
+        help="Seconds between batch job status checks (default: GEMINI_BATCH_POLL_SECONDS or 30)",
+    )
+
+    _ = parser.add_argument(
+        "--ledger",
+        action="store_true",
+        help="Record the run in a durable job ledger so it can be resumed with --resume",
+    )
+
+    _ = parser.add_argument(
+        "--resume",
+        type=str,
+        metavar="RUN_ID",
+        help="Resume a ledger run; its files are read from the ledger",
+    )
+
+    _ = parser.add_argument(
+        "--ledger-path",
+        type=str,
+        default=str(DEFAULT_LEDGER_PATH),
+        help=f"Job ledger database (default: {DEFAULT_LEDGER_PATH})",
+    )
+
+    _ = parser.add_argument(
+        "--metrics-jsonl",
+        type=str,
+        help="Append per-document and per-stage metrics to this JSON Lines file",
+    )
+
+    _ = parser.add_argument(
+        "--metrics-prom",
+        type=str,
+        help="Write aggregated metrics to this Prometheus textfile (node_exporter)",
+    )
+
     _ = parser.add_argument(
         "--verbose", action="store_true", help="Enable verbose output"
     )
 
     args = parser.parse_args()
 
+    resume: str | None = args.resume  # pyright: ignore[reportAny]
+    if resume and args.files:  # pyright: ignore[reportAny]
+        parser.error("--resume reads its files from the ledger; do not list files")
+    ledger: bool = args.ledger or resume is not None  # pyright: ignore[reportAny]
+    if ledger and (args.batch_mode or args.stream):  # pyright: ignore[reportAny]
+        parser.error("--ledger cannot be combined with --batch-mode or --stream")
+
     # Handle --version case (already handled by argparse, this is for clarity)
-    if not args.files:  # pyright: ignore[reportAny]
+    if not args.files and not resume:  # pyright: ignore[reportAny]
         parser.print_help()
         sys.exit(1)
 
@@ -94,7 +432,7 @@ Examples:
 
         files_to_classify.append(file_path)  # pyright: ignore[reportAny]
 
-    if not files_to_classify:
+    if not files_to_classify and not resume:
         print("Error: No valid PDF files found")
         sys.exit(1)
 
@@ -105,53 +443,237 @@ Examples:
         print("export GOOGLE_API_KEY='your_api_key_here'")
         sys.exit(1)
 
+    hooks = _metrics_hooks(
+        args.metrics_jsonl,  # pyright: ignore[reportAny]
+        args.metrics_prom,  # pyright: ignore[reportAny]
+    )
+    _import_pipeline()
+
+    if ledger:
+        _main_ledger(
+            files_to_classify,
+            args.ledger_path,  # pyright: ignore[reportAny]
+            resume,
+            args.processes,  # pyright: ignore[reportAny]
+            args.output,  # pyright: ignore[reportAny]
+            args.verbose,  # pyright: ignore[reportAny]
+            hooks,
+        )
+        return
+
+    if args.batch_mode:  # pyright: ignore[reportAny]
+        _main_batch(
+            files_to_classify,
+            args.batch_poll_interval,  # pyright: ignore[reportAny]
+            args.output,  # pyright: ignore[reportAny]
+            args.verbose,  # pyright: ignore[reportAny]
+        )
+        return
+
+    if args.stream:  # pyright: ignore[reportAny]
+        _main_stream(
+            files_to_classify,
+            args.processes,  # pyright: ignore[reportAny]
+            args.output,  # pyright: ignore[reportAny]
+            not args.no_dedup,  # pyright: ignore[reportAny]
+            hooks,
+        )
+        return
+
     print(f"🚀 Starting classification of {len(files_to_classify)} files...")
     print(f"📊 Using {args.processes} parallel processes")  # pyright: ignore[reportAny]
 
     try:
-        with multiprocessing.Pool(processes=args.processes) as pool:  # pyright: ignore[reportAny]
-            results = pool.map(classify_document, files_to_classify)
+        processes: int = args.processes  # pyright: ignore[reportAny]
+        with multiprocessing.Pool(processes=processes) as pool:
+            duplicates = _find_duplicates(
+                pool, files_to_classify, not args.no_dedup  # pyright: ignore[reportAny]
+            )
+            representatives = duplicates.representatives
+            unique_results: dict[str, BaseModel | None] = {}
+            unique_metrics: dict[str, DocumentMetrics] = {}
+            for filename, result, metrics in pool.map(
+                _classify_with_metrics, _jobs(representatives)
+            ):
+                unique_results[filename] = result
+                unique_metrics[filename] = metrics
+                emit_document(metrics, hooks)
+
+        results: list[BaseModel | None] = []
+        for filename in files_to_classify:
+            result = unique_results[duplicates.representative_of(filename)]
+            results.append(result_for_path(result, filename) if result else None)
 
         print(
             f"\n✅ Classification completed: {len(files_to_classify)} files processed"
         )
+        report = _dedup_report(
+            duplicates,
+            sum(
+                gemini_calls_for(unique_metrics[representative])
+                * (len(duplicates.copies_of(representative)) - 1)
+                for representative in representatives
+            ),
+        )
+        if report:
+            print(report)
+
+        _report_results(
+            files_to_classify,
+            results,
+            args.output,  # pyright: ignore[reportAny]
+            args.verbose,  # pyright: ignore[reportAny]
+        )
 
-        # Output results
-        all_results = []
-        for i, result in enumerate(results):
-            if args.verbose or not args.output:  # pyright: ignore[reportAny]
-                print(f"\n📄 File {i + 1}: {files_to_classify[i]}")
-                print("-" * 90)
-                if result:
-                    metadados_doc = getattr(result, "metadados_documento", None)
-                    d = dict(result)
-                    if metadados_doc is not None:
-                        metadados_doc = dict(metadados_doc)
-                        del d["metadados_documento"]
-                        pretty_print([d, metadados_doc])
-                    else:
-                        pretty_print(d)
+    except KeyboardInterrupt:
+        print("\n⚠️  Classification interrupted by user")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n❌ Error during classification: {e}")
+        sys.exit(1)
 
-                else:
-                    print("❌ Classification failed")
 
-            if result:
-                all_results.append(result.model_dump())  # pyright: ignore[reportUnknownMemberType]
+def _main_stream(
+    files_to_classify: list[str],
+    processes: int,
+    output: str | None,
+    dedup: bool,
+    hooks: list[MetricsHook],
+) -> None:
+    print(
+        f"🚀 Streaming classification of {len(files_to_classify)} files...",
+        file=sys.stderr,
+    )
+    print(f"📊 Using {processes} parallel processes", file=sys.stderr)
+
+    try:
+        if output:
+            with open(output, "w", encoding="utf-8") as output_file:
+                failures = _stream_results(
+                    files_to_classify, processes, output_file, dedup, hooks
+                )
+        else:
+            failures = _stream_results(
+                files_to_classify, processes, sys.stdout, dedup, hooks
+            )
+    except KeyboardInterrupt:
+        print("\n⚠️  Classification interrupted by user", file=sys.stderr)
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n❌ Error during classification: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    print(
+        f"\n✅ Classification completed: {len(files_to_classify)} files processed, "
+        f"{failures} failed",
+        file=sys.stderr,
+    )
+    if output:
+        print(f"💾 Results streamed to: {output}", file=sys.stderr)
+
+
+def _main_batch(
+    files_to_classify: list[str],
+    poll_interval: float | None,
+    output: str | None,
+    verbose: bool,
+) -> None:
+    from ..agents import ErrorOutput
+    from ..batch import BATCH_POLL_SECONDS, classify_batch
+
+    if poll_interval is None:
+        poll_interval = BATCH_POLL_SECONDS
+
+    print(f"🚀 Starting batch classification of {len(files_to_classify)} files...")
+    print("🌙 Steps run as Gemini batch jobs; re-run the same command to resume")
 
-        # Save to output file if specified
-        if args.output:  # pyright: ignore[reportAny]
-            output_path = Path(args.output)  # pyright: ignore[reportAny]
-            with open(output_path, "w", encoding="utf-8") as f:
-                json.dump(all_results, f, indent=2, ensure_ascii=False)
-            print(f"\n💾 Results saved to: {output_path}")
+    try:
+        results: list[BaseModel | None] = []
+        for result in classify_batch(files_to_classify, poll_interval=poll_interval):
+            if hasattr(result, "conteudo"):
+                del result.conteudo  # pyright: ignore[reportAttributeAccessIssue]
+            results.append(result)
+    except KeyboardInterrupt:
+        print("\n⚠️  Batch classification interrupted; submitted jobs keep running")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n❌ Error during batch classification: {e}")
+        sys.exit(1)
+
+    failures = sum(isinstance(result, ErrorOutput) for result in results)
+    print(
+        f"\n✅ Classification completed: {len(files_to_classify)} files processed, "
+        f"{failures} failed"
+    )
+    _report_results(files_to_classify, results, output, verbose)
+
+
+def _main_ledger(
+    files_to_classify: list[str],
+    ledger_path: str,
+    run_id: str | None,
+    processes: int,
+    output: str | None,
+    verbose: bool,
+    hooks: list[MetricsHook],
+) -> None:
+    ledger = JobLedger(ledger_path)
+    if run_id is None:
+        run_id = ledger.create_run(files_to_classify)
+        print(f"📒 Run {run_id} recorded in {ledger.path}")
+    elif not ledger.has_run(run_id):
+        print(f"Error: Run '{run_id}' not found in {ledger.path}")
+        sys.exit(1)
+    else:
+        recovered = ledger.recover(run_id)
+        print(f"📒 Resuming run {run_id}: {recovered} files returned to the queue")
+
+    counts = ledger.counts(run_id)
+    pending = counts["pending"]
+    print(
+        f"🚀 Starting classification of {pending} files "
+        f"({counts['done']} of {sum(counts.values())} already done)..."
+    )
+    print(f"📊 Using {processes} parallel processes")
 
+    completed = 0
+    job = (str(ledger.path), run_id, time.time())
+    try:
+        with multiprocessing.Pool(processes=processes) as pool:
+            for item in pool.imap_unordered(_classify_ledger_job, [job] * pending):
+                if item is None:
+                    continue
+                filename, _, metrics = item
+                emit_document(metrics, hooks)
+                completed += 1
+                print(f"[{completed}/{pending}] {filename}")
     except KeyboardInterrupt:
-        print("\n⚠️  Classification interrupted by user")
+        print(f"\n⚠️  Classification interrupted; resume with --resume {run_id}")
         sys.exit(1)
     except Exception as e:
         print(f"\n❌ Error during classification: {e}")
+        print(f"Resume with --resume {run_id}")
         sys.exit(1)
 
+    counts = ledger.counts(run_id)
+    print(
+        f"\n✅ Run {run_id}: {counts['done']} files classified, "
+        f"{counts['error']} failed"
+    )
+    unfinished = sum(counts.values()) - counts["done"] - counts["error"]
+    if unfinished:
+        print(f"⏳ {unfinished} files are still being classified by other workers")
+    if counts["error"]:
+        print(f"🔁 Retry failed files with --resume {run_id}")
+
+    jobs = ledger.jobs(run_id)
+    _report_results(
+        [job.path for job in jobs],
+        [_ledger_result(job) for job in jobs],
+        output,
+        verbose,
+    )
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,559 @@
+"""
+``agentic-classify serve``: a long-running classification service.
+
+The service starts one pool of worker processes and keeps it warm: every worker
+imports the pipeline, loads the prompts and builds its Gemini client once, at
+startup. Jobs arrive over HTTP, on a TCP port and/or a Unix socket:
+
+- ``POST /classify`` with ``{"files": ["/path/a.pdf", ...]}`` streams one JSON
+  line per file (``application/x-ndjson``, chunked) as soon as it is classified,
+  in completion order. Each line is the classification result, as written by
+  ``agentic-classify --stream``.
+- ``GET /health`` reports the number of workers, the uptime and whether the
+  checkpoint store can be written and read; 503 when it cannot.
+- ``GET /queue`` reports the files waiting for a worker, the files being
+  classified and the totals since startup.
+
+Requests that would push the number of unfinished files above ``--max-pending``
+are rejected with 503 and a ``Retry-After`` header, and bodies larger than
+``--max-body-bytes`` with 413.
+
+The service listens on 127.0.0.1 by default. With ``--token`` (or
+``AGENTIC_SERVE_TOKEN``), ``/classify`` and ``/queue`` require an
+``Authorization: Bearer <token>`` header; other addresses are only accepted
+with a token.
+
+    agentic-classify serve --socket /run/agentic-classify.sock --processes 8
+    curl --unix-socket /run/agentic-classify.sock \\
+        -d '{"files": ["/data/factura.pdf"]}' http://localhost/classify
+"""
+
+from __future__ import annotations
+
+import argparse
+import errno
+import hmac
+import ipaddress
+import json
+import os
+import queue
+import signal
+import socket
+import socketserver
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+
+from pydantic import BaseModel
+
+from ..agents import ErrorOutput, _get_client
+from ..checkpoints import get_checkpoint_store
+from ..metrics import DocumentMetrics, MetricsHook, emit_document
+from ..prompts import preload_prompts
+from ..schemas import preload_response_schemas
+from .classify_documents import (
+    _classify_with_metrics,
+    _metrics_hooks,
+    _redirect_stdout_to_stderr,
+)
+
+DEFAULT_PORT = 8765
+DEFAULT_MAX_PENDING = 10_000
+DEFAULT_MAX_BODY_BYTES = 1024 * 1024
+_RETRY_AFTER_SECONDS = 5
+_HEALTH_KEY = "serve-health-probe"
+
+
+def _warm_worker() -> None:
+    """Pool initializer: pay the start-up costs once per worker process."""
+    _redirect_stdout_to_stderr()
+    preload_prompts()
+    preload_response_schemas()
+    _ = _get_client()
+
+
+class ClassificationService:
+    """A warm worker pool shared by every request the service accepts.
+
+    A worker that dies (killed, or out of memory) breaks the pool: the files it
+    held, and any others still queued in it, are reported as failed, and the
+    next submission starts a new pool.
+    """
+
+    def __init__(
+        self,
+        processes: int,
+        hooks: list[MetricsHook] | None = None,
+        max_pending: int = DEFAULT_MAX_PENDING,
+    ) -> None:
+        self.processes = processes
+        self.hooks = hooks or []
+        self.max_pending = max_pending
+        self.started_at = time.time()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+        # Separate from `_lock`: replacing a pool cancels its futures, whose
+        # callbacks take `_lock`.
+        self._pool_lock = threading.Lock()
+        self._pool = self._start_pool()
+
+    def _start_pool(self) -> ProcessPoolExecutor:
+        pool = ProcessPoolExecutor(max_workers=self.processes, initializer=_warm_worker)
+        # The executor starts its workers on first use; start and warm them now.
+        for future in [pool.submit(os.getpid) for _ in range(self.processes)]:
+            _ = future.result()
+        return pool
+
+    def _submit(self, *args: Any) -> Future[Any]:
+        with self._pool_lock:
+            try:
+                return self._pool.submit(_classify_with_metrics, *args)
+            except BrokenProcessPool:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = self._start_pool()
+                return self._pool.submit(_classify_with_metrics, *args)
+
+    @property
+    def pending(self) -> int:
+        return self.submitted - self.completed
+
+    def submit(
+        self, filenames: list[str]
+    ) -> queue.SimpleQueue[tuple[str, BaseModel | None]] | None:
+        """Queue files for classification.
+
+        Returns:
+            A queue receiving ``(filename, result)`` pairs as they complete, or
+            None when accepting the files would exceed ``max_pending``
+        """
+        with self._lock:
+            if self.pending + len(filenames) > self.max_pending:
+                return None
+            self.submitted += len(filenames)
+
+        results: queue.SimpleQueue[tuple[str, BaseModel | None]] = queue.SimpleQueue()
+        submitted_at = time.time()
+        for filename in filenames:
+            try:
+                future = self._submit((filename, submitted_at))
+            except BrokenProcessPool:
+                # The new pool broke while starting; fail the file, not the job.
+                self._finished(filename, None, results)
+                continue
+            future.add_done_callback(
+                lambda future, filename=filename: self._finished(
+                    filename, future, results
+                )
+            )
+        return results
+
+    def _finished(
+        self,
+        filename: str,
+        future: Future[tuple[str, BaseModel | None, DocumentMetrics]] | None,
+        results: queue.SimpleQueue[tuple[str, BaseModel | None]],
+    ) -> None:
+        # Runs in the pool's management thread; keep it short.
+        result: BaseModel | None = None
+        metrics: DocumentMetrics | None = None
+        if future is not None and not future.cancelled() and not future.exception():
+            _, result, metrics = future.result()
+        if metrics is not None:
+            emit_document(metrics, self.hooks)
+        with self._lock:
+            self.completed += 1
+            if result is None or isinstance(result, ErrorOutput):
+                self.failed += 1
+        results.put((filename, result))
+
+    def health(self) -> dict[str, Any]:
+        """Liveness and a write-then-read probe of the checkpoint store."""
+        try:
+            store = get_checkpoint_store()
+            probe = str(time.time())
+            store.put(_HEALTH_KEY, probe)
+            if store.get(_HEALTH_KEY) != probe:
+                raise OSError("probe read back a different value")
+            checkpoints = {"backend": type(store).__name__, "status": "ok"}
+        except (OSError, sqlite3.Error, ValueError) as error:
+            checkpoints = {"status": "error", "error": str(error)}
+        return {
+            "status": "ok" if checkpoints["status"] == "ok" else "degraded",
+            "workers": self.processes,
+            "uptime_seconds": round(time.time() - self.started_at, 3),
+            "pending": self.pending,
+            "checkpoints": checkpoints,
+        }
+
+    def queue_depth(self) -> dict[str, int]:
+        with self._lock:
+            pending = self.pending
+            return {
+                # The pool does not report which files a worker has picked up;
+                # with every worker busy, the rest are waiting.
+                "queued": max(pending - self.processes, 0),
+                "running": min(pending, self.processes),
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "max_pending": self.max_pending,
+            }
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: _TCPServer | _UnixServer
+
+    def log_message(self, format: str, *args: Any) -> None:
+        if self.server.verbose:
+            print(f"{self.address_string()} {format % args}", file=sys.stderr)
+
+    def address_string(self) -> str:
+        # Unix socket peers have no address.
+        return str(self.client_address[0]) if self.client_address else "unix"
+
+    def _send_json(
+        self,
+        status: int,
+        payload: dict[str, Any],
+        headers: dict[str, str] | None = None,
+    ) -> None:
+        content = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        _ = self.wfile.write(content)
+
+    def _send_error(
+        self, status: int, message: str, headers: dict[str, str] | None = None
+    ) -> None:
+        self._send_json(status, {"error": message}, headers)
+
+    def _write_chunk(self, data: bytes) -> None:
+        _ = self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _authorized(self) -> bool:
+        """Check the bearer token, answering 401 when it is missing or wrong."""
+        token = self.server.token
+        if not token:
+            return True
+        supplied = self.headers.get("Authorization", "")
+        if hmac.compare_digest(supplied.encode("utf-8"), f"Bearer {token}".encode()):
+            return True
+        self.close_connection = True
+        self._send_error(401, "Missing or invalid bearer token")
+        return False
+
+    def do_GET(self) -> None:
+        path = self.path.split("?")[0].rstrip("/")
+        service = self.server.service
+        if path == "/health":
+            health = service.health()
+            self._send_json(200 if health["status"] == "ok" else 503, health)
+        elif path == "/queue":
+            if self._authorized():
+                self._send_json(200, service.queue_depth())
+        else:
+            self._send_error(404, f"Not found: {self.path}")
+
+    def _read_body(self) -> bytes | None:
+        """The request body, or None after answering 400, 411 or 413."""
+        # The body is not read on errors, so the connection cannot be reused.
+        self.close_connection = True
+        header = self.headers.get("Content-Length")
+        if header is None:
+            self._send_error(411, "Content-Length is required")
+            return None
+        if not header.strip().isdigit():
+            self._send_error(400, f"Invalid Content-Length: {header!r}")
+            return None
+        length = int(header)
+        if length > self.server.max_body_bytes:
+            self._send_error(
+                413, f"Body larger than {self.server.max_body_bytes} bytes"
+            )
+            return None
+        body = self.rfile.read(length)
+        if len(body) < length:
+            return None
+        self.close_connection = False
+        return body
+
+    def _parse_files(self, body: bytes) -> list[str] | None:
+        try:
+            payload = json.loads(body or b"{}")
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return None
+        files = payload.get("files") if isinstance(payload, dict) else None
+        if not isinstance(files, list) or not all(isinstance(f, str) for f in files):
+            return None
+        return files
+
+    def do_POST(self) -> None:
+        if self.path.split("?")[0].rstrip("/") != "/classify":
+            self.close_connection = True
+            self._send_error(404, f"Not found: {self.path}")
+            return
+        if not self._authorized():
+            return
+
+        body = self._read_body()
+        if body is None:
+            return
+        files = self._parse_files(body)
+        if files is None:
+            self._send_error(400, 'Expected a JSON body like {"files": ["a.pdf"]}')
+            return
+
+        results = self.server.service.submit(files)
+        if results is None:
+            self._send_error(
+                503,
+                "Too many pending files, retry later",
+                {"Retry-After": str(_RETRY_AFTER_SECONDS)},
+            )
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for _ in files:
+                filename, result = results.get()
+                if result is None:
+                    result = ErrorOutput(
+                        localizacao_ficheiro=filename, erro="Classification failed"
+                    )
+                self._write_chunk((result.model_dump_json() + "\n").encode("utf-8"))
+            self._write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client left; its files still finish and land in checkpoints.
+            self.close_connection = True
+
+
+class _ServerOptions:
+    """Settings the request handler reads from its server."""
+
+    service: ClassificationService
+    verbose: bool
+    token: str | None
+    max_body_bytes: int
+
+    def _configure(
+        self,
+        service: ClassificationService,
+        verbose: bool,
+        token: str | None,
+        max_body_bytes: int,
+    ) -> None:
+        self.service = service
+        self.verbose = verbose
+        self.token = token
+        self.max_body_bytes = max_body_bytes
+
+
+class _TCPServer(_ServerOptions, ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: tuple[str, int],
+        service: ClassificationService,
+        verbose: bool,
+        token: str | None = None,
+        max_body_bytes: int = DEFAULT_MAX_BODY_BYTES,
+    ) -> None:
+        super().__init__(address, _Handler)
+        self._configure(service, verbose, token, max_body_bytes)
+
+
+class _UnixServer(
+    _ServerOptions, socketserver.ThreadingMixIn, socketserver.UnixStreamServer
+):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        path: str,
+        service: ClassificationService,
+        verbose: bool,
+        token: str | None = None,
+        max_body_bytes: int = DEFAULT_MAX_BODY_BYTES,
+    ) -> None:
+        if os.path.exists(path):
+            _remove_stale_socket(path)
+        super().__init__(path, _Handler)
+        self._configure(service, verbose, token, max_body_bytes)
+
+
+def _remove_stale_socket(path: str) -> None:
+    """Remove a socket file left by a dead instance; refuse a live one."""
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except (ConnectionRefusedError, FileNotFoundError):
+        Path(path).unlink(missing_ok=True)
+        return
+    finally:
+        probe.close()
+    raise OSError(errno.EADDRINUSE, f"{path} is served by a running instance")
+
+
+def _is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="agentic-classify serve",
+        description="Run a classification service with warm worker processes",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  agentic-classify serve --port 8765 --processes 8
+  agentic-classify serve --socket /run/agentic-classify.sock
+  curl -d '{"files": ["/data/documento.pdf"]}' http://127.0.0.1:8765/classify
+        """,
+    )
+    _ = parser.add_argument(
+        "--host", default="127.0.0.1", help="Address to listen on (default: 127.0.0.1)"
+    )
+    _ = parser.add_argument(
+        "--port",
+        type=int,
+        help=f"TCP port to listen on (default: {DEFAULT_PORT} unless --socket is given)",
+    )
+    _ = parser.add_argument("--socket", help="Unix socket path to listen on")
+    _ = parser.add_argument(
+        "--processes",
+        type=int,
+        default=4,
+        help="Number of warm worker processes (default: 4)",
+    )
+    _ = parser.add_argument(
+        "--max-pending",
+        type=int,
+        default=DEFAULT_MAX_PENDING,
+        help=f"Reject jobs beyond this many unfinished files (default: {DEFAULT_MAX_PENDING})",
+    )
+    _ = parser.add_argument(
+        "--max-body-bytes",
+        type=int,
+        default=DEFAULT_MAX_BODY_BYTES,
+        help=f"Reject request bodies larger than this (default: {DEFAULT_MAX_BODY_BYTES})",
+    )
+    _ = parser.add_argument(
+        "--token",
+        default=os.environ.get("AGENTIC_SERVE_TOKEN"),
+        help="Bearer token required by /classify and /queue; needed to listen on "
+        "a non-loopback address (default: $AGENTIC_SERVE_TOKEN)",
+    )
+    _ = parser.add_argument(
+        "--metrics-jsonl",
+        type=str,
+        help="Append per-document and per-stage metrics to this JSON Lines file",
+    )
+    _ = parser.add_argument(
+        "--metrics-prom",
+        type=str,
+        help="Write aggregated metrics to this Prometheus textfile (node_exporter)",
+    )
+    _ = parser.add_argument(
+        "--verbose", action="store_true", help="Log every request to stderr"
+    )
+    args = parser.parse_args(argv)
+
+    if not os.getenv("GOOGLE_API_KEY"):
+        print("Error: GOOGLE_API_KEY environment variable not set", file=sys.stderr)
+        sys.exit(1)
+
+    socket_path: str | None = args.socket  # pyright: ignore[reportAny]
+    host: str = args.host  # pyright: ignore[reportAny]
+    port: int | None = args.port  # pyright: ignore[reportAny]
+    verbose: bool = args.verbose  # pyright: ignore[reportAny]
+    token: str | None = args.token or None  # pyright: ignore[reportAny]
+    max_body_bytes: int = args.max_body_bytes  # pyright: ignore[reportAny]
+
+    if (port is not None or not socket_path) and not _is_loopback(host) and not token:
+        print(
+            f"Error: listening on {host} requires --token (or AGENTIC_SERVE_TOKEN)",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+
+    # The first workers are forked before any server thread starts.
+    service = ClassificationService(
+        args.processes,  # pyright: ignore[reportAny]
+        _metrics_hooks(
+            args.metrics_jsonl,  # pyright: ignore[reportAny]
+            args.metrics_prom,  # pyright: ignore[reportAny]
+        ),
+        args.max_pending,  # pyright: ignore[reportAny]
+    )
+
+    servers: list[_TCPServer | _UnixServer] = []
+    addresses: list[str] = []
+    try:
+        if socket_path:
+            servers.append(
+                _UnixServer(socket_path, service, verbose, token, max_body_bytes)
+            )
+            addresses.append(f"unix:{socket_path}")
+        if port is not None or not socket_path:
+            address = (host, DEFAULT_PORT if port is None else port)
+            tcp_server = _TCPServer(address, service, verbose, token, max_body_bytes)
+            servers.append(tcp_server)
+            addresses.append(f"http://{host}:{tcp_server.server_address[1]}")
+    except OSError as error:
+        service.close()
+        print(f"Error: cannot listen: {error}", file=sys.stderr)
+        sys.exit(1)
+
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    stop = threading.Event()
+    _ = signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    print(
+        f"🛰️  Serving on {', '.join(addresses)} with {service.processes} warm workers",
+        file=sys.stderr,
+        flush=True,
+    )
+
+    try:
+        while not stop.wait(1.0):
+            pass
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print("\n🛑 Shutting down", file=sys.stderr)
+        for server in servers:
+            server.shutdown()
+            server.server_close()
+        if socket_path and os.path.exists(socket_path):
+            os.unlink(socket_path)
+        service.close()
+
+
+__all__ = ["ClassificationService", "main"]
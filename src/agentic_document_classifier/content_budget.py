@@ -0,0 +1,245 @@
+"""
+Content budgets for the Markdown sent to triage and the specialists.
+
+The OCR Markdown of a 200-page bank statement or customs file is far larger
+than the calls need: the group is settled by the first pages, and a specialist
+needs the parts that hold its schema's fields. Before a request is sent, its
+content is measured locally with the same estimate the rate limiter uses
+(`rate_limit.estimate_text_tokens`) and, when it exceeds the stage's budget,
+replaced by an excerpt of whole Markdown blocks (paragraphs, tables, headed
+sections), with a marker where content was left out:
+
+- triage: the head of the document, its tail and evenly spaced samples of the
+  middle (`triage_excerpt`)
+- specialists and single-pass calls: the head of the document, then the blocks
+  that mention the most terms of the output schema's field names and
+  descriptions, dates or amounts (`specialist_excerpt`)
+
+Only the request changes; results keep the full content. Configuration:
+
+- ``TRIAGE_CONTENT_TOKENS``: triage budget (default 12000, 0 disables)
+- ``SPECIALIST_CONTENT_TOKENS``: specialist and single-pass budget
+  (default 200000, 0 disables)
+"""
+
+from __future__ import annotations
+
+import functools
+import math
+import os
+import re
+import unicodedata
+from collections.abc import Callable, Iterator
+from typing import Any
+
+from pydantic import BaseModel
+
+from .metrics import record_omitted_tokens
+from .rate_limit import estimate_text_tokens
+
+TRIAGE_CONTENT_TOKENS = int(os.environ.get("TRIAGE_CONTENT_TOKENS", "12000"))
+SPECIALIST_CONTENT_TOKENS = int(os.environ.get("SPECIALIST_CONTENT_TOKENS", "200000"))
+
+# Shares of the triage budget; samples of the middle get the rest.
+TRIAGE_HEAD_SHARE = 0.6
+TRIAGE_TAIL_SHARE = 0.2
+# Share of the specialist budget kept for the head of the document.
+SPECIALIST_HEAD_SHARE = 0.25
+
+# Blocks are kept or dropped whole, so none may exceed this share of a budget.
+_MAX_BLOCK_SHARE = 16
+_MIN_BLOCK_CHARACTERS = 200
+_BLOCK_BREAK = re.compile(r"\n\s*\n|\n(?=#)")
+_WORD = re.compile(r"[0-9A-Z]{4,}")
+_DATE = re.compile(r"\b\d{1,4}[-/.]\d{1,2}[-/.]\d{1,4}\b")
+_AMOUNT = re.compile(r"\b\d{1,3}(?:[ .,]\d{3})*[.,]\d{2}\b")
+_STOPWORDS = frozenset(
+    "PARA COMO ESTE ESTA ESSE ESSA DESTE DESTA NESTE NESTA SEMPRE QUANDO ONDE "
+    "ENTRADA SAIDA CAMPO VALOR EXEMPLO FORMATO OMITIR PRESENTE NULO NULA "
+    "DOCUMENTO DOCUMENTOS ECOADO ECOADA ECOADOS ECOADAS".split()
+)
+
+
+def _normalise(text: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(
+        char for char in decomposed if not unicodedata.combining(char)
+    ).upper()
+
+
+def _split_blocks(markdown: str, max_characters: int) -> list[str]:
+    """Markdown blocks, split at blank lines and headings, of bounded size."""
+    blocks: list[str] = []
+    for block in _BLOCK_BREAK.split(markdown):
+        block = block.strip("\n")
+        if not block.strip():
+            continue
+        while len(block) > max_characters:
+            # Long tables and paragraphs are cut at a line break if possible.
+            cut = block.rfind("\n", 0, max_characters)
+            if cut <= 0:
+                cut = max_characters
+            blocks.append(block[:cut])
+            block = block[cut:].lstrip("\n")
+        if block:
+            blocks.append(block)
+    return blocks
+
+
+def _render(blocks: list[str], selected: set[int]) -> str:
+    parts: list[str] = []
+    omitted = 0
+    for index, block in enumerate(blocks):
+        if index in selected:
+            if omitted:
+                parts.append(f"[… {omitted} caracteres omitidos …]")
+                omitted = 0
+            parts.append(block)
+        else:
+            omitted += len(block)
+    if omitted:
+        parts.append(f"[… {omitted} caracteres omitidos …]")
+    return "\n\n".join(parts)
+
+
+def _take(
+    blocks: list[str], order: Iterator[int], selected: set[int], budget: int
+) -> int:
+    """Add blocks from ``order`` to ``selected`` while they fit ``budget`` tokens."""
+    used = 0
+    for index in order:
+        if index in selected:
+            continue
+        cost = estimate_text_tokens(blocks[index])
+        if used + cost > budget:
+            break
+        selected.add(index)
+        used += cost
+    return used
+
+
+def _excerpt(
+    markdown: str, budget: int, select: Callable[[list[str], int], set[int]]
+) -> str:
+    """``markdown`` if it fits ``budget``, else the blocks ``select`` keeps."""
+    total = estimate_text_tokens(markdown)
+    if budget <= 0 or total <= budget:
+        return markdown
+    # Leave room for the omission markers.
+    budget = budget * 19 // 20
+    max_characters = max(
+        len(markdown) * budget // total // _MAX_BLOCK_SHARE, _MIN_BLOCK_CHARACTERS
+    )
+    blocks = _split_blocks(markdown, max_characters)
+    excerpt = _render(blocks, select(blocks, budget))
+    record_omitted_tokens(max(total - estimate_text_tokens(excerpt), 0))
+    return excerpt
+
+
+def _select_triage(blocks: list[str], budget: int) -> set[int]:
+    selected: set[int] = set()
+    head = _take(
+        blocks, iter(range(len(blocks))), selected, int(budget * TRIAGE_HEAD_SHARE)
+    )
+    tail_start = len(blocks)
+    tail_budget = int(budget * TRIAGE_TAIL_SHARE)
+    tail = 0
+    for index in reversed(range(len(blocks))):
+        if index in selected:
+            break
+        cost = estimate_text_tokens(blocks[index])
+        if tail + cost > tail_budget:
+            break
+        tail += cost
+        tail_start = index
+    selected.update(range(tail_start, len(blocks)))
+
+    # Evenly spaced samples of the middle, one block each.
+    middle = [index for index in range(len(blocks)) if index not in selected]
+    remaining = budget - head - tail
+    if middle and remaining > 0:
+        middle_tokens = sum(estimate_text_tokens(blocks[index]) for index in middle)
+        count = max(
+            1, min(len(middle), remaining * len(middle) // max(middle_tokens, 1))
+        )
+        step = len(middle) / count
+        samples = (middle[int(step * (number + 0.5))] for number in range(count))
+        _ = _take(blocks, samples, selected, remaining)
+    return selected
+
+
+def triage_excerpt(markdown: str, budget: int = TRIAGE_CONTENT_TOKENS) -> str:
+    """``markdown`` within ``budget`` tokens: head, tail and samples of the middle."""
+    return _excerpt(markdown, budget, _select_triage)
+
+
+def _schema_words(schema: Any) -> Iterator[str]:
+    if isinstance(schema, dict):
+        for key, value in schema.items():
+            if key == "properties" and isinstance(value, dict):
+                for name in value:
+                    yield from name.replace("_", " ").split()
+            if key == "description" and isinstance(value, str):
+                yield from value.split()
+            yield from _schema_words(value)
+    elif isinstance(schema, list):
+        for item in schema:
+            yield from _schema_words(item)
+
+
+@functools.lru_cache(maxsize=None)
+def schema_vocabulary(response_model: type[BaseModel]) -> frozenset[str]:
+    """Normalised words of the field names and descriptions of ``response_model``."""
+    text = _normalise(" ".join(_schema_words(response_model.model_json_schema())))
+    return frozenset(_WORD.findall(text)) - _STOPWORDS
+
+
+def _relevance(block: str, vocabulary: frozenset[str]) -> float:
+    text = _normalise(block)
+    matches = len(vocabulary.intersection(_WORD.findall(text)))
+    matches += bool(_DATE.search(text)) + bool(_AMOUNT.search(text))
+    # Matches per block, mildly favouring short blocks over long ones.
+    return matches / math.sqrt(max(estimate_text_tokens(block), 1))
+
+
+def specialist_excerpt(
+    markdown: str,
+    response_model: type[BaseModel],
+    budget: int = SPECIALIST_CONTENT_TOKENS,
+) -> str:
+    """``markdown`` within ``budget`` tokens: head and the most relevant blocks."""
+
+    def select(blocks: list[str], budget: int) -> set[int]:
+        selected: set[int] = set()
+        head = _take(
+            blocks,
+            iter(range(len(blocks))),
+            selected,
+            int(budget * SPECIALIST_HEAD_SHARE),
+        )
+        vocabulary = schema_vocabulary(response_model)
+        scores = {
+            index: _relevance(blocks[index], vocabulary)
+            for index in range(len(blocks))
+            if index not in selected
+        }
+        ranked = sorted(scores, key=lambda index: (-scores[index], index))
+        remaining = budget - head
+        for index in ranked:
+            cost = estimate_text_tokens(blocks[index])
+            # Skip blocks that do not fit; a smaller relevant one may.
+            if cost <= remaining and scores[index] > 0:
+                selected.add(index)
+                remaining -= cost
+        return selected
+
+    return _excerpt(markdown, budget, select)
+
+
+__all__ = [
+    "SPECIALIST_CONTENT_TOKENS",
+    "TRIAGE_CONTENT_TOKENS",
+    "schema_vocabulary",
+    "specialist_excerpt",
+    "triage_excerpt",
+]
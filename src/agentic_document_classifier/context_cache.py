@@ -0,0 +1,309 @@
+"""
+Gemini context caching for large system prompts.
+
+The triage and specialist prompts are sent as ``system_instruction`` on every
+call. With context caching enabled, each prompt is registered once per model as
+a Gemini cached content and later calls refer to it by name, so the prompt
+tokens are neither re-uploaded nor billed at the full input rate.
+
+Caching is opt-in and configured through environment variables:
+
+- ``GEMINI_CONTEXT_CACHE``: set to ``true``/``1``/``yes`` to enable
+- ``GEMINI_CONTEXT_CACHE_TTL_SECONDS``: lifetime of each cache (default 3600)
+- ``GEMINI_CONTEXT_CACHE_MIN_TOKENS``: prompts with fewer estimated tokens are
+  sent inline. By default, the smallest cache Gemini accepts for the model:
+  4096 tokens for Pro models, 1024 for the others
+- ``GEMINI_CONTEXT_CACHE_LOCK_DIRECTORY``: directory of the lock files that
+  serialise cache creation across processes
+  (default ``/tmp/ag_classifier_context_cache``)
+
+Caches are named after a hash of the model and prompt. Looking up and creating
+the cache of a prompt happens under a lock for that name, held across threads
+and, through a lock file, across the worker processes of the host, so siblings
+reuse the cache the first of them created instead of each creating their own.
+Other prompts are not held up meanwhile. Cache creation and TTL updates go
+through the shared rate limiter (see `rate_limit`). A call rejected because its
+cache expired or was deleted (`is_missing_cache_error`) forgets the cache and
+is made once more with a new one.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import hashlib
+import os
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+import httpx
+from google import genai
+from google.genai import errors as genai_errors
+from google.genai import types as genai_types
+
+from .rate_limit import call_with_retry, estimate_text_tokens
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None  # type: ignore[assignment]
+
+CONTEXT_CACHE_ENABLED = os.environ.get("GEMINI_CONTEXT_CACHE", "").lower() in (
+    "true",
+    "1",
+    "yes",
+)
+CONTEXT_CACHE_TTL_SECONDS = int(
+    os.environ.get("GEMINI_CONTEXT_CACHE_TTL_SECONDS", "3600")
+)
+CONTEXT_CACHE_MIN_TOKENS = int(os.environ.get("GEMINI_CONTEXT_CACHE_MIN_TOKENS") or 0)
+LOCK_DIRECTORY = Path(
+    os.environ.get(
+        "GEMINI_CONTEXT_CACHE_LOCK_DIRECTORY", "/tmp/ag_classifier_context_cache"
+    )
+)
+
+_DISPLAY_NAME_PREFIX = "agentic-classifier-"
+# A cache is refreshed once less than this fraction of its TTL remains.
+_REFRESH_FRACTION = 0.2
+# After a failed create, the prompt is sent inline for this long before retrying.
+_FAILURE_BACKOFF_SECONDS = 300.0
+# Smallest explicit cache Gemini accepts, in tokens.
+_PRO_MIN_TOKENS = 4096
+_MIN_TOKENS = 1024
+
+
+def minimum_cache_tokens(model: str) -> int:
+    """Estimated tokens a prompt needs to be cached for ``model``."""
+    if CONTEXT_CACHE_MIN_TOKENS > 0:
+        return CONTEXT_CACHE_MIN_TOKENS
+    return _PRO_MIN_TOKENS if "-pro" in model else _MIN_TOKENS
+
+
+@dataclass
+class _CacheEntry:
+    name: str
+    expires_at: float
+
+
+class PromptContextCache:
+    """Registry of Gemini cached contents holding system prompts.
+
+    Args:
+        ttl_seconds: Lifetime requested for each cached content
+        min_tokens: Prompts with fewer estimated tokens are never cached
+            (by default `minimum_cache_tokens` of the model)
+        lock_directory: Directory of the cross-process lock files, or None to
+            only serialise creation within this process
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: int = CONTEXT_CACHE_TTL_SECONDS,
+        min_tokens: int | None = None,
+        lock_directory: Path | None = LOCK_DIRECTORY,
+    ) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.min_tokens = min_tokens
+        self.lock_directory = lock_directory
+        self.refresh_margin = ttl_seconds * _REFRESH_FRACTION
+        self._entries: dict[str, _CacheEntry] = {}
+        self._failures: dict[str, float] = {}
+        # Guards the registry below; never held across a network call.
+        self._lock = threading.Lock()
+        self._name_locks: dict[str, threading.Lock] = {}
+
+    def _too_small(self, model: str, prompt: str) -> bool:
+        minimum = self.min_tokens
+        if minimum is None:
+            minimum = minimum_cache_tokens(model)
+        return estimate_text_tokens(prompt) < minimum
+
+    @contextmanager
+    def _creation_lock(self, display_name: str) -> Iterator[None]:
+        """Serialise lookup and creation of one cache across threads and processes."""
+        with self._lock:
+            lock = self._name_locks.setdefault(display_name, threading.Lock())
+        with lock:
+            if fcntl is None or self.lock_directory is None:
+                yield
+                return
+            self.lock_directory.mkdir(parents=True, exist_ok=True)
+            path = self.lock_directory / f"{display_name}.lock"
+            with open(path, "a", encoding="utf-8") as handle:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=64)
+    def _display_name(model: str, prompt: str) -> str:
+        digest = hashlib.sha256(f"{model}\0{prompt}".encode("utf-8")).hexdigest()
+        return f"{_DISPLAY_NAME_PREFIX}{digest[:32]}"
+
+    def _fresh_entry(self, display_name: str) -> str | None:
+        entry = self._entries.get(display_name)
+        if entry is not None and entry.expires_at - time.time() > self.refresh_margin:
+            return entry.name
+        return None
+
+    def cached_content_name(
+        self, client: genai.Client, model: str, prompt: str
+    ) -> str | None:
+        """Return the cached content name holding ``prompt`` for ``model``.
+
+        The cache is created on first use and its TTL is extended when it is
+        close to expiring. Returns None when the prompt should be sent inline,
+        either because it is too small or because the cache could not be
+        created.
+        """
+        if self._too_small(model, prompt):
+            return None
+
+        display_name = self._display_name(model, prompt)
+        name = self._fresh_entry(display_name)
+        if name is not None:
+            return name
+
+        with self._creation_lock(display_name):
+            # Another thread may have refreshed the entry while we waited.
+            name = self._fresh_entry(display_name)
+            if name is not None:
+                return name
+
+            if time.time() < self._failures.get(display_name, 0.0):
+                return None
+
+            try:
+                entry = self._refresh_or_create(client, model, prompt, display_name)
+            except (genai_errors.APIError, httpx.TransportError, ValueError):
+                with self._lock:
+                    self._failures[display_name] = (
+                        time.time() + _FAILURE_BACKOFF_SECONDS
+                    )
+                    _ = self._entries.pop(display_name, None)
+                return None
+
+            with self._lock:
+                self._entries[display_name] = entry
+            return entry.name
+
+    async def acached_content_name(
+        self, client: genai.Client, model: str, prompt: str
+    ) -> str | None:
+        """Async counterpart of `cached_content_name`.
+
+        The common case (a fresh cache entry) is answered without leaving the
+        event loop; creation and refresh run in a worker thread.
+        """
+        if self._too_small(model, prompt):
+            return None
+
+        name = self._fresh_entry(self._display_name(model, prompt))
+        if name is not None:
+            return name
+
+        return await asyncio.to_thread(self.cached_content_name, client, model, prompt)
+
+    def _refresh_or_create(
+        self, client: genai.Client, model: str, prompt: str, display_name: str
+    ) -> _CacheEntry:
+        ttl = f"{self.ttl_seconds}s"
+
+        entry = self._entries.get(display_name)
+        if entry is None:
+            entry = self._find_existing(client, model, display_name)
+
+        if entry is not None:
+            if entry.expires_at - time.time() > self.refresh_margin:
+                return entry
+            try:
+                updated = call_with_retry(
+                    lambda: client.caches.update(
+                        name=entry.name,
+                        config=genai_types.UpdateCachedContentConfig(ttl=ttl),
+                    )
+                )
+                return self._entry_from(updated)
+            except genai_errors.APIError:
+                # Expired or deleted in the meantime: fall through and recreate.
+                pass
+
+        created = call_with_retry(
+            lambda: client.caches.create(
+                model=model,
+                config=genai_types.CreateCachedContentConfig(
+                    display_name=display_name,
+                    system_instruction=prompt,
+                    ttl=ttl,
+                ),
+            ),
+            estimate_text_tokens(prompt),
+        )
+        return self._entry_from(created)
+
+    def _find_existing(
+        self, client: genai.Client, model: str, display_name: str
+    ) -> _CacheEntry | None:
+        for cached in client.caches.list():
+            if cached.display_name != display_name or not cached.name:
+                continue
+            if cached.model and not cached.model.endswith(model):
+                continue
+            entry = self._entry_from(cached)
+            if entry.expires_at > time.time():
+                return entry
+        return None
+
+    def _entry_from(self, cached: genai_types.CachedContent) -> _CacheEntry:
+        if not cached.name:
+            raise ValueError("Gemini returned a cached content without a name.")
+        if cached.expire_time is not None:
+            expires_at = cached.expire_time.timestamp()
+        else:
+            expires_at = time.time() + self.ttl_seconds
+        return _CacheEntry(name=cached.name, expires_at=expires_at)
+
+    def invalidate(self, model: str, prompt: str) -> None:
+        """Forget the cache holding ``prompt`` for ``model``, which a call rejected."""
+        with self._lock:
+            _ = self._entries.pop(self._display_name(model, prompt), None)
+
+    def clear(self) -> None:
+        """Forget all known caches in this process (remote caches are kept)."""
+        with self._lock:
+            self._entries.clear()
+            self._failures.clear()
+
+
+def is_missing_cache_error(error: genai_errors.APIError) -> bool:
+    """Whether ``error`` rejects a call because its cached content is gone."""
+    return error.code in (400, 403, 404) and "cache" in str(error).lower()
+
+
+_PROMPT_CACHE: PromptContextCache | None = None
+
+
+def get_prompt_context_cache() -> PromptContextCache | None:
+    """Return the process-wide prompt cache, or None when caching is disabled."""
+    global _PROMPT_CACHE
+    if not CONTEXT_CACHE_ENABLED:
+        return None
+    if _PROMPT_CACHE is None:
+        _PROMPT_CACHE = PromptContextCache()
+    return _PROMPT_CACHE
+
+
+__all__ = [
+    "CONTEXT_CACHE_ENABLED",
+    "PromptContextCache",
+    "get_prompt_context_cache",
+    "is_missing_cache_error",
+    "minimum_cache_tokens",
+]
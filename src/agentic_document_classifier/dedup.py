@@ -0,0 +1,85 @@
+"""
+Content-addressed deduplication of batch inputs.
+
+The same PDF often appears several times in a batch under different paths.
+Grouping the inputs by file identifier (see `agents.file_identifier`) lets a
+batch runner classify each unique document once and copy the result to every
+path, rewriting ``localizacao_ficheiro`` for each copy.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from pydantic import BaseModel
+
+    from .metrics import DocumentMetrics
+
+
+@dataclass
+class DuplicateGroups:
+    """Input paths grouped by file identifier, in input order."""
+
+    groups: dict[str, list[str]] = field(default_factory=dict)
+    _representative: dict[str, str] = field(default_factory=dict)
+    _identifier: dict[str, str] = field(default_factory=dict)
+
+    def add(self, path: str, identifier: str) -> None:
+        paths = self.groups.setdefault(identifier, [])
+        paths.append(path)
+        self._representative[path] = paths[0]
+        self._identifier[path] = identifier
+
+    @property
+    def representatives(self) -> list[str]:
+        """The first path of each group: the only ones that need classifying."""
+        return [paths[0] for paths in self.groups.values()]
+
+    @property
+    def duplicate_count(self) -> int:
+        return sum(len(paths) - 1 for paths in self.groups.values())
+
+    def representative_of(self, path: str) -> str:
+        return self._representative[path]
+
+    def copies_of(self, representative: str) -> list[str]:
+        """All paths sharing ``representative``'s content, itself included."""
+        return self.groups[self._identifier[representative]]
+
+
+def group_duplicates(identified: Iterable[tuple[str, str]]) -> DuplicateGroups:
+    """Group ``(path, identifier)`` pairs by identifier."""
+    duplicates = DuplicateGroups()
+    for path, identifier in identified:
+        duplicates.add(path, identifier)
+    return duplicates
+
+
+def result_for_path(result: BaseModel, path: str) -> BaseModel:
+    """Return ``result`` as it should be reported for ``path``."""
+    if getattr(result, "localizacao_ficheiro", path) == path:
+        return result
+    return result.model_copy(update={"localizacao_ficheiro": path})
+
+
+def gemini_calls_for(metrics: DocumentMetrics | None) -> int:
+    """
+    Number of Gemini calls recorded in ``metrics`` for one document.
+
+    Counts every response, so chunked OCR, re-asks and escalations are
+    included, while checkpoint hits, text-layer OCR and local triage are not.
+    """
+    if metrics is None:
+        return 0
+    return sum(stage.calls for stage in metrics.stages)
+
+
+__all__ = [
+    "DuplicateGroups",
+    "gemini_calls_for",
+    "group_duplicates",
+    "result_for_path",
+]
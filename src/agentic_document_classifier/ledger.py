@@ -0,0 +1,398 @@
+"""
+Durable job ledger for large classification runs.
+
+A run is a list of files recorded in a SQLite database, one job per file. Each
+job moves through the states ``pending``, ``ocr``, ``triage``, ``specialist``
+and finally ``done`` or ``error``, and keeps its attempt count, the worker that
+holds it, its result and its last error. Because the ledger lives outside the
+process, a run that dies half-way is resumed by its run id without enumerating
+the files again; documents already classified are never classified twice.
+
+Workers claim jobs themselves, one at a time, inside an immediate transaction,
+so any number of processes (on the same host) can work through one run. A claim
+is a lease: a heartbeat thread refreshes it while the worker holds the job (see
+`JobLedger.keep_alive`), as does every stage it starts, and `JobLedger.recover`
+returns jobs whose lease expired, or whose worker process is gone, to
+``pending``. Results are only recorded by the worker holding the job, so a file
+reclaimed from a slow worker is still recorded exactly once.
+
+Configuration:
+
+- ``JOB_LEDGER_PATH``: database file (default ``/tmp/ag_classifier_jobs.sqlite3``)
+- ``JOB_LEDGER_LEASE_SECONDS``: lease of a claimed job (default 900)
+- ``JOB_LEDGER_MAX_ATTEMPTS``: attempts before an error is final (default 3)
+"""
+
+from __future__ import annotations
+
+import os
+import secrets
+import socket
+import sqlite3
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+from .metrics import MetricsHook, StageMetrics
+
+DEFAULT_LEDGER_PATH = Path(
+    os.environ.get("JOB_LEDGER_PATH", "/tmp/ag_classifier_jobs.sqlite3")
+)
+LEASE_SECONDS = float(os.environ.get("JOB_LEDGER_LEASE_SECONDS", "900"))
+MAX_ATTEMPTS = int(os.environ.get("JOB_LEDGER_MAX_ATTEMPTS", "3"))
+
+JOB_STATES = ("pending", "ocr", "triage", "specialist", "done", "error")
+_IN_PROGRESS = ("ocr", "triage", "specialist")
+# Pipeline stage (see `metrics`) -> job state entered when the stage starts.
+_STAGE_STATES = {
+    "ocr": "ocr",
+    "triage": "triage",
+    "single_pass": "triage",
+    "specialist": "specialist",
+}
+
+
+@dataclass
+class Job:
+    run_id: str
+    position: int
+    path: str
+    state: str
+    attempts: int
+    worker: str | None = None
+    result_model: str | None = None
+    result: str | None = None
+    error: str | None = None
+
+
+def worker_id() -> str:
+    """Identifier of the calling process, as recorded on claimed jobs."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _worker_gone(worker: str | None) -> bool:
+    """Whether ``worker`` is a process of this host that no longer exists."""
+    if not worker:
+        return True
+    host, _, pid = worker.rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        return False
+    # A killed worker whose parent died too may linger as a zombie until it is
+    # reaped; on Linux, /proc tells them apart from live processes.
+    try:
+        stat = Path(f"/proc/{pid}/stat").read_text()
+    except OSError:
+        return False
+    return stat.rpartition(")")[2].split()[0] == "Z"
+
+
+class JobLedger:
+    """Runs and their per-file jobs in a SQLite database shared by workers."""
+
+    def __init__(
+        self,
+        path: Path | str = DEFAULT_LEDGER_PATH,
+        lease_seconds: float = LEASE_SECONDS,
+        max_attempts: int = MAX_ATTEMPTS,
+    ) -> None:
+        self.path = Path(path)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._connection: sqlite3.Connection | None = None
+        self._connection_pid: int | None = None
+
+    def _connect(self) -> sqlite3.Connection:
+        # Connections must not be shared across fork(), so each process opens
+        # its own on first use.
+        if self._connection is None or self._connection_pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(
+                self.path, timeout=30.0, isolation_level=None, check_same_thread=False
+            )
+            _ = connection.execute("PRAGMA journal_mode=WAL")
+            _ = connection.execute("PRAGMA synchronous=NORMAL")
+            _ = connection.execute("""
+                CREATE TABLE IF NOT EXISTS runs (
+                    run_id TEXT PRIMARY KEY,
+                    created_at REAL NOT NULL,
+                    files INTEGER NOT NULL
+                )
+                """)
+            _ = connection.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    run_id TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    path TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    worker TEXT,
+                    heartbeat_at REAL,
+                    result_model TEXT,
+                    result TEXT,
+                    error TEXT,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (run_id, position)
+                )
+                """)
+            _ = connection.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_state ON jobs (run_id, state, position)"
+            )
+            self._connection = connection
+            self._connection_pid = os.getpid()
+        return self._connection
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        # BEGIN IMMEDIATE takes the write lock up front, so two workers can
+        # never read the same pending job and both claim it.
+        with self._lock:
+            connection = self._connect()
+            _ = connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+                _ = connection.execute("COMMIT")
+            except BaseException:
+                _ = connection.execute("ROLLBACK")
+                raise
+
+    def create_run(self, paths: list[str], run_id: str | None = None) -> str:
+        """Record a new run with one pending job per path, in order.
+
+        Returns:
+            The run id, to pass to `claim` and to resume the run later
+        """
+        run_id = run_id or f"{time.strftime('%Y%m%d-%H%M%S')}-{secrets.token_hex(3)}"
+        now = time.time()
+        with self._transaction() as connection:
+            _ = connection.execute(
+                "INSERT INTO runs (run_id, created_at, files) VALUES (?, ?, ?)",
+                (run_id, now, len(paths)),
+            )
+            _ = connection.executemany(
+                "INSERT INTO jobs (run_id, position, path, state, updated_at) "
+                "VALUES (?, ?, ?, 'pending', ?)",
+                [(run_id, position, path, now) for position, path in enumerate(paths)],
+            )
+        return run_id
+
+    def has_run(self, run_id: str) -> bool:
+        with self._lock:
+            row = (
+                self._connect()
+                .execute("SELECT 1 FROM runs WHERE run_id = ?", (run_id,))
+                .fetchone()
+            )
+        return row is not None
+
+    def recover(self, run_id: str) -> int:
+        """Return abandoned and retryable jobs of a run to ``pending``.
+
+        A job is abandoned when its lease expired or its worker process no
+        longer exists; failed jobs are retried until they reach
+        ``max_attempts``.
+
+        Returns:
+            Number of jobs returned to ``pending``
+        """
+        expired = time.time() - self.lease_seconds
+        with self._transaction() as connection:
+            rows = connection.execute(
+                f"SELECT position, worker, heartbeat_at FROM jobs "
+                f"WHERE run_id = ? AND state IN ({', '.join('?' * len(_IN_PROGRESS))})",
+                (run_id, *_IN_PROGRESS),
+            ).fetchall()
+            abandoned = [
+                (run_id, position)
+                for position, worker, heartbeat_at in rows
+                if (heartbeat_at or 0.0) < expired or _worker_gone(worker)
+            ]
+            _ = connection.executemany(
+                "UPDATE jobs SET state = 'pending', worker = NULL "
+                "WHERE run_id = ? AND position = ?",
+                abandoned,
+            )
+            retried = connection.execute(
+                "UPDATE jobs SET state = 'pending', worker = NULL "
+                "WHERE run_id = ? AND state = 'error' AND attempts < ?",
+                (run_id, self.max_attempts),
+            ).rowcount
+        return len(abandoned) + retried
+
+    def claim(self, run_id: str, worker: str | None = None) -> Job | None:
+        """Take the next pending job of a run, or None when there is none."""
+        worker = worker or worker_id()
+        now = time.time()
+        with self._transaction() as connection:
+            row = connection.execute(
+                "SELECT position, path, attempts FROM jobs "
+                "WHERE run_id = ? AND state = 'pending' ORDER BY position LIMIT 1",
+                (run_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            position, path, attempts = row
+            _ = connection.execute(
+                "UPDATE jobs SET state = ?, attempts = ?, worker = ?, "
+                "heartbeat_at = ?, updated_at = ? WHERE run_id = ? AND position = ?",
+                (_IN_PROGRESS[0], attempts + 1, worker, now, now, run_id, position),
+            )
+        return Job(run_id, position, path, _IN_PROGRESS[0], attempts + 1, worker)
+
+    def _update_held(
+        self, job: Job, assignments: str, values: tuple[object, ...]
+    ) -> bool:
+        # Only the worker holding the job may change it.
+        now = time.time()
+        with self._transaction() as connection:
+            updated = connection.execute(
+                f"UPDATE jobs SET {assignments}, heartbeat_at = ?, updated_at = ? "
+                f"WHERE run_id = ? AND position = ? AND worker = ? "
+                f"AND state IN ({', '.join('?' * len(_IN_PROGRESS))})",
+                (
+                    *values,
+                    now,
+                    now,
+                    job.run_id,
+                    job.position,
+                    job.worker,
+                    *_IN_PROGRESS,
+                ),
+            ).rowcount
+        return updated == 1
+
+    def advance(self, job: Job, state: str) -> bool:
+        """Move a held job to a pipeline state and refresh its lease."""
+        if state not in _IN_PROGRESS:
+            raise ValueError(f"Not an in-progress job state: {state}")
+        job.state = state
+        return self._update_held(job, "state = ?", (state,))
+
+    def heartbeat(self, job: Job) -> bool:
+        """Refresh the lease of a held job.
+
+        Returns:
+            False when the job is no longer held by this worker
+        """
+        with self._transaction() as connection:
+            updated = connection.execute(
+                f"UPDATE jobs SET heartbeat_at = ? "
+                f"WHERE run_id = ? AND position = ? AND worker = ? "
+                f"AND state IN ({', '.join('?' * len(_IN_PROGRESS))})",
+                (time.time(), job.run_id, job.position, job.worker, *_IN_PROGRESS),
+            ).rowcount
+        return updated == 1
+
+    @contextmanager
+    def keep_alive(self, job: Job) -> Iterator[None]:
+        """Refresh the lease of a held job from a background thread.
+
+        The lease is refreshed three times per ``lease_seconds`` until the block
+        exits, so a stage slower than the lease (a long OCR with retries) does
+        not let `recover` hand the job to another worker.
+        """
+        stopped = threading.Event()
+
+        def beat() -> None:
+            while not stopped.wait(self.lease_seconds / 3):
+                if not self.heartbeat(job):
+                    return
+
+        thread = threading.Thread(target=beat, name="ledger-heartbeat", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stopped.set()
+            thread.join()
+
+    def complete(self, job: Job, result_model: str, result: str) -> bool:
+        """Record the result of a held job.
+
+        Returns:
+            False when the job is no longer held by this worker (its lease
+            expired and it was reclaimed); the result is then not recorded
+        """
+        job.state, job.result_model, job.result = "done", result_model, result
+        return self._update_held(
+            job,
+            "state = 'done', result_model = ?, result = ?, error = NULL",
+            (result_model, result),
+        )
+
+    def fail(
+        self,
+        job: Job,
+        error: str,
+        result_model: str | None = None,
+        result: str | None = None,
+    ) -> bool:
+        """Record the failure of a held job. See `complete`."""
+        job.state, job.error = "error", error
+        job.result_model, job.result = result_model, result
+        return self._update_held(
+            job,
+            "state = 'error', error = ?, result_model = ?, result = ?",
+            (error, result_model, result),
+        )
+
+    def counts(self, run_id: str) -> dict[str, int]:
+        """Number of jobs of a run in each state."""
+        with self._lock:
+            rows = (
+                self._connect()
+                .execute(
+                    "SELECT state, COUNT(*) FROM jobs WHERE run_id = ? GROUP BY state",
+                    (run_id,),
+                )
+                .fetchall()
+            )
+        counts = dict.fromkeys(JOB_STATES, 0)
+        counts.update({state: count for state, count in rows})
+        return counts
+
+    def jobs(self, run_id: str) -> list[Job]:
+        """Every job of a run, in the order the files were given."""
+        with self._lock:
+            rows = (
+                self._connect()
+                .execute(
+                    "SELECT position, path, state, attempts, worker, result_model, "
+                    "result, error FROM jobs WHERE run_id = ? ORDER BY position",
+                    (run_id,),
+                )
+                .fetchall()
+            )
+        return [Job(run_id, *row) for row in rows]
+
+
+class LedgerProgressHook(MetricsHook):
+    """Advances a claimed job through the ledger as its pipeline stages start."""
+
+    def __init__(self, ledger: JobLedger, job: Job) -> None:
+        self.ledger = ledger
+        self.job = job
+
+    def on_stage_start(self, metrics: StageMetrics) -> None:
+        state = _STAGE_STATES.get(metrics.stage)
+        if state is not None and metrics.document == self.job.path:
+            _ = self.ledger.advance(self.job, state)
+
+
+__all__ = [
+    "DEFAULT_LEDGER_PATH",
+    "JOB_STATES",
+    "Job",
+    "JobLedger",
+    "LedgerProgressHook",
+    "worker_id",
+]
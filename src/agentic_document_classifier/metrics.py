@@ -0,0 +1,475 @@
+"""
+Per-document, per-stage instrumentation of the classification pipeline.
+
+Every document classified is tracked as a `DocumentMetrics` holding one
+`StageMetrics` per pipeline stage (``ocr``, ``triage``, ``specialist``, or
+``single_pass`` when triage and specialist are merged). A stage records its wall
+time, the time spent waiting for the rate limiter, Gemini token usage and
+estimated cost, whether it was served from a checkpoint, how many retries it
+needed, how many invalid answers were repaired locally or re-asked, how often
+an unusable answer escalated it to the next model of its `routing` policy, and
+how many content tokens its `content_budget` left out of the request.
+
+Metrics are delivered to hooks registered with `add_metrics_hook`. Subclass
+`MetricsHook` and override the events you need; `JsonLinesMetricsExporter` and
+`PrometheusTextfileExporter` are provided. The current document and stage are
+kept in context variables, so tracking works the same for threads, worker
+processes and asyncio tasks. The ``record_*`` functions may be called from
+several threads for one stage (the OCR of page chunks) and update it under a
+lock.
+
+Two waits are reported separately: a stage's ``rate_limit_wait`` is the time
+its calls waited for the shared rate limiter, and a document's ``queue_wait``
+the time it waited for a worker process or a concurrency slot before its first
+stage started.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any
+
+# USD per million tokens: (input, cached input, output). List prices for the
+# standard tier; override with GEMINI_PRICING='{"model": [in, cached, out]}'.
+MODEL_PRICING: dict[str, tuple[float, float, float]] = {
+    "gemini-2.5-pro": (1.25, 0.31, 10.0),
+    "gemini-2.5-flash": (0.30, 0.075, 2.50),
+    "gemini-2.5-flash-lite": (0.10, 0.025, 0.40),
+    "gemini-2.0-flash": (0.10, 0.025, 0.40),
+    "gemini-2.0-flash-lite": (0.075, 0.01875, 0.30),
+}
+MODEL_PRICING.update(
+    {
+        model: (float(prices[0]), float(prices[1]), float(prices[2]))
+        for model, prices in json.loads(os.environ.get("GEMINI_PRICING", "{}")).items()
+    }
+)
+
+
+@dataclass
+class StageMetrics:
+    document: str
+    stage: str
+    started_at: float = field(default_factory=time.time)
+    wall_time: float = 0.0
+    rate_limit_wait: float = 0.0
+    model: str | None = None
+    calls: int = 0
+    retries: int = 0
+    repairs: int = 0
+    reasks: int = 0
+    escalations: int = 0
+    omitted_tokens: int = 0
+    checkpoint_hit: bool = False
+    local_result: bool = False
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+    output_tokens: int = 0
+    total_tokens: int = 0
+    estimated_cost_usd: float = 0.0
+    error: str | None = None
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass
+class DocumentMetrics:
+    document: str
+    started_at: float = field(default_factory=time.time)
+    wall_time: float = 0.0
+    queue_wait: float = 0.0
+    stages: list[StageMetrics] = field(default_factory=list)
+    error: str | None = None
+
+    @property
+    def total_tokens(self) -> int:
+        return sum(stage.total_tokens for stage in self.stages)
+
+    @property
+    def estimated_cost_usd(self) -> float:
+        return sum(stage.estimated_cost_usd for stage in self.stages)
+
+    def to_dict(self) -> dict[str, Any]:
+        data = asdict(self)
+        data["total_tokens"] = self.total_tokens
+        data["estimated_cost_usd"] = self.estimated_cost_usd
+        return data
+
+
+class MetricsHook:
+    """Receiver of pipeline metrics. Override the events of interest."""
+
+    def on_stage_start(self, metrics: StageMetrics) -> None:
+        """Called when a stage begins, before any checkpoint lookup."""
+
+    def on_stage_end(self, metrics: StageMetrics) -> None:
+        """Called when a stage finishes, successfully or not."""
+
+    def on_document_end(self, metrics: DocumentMetrics) -> None:
+        """Called once per document after its last stage."""
+
+
+_HOOKS: list[MetricsHook] = []
+_CURRENT_DOCUMENT: ContextVar[DocumentMetrics | None] = ContextVar(
+    "current_document", default=None
+)
+_CURRENT_STAGE: ContextVar[StageMetrics | None] = ContextVar(
+    "current_stage", default=None
+)
+# Guards stage counters updated by the threads of one stage.
+_RECORD_LOCK = threading.Lock()
+
+
+def add_metrics_hook(hook: MetricsHook) -> None:
+    """Register ``hook`` to receive metrics from this process."""
+    _HOOKS.append(hook)
+
+
+def remove_metrics_hook(hook: MetricsHook) -> None:
+    """Unregister a hook added with `add_metrics_hook`."""
+    if hook in _HOOKS:
+        _HOOKS.remove(hook)
+
+
+def emit_document(metrics: DocumentMetrics, hooks: list[MetricsHook]) -> None:
+    """Replay a finished document's stage and document events to ``hooks``.
+
+    Used to forward metrics collected in a worker process to hooks living in
+    the parent process.
+    """
+    for hook in hooks:
+        for stage in metrics.stages:
+            hook.on_stage_end(stage)
+        hook.on_document_end(metrics)
+
+
+@contextmanager
+def track_document(document: str, queue_wait: float = 0.0) -> Iterator[DocumentMetrics]:
+    """Track one document. Nested calls reuse the outer tracker.
+
+    Args:
+        document: Path of the document being classified
+        queue_wait: Seconds the document waited before processing started
+            (e.g. for a worker process or a concurrency slot)
+    """
+    current = _CURRENT_DOCUMENT.get()
+    if current is not None:
+        yield current
+        return
+
+    metrics = DocumentMetrics(document=document, queue_wait=queue_wait)
+    token = _CURRENT_DOCUMENT.set(metrics)
+    start = time.perf_counter()
+    try:
+        yield metrics
+    finally:
+        metrics.wall_time = time.perf_counter() - start
+        _CURRENT_DOCUMENT.reset(token)
+        for hook in list(_HOOKS):
+            hook.on_document_end(metrics)
+
+
+@contextmanager
+def track_stage(stage: str) -> Iterator[StageMetrics]:
+    """Track one pipeline stage of the current document."""
+    document = _CURRENT_DOCUMENT.get()
+    metrics = StageMetrics(
+        document=document.document if document is not None else "", stage=stage
+    )
+    token = _CURRENT_STAGE.set(metrics)
+    for hook in list(_HOOKS):
+        hook.on_stage_start(metrics)
+
+    start = time.perf_counter()
+    try:
+        yield metrics
+    except BaseException as error:
+        metrics.error = f"{type(error).__name__}: {error}"
+        raise
+    finally:
+        metrics.wall_time = time.perf_counter() - start
+        _CURRENT_STAGE.reset(token)
+        if document is not None:
+            document.stages.append(metrics)
+            if metrics.error and document.error is None:
+                document.error = metrics.error
+        for hook in list(_HOOKS):
+            hook.on_stage_end(metrics)
+
+
+def current_stage() -> StageMetrics | None:
+    """The stage being tracked in this context, if any."""
+    return _CURRENT_STAGE.get()
+
+
+def record_checkpoint_hit() -> None:
+    stage = _CURRENT_STAGE.get()
+    if stage is not None:
+        stage.checkpoint_hit = True
+
+
+def record_local_result() -> None:
+    """Mark the current stage as answered locally, without calling Gemini."""
+    stage = _CURRENT_STAGE.get()
+    if stage is not None:
+        stage.local_result = True
+
+
+def record_retry() -> None:
+    stage = _CURRENT_STAGE.get()
+    if stage is not None:
+        with _RECORD_LOCK:
+            stage.retries += 1
+
+
+def record_repair() -> None:
+    """Count an invalid answer that was repaired locally."""
+    stage = _CURRENT_STAGE.get()
+    if stage is not None:
+        with _RECORD_LOCK:
+            stage.repairs += 1
+
+
+def record_reask() -> None:
+    """Count an invalid answer that was asked again with its validation errors."""
+    stage = _CURRENT_STAGE.get()
+    if stage is not None:
+        with _RECORD_LOCK:
+            stage.reasks += 1
+
+
+def record_escalation() -> None:
+    """Count a call whose answer was unusable and was asked of the next model."""
+    stage = _CURRENT_STAGE.get()
+    if stage is not None:
+        with _RECORD_LOCK:
+            stage.escalations += 1
+
+
+def record_omitted_tokens(tokens: int) -> None:
+    """Count content tokens left out of a request by its content budget."""
+    stage = _CURRENT_STAGE.get()
+    if stage is not None:
+        with _RECORD_LOCK:
+            stage.omitted_tokens += tokens
+
+
+def record_wait(seconds: float) -> None:
+    """Add time spent waiting for the rate limiter to the current stage."""
+    stage = _CURRENT_STAGE.get()
+    if stage is not None:
+        with _RECORD_LOCK:
+            stage.rate_limit_wait += seconds
+
+
+def estimate_cost(
+    model: str, prompt_tokens: int, cached_tokens: int, output_tokens: int
+) -> float:
+    """Estimated USD cost of a call, or 0.0 for models without known pricing."""
+    prices = MODEL_PRICING.get(model.removeprefix("models/"))
+    if prices is None:
+        return 0.0
+    input_price, cached_price, output_price = prices
+    return (
+        (prompt_tokens - cached_tokens) * input_price
+        + cached_tokens * cached_price
+        + output_tokens * output_price
+    ) / 1_000_000
+
+
+def record_usage(response: Any, model: str) -> None:
+    """Add a Gemini response's ``usage_metadata`` to the current stage."""
+    stage = _CURRENT_STAGE.get()
+    if stage is None:
+        return
+
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        with _RECORD_LOCK:
+            stage.model = model
+            stage.calls += 1
+        return
+
+    prompt_tokens = usage.prompt_token_count or 0
+    cached_tokens = usage.cached_content_token_count or 0
+    # Thinking tokens are billed as output tokens.
+    output_tokens = (usage.candidates_token_count or 0) + (
+        usage.thoughts_token_count or 0
+    )
+    cost = estimate_cost(model, prompt_tokens, cached_tokens, output_tokens)
+    with _RECORD_LOCK:
+        stage.model = model
+        stage.calls += 1
+        stage.prompt_tokens += prompt_tokens
+        stage.cached_tokens += cached_tokens
+        stage.output_tokens += output_tokens
+        stage.total_tokens += usage.total_token_count or 0
+        stage.estimated_cost_usd += cost
+
+
+# ============================================================================
+# Exporters
+# ============================================================================
+
+
+class MetricsCollector(MetricsHook):
+    """Keeps finished documents in memory until `drain` is called."""
+
+    def __init__(self) -> None:
+        self._documents: list[DocumentMetrics] = []
+        self._lock = threading.Lock()
+
+    def on_document_end(self, metrics: DocumentMetrics) -> None:
+        with self._lock:
+            self._documents.append(metrics)
+
+    def drain(self) -> list[DocumentMetrics]:
+        with self._lock:
+            documents, self._documents = self._documents, []
+        return documents
+
+
+class JsonLinesMetricsExporter(MetricsHook):
+    """Appends one JSON line per finished stage and per finished document."""
+
+    def __init__(self, path: Path | str) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def _write(self, record: dict[str, Any]) -> None:
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock, open(self.path, "a", encoding="utf-8") as handle:
+            _ = handle.write(line)
+
+    def on_stage_end(self, metrics: StageMetrics) -> None:
+        self._write({"event": "stage", **metrics.to_dict()})
+
+    def on_document_end(self, metrics: DocumentMetrics) -> None:
+        record = metrics.to_dict()
+        del record["stages"]
+        self._write({"event": "document", **record})
+
+
+class PrometheusTextfileExporter(MetricsHook):
+    """Aggregates metrics and rewrites a node_exporter textfile after each document.
+
+    The file is replaced atomically, so the textfile collector never reads a
+    partial scrape.
+    """
+
+    PREFIX = "agentic_classifier"
+
+    def __init__(self, path: Path | str) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._stage_counters: dict[tuple[str, str], float] = defaultdict(float)
+        self._documents = 0
+        self._failed_documents = 0
+        self._document_seconds = 0.0
+        self._document_queue_seconds = 0.0
+
+    def on_stage_end(self, metrics: StageMetrics) -> None:
+        with self._lock:
+            counters = self._stage_counters
+            stage = metrics.stage
+            counters[(stage, "runs")] += 1
+            counters[(stage, "seconds")] += metrics.wall_time
+            counters[(stage, "rate_limit_wait_seconds")] += metrics.rate_limit_wait
+            counters[(stage, "calls")] += metrics.calls
+            counters[(stage, "retries")] += metrics.retries
+            counters[(stage, "repairs")] += metrics.repairs
+            counters[(stage, "reasks")] += metrics.reasks
+            counters[(stage, "escalations")] += metrics.escalations
+            counters[(stage, "omitted_tokens")] += metrics.omitted_tokens
+            counters[(stage, "checkpoint_hits")] += int(metrics.checkpoint_hit)
+            counters[(stage, "local_results")] += int(metrics.local_result)
+            counters[(stage, "errors")] += int(metrics.error is not None)
+            counters[(stage, "successes")] += int(metrics.error is None)
+            counters[(stage, "prompt_tokens")] += metrics.prompt_tokens
+            counters[(stage, "cached_tokens")] += metrics.cached_tokens
+            counters[(stage, "output_tokens")] += metrics.output_tokens
+            counters[(stage, "cost_usd")] += metrics.estimated_cost_usd
+
+    def on_document_end(self, metrics: DocumentMetrics) -> None:
+        with self._lock:
+            self._documents += 1
+            self._failed_documents += int(metrics.error is not None)
+            self._document_seconds += metrics.wall_time
+            self._document_queue_seconds += metrics.queue_wait
+        self.flush()
+
+    def render(self) -> str:
+        prefix = self.PREFIX
+        with self._lock:
+            lines = [
+                f"# TYPE {prefix}_documents_total counter",
+                f"{prefix}_documents_total {self._documents}",
+                f"# TYPE {prefix}_documents_failed_total counter",
+                f"{prefix}_documents_failed_total {self._failed_documents}",
+                f"# TYPE {prefix}_document_seconds_total counter",
+                f"{prefix}_document_seconds_total {self._document_seconds}",
+                f"# TYPE {prefix}_document_queue_seconds_total counter",
+                f"{prefix}_document_queue_seconds_total "
+                f"{self._document_queue_seconds}",
+            ]
+            names = sorted({name for _, name in self._stage_counters})
+            for name in names:
+                metric = f"{prefix}_stage_{name}_total"
+                lines.append(f"# TYPE {metric} counter")
+                for (stage, counter_name), value in sorted(
+                    self._stage_counters.items()
+                ):
+                    if counter_name == name:
+                        lines.append(f'{metric}{{stage="{stage}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def flush(self) -> None:
+        content = self.render()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        file_descriptor, temp_name = tempfile.mkstemp(
+            dir=self.path.parent, prefix=f".{self.path.name}."
+        )
+        try:
+            with os.fdopen(file_descriptor, "w", encoding="utf-8") as handle:
+                _ = handle.write(content)
+            os.replace(temp_name, self.path)
+        except BaseException:
+            Path(temp_name).unlink(missing_ok=True)
+            raise
+
+
+__all__ = [
+    "DocumentMetrics",
+    "JsonLinesMetricsExporter",
+    "MetricsCollector",
+    "MetricsHook",
+    "PrometheusTextfileExporter",
+    "StageMetrics",
+    "add_metrics_hook",
+    "current_stage",
+    "emit_document",
+    "estimate_cost",
+    "record_checkpoint_hit",
+    "record_escalation",
+    "record_local_result",
+    "record_omitted_tokens",
+    "record_reask",
+    "record_repair",
+    "record_retry",
+    "record_usage",
+    "record_wait",
+    "remove_metrics_hook",
+    "track_document",
+    "track_stage",
+]
@@ -0,0 +1,37 @@
+"""
+Pydantic models of the classification pipeline.
+
+`common` holds the models every step needs. Each specialist's output models live
+in their own module (``banking``, ``customs``, ``freight``, ``hr``, ``invoice``,
+``taxes``) and are only imported when that specialist runs, so a process that
+never sees, say, a customs document never builds the customs models. Specialist
+models are still available as attributes of this package, imported on first
+access.
+"""
+
+from importlib import import_module
+from typing import Any
+
+from .common import DocumentGroup, ErrorOutput, TriageOutput, TriageResponse
+
+SPECIALIST_MODULES = ("banking", "customs", "freight", "hr", "invoice", "taxes")
+
+
+def __getattr__(name: str) -> Any:
+    # Submodule names must fail here so the import system loads the submodule.
+    if name.startswith("__") or name in SPECIALIST_MODULES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    for module_name in SPECIALIST_MODULES:
+        module = import_module(f"{__name__}.{module_name}")
+        if name in vars(module):
+            return vars(module)[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+__all__ = [
+    "SPECIALIST_MODULES",
+    "DocumentGroup",
+    "ErrorOutput",
+    "TriageOutput",
+    "TriageResponse",
+]
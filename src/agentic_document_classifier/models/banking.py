@@ -0,0 +1,177 @@
+"""Output models of the banking specialist (``DOCUMENTOS_BANCARIOS``)."""
+
+from enum import Enum
+
+from pydantic import BaseModel, Field
+
+
+class TipoDocumentoBancario(str, Enum):
+    EXTRACTO_BANCARIO = "EXTRACTO_BANCARIO"
+    COMPROVATIVO_TRANSFERENCIA_BANCARIA = "COMPROVATIVO_TRANSFERENCIA_BANCARIA"
+    COMPROVATIVO_TRANSFERENCIA_ATM = "COMPROVATIVO_TRANSFERENCIA_ATM"
+    COMPROVATIVO_TRANSFERENCIA_MULTICAIXA_EXPRESS = (
+        "COMPROVATIVO_TRANSFERENCIA_MULTICAIXA_EXPRESS"
+    )
+    COMPROVATIVO_PAGAMENTO = "COMPROVATIVO_PAGAMENTO"
+    OUTRO_DOCUMENTO_BANCARIO = "OUTRO_DOCUMENTO_BANCARIO"
+
+
+class MetadadosComunsBancario(BaseModel):
+    numero_operacao: str = Field(
+        ...,
+        description="Identificador único da operação ou documento interno do banco (ex: número de transacção, número de registo do movimento).",
+    )
+    entidade_emissora: str = Field(
+        ...,
+        description="Nome do banco ou instituição financeira que emitiu o documento.",
+    )
+    nome_ordenante: str = Field(
+        ..., description="Nome completo ou razão social do cliente/titular da conta."
+    )
+    iban_ordenante: str | None = Field(
+        ...,
+        description="Número de Identificação Bancária Internacional (IBAN) da conta do cliente.",
+    )
+    numero_conta_ordenante: str = Field(
+        ...,
+        description="Número da conta bancária do cliente (pode ser um formato interno do banco, diferente do IBAN).",
+    )
+    observacoes: str | None = Field(
+        default=None,
+        description="Quaisquer observações, notas ou descrições adicionais relevantes encontradas no corpo do documento.",
+    )
+
+
+class MetadadosExtractoBancario(BaseModel):
+    entidade_emissora: str = Field(
+        ...,
+        description="Nome do banco ou instituição financeira que emitiu o documento.",
+    )
+    nome_cliente: str = Field(
+        ..., description="Nome completo ou razão social do cliente/titular da conta."
+    )
+    numero_conta: str = Field(
+        ...,
+        description="Número da conta bancária do cliente (pode ser um formato interno do banco, diferente do IBAN).",
+    )
+    observacoes: str | None = Field(
+        default=None,
+        description="Quaisquer observações, notas ou descrições adicionais relevantes encontradas no corpo do documento.",
+    )
+    saldo_inicial: float = Field(
+        ..., description="O saldo da conta no início do período do extracto."
+    )
+    saldo_final: float = Field(
+        ..., description="O saldo da conta no final do período do extracto."
+    )
+    periodo_referencia_inicio: str = Field(
+        ...,
+        description='A data de início do intervalo de datas a que o extracto se refere. Formato: "yyyy-MM-dd".',
+    )
+    periodo_referencia_fim: str = Field(
+        ...,
+        description='A data de fim do intervalo de datas a que o extracto se refere. Formato: "yyyy-MM-dd".',
+    )
+
+
+class MetadadosComprovativoTransferenciaBancaria(MetadadosComunsBancario):
+    nome_beneficiario: str = Field(
+        ..., description="Nome do beneficiário da transferência."
+    )
+    iban_beneficiario: str = Field(..., description="IBAN da conta do beneficiário.")
+    montante: float = Field(..., description="O montante total transferido.")
+    moeda: str = Field(
+        ...,
+        description='Moeda da transferência. Formato: Código de moeda (ex: "AOA", "USD", "EUR").',
+    )
+    referencia_transaccao: str = Field(
+        ..., description="Código único de identificação da transacção bancária."
+    )
+    finalidade_transferencia: str | None = Field(
+        default=None,
+        description="Descrição da finalidade da transferência, se mencionada.",
+    )
+
+
+class MetadadosComprovativoTransferenciaATM(MetadadosComunsBancario):
+    numero_caixa: str = Field(
+        ..., description="Número da caixa (ATM) onde foi realizada a transferência."
+    )
+    montante: float = Field(..., description="O montante total transferido.")
+    iban_destino: str = Field(..., description="IBAN da conta de destino dos fundos.")
+    referencia_transaccao: str | None = Field(
+        default=None,
+        description="Referência ou código da transacção gerada pelo terminal.",
+    )
+    movimento_cartao: str | None = Field(
+        default=None, description="Número do movimento do cartão, se disponível."
+    )
+
+
+class MetadadosComprovativoTransferenciaMulticaixaExpress(MetadadosComunsBancario):
+    telefone_beneficiario: str | None = Field(
+        default=None,
+        description='Número de telefone do beneficiário da transferência Multicaixa Express. Formato: Numérico (ex: "923123456").',
+    )
+    montante: float = Field(..., description="O montante total transferido.")
+
+
+class MetadadosComprovativoPagamento(MetadadosComunsBancario):
+    montante: float = Field(..., description="O montante total pago.")
+    entidade_pagamento: str | None = Field(
+        default=None, description="Nome da entidade ou empresa que recebeu o pagamento."
+    )
+    referencia_pagamento: str = Field(
+        ...,
+        description="Uma referência única para o pagamento (ex: número de fatura, referência de entidade).",
+    )
+    tipo_pagamento: str | None = Field(
+        default=None,
+        description='Descrição do tipo de pagamento ou serviço pago (ex: "Água", "Eletricidade", "Telecomunicações", "Imposto").',
+    )
+
+
+class MetadadosOutroDocumentoBancario(MetadadosComunsBancario):
+    tipo_documento_especifico: str = Field(
+        ...,
+        description='Uma descrição textual mais detalhada do tipo de documento (ex: "Aviso de Débito por Comissão", "Confirmação de Alteração Contratual", "Carta Informativa").',
+    )
+
+
+class BankingOutput(BaseModel):
+    localizacao_ficheiro: str = Field(
+        description="O caminho ou identificador da origem do documento digital (ecoado da entrada)."
+    )
+    grupo_documento: str = Field(
+        description='O grupo a que o documento pertence. Para este contexto, será sempre "DOCUMENTOS_BANCARIOS" (ecoado da entrada).'
+    )
+    numero_documento: str = Field(
+        description="Um código identificador do documento processado, que pode ser o numero_documento da entrada ou um identificador atribuído durante o processamento."
+    )
+    data_emissao: str = Field(
+        description='A data em que o documento foi criado, emitido, ou a data principal a que a informação do documento se refere (ecoado da entrada ou extraído se a entrada não o fornecer e estiver presente no conteúdo). Formato: "yyyy-MM-dd".'
+    )
+    hora_emissao: str | None = Field(
+        default=None,
+        description='A hora de emissão do documento (ecoado da entrada ou extraído se a entrada não o fornecer e estiver presente no conteúdo). Omitir se não estiver presente. Formato: "HH:mm".',
+    )
+    notas_triagem: str | None = Field(
+        default=None,
+        description="Notas explicativas com uma descrição do conteúdo do documento ou observações da triagem (ecoado da entrada).",
+    )
+    tipo_documento: TipoDocumentoBancario = Field(
+        description="A classificação final do tipo de documento bancário."
+    )
+    notas_classificacao: str = Field(
+        description="Justificação detalhada para a classificação do documento, redigida em português europeu (pré-acordo de 1990)."
+    )
+    metadados_documento: (
+        MetadadosExtractoBancario
+        | MetadadosComprovativoTransferenciaBancaria
+        | MetadadosComprovativoTransferenciaATM
+        | MetadadosComprovativoTransferenciaMulticaixaExpress
+        | MetadadosComprovativoPagamento
+        | MetadadosOutroDocumentoBancario
+    ) = Field(
+        description="Um objeto que contém metadados específicos extraídos do conteúdo do documento."
+    )
@@ -0,0 +1,72 @@
+"""Models shared by every step: document groups, errors and the triage output."""
+
+from enum import Enum
+
+from pydantic import BaseModel, Field
+
+
+# Definição do Enum para os grupos de documentos permitidos
+class DocumentGroup(str, Enum):
+    """
+    Enumeração para os grupos de documentos predefinidos.
+    """
+
+    DOCUMENTOS_COMERCIAIS = "DOCUMENTOS_COMERCIAIS"
+    DOCUMENTOS_ADUANEIROS = "DOCUMENTOS_ADUANEIROS"
+    DOCUMENTOS_FRETE = "DOCUMENTOS_FRETE"
+    DOCUMENTOS_FISCAIS = "DOCUMENTOS_FISCAIS"
+    DOCUMENTOS_BANCARIOS = "DOCUMENTOS_BANCARIOS"
+    DOCUMENTOS_RH = "DOCUMENTOS_RH"
+    OUTROS_DOCUMENTOS = "OUTROS_DOCUMENTOS"
+
+
+class ErrorOutput(BaseModel):
+    localizacao_ficheiro: str = Field(description="Ecoado da entrada.")
+    erro: str = Field(description="Descrição do erro.")
+    grupo_documento: str | None = Field(
+        default=None,
+        description="O valor recebido no campo grupo_documento da entrada.",
+    )
+    notas_triagem: str | None = Field(
+        default=None, description="Nota explicativa sobre a falha na triagem."
+    )
+    notas_classificacao: str | None = Field(
+        default=None, description="Nota explicativa sobre a falha na classificação."
+    )
+
+
+# ============================================================================
+# Triage Agent Data Models
+# ============================================================================
+
+
+class TriageResponse(BaseModel):
+    """
+    Triage fields produced by the model. The content is attached locally (see
+    `TriageOutput`) instead of being echoed back as output tokens.
+    """
+
+    localizacao_ficheiro: str = Field(
+        ..., description="Localização original do ficheiro."
+    )
+    grupo_documento: DocumentGroup = Field(
+        ..., description="Grupo ao qual o documento foi atribuído."
+    )
+    numero_documento: str = Field(
+        ..., description="Código único que identifica o documento específico."
+    )
+    data_emissao: str = Field(
+        ...,
+        description="Data em que o documento foi criado, emitido ou a data de referência (Formato yyyy-MM-dd).",
+    )
+    hora_emissao: str | None = Field(
+        None, description="Hora de emissão do documento (Opcional, Formato HH:mm)."
+    )
+    notas_triagem: str = Field(
+        ...,
+        description="Notas que justificam a escolha da categoria (Texto livre, Português Europeu).",
+    )
+
+
+class TriageOutput(TriageResponse):
+    conteudo: str = Field(..., description="Conteúdo do ficheiro em formato Markdown.")
@@ -0,0 +1,46 @@
+"""Output models of the human resources specialist (``DOCUMENTOS_RH``)."""
+
+from enum import Enum
+
+from pydantic import BaseModel, Field
+
+
+class HrDocumentType(str, Enum):
+    FOLHA_REMUNERACAO = "FOLHA_REMUNERACAO"
+    FOLHA_REMUNERACAO_INSS = "FOLHA_REMUNERACAO_INSS"
+    OUTRO_DOCUMENTO = "OUTRO_DOCUMENTO"
+
+
+class MetadadosFolhaRemuneracao(BaseModel):
+    mes_referencia: str = Field(
+        description="Mês e ano de referência. Formato de saída: 'yyyy-MM'."
+    )
+    nome_contribuinte: str = Field(
+        description="Nome ou designação social completa da entidade empregadora."
+    )
+    nif_contribuinte: str = Field(
+        description="Número de Identificação Fiscal (NIF) da entidade contribuinte."
+    )
+
+
+class MetadadosFolhaRemuneracaoINSS(MetadadosFolhaRemuneracao):
+    inscricao_inss: str = Field(
+        description="Número de inscrição da entidade contribuinte no Instituto Nacional de Segurança Social (INSS)."
+    )
+
+
+class HrOutput(BaseModel):
+    localizacao_ficheiro: str = Field(description="Ecoado da entrada.")
+    grupo_documento: str = Field(description="Ecoado da entrada.")
+    numero_documento: str = Field(description="Ecoado da entrada.")
+    data_emissao: str = Field(description="Ecoado do campo data_emissao da entrada.")
+    hora_emissao: str = Field(description="Ecoado do campo hora_emissao da entrada.")
+    notas_triagem: str = Field(description="Ecoado da entrada.")
+    notas_classificacao: str = Field(
+        description="Justificação da classificação, em Português Europeu pré-1990. Obrigatório."
+    )
+
+    tipo_documento: HrDocumentType
+    metadados_documento: (
+        MetadadosFolhaRemuneracao | MetadadosFolhaRemuneracaoINSS | None
+    )
@@ -0,0 +1,106 @@
+"""Output models of the invoice specialist (``DOCUMENTOS_COMERCIAIS``)."""
+
+from enum import Enum
+
+from pydantic import BaseModel, Field
+
+from .common import DocumentGroup
+
+
+class InvoiceDocumentType(str, Enum):
+    FACTURA_PRO_FORMA = "FACTURA_PRO_FORMA"
+    FACTURA_RECIBO = "FACTURA_RECIBO"
+    FACTURA = "FACTURA"
+    FACTURA_GLOBAL = "FACTURA_GLOBAL"
+    FACTURA_GENERICA = "FACTURA_GENERICA"
+    NOTA_DEBITO = "NOTA_DEBITO"
+    NOTA_CREDITO = "NOTA_CREDITO"
+    RECIBO = "RECIBO"
+    OUTRO_DOCUMENTO = "OUTRO_DOCUMENTO"
+
+
+class MetadadosComunsFactura(BaseModel):
+    nif_emitente: str = Field(
+        ...,
+        description="Número de identificação fiscal da entidade que emitiu o documento.",
+    )
+    nome_emitente: str = Field(
+        ..., description="Nome da entidade que emitiu o documento."
+    )
+    nif_cliente: str = Field(
+        ..., description="Número de identificação fiscal do cliente."
+    )
+    nome_cliente: str = Field(..., description="Nome do cliente.")
+    meio_pagamento: str = Field(..., description="Forma de pagamento.")
+    moeda: str = Field(
+        ...,
+        description="Código da moeda utilizada nos valores do documento (ISO 4217).",
+    )
+    total_sem_iva: float = Field(..., description="Valor total do documento sem IVA.")
+    iva: float = Field(..., description="Valor total do IVA.")
+    total: float = Field(..., description="Valor total do documento.")
+    observacoes: str = Field(..., description="Observações adicionais.")
+
+
+class MetadadosProformaFactura(MetadadosComunsFactura):
+    validade: str = Field(
+        ..., description="Data de validade da proforma., formato=yyyy-MM-dd"
+    )
+
+
+class MetadadosGlobalGenerica(MetadadosComunsFactura):
+    periodo_referencia_inicio: str = Field(
+        ..., description="Data de início do período de referência."
+    )
+    periodo_referencia_fim: str = Field(
+        ..., description="Data de fim do período de referência."
+    )
+
+
+class MetadadosNotaCredito(MetadadosComunsFactura):
+    motivo: str = Field(..., description="Motivo da nota de crédito.")
+    documento_origem: DocumentGroup = Field(
+        ..., description="Documento de origem da nota de crédito."
+    )
+
+
+class MetadadosNotaDebito(MetadadosComunsFactura):
+    descricao: str = Field(..., description="Descrição da nota de débito.")
+
+
+class DetalheRecibo(BaseModel):
+    documento: str = Field(
+        ..., description="Identificador do documento (ex: factura) que está a ser pago."
+    )
+    facturado: float = Field(
+        ..., description="Valor total do documento original que estava pendente."
+    )
+    pago: float = Field(
+        ...,
+        description="Valor efectivamente pago referente a esse documento específico neste recibo.",
+    )
+
+
+class MetadadosRecibo(MetadadosComunsFactura):
+    detalhes: list[DetalheRecibo] = Field(..., description="Detalhes dos pagamentos.")
+
+
+class InvoiceOutput(BaseModel):
+    localizacao_ficheiro: str = Field(description="Ecoado da entrada.")
+    grupo_documento: str = Field(description="Ecoado da entrada.")
+    numero_documento: str = Field(description="Ecoado da entrada.")
+    data_emissao: str = Field(description="Ecoado do campo data_emissao da entrada.")
+    hora_emissao: str = Field(description="Ecoado do campo hora_emissao da entrada.")
+    notas_triagem: str = Field(description="Ecoado da entrada.")
+    notas_classificacao: str = Field(
+        description="Justificação da classificação, em Português Europeu pré-1990. Obrigatório."
+    )
+    tipo_documento: InvoiceDocumentType
+    metadados_documento: (
+        MetadadosComunsFactura
+        | MetadadosProformaFactura
+        | MetadadosGlobalGenerica
+        | MetadadosNotaDebito
+        | MetadadosNotaCredito
+        | MetadadosRecibo
+    )
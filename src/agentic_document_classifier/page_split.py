@@ -0,0 +1,208 @@
+"""
+Page-range splitting of large PDFs for parallel OCR.
+
+A long scanned document sent to Gemini as a single PDF part makes one slow call
+that dominates the tail latency of a batch and sometimes times out. With
+``pypdf`` installed (the ``pdf`` extra), documents of at least
+``OCR_SPLIT_MIN_PAGES`` pages are split into chunks of ``OCR_SPLIT_CHUNK_PAGES``
+pages. The OCR step converts the chunks concurrently and joins the Markdown in
+page order.
+
+Each chunk carries a digest of its pages' content, independent of the file they
+came from and of PDF object numbering. The OCR step caches chunk results under
+that digest, so editing one page only invalidates the chunk that contains it.
+With the default of one page per chunk, every page is cached on its own.
+`split_pages` makes one chunk per selected page, which the OCR step uses for
+the pages without text of a document read from its text layer (see
+`text_layer`).
+A chunk's PDF is only written when its OCR call needs it (`PageChunk.write`),
+so cached chunks are never written and a document holds at most
+``OCR_SPLIT_MAX_CONCURRENCY`` chunk PDFs in memory at a time.
+
+Configuration through environment variables:
+
+- ``OCR_SPLIT_MIN_PAGES``: split documents with at least this many pages
+  (default 20, 0 disables splitting)
+- ``OCR_SPLIT_CHUNK_PAGES``: pages per chunk (default 1)
+- ``OCR_SPLIT_MAX_CONCURRENCY``: chunks of one document converted at the same
+  time (default 8)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Any
+
+try:
+    from pypdf import PdfReader, PdfWriter
+    from pypdf.errors import PyPdfError
+    from pypdf.generic import (
+        ArrayObject,
+        DictionaryObject,
+        IndirectObject,
+        StreamObject,
+    )
+except ImportError:  # pragma: no cover - optional dependency
+    PdfReader = None  # type: ignore[assignment,misc]
+    PyPdfError = Exception  # type: ignore[assignment,misc]
+
+
+SPLIT_MIN_PAGES = int(os.environ.get("OCR_SPLIT_MIN_PAGES", "20"))
+CHUNK_PAGES = max(int(os.environ.get("OCR_SPLIT_CHUNK_PAGES", "1")), 1)
+SPLIT_MAX_CONCURRENCY = max(int(os.environ.get("OCR_SPLIT_MAX_CONCURRENCY", "8")), 1)
+
+
+@dataclass(frozen=True)
+class PageChunk:
+    """A range of pages of a PDF, written as a standalone PDF on demand."""
+
+    first_page: int
+    last_page: int
+    digest: str
+    _pages: tuple[Any, ...] = field(repr=False, compare=False)
+    # Chunks of one document share its reader, which is not thread-safe.
+    _lock: threading.Lock = field(repr=False, compare=False)
+
+    @property
+    def pages(self) -> int:
+        return self.last_page - self.first_page + 1
+
+    def write(self) -> bytes:
+        """
+        The chunk as a standalone PDF; the source stream must still be open.
+
+        Raises:
+            RuntimeError: If pypdf cannot write the pages
+        """
+        buffer = io.BytesIO()
+        with self._lock:
+            try:
+                writer = PdfWriter()
+                for page in self._pages:
+                    _ = writer.add_page(page)
+                _ = writer.write(buffer)
+            except (PyPdfError, ValueError, KeyError, TypeError) as error:
+                raise RuntimeError(
+                    f"Could not extract pages {self.first_page} to {self.last_page}: "
+                    f"{error}"
+                ) from error
+        return buffer.getvalue()
+
+
+def _feed(digest: Any, obj: Any, seen: set[int]) -> None:
+    """Hash a PDF object by content, following references but not ``/Parent``."""
+    if isinstance(obj, IndirectObject):
+        obj = obj.get_object()
+
+    if isinstance(obj, (DictionaryObject, ArrayObject)):
+        if id(obj) in seen:
+            digest.update(b"<seen>")
+            return
+        seen.add(id(obj))
+
+    if isinstance(obj, DictionaryObject):
+        digest.update(b"<<")
+        for key in sorted(obj.keys()):
+            if key == "/Parent":
+                continue
+            digest.update(key.encode("utf-8"))
+            _feed(digest, obj.raw_get(key), seen)
+        digest.update(b">>")
+        if isinstance(obj, StreamObject):
+            digest.update(obj.get_data())
+    elif isinstance(obj, ArrayObject):
+        digest.update(b"[")
+        for item in obj:
+            _feed(digest, item, seen)
+        digest.update(b"]")
+    else:
+        digest.update(repr(obj).encode("utf-8"))
+        digest.update(b"\0")
+
+
+def page_digest(page: Any) -> str:
+    """Content hash of a page, including its resources (fonts, images)."""
+    digest = hashlib.blake2b(digest_size=16)
+    _feed(digest, page, set())
+    return digest.hexdigest()
+
+
+def _make_chunk(
+    pages: tuple[Any, ...], first_page: int, lock: threading.Lock
+) -> PageChunk:
+    digest = hashlib.blake2b(digest_size=16)
+    for page in pages:
+        digest.update(page_digest(page).encode("ascii"))
+    return PageChunk(
+        first_page=first_page,
+        last_page=first_page + len(pages) - 1,
+        digest=digest.hexdigest(),
+        _pages=pages,
+        _lock=lock,
+    )
+
+
+def split_pdf(source: Any, chunk_pages: int = CHUNK_PAGES) -> list[PageChunk] | None:
+    """Split a PDF into page chunks, or return None when it should not be split.
+
+    Documents below ``OCR_SPLIT_MIN_PAGES`` pages, encrypted documents and
+    documents pypdf cannot parse are left whole. The chunks read from
+    ``source`` when written, so it must stay open while they are in use.
+
+    Args:
+        source: A binary stream over the PDF (a file, ``BytesIO`` or ``mmap``)
+        chunk_pages: Pages per chunk
+    """
+    if PdfReader is None or SPLIT_MIN_PAGES <= 0:
+        return None
+
+    try:
+        reader = PdfReader(source)
+        if reader.is_encrypted or len(reader.pages) < SPLIT_MIN_PAGES:
+            return None
+
+        pages = list(reader.pages)
+        lock = threading.Lock()
+        return [
+            _make_chunk(tuple(pages[start : start + chunk_pages]), start + 1, lock)
+            for start in range(0, len(pages), chunk_pages)
+        ]
+    except (PyPdfError, ValueError, KeyError, TypeError, OSError):
+        return None
+
+
+def split_pages(source: Any, page_numbers: list[int]) -> list[PageChunk] | None:
+    """One chunk per page of ``page_numbers`` (1-based), whatever the length.
+
+    Returns None when pypdf is missing or cannot read the document. As with
+    `split_pdf`, ``source`` must stay open while the chunks are in use.
+    """
+    if PdfReader is None:
+        return None
+
+    try:
+        reader = PdfReader(source)
+        if reader.is_encrypted:
+            return None
+        lock = threading.Lock()
+        return [
+            _make_chunk((reader.pages[number - 1],), number, lock)
+            for number in page_numbers
+        ]
+    except (PyPdfError, ValueError, KeyError, TypeError, OSError, IndexError):
+        return None
+
+
+__all__ = [
+    "CHUNK_PAGES",
+    "PageChunk",
+    "SPLIT_MAX_CONCURRENCY",
+    "SPLIT_MIN_PAGES",
+    "page_digest",
+    "split_pages",
+    "split_pdf",
+]
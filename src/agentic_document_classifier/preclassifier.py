@@ -0,0 +1,499 @@
+"""
+Local pre-classifier for the triage step.
+
+Many documents name their group in plain words: a bank statement says "Extracto
+de Conta", a customs declaration says "Documento Único". The pre-classifier
+predicts the `DocumentGroup` of the OCR Markdown locally, with a confidence
+between 0 and 1, from two sources:
+
+- keyword and pattern rules taken from the group descriptions of the triage
+  prompt. Each group's score is the sum of the weights of its patterns found in
+  the document, and the confidence is the softmax of the scores next to a
+  baseline score for "no group" (`OUTROS_DOCUMENTOS`). A group is only
+  predicted with a strong match, such as its document title, and it needs
+  further matches, and no competing ones, to be confident.
+- optionally, a multinomial Naive Bayes model over the document's words, trained
+  on our own triage results (the step-2 checkpoints) with
+  ``python -m agentic_document_classifier.preclassifier train MODEL.json``.
+  Its confidence is the softmax of the mean log-likelihood per word, since the
+  summed log-likelihoods of a long document saturate the softmax at 1.0.
+
+The model never predicts on its own: it confirms or vetoes the rules, and when
+the sources disagree there is no prediction. A confident prediction of a
+group with a specialist lets the pipeline skip the triage call: the specialist
+receives a triage result built locally, without document number or date, which
+it extracts from the content itself. Locally triaged documents are never written
+to the triage checkpoints, so the model is only ever trained on Gemini's
+decisions. ``python -m agentic_document_classifier.preclassifier evaluate``
+measures, on the checkpoints, how many documents would skip triage and how often
+the local group agrees with Gemini's.
+
+Configuration:
+
+- ``LOCAL_TRIAGE``: ``true`` enables the pre-classifier (default off)
+- ``LOCAL_TRIAGE_THRESHOLD``: minimum confidence to skip triage (default 0.9)
+- ``LOCAL_TRIAGE_MODEL``: trained model file; rules only when unset
+"""
+
+from __future__ import annotations
+
+import argparse
+import functools
+import hashlib
+import json
+import math
+import os
+import re
+import unicodedata
+from collections import Counter
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from pathlib import Path
+
+from .checkpoints import CheckpointStore, get_checkpoint_store
+from .models import DocumentGroup
+
+LOCAL_TRIAGE = os.environ.get("LOCAL_TRIAGE", "").lower() in ("true", "1", "yes")
+LOCAL_TRIAGE_THRESHOLD = float(os.environ.get("LOCAL_TRIAGE_THRESHOLD", "0.9"))
+LOCAL_TRIAGE_MODEL = os.environ.get("LOCAL_TRIAGE_MODEL")
+
+# Only the start of long documents is read: titles and issuers come first.
+MAX_CHARACTERS = 20_000
+MAX_TOKENS = 2_000
+
+_STRONG = 3.0
+_WEAK = 1.0
+# Score of the null class: a strong match alone leaves a group at 0.5.
+_BASELINE = _STRONG
+
+# Patterns match text normalised by `_normalise`: upper case, no accents.
+_RULES: dict[DocumentGroup, list[tuple[str, float]]] = {
+    DocumentGroup.DOCUMENTOS_COMERCIAIS: [
+        (r"\bFA(C)?TURA\b", _STRONG),
+        (r"\bFA(C)?TURA[- ]RECIBO\b", _WEAK),
+        (r"\bPRO[- ]?FORMA\b", _WEAK),
+        (r"\bNOTA DE CREDITO\b", _STRONG),
+        (r"\b(FTM?|FR|NC) ?[A-Z0-9]*\d+/\d+", _WEAK),
+        (r"\bPROCESSADO POR PROGRAMA\b", _WEAK),
+        (r"\bFORNECEDOR\b", _WEAK),
+        (r"\bPRECO UNIT(ARIO)?\b", _WEAK),
+        (r"\bQUANTIDADE\b", _WEAK),
+    ],
+    DocumentGroup.DOCUMENTOS_ADUANEIROS: [
+        (r"\bDOCUMENTO UNICO\b", _STRONG),
+        (r"\bDECLARACAO ADUANEIRA\b", _STRONG),
+        (r"\bNOTA DE DESALFANDEGAMENTO\b", _STRONG),
+        (r"\bASYCUDA(WORLD)?\b", _STRONG),
+        (r"\bALFANDEGA\b", _WEAK),
+        (r"\bDESPACHANTE\b", _WEAK),
+        (r"\bDIREITOS ADUANEIROS\b", _WEAK),
+        (r"\bCODIGO PAUTAL\b", _WEAK),
+        (r"\bIMPORTADOR\b", _WEAK),
+        (r"\bEXPORTADOR\b", _WEAK),
+    ],
+    DocumentGroup.DOCUMENTOS_FRETE: [
+        (r"\bAIR ?WAYBILL\b", _STRONG),
+        (r"\bBILL OF LADING\b", _STRONG),
+        (r"\bCARTA DE PORTE\b", _STRONG),
+        (r"\bPACKING LIST\b", _STRONG),
+        (r"\b(CERTIFICADO DE EMBARQUE|ARCCLA)\b", _STRONG),
+        (r"\bSHIPPER\b", _WEAK),
+        (r"\bCONSIGNEE\b", _WEAK),
+        (r"\bCARRIER\b", _WEAK),
+        (r"\bPORT OF (LOADING|DISCHARGE)\b", _WEAK),
+        (r"\bGROSS WEIGHT\b", _WEAK),
+        (r"\b(TAAG|HAPAG[- ]LLOYD|CMA CGM|MSC|MAERSK)\b", _WEAK),
+    ],
+    DocumentGroup.DOCUMENTOS_FISCAIS: [
+        (r"\bADMINISTRACAO GERAL TRIBUTARIA\b", _WEAK),
+        (r"\bNOTA DE LIQUIDACAO\b", _WEAK),
+        (r"\bGUIA DE PAGAMENTO\b", _STRONG),
+        (r"\bMAPA DE RETENC(AO|OES)\b", _STRONG),
+        (r"\b(RUPE|REFERENCIA UNICA DE PAGAMENTO)\b", _STRONG),
+        (r"\bIMPOSTO DEVIDO\b", _WEAK),
+        (r"\bBASE DE INCIDENCIA\b", _WEAK),
+        (r"\bVALOR A PAGAR\b", _WEAK),
+        (r"\bPERIODO DE REFERENCIA\b", _WEAK),
+    ],
+    DocumentGroup.DOCUMENTOS_BANCARIOS: [
+        (r"\bEXTRA(C)?TO (DE CONTA|BANCARIO|DE MOVIMENTOS)\b", _STRONG),
+        (r"\bCOMPROVATIVO DE TRANSFERENCIA\b", _STRONG),
+        (r"\bMULTICAIXA EXPRESS\b", _WEAK),
+        (r"\bIBAN\b", _WEAK),
+        (r"\bSALDO\b", _WEAK),
+        (r"\bMOVIMENTOS\b", _WEAK),
+        (r"\bORDENANTE\b", _WEAK),
+        (r"\bBENEFICIARIO\b", _WEAK),
+        (r"\bCOMISSO(ES|AO)\b", _WEAK),
+        (r"\b(BANCO|BAI|BFA|BPC|CAIXA ANGOLA)\b", _WEAK),
+    ],
+    DocumentGroup.DOCUMENTOS_RH: [
+        (r"\bFOLHA DE REMUNERAC(AO|OES)\b", _STRONG),
+        (r"\bTRABALHADOR(ES)?\b", _WEAK),
+        (r"\bCATEGORIA PROFISSIONAL\b", _WEAK),
+        (r"\bSALARIO BASE\b", _WEAK),
+        (r"\bSEGURANCA SOCIAL\b", _WEAK),
+    ],
+}
+_SOURCE_NAMES = {"rules": "regras", "model": "modelo"}
+_COMPILED_RULES = {
+    group: [(re.compile(pattern), weight) for pattern, weight in rules]
+    for group, rules in _RULES.items()
+}
+
+
+@dataclass(frozen=True)
+class Prediction:
+    group: DocumentGroup
+    confidence: float
+    source: str
+    evidence: tuple[str, ...] = ()
+
+    def triage_notes(self) -> str:
+        """Text for ``notas_triagem`` of a locally triaged document."""
+        evidence = f": {', '.join(self.evidence)}" if self.evidence else ""
+        return (
+            f"Pré-classificação local ({_SOURCE_NAMES[self.source]}, confiança "
+            f"{self.confidence:.2f}){evidence}. Triagem pelo modelo não efectuada; "
+            "número e data do documento por extrair do conteúdo."
+        )
+
+
+def _normalise(markdown: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", markdown[:MAX_CHARACTERS])
+    text = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return re.sub(r"\s+", " ", text.upper())
+
+
+def _softmax(scores: dict[DocumentGroup, float]) -> dict[DocumentGroup, float]:
+    top = max(scores.values())
+    weights = {group: math.exp(score - top) for group, score in scores.items()}
+    total = sum(weights.values())
+    return {group: weight / total for group, weight in weights.items()}
+
+
+def rule_prediction(markdown: str) -> Prediction | None:
+    """
+    The group the keyword rules favour.
+
+    None when the favoured group has no strong match, or when no group beats
+    the null class.
+    """
+    text = _normalise(markdown)
+    scores: dict[DocumentGroup, float] = {DocumentGroup.OUTROS_DOCUMENTOS: _BASELINE}
+    evidence: dict[DocumentGroup, list[str]] = {}
+    strong: set[DocumentGroup] = set()
+    for group, rules in _COMPILED_RULES.items():
+        scores[group] = 0.0
+        evidence[group] = []
+        for pattern, weight in rules:
+            match = pattern.search(text)
+            if match:
+                scores[group] += weight
+                evidence[group].append(match.group(0).strip())
+                if weight >= _STRONG:
+                    strong.add(group)
+
+    probabilities = _softmax(scores)
+    group = max(probabilities, key=probabilities.__getitem__)
+    if group not in strong:
+        return None
+    return Prediction(group, probabilities[group], "rules", tuple(evidence[group]))
+
+
+def _tokens(markdown: str) -> list[str]:
+    return re.findall(r"[A-Z0-9]{2,}", _normalise(markdown))[:MAX_TOKENS]
+
+
+class NaiveBayesModel:
+    """Multinomial Naive Bayes over document words, stored as JSON."""
+
+    def __init__(
+        self,
+        log_priors: dict[DocumentGroup, float],
+        log_likelihoods: dict[DocumentGroup, dict[str, float]],
+        log_unknown: dict[DocumentGroup, float],
+    ) -> None:
+        self.log_priors = log_priors
+        self.log_likelihoods = log_likelihoods
+        self.log_unknown = log_unknown
+
+    @classmethod
+    def fit(
+        cls,
+        examples: Iterable[tuple[str, DocumentGroup]],
+        max_vocabulary: int = 20_000,
+        min_documents: int = 2,
+    ) -> NaiveBayesModel:
+        """Train on ``(markdown, group)`` pairs with add-one smoothing."""
+        documents: Counter[DocumentGroup] = Counter()
+        counts: dict[DocumentGroup, Counter[str]] = {}
+        document_frequency: Counter[str] = Counter()
+        for markdown, group in examples:
+            tokens = _tokens(markdown)
+            documents[group] += 1
+            counts.setdefault(group, Counter()).update(tokens)
+            document_frequency.update(set(tokens))
+        if not documents:
+            raise ValueError("No training examples")
+
+        vocabulary = {
+            token
+            for token, frequency in document_frequency.most_common(max_vocabulary)
+            if frequency >= min_documents
+        }
+        total_documents = sum(documents.values())
+        log_priors: dict[DocumentGroup, float] = {}
+        log_likelihoods: dict[DocumentGroup, dict[str, float]] = {}
+        log_unknown: dict[DocumentGroup, float] = {}
+        for group, group_counts in counts.items():
+            known = {token: group_counts[token] for token in vocabulary}
+            denominator = math.log(sum(known.values()) + len(vocabulary) + 1)
+            log_priors[group] = math.log(documents[group] / total_documents)
+            log_likelihoods[group] = {
+                token: math.log(count + 1) - denominator
+                for token, count in known.items()
+                if count
+            }
+            log_unknown[group] = -denominator
+        return cls(log_priors, log_likelihoods, log_unknown)
+
+    def predict(self, markdown: str) -> Prediction | None:
+        tokens = [
+            token
+            for token in _tokens(markdown)
+            if any(
+                token in likelihoods for likelihoods in self.log_likelihoods.values()
+            )
+        ]
+        if not tokens:
+            return None
+        # Words are not independent evidence: averaging per word keeps the
+        # confidence of a long document comparable to the threshold.
+        scores = {
+            group: (
+                prior
+                + sum(
+                    self.log_likelihoods[group].get(token, self.log_unknown[group])
+                    for token in tokens
+                )
+            )
+            / len(tokens)
+            for group, prior in self.log_priors.items()
+        }
+        probabilities = _softmax(scores)
+        group = max(probabilities, key=probabilities.__getitem__)
+        return Prediction(group, probabilities[group], "model")
+
+    def save(self, path: str | Path) -> None:
+        stored = {
+            "version": 1,
+            "groups": {
+                group.value: {
+                    "log_prior": self.log_priors[group],
+                    "log_unknown": self.log_unknown[group],
+                    "log_likelihoods": self.log_likelihoods[group],
+                }
+                for group in self.log_priors
+            },
+        }
+        _ = Path(path).write_text(json.dumps(stored), encoding="utf-8")
+
+    @classmethod
+    def load(cls, path: str | Path) -> NaiveBayesModel:
+        stored = json.loads(Path(path).read_text(encoding="utf-8"))
+        if stored.get("version") != 1:
+            raise ValueError(f"Unsupported pre-classifier model: {path}")
+        groups = {DocumentGroup(name): data for name, data in stored["groups"].items()}
+        return cls(
+            {group: data["log_prior"] for group, data in groups.items()},
+            {group: data["log_likelihoods"] for group, data in groups.items()},
+            {group: data["log_unknown"] for group, data in groups.items()},
+        )
+
+
+@functools.cache
+def _load_model(path: str) -> NaiveBayesModel:
+    return NaiveBayesModel.load(path)
+
+
+def predict(markdown: str, model: NaiveBayesModel | None = None) -> Prediction | None:
+    """The rules' prediction, confirmed by ``model``: None when they disagree.
+
+    Without a rule prediction there is none; the confidence is that of the
+    more confident source.
+    """
+    rules = rule_prediction(markdown)
+    if rules is None or model is None:
+        return rules
+    learned = model.predict(markdown)
+    if learned is None:
+        return rules
+    if learned.group != rules.group:
+        return None
+    return max(rules, learned, key=lambda prediction: prediction.confidence)
+
+
+def preclassify(markdown: str) -> Prediction | None:
+    """The configured local prediction, or None when disabled or not confident."""
+    if not LOCAL_TRIAGE:
+        return None
+    model = _load_model(LOCAL_TRIAGE_MODEL) if LOCAL_TRIAGE_MODEL else None
+    prediction = predict(markdown, model)
+    if prediction is None or prediction.confidence < LOCAL_TRIAGE_THRESHOLD:
+        return None
+    return prediction
+
+
+# ============================================================================
+# Training and evaluation on the triage checkpoints
+# ============================================================================
+
+# Stage keys end in a variant of the prompt, model and settings; any version of
+# a document's OCR and triage will do as a training example.
+_STAGE_KEY = re.compile(
+    r"^(?P<identifier>[^_]+)_step_(?P<step>[12])(?:_[0-9a-f]+)?\.(?:md|json)$"
+)
+
+
+def labelled_examples(
+    store: CheckpointStore | None = None,
+) -> Iterator[tuple[str, str, DocumentGroup]]:
+    """``(identifier, markdown, group)`` of every document Gemini triaged.
+
+    Read from the step-2 (triage) and step-1 (OCR) checkpoints.
+    """
+    store = store or get_checkpoint_store()
+    ocr_keys: dict[str, str] = {}
+    triage_keys: dict[str, str] = {}
+    for key in store.keys():
+        match = _STAGE_KEY.match(key)
+        if match:
+            keys = ocr_keys if match.group("step") == "1" else triage_keys
+            keys[match.group("identifier")] = key
+
+    for identifier, key in triage_keys.items():
+        if identifier not in ocr_keys:
+            continue
+        triage = store.get(key)
+        markdown = store.get(ocr_keys[identifier])
+        if triage is None or markdown is None:
+            continue
+        try:
+            group = DocumentGroup(json.loads(triage)["grupo_documento"])
+        except (ValueError, KeyError, TypeError):
+            continue
+        yield identifier, markdown, group
+
+
+def _held_out(identifier: str, fraction: float) -> bool:
+    # Stable across runs, so repeated training reports comparable numbers.
+    digest = hashlib.sha256(identifier.encode("utf-8")).digest()
+    return int.from_bytes(digest[:4], "big") / 2**32 < fraction
+
+
+def evaluation_report(
+    examples: list[tuple[str, str, DocumentGroup]],
+    model: NaiveBayesModel | None,
+    threshold: float,
+) -> str:
+    """Coverage and agreement with Gemini's triage of confident predictions."""
+    from .agents import SPECIALIST_AGENT_CONFIG
+
+    skipped = 0
+    agreed = 0
+    disagreements: Counter[tuple[str, str]] = Counter()
+    for _, markdown, group in examples:
+        prediction = predict(markdown, model)
+        if (
+            prediction is None
+            or prediction.confidence < threshold
+            or prediction.group not in SPECIALIST_AGENT_CONFIG
+        ):
+            continue
+        skipped += 1
+        if prediction.group == group:
+            agreed += 1
+        else:
+            disagreements[(group.value, prediction.group.value)] += 1
+
+    lines = [
+        f"Documents: {len(examples)}",
+        f"Triage skipped at confidence {threshold:.2f}: {skipped} "
+        f"({skipped / max(len(examples), 1):.1%})",
+        f"Agreement with Gemini's triage: {agreed}/{skipped} "
+        f"({agreed / max(skipped, 1):.1%})",
+    ]
+    for (expected, predicted), count in disagreements.most_common():
+        lines.append(f"  {expected} predicted as {predicted}: {count}")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Train or evaluate the local triage pre-classifier"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    train = commands.add_parser("train", help="Train a model on the triage checkpoints")
+    _ = train.add_argument("model", help="Model file to write (JSON)")
+    _ = train.add_argument(
+        "--holdout",
+        type=float,
+        default=0.2,
+        help="Fraction of documents held out for the report (default: 0.2)",
+    )
+    evaluate = commands.add_parser(
+        "evaluate", help="Report how the rules (and a model) agree with triage"
+    )
+    _ = evaluate.add_argument("--model", help="Trained model file to evaluate")
+    for command in (train, evaluate):
+        _ = command.add_argument(
+            "--threshold",
+            type=float,
+            default=LOCAL_TRIAGE_THRESHOLD,
+            help=f"Confidence threshold (default: {LOCAL_TRIAGE_THRESHOLD})",
+        )
+    args = parser.parse_args()
+    threshold: float = args.threshold  # pyright: ignore[reportAny]
+
+    examples = list(labelled_examples())
+    if not examples:
+        raise SystemExit("No triage checkpoints found")
+
+    if args.command == "evaluate":  # pyright: ignore[reportAny]
+        model_path: str | None = args.model  # pyright: ignore[reportAny]
+        model = NaiveBayesModel.load(model_path) if model_path else None
+        print(evaluation_report(examples, model, threshold))
+        return
+
+    output: str = args.model  # pyright: ignore[reportAny]
+    holdout: float = args.holdout  # pyright: ignore[reportAny]
+    held_out = [example for example in examples if _held_out(example[0], holdout)]
+    training = [example for example in examples if not _held_out(example[0], holdout)]
+    if held_out and training:
+        model = NaiveBayesModel.fit(
+            (markdown, group) for _, markdown, group in training
+        )
+        print(f"Held-out documents ({holdout:.0%}):")
+        print(evaluation_report(held_out, model, threshold))
+
+    model = NaiveBayesModel.fit((markdown, group) for _, markdown, group in examples)
+    model.save(output)
+    print(f"Model trained on {len(examples)} documents written to {output}")
+
+
+__all__ = [
+    "LOCAL_TRIAGE",
+    "LOCAL_TRIAGE_MODEL",
+    "LOCAL_TRIAGE_THRESHOLD",
+    "NaiveBayesModel",
+    "Prediction",
+    "labelled_examples",
+    "preclassify",
+    "predict",
+    "rule_prediction",
+]
+
+
+if __name__ == "__main__":
+    main()
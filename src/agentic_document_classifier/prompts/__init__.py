@@ -2,17 +2,50 @@
 
 This package contains prompt templates and configurations
 for different document classification agents.
+
+Prompts are read from disk once per process and kept in memory, together with
+a content hash that callers can use to key caches on the prompt version. Use
+`reload_prompts` to pick up edits to the Markdown files without restarting.
 """
 
+import hashlib
+import threading
 from pathlib import Path
 
 # Get the directory where this __init__.py file is located
 PROMPTS_DIR = Path(__file__).parent
 
+_PROMPTS: dict[str, tuple[str, str]] = {}
+_PROMPTS_LOCK = threading.Lock()
+
+
+def _load_entry(prompt_name: str) -> tuple[str, str]:
+    entry = _PROMPTS.get(prompt_name)
+    if entry is not None:
+        return entry
+
+    with _PROMPTS_LOCK:
+        entry = _PROMPTS.get(prompt_name)
+        if entry is None:
+            prompt_file = PROMPTS_DIR / f"{prompt_name}.md"
+            try:
+                content = prompt_file.read_text(encoding="utf-8")
+            except FileNotFoundError:
+                raise FileNotFoundError(
+                    f"Prompt file not found: {prompt_file}"
+                ) from None
+
+            digest = hashlib.sha256(content.encode("utf-8")).hexdigest()
+            entry = (content, digest)
+            _PROMPTS[prompt_name] = entry
+    return entry
+
 
 def load_prompt(prompt_name: str) -> str:
     """Load a prompt template from a markdown file.
 
+    The file is read on first use and served from memory afterwards.
+
     Args:
         prompt_name: Name of the prompt file (without .md extension)
 
@@ -22,11 +55,31 @@ def load_prompt(prompt_name: str) -> str:
     Raises:
         FileNotFoundError: If the prompt file doesn't exist
     """
-    prompt_file = PROMPTS_DIR / f"{prompt_name}.md"
-    if not prompt_file.exists():
-        raise FileNotFoundError(f"Prompt file not found: {prompt_file}")
+    return _load_entry(prompt_name)[0]
+
+
+def prompt_hash(prompt_name: str) -> str:
+    """Return the SHA-256 hex digest of a prompt's content.
+
+    Args:
+        prompt_name: Name of the prompt file (without .md extension)
+
+    Raises:
+        FileNotFoundError: If the prompt file doesn't exist
+    """
+    return _load_entry(prompt_name)[1]
+
+
+def preload_prompts(prompt_names: list[str] | None = None) -> None:
+    """Read prompts into memory ahead of use (all available prompts by default)."""
+    for prompt_name in prompt_names or AVAILABLE_PROMPTS:
+        _ = _load_entry(prompt_name)
+
 
-    return prompt_file.read_text(encoding="utf-8")
+def reload_prompts() -> None:
+    """Discard the in-memory prompts so the next access re-reads the files."""
+    with _PROMPTS_LOCK:
+        _PROMPTS.clear()
 
 
 # Available prompt templates
@@ -40,10 +93,14 @@ AVAILABLE_PROMPTS = [
     "hr_classifier_prompt",
     "invoice_classifier_prompt",
     "taxes_classifier_prompt",
+    "single_pass_prompt",
 ]
 
 __all__ = [
     "load_prompt",
+    "prompt_hash",
+    "preload_prompts",
+    "reload_prompts",
     "PROMPTS_DIR",
     "AVAILABLE_PROMPTS",
 ]
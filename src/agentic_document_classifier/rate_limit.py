@@ -0,0 +1,358 @@
+"""
+Rate limiting and retry for Gemini API calls.
+
+Every Gemini call goes through `call_with_retry` (or `acall_with_retry`), which:
+
+1. Reserves capacity from a token bucket limiting requests per minute and
+   tokens per minute. The bucket state lives in a small file guarded by an
+   advisory lock, so every worker process on the host shares the same budget.
+2. Retries throttling (429), server (5xx) and transport errors with jittered
+   exponential backoff, honouring the delay the API asks for.
+3. Adapts: a 429 halves the shared rate and pauses all workers for the
+   requested delay; successful calls restore the rate gradually. The 429s of
+   requests sent before the last decrease halve it only once, so a burst of
+   parallel throttles does not collapse the rate.
+
+The async path runs the limiter, whose state file lock blocks, in a worker
+thread, so waiting for another process never stalls the event loop.
+
+Configuration through environment variables:
+
+- ``GEMINI_MAX_RPM``: requests per minute (no limit when unset or 0)
+- ``GEMINI_MAX_TPM``: estimated input tokens per minute (no limit when unset or 0)
+- ``GEMINI_MAX_RETRIES``: retries per call (default 5)
+- ``GEMINI_RATE_LIMIT_STATE``: shared state file
+  (default ``/tmp/ag_classifier_rate_limit.json``)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, TypeVar
+
+import httpx
+from google.genai import errors as genai_errors
+
+from .metrics import record_retry, record_wait
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None  # type: ignore[assignment]
+
+
+R = TypeVar("R")
+
+MAX_RPM = float(os.environ.get("GEMINI_MAX_RPM") or 0)
+MAX_TPM = float(os.environ.get("GEMINI_MAX_TPM") or 0)
+MAX_RETRIES = int(os.environ.get("GEMINI_MAX_RETRIES", "5"))
+STATE_FILE = Path(
+    os.environ.get("GEMINI_RATE_LIMIT_STATE", "/tmp/ag_classifier_rate_limit.json")
+)
+
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+RETRYABLE_STATUS_CODES = frozenset({408, 429, 500, 502, 503, 504})
+
+# Adaptive rate: multiplicative decrease on 429, additive increase on success.
+_MIN_RATE_FACTOR = 0.1
+_RATE_DECREASE = 0.5
+_RATE_INCREASE = 0.02
+
+_CHARS_PER_TOKEN = 4
+_TOKENS_PER_PDF_PAGE = 258
+_PDF_PAGE_PATTERN = re.compile(rb"/Type\s*/Page\b")
+
+
+def estimate_text_tokens(*texts: str) -> int:
+    """Rough local token estimate for text sent to Gemini."""
+    return sum(len(text) for text in texts) // _CHARS_PER_TOKEN + 1
+
+
+def estimate_pdf_tokens(pdf_bytes: bytes) -> int:
+    """Rough local token estimate for a PDF part (Gemini bills per page)."""
+    pages = len(_PDF_PAGE_PATTERN.findall(pdf_bytes))
+    return max(pages, 1) * _TOKENS_PER_PDF_PAGE
+
+
+class SharedRateLimiter:
+    """Token bucket for requests and tokens per minute shared across processes.
+
+    Callers reserve capacity up front and sleep for the returned delay. The
+    bucket may go negative, which queues later callers behind earlier ones
+    instead of letting them race for the next refill.
+
+    Args:
+        requests_per_minute: Request budget, or 0 for no request limit
+        tokens_per_minute: Token budget, or 0 for no token limit
+        state_file: File holding the shared bucket state
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float,
+        tokens_per_minute: float,
+        state_file: Path = STATE_FILE,
+    ) -> None:
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.state_file = state_file
+        self._thread_lock = threading.Lock()
+        self._local_state: dict[str, float] | None = None
+        self._last_factor = 1.0
+
+    @contextmanager
+    def _locked_state(self) -> Iterator[dict[str, float]]:
+        with self._thread_lock:
+            if fcntl is None:
+                if self._local_state is None:
+                    self._local_state = self._initial_state()
+                yield self._local_state
+                return
+
+            self.state_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.state_file, "a+", encoding="utf-8") as handle:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+                try:
+                    _ = handle.seek(0)
+                    try:
+                        state: dict[str, float] = json.loads(handle.read())
+                    except ValueError:
+                        state = self._initial_state()
+                    yield state
+                    _ = handle.seek(0)
+                    _ = handle.truncate()
+                    _ = handle.write(json.dumps(state))
+                    handle.flush()
+                finally:
+                    fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+    def _initial_state(self) -> dict[str, float]:
+        return {
+            "updated_at": time.time(),
+            "requests": self.requests_per_minute,
+            "tokens": self.tokens_per_minute,
+            "factor": 1.0,
+            "paused_until": 0.0,
+            "decreased_at": 0.0,
+        }
+
+    @staticmethod
+    def _take(
+        state: dict[str, float], field: str, limit: float, amount: float, elapsed: float
+    ) -> float:
+        """Refill one bucket, take ``amount`` from it and return the wait needed."""
+        if limit <= 0:
+            return 0.0
+        rate = limit * state["factor"] / 60.0
+        available = min(state[field] + elapsed * rate, limit * state["factor"])
+        available -= amount
+        state[field] = available
+        return -available / rate if available < 0 else 0.0
+
+    def reserve(self, tokens: int) -> float:
+        """Reserve one request and ``tokens`` tokens; return seconds to wait."""
+        with self._locked_state() as state:
+            now = time.time()
+            elapsed = max(now - state["updated_at"], 0.0)
+            state["updated_at"] = now
+            wait = max(
+                self._take(state, "requests", self.requests_per_minute, 1, elapsed),
+                self._take(state, "tokens", self.tokens_per_minute, tokens, elapsed),
+                state["paused_until"] - now,
+            )
+            self._last_factor = state["factor"]
+        return max(wait, 0.0)
+
+    @property
+    def recovering(self) -> bool:
+        """Whether the rate was reduced by throttling when last seen."""
+        return self._last_factor < 1.0
+
+    def throttled(
+        self, retry_after: float | None, sent_at: float | None = None
+    ) -> None:
+        """Record a 429: slow everyone down and pause for ``retry_after``.
+
+        ``sent_at`` is when the throttled request was sent. A request sent
+        before the last decrease was throttled at the old rate, so it only
+        extends the pause. Without ``sent_at`` the rate is always lowered.
+        """
+        with self._locked_state() as state:
+            if sent_at is None or sent_at >= state.get("decreased_at", 0.0):
+                state["factor"] = max(
+                    state["factor"] * _RATE_DECREASE, _MIN_RATE_FACTOR
+                )
+                state["decreased_at"] = time.time()
+            if retry_after:
+                state["paused_until"] = max(
+                    state["paused_until"], time.time() + retry_after
+                )
+            self._last_factor = state["factor"]
+
+    def succeeded(self) -> None:
+        """Record a successful call, recovering the rate after throttling."""
+        if not self.recovering:
+            return
+        with self._locked_state() as state:
+            state["factor"] = min(state["factor"] + _RATE_INCREASE, 1.0)
+            self._last_factor = state["factor"]
+
+
+_LIMITER: SharedRateLimiter | None = None
+
+
+def get_rate_limiter() -> SharedRateLimiter | None:
+    """Return the process-wide limiter, or None when no limits are configured."""
+    global _LIMITER
+    if _LIMITER is None and (MAX_RPM > 0 or MAX_TPM > 0):
+        _LIMITER = SharedRateLimiter(MAX_RPM, MAX_TPM)
+    return _LIMITER
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, genai_errors.APIError):
+        return error.code in RETRYABLE_STATUS_CODES
+    return isinstance(error, httpx.TransportError)
+
+
+def _parse_seconds(value: Any) -> float | None:
+    try:
+        return float(str(value).strip().rstrip("s"))
+    except ValueError:
+        return None
+
+
+def retry_after_seconds(error: Exception) -> float | None:
+    """Delay requested by the API, from the Retry-After header or RetryInfo."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers is not None:
+        value = headers.get("retry-after")
+        if value is not None:
+            seconds = _parse_seconds(value)
+            if seconds is not None:
+                return seconds
+
+    details = getattr(error, "details", None)
+    if isinstance(details, dict):
+        for detail in details.get("error", {}).get("details", []) or []:
+            if isinstance(detail, dict) and "retryDelay" in detail:
+                return _parse_seconds(detail["retryDelay"])
+    return None
+
+
+def backoff_delay(attempt: int, retry_after: float | None = None) -> float:
+    """Full-jitter exponential backoff, never shorter than ``retry_after``."""
+    ceiling = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2**attempt)
+    delay = random.uniform(0, ceiling)
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+def _before_call(limiter: SharedRateLimiter | None, estimated_tokens: int) -> float:
+    wait = limiter.reserve(estimated_tokens) if limiter is not None else 0.0
+    if wait > 0:
+        record_wait(wait)
+    return wait
+
+
+def _check_retry(error: Exception, attempt: int) -> float | None:
+    """Return the delay the API asked for, or re-raise when the error is final."""
+    if not _is_retryable(error) or attempt >= MAX_RETRIES:
+        raise error
+
+    record_retry()
+    return retry_after_seconds(error)
+
+
+def _is_throttling(error: Exception) -> bool:
+    return getattr(error, "code", None) == 429
+
+
+def call_with_retry(call: Callable[[], R], estimated_tokens: int = 0) -> R:
+    """Run a Gemini call under the shared rate limit, retrying transient errors.
+
+    Args:
+        call: Zero-argument callable performing the API request
+        estimated_tokens: Local estimate of the input tokens of the request
+
+    Raises:
+        google.genai.errors.APIError: If the error is not retryable or the
+            retry budget is exhausted
+    """
+    limiter = get_rate_limiter()
+    attempt = 0
+    while True:
+        wait = _before_call(limiter, estimated_tokens)
+        if wait > 0:
+            time.sleep(wait)
+        sent_at = time.time()
+        try:
+            result = call()
+        except (genai_errors.APIError, httpx.TransportError) as error:
+            retry_after = _check_retry(error, attempt)
+            if limiter is not None and _is_throttling(error):
+                limiter.throttled(retry_after, sent_at)
+            time.sleep(backoff_delay(attempt, retry_after))
+            attempt += 1
+            continue
+
+        if limiter is not None:
+            limiter.succeeded()
+        return result
+
+
+async def acall_with_retry(
+    call: Callable[[], Awaitable[R]], estimated_tokens: int = 0
+) -> R:
+    """Async counterpart of `call_with_retry`.
+
+    The limiter locks its state file, which may block while another process
+    holds it, so its methods run in a worker thread.
+    """
+    limiter = get_rate_limiter()
+    attempt = 0
+    while True:
+        wait = 0.0
+        if limiter is not None:
+            wait = await asyncio.to_thread(limiter.reserve, estimated_tokens)
+        if wait > 0:
+            record_wait(wait)
+            await asyncio.sleep(wait)
+        sent_at = time.time()
+        try:
+            result = await call()
+        except (genai_errors.APIError, httpx.TransportError) as error:
+            retry_after = _check_retry(error, attempt)
+            if limiter is not None and _is_throttling(error):
+                await asyncio.to_thread(limiter.throttled, retry_after, sent_at)
+            await asyncio.sleep(backoff_delay(attempt, retry_after))
+            attempt += 1
+            continue
+
+        if limiter is not None and limiter.recovering:
+            await asyncio.to_thread(limiter.succeeded)
+        return result
+
+
+__all__ = [
+    "SharedRateLimiter",
+    "acall_with_retry",
+    "backoff_delay",
+    "call_with_retry",
+    "estimate_pdf_tokens",
+    "estimate_text_tokens",
+    "get_rate_limiter",
+    "retry_after_seconds",
+]
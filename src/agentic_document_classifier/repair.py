@@ -0,0 +1,220 @@
+"""
+Local repair of structured Gemini answers that fail validation.
+
+Most invalid answers are almost right: the JSON is wrapped in a Markdown code
+fence or a sentence of prose, it was cut off by the output token limit, or an
+enum value is spelled the way the document spells it ("Documento Único")
+rather than as the schema's code (``DOCUMENTO_UNICO``). `repair_json` parses
+such payloads and `repair_enum_values` maps enum near-misses to the closest
+allowed value. Answers that still fail are re-asked with
+`validation_error_summary` (see ``GEMINI_REASK_BUDGET`` in `agents`).
+"""
+
+from __future__ import annotations
+
+import difflib
+import json
+import re
+import unicodedata
+from dataclasses import dataclass
+from typing import Any
+
+from pydantic import ValidationError
+
+# Minimum similarity of a normalised enum near-miss to the allowed value.
+ENUM_MATCH_CUTOFF = 0.85
+
+_FENCE = re.compile(r"^```[\w-]*[ \t]*\n?(.*?)(?:\n?```)?$", re.DOTALL)
+_STRING = re.compile(r'"(?:[^"\\]|\\.)*"', re.DOTALL)
+_SCALAR = re.compile(r"-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?|true|false|null")
+_EXPECTED = re.compile(r"'((?:[^'\\]|\\.)*)'")
+_DECODER = json.JSONDecoder(strict=False)
+
+
+@dataclass
+class _Frame:
+    closer: str
+    expects_key: bool
+
+
+def _complete_prefix(text: str) -> str:
+    """
+    The longest complete JSON prefix of ``text``, with its open containers closed.
+
+    Trailing commas are dropped, a truncated string value is closed and a
+    truncated key, number or literal is discarded with its member.
+    """
+    pieces: list[str] = []
+    stack: list[_Frame] = []
+    # Pieces and closers at the last point where every value so far is complete.
+    safe: tuple[int, str] = (0, "")
+
+    def mark_safe() -> None:
+        nonlocal safe
+        safe = (len(pieces), "".join(frame.closer for frame in reversed(stack)))
+
+    index = 0
+    while index < len(text):
+        char = text[index]
+        is_key = bool(stack) and stack[-1].expects_key
+        if char == '"':
+            match = _STRING.match(text, index)
+            if match is None:
+                if not is_key:
+                    # A backslash left dangling by the cut would escape the quote.
+                    tail = text[index:]
+                    if (len(tail) - len(tail.rstrip("\\"))) % 2:
+                        tail = tail[:-1]
+                    pieces.append(tail + '"')
+                    mark_safe()
+                break
+            pieces.append(match.group())
+            index = match.end()
+            if not is_key:
+                mark_safe()
+            continue
+        if char in "{[":
+            pieces.append(char)
+            stack.append(_Frame("}" if char == "{" else "]", char == "{"))
+            mark_safe()
+        elif char in "}]":
+            if not stack:
+                break
+            while pieces and (pieces[-1].isspace() or pieces[-1] == ","):
+                _ = pieces.pop()
+            pieces.append(stack.pop().closer)
+            mark_safe()
+            if not stack:
+                break
+        elif char == ",":
+            pieces.append(char)
+            if stack:
+                stack[-1].expects_key = stack[-1].closer == "}"
+        elif char == ":":
+            pieces.append(char)
+            if stack:
+                stack[-1].expects_key = False
+        elif char.isspace():
+            pieces.append(char)
+        else:
+            match = _SCALAR.match(text, index)
+            # A scalar running into the end of the text may have been cut short.
+            if match is None or match.end() == len(text):
+                break
+            pieces.append(match.group())
+            index = match.end()
+            mark_safe()
+            continue
+        index += 1
+
+    count, closers = safe
+    return "".join(pieces[:count]) + closers
+
+
+def repair_json(payload: str) -> Any:
+    """
+    Parse a JSON answer, repairing the usual defects of model output.
+
+    Markdown code fences and prose around the JSON value are ignored, trailing
+    commas are dropped and a truncated value is closed (see `_complete_prefix`).
+
+    Raises:
+        ValueError: If no JSON value can be recovered
+    """
+    text = payload.strip()
+    fenced = _FENCE.match(text)
+    if fenced is not None:
+        text = fenced.group(1).strip()
+    starts = [index for index in (text.find("{"), text.find("[")) if index >= 0]
+    if not starts:
+        raise ValueError("No JSON value in the response")
+    text = text[min(starts) :]
+
+    try:
+        value, _ = _DECODER.raw_decode(text)
+        return value
+    except json.JSONDecodeError:
+        pass
+    return _DECODER.decode(_complete_prefix(text))
+
+
+def _normalise(value: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", value)
+    text = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return re.sub(r"[^0-9A-Z]+", "_", text.upper()).strip("_")
+
+
+def closest_value(value: Any, allowed: list[str]) -> str | None:
+    """The allowed value ``value`` is a near-miss of, or None."""
+    if not isinstance(value, str) or not allowed:
+        return None
+    by_form = {_normalise(option): option for option in allowed}
+    form = _normalise(value)
+    if form in by_form:
+        return by_form[form]
+    matches = difflib.get_close_matches(form, by_form, n=1, cutoff=ENUM_MATCH_CUTOFF)
+    return by_form[matches[0]] if matches else None
+
+
+def _set_at(data: Any, loc: tuple[int | str, ...], value: str) -> bool:
+    node = data
+    for position, part in enumerate(loc):
+        last = position == len(loc) - 1
+        if isinstance(node, dict):
+            if part not in node:
+                # Union errors name the member model tried; it is not a key.
+                continue
+            if last:
+                node[part] = value
+                return True
+            node = node[part]
+        elif isinstance(node, list) and isinstance(part, int) and part < len(node):
+            if last:
+                node[part] = value
+                return True
+            node = node[part]
+        else:
+            return False
+    return False
+
+
+def repair_enum_values(data: Any, error: ValidationError) -> bool:
+    """
+    Replace the enum near-misses reported by ``error`` in ``data``, in place.
+
+    Returns:
+        True if at least one value was replaced
+    """
+    repaired = False
+    for detail in error.errors():
+        if detail["type"] not in ("enum", "literal_error"):
+            continue
+        expected = str(detail.get("ctx", {}).get("expected", ""))
+        allowed = [option.replace("\\'", "'") for option in _EXPECTED.findall(expected)]
+        match = closest_value(detail["input"], allowed)
+        if match is not None and _set_at(data, tuple(detail["loc"]), match):
+            repaired = True
+    return repaired
+
+
+def validation_error_summary(error: ValidationError, limit: int = 20) -> str:
+    """The errors of ``error`` as short lines, for re-asking the model."""
+    lines: list[str] = []
+    for detail in error.errors(include_url=False)[:limit]:
+        location = ".".join(str(part) for part in detail["loc"]) or "(raiz)"
+        received = repr(detail["input"])
+        if len(received) > 80:
+            received = received[:77] + "..."
+        lines.append(f"- {location}: {detail['msg']} (recebido: {received})")
+    if error.error_count() > limit:
+        lines.append(f"- ... e mais {error.error_count() - limit} erros")
+    return "\n".join(lines)
+
+
+__all__ = [
+    "ENUM_MATCH_CUTOFF",
+    "closest_value",
+    "repair_enum_values",
+    "repair_json",
+    "validation_error_summary",
+]
@@ -0,0 +1,83 @@
+"""
+Per-stage Gemini model policy with escalation.
+
+Every pipeline stage calls a chain of models. The first model answers unless its
+answer is unusable: an empty response, or JSON that does not match the output
+schema. Then the next model of the chain is asked the same question. API errors
+are retried on the same model (see `rate_limit`) and never escalate. Cheap, fast
+models can thus handle most documents while harder groups, or the documents the
+cheap model gets wrong, go to a stronger one.
+
+The policy is read from ``GEMINI_MODEL_POLICY``: comma-separated
+``key=model>fallback>...`` entries. Keys are the stages ``ocr``, ``triage``,
+``single_pass`` and ``specialist`` (every specialist), or a document group with
+a specialist, which overrides ``specialist`` for that group's specialist:
+
+    GEMINI_MODEL_POLICY="triage=gemini-2.5-flash-lite>gemini-2.5-flash,
+        DOCUMENTOS_RH=gemini-2.5-flash-lite>gemini-2.5-flash,
+        DOCUMENTOS_ADUANEIROS=gemini-2.5-pro,DOCUMENTOS_FISCAIS=gemini-2.5-pro"
+
+Stages without an entry use ``GEMINI_MODEL`` alone. Escalations are counted in
+the stage metrics (``escalations``).
+"""
+
+from __future__ import annotations
+
+import os
+
+from .models import DocumentGroup
+
+DEFAULT_MODEL_NAME = os.environ.get("GEMINI_MODEL", "gemini-2.5-flash")
+
+STAGES = ("ocr", "triage", "single_pass", "specialist")
+
+
+def parse_model_policy(policy: str) -> dict[str, tuple[str, ...]]:
+    """Parse a ``GEMINI_MODEL_POLICY`` value into model chains by key."""
+    # OUTROS_DOCUMENTOS has no specialist: its documents stop after triage.
+    groups = {
+        group.value
+        for group in DocumentGroup
+        if group is not DocumentGroup.OUTROS_DOCUMENTOS
+    }
+    chains: dict[str, tuple[str, ...]] = {}
+    for entry in policy.split(","):
+        if not entry.strip():
+            continue
+        key, separator, models = entry.partition("=")
+        key = key.strip()
+        chain = tuple(model.strip() for model in models.split(">") if model.strip())
+        if not separator or not chain:
+            raise ValueError(f"Invalid GEMINI_MODEL_POLICY entry: {entry.strip()!r}")
+        if key not in STAGES and key not in groups:
+            raise ValueError(
+                f"Unknown GEMINI_MODEL_POLICY key {key!r}; expected one of "
+                f"{', '.join(STAGES)} or a document group with a specialist"
+            )
+        chains[key] = chain
+    return chains
+
+
+MODEL_POLICY = parse_model_policy(os.environ.get("GEMINI_MODEL_POLICY", ""))
+
+
+def model_tiers(stage: str, group: DocumentGroup | None = None) -> tuple[str, ...]:
+    """Models to call for ``stage`` (and ``group``'s specialist), in order."""
+    if group is not None and group.value in MODEL_POLICY:
+        return MODEL_POLICY[group.value]
+    return MODEL_POLICY.get(stage, (DEFAULT_MODEL_NAME,))
+
+
+def policy_key(models: tuple[str, ...]) -> str:
+    """A chain as one string, for checkpoint keys; a single model is its name."""
+    return ">".join(models)
+
+
+__all__ = [
+    "DEFAULT_MODEL_NAME",
+    "MODEL_POLICY",
+    "STAGES",
+    "model_tiers",
+    "parse_model_policy",
+    "policy_key",
+]
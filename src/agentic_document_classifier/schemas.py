@@ -0,0 +1,179 @@
+"""
+Gemini response schemas for the structured output models, built once.
+
+Passing a pydantic class as ``response_schema`` makes google-genai generate its
+JSON schema, inline the ``$defs`` and validate the result into a `Schema` on
+every call. For models with large metadata unions, such as `TaxesOutput` or
+`CustomsOutput`, that costs milliseconds of CPU per call. `response_schema`
+runs the same conversion once per model and process and returns the resulting
+`Schema`, which the SDK sends unchanged; the request body is identical.
+
+Schemas can also be written ahead of time, e.g. when building an image:
+
+    python -m agentic_document_classifier.schemas /opt/agentic/schemas
+
+and loaded by pointing ``GEMINI_SCHEMA_DIRECTORY`` at that directory, so worker
+processes skip the conversion altogether. Each file records a fingerprint of the
+``models`` package source and the google-genai version; files that do not match
+the running code are ignored and the schema is converted as usual.
+
+The conversion is the SDK's private ``_transformers.t_schema``. Should a
+google-genai release drop it, `response_schema` returns the pydantic class and
+the SDK converts it on every call, as it did before this module existed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import functools
+import hashlib
+import json
+import os
+import threading
+from importlib import metadata
+from pathlib import Path
+
+from google.genai import types as genai_types
+from pydantic import BaseModel
+
+from . import models
+
+try:
+    from google.genai._transformers import t_schema
+except ImportError:  # pragma: no cover - private SDK API
+    t_schema = None
+
+SCHEMA_DIRECTORY = os.environ.get("GEMINI_SCHEMA_DIRECTORY")
+
+_SCHEMAS: dict[type[BaseModel], genai_types.Schema | type[BaseModel]] = {}
+_SCHEMAS_LOCK = threading.Lock()
+
+
+@functools.cache
+def _fingerprint() -> str:
+    digest = hashlib.sha256(metadata.version("google-genai").encode("utf-8"))
+    for source in sorted(Path(models.__file__).parent.glob("*.py")):
+        digest.update(source.name.encode("utf-8"))
+        digest.update(source.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def _schema_path(directory: str | Path, model: type[BaseModel]) -> Path:
+    return Path(directory) / f"{model.__name__}.json"
+
+
+def _is_packaged(model: type[BaseModel]) -> bool:
+    # Only models defined in `models` are covered by the fingerprint; models
+    # built at runtime (e.g. the single-pass union) are always converted.
+    return model.__module__.startswith(f"{models.__name__}.")
+
+
+def _load_schema(model: type[BaseModel]) -> genai_types.Schema | None:
+    if not SCHEMA_DIRECTORY or not _is_packaged(model):
+        return None
+    try:
+        stored = json.loads(
+            _schema_path(SCHEMA_DIRECTORY, model).read_text(encoding="utf-8")
+        )
+    except (OSError, ValueError):
+        return None
+    if stored.get("fingerprint") != _fingerprint():
+        return None
+    return genai_types.Schema.model_validate(stored["schema"])
+
+
+def _convert(model: type[BaseModel]) -> genai_types.Schema:
+    # The SDK's own conversion, so the request is exactly what passing the
+    # class would have sent. API-mode checks still run on every call, when the
+    # SDK copies the returned schema into the request.
+    if t_schema is None:
+        raise RuntimeError(
+            f"google-genai {metadata.version('google-genai')} has no schema conversion"
+        )
+    schema = t_schema(None, model)
+    if schema is None:
+        raise ValueError(f"No response schema for {model.__name__}")
+    return schema
+
+
+def response_schema(model: type[BaseModel]) -> genai_types.Schema | type[BaseModel]:
+    """The Gemini `Schema` for ``model``, converted on first use and cached.
+
+    ``model`` itself when the SDK's conversion is unavailable. The returned
+    object is shared and must not be modified.
+    """
+    schema = _SCHEMAS.get(model)
+    if schema is not None:
+        return schema
+
+    with _SCHEMAS_LOCK:
+        schema = _SCHEMAS.get(model)
+        if schema is None:
+            schema = _load_schema(model)
+            if schema is None:
+                schema = _convert(model) if t_schema is not None else model
+            _SCHEMAS[model] = schema
+    return schema
+
+
+def output_models() -> list[type[BaseModel]]:
+    """The triage model and every specialist output model."""
+    from .agents import SPECIALIST_AGENT_CONFIG
+
+    return [models.TriageResponse] + [
+        response_model for _, response_model in SPECIALIST_AGENT_CONFIG.values()
+    ]
+
+
+def preload_response_schemas(
+    response_models: list[type[BaseModel]] | None = None,
+) -> None:
+    """Build schemas ahead of use (all output models by default)."""
+    for model in response_models or output_models():
+        _ = response_schema(model)
+
+
+def write_response_schemas(
+    directory: str | Path, response_models: list[type[BaseModel]] | None = None
+) -> list[Path]:
+    """Write the schemas of ``response_models`` for ``GEMINI_SCHEMA_DIRECTORY``.
+
+    Returns:
+        Paths of the written files
+    """
+    Path(directory).mkdir(parents=True, exist_ok=True)
+    written: list[Path] = []
+    for model in response_models or output_models():
+        path = _schema_path(directory, model)
+        stored = {
+            "fingerprint": _fingerprint(),
+            "schema": _convert(model).model_dump(mode="json", exclude_unset=True),
+        }
+        _ = path.write_text(json.dumps(stored, ensure_ascii=False), encoding="utf-8")
+        written.append(path)
+    return written
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Write the Gemini response schemas of every output model"
+    )
+    _ = parser.add_argument("directory", help="Directory for GEMINI_SCHEMA_DIRECTORY")
+    args = parser.parse_args()
+    directory: str = args.directory  # pyright: ignore[reportAny]
+
+    for path in write_response_schemas(directory):
+        print(path)
+
+
+__all__ = [
+    "SCHEMA_DIRECTORY",
+    "output_models",
+    "preload_response_schemas",
+    "response_schema",
+    "write_response_schemas",
+]
+
+
+if __name__ == "__main__":
+    main()
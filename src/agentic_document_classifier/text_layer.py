@@ -0,0 +1,213 @@
+"""
+Local Markdown extraction for PDFs with an embedded text layer.
+
+Born-digital PDFs (most invoices and bank statements) already carry their text,
+so sending them to Gemini for OCR is slow and costly. When ``pypdf`` is
+installed (``pip install agentic_document_classifier[pdf]``), the OCR step first
+extracts the text layer locally and keeps it only if it passes a quality check:
+
+- coverage: most pages have text, so a scan with a few stamped pages is not
+  mistaken for a digital document
+- density: pages carry enough characters on average to be a real text layer
+  rather than a header stamped over a scan
+- glyph sanity: the characters are printable letters, digits and punctuation,
+  not private-use glyphs, replacement characters or ``(cid:NN)`` codes left by
+  fonts without a Unicode mapping
+
+Documents that fail the check are sent to Gemini OCR as before. Pages without
+text in a document that passes, such as a scanned annex, are never dropped:
+`extract_text_pages` reports them, and the OCR step converts those pages alone
+with Gemini.
+
+The Markdown holds only the document's content. The original path is sent with
+each request instead, so documents with the same content share one checkpoint.
+
+Configuration through environment variables:
+
+- ``PDF_TEXT_LAYER``: set to ``false``/``0``/``no`` to always use Gemini OCR
+- ``PDF_TEXT_LAYER_MIN_CHARS_PER_PAGE``: minimum average non-blank characters
+  per page (default 200)
+- ``PDF_TEXT_LAYER_MIN_COVERAGE``: minimum fraction of pages with text for the
+  text layer to be used (default 0.9); the other pages go to Gemini OCR
+- ``PDF_TEXT_LAYER_MIN_SANE_RATIO``: minimum fraction of sane glyphs
+  (default 0.95)
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import unicodedata
+from dataclasses import dataclass
+from typing import Any
+
+try:
+    from pypdf import PdfReader
+    from pypdf.errors import PyPdfError
+except ImportError:  # pragma: no cover - optional dependency
+    PdfReader = None  # type: ignore[assignment,misc]
+    PyPdfError = Exception  # type: ignore[assignment,misc]
+
+
+TEXT_LAYER_ENABLED = os.environ.get("PDF_TEXT_LAYER", "true").lower() not in (
+    "false",
+    "0",
+    "no",
+)
+MIN_CHARS_PER_PAGE = int(os.environ.get("PDF_TEXT_LAYER_MIN_CHARS_PER_PAGE", "200"))
+MIN_COVERAGE = float(os.environ.get("PDF_TEXT_LAYER_MIN_COVERAGE", "0.9"))
+MIN_SANE_RATIO = float(os.environ.get("PDF_TEXT_LAYER_MIN_SANE_RATIO", "0.95"))
+
+# A page with fewer non-blank characters than this counts as having no text.
+_MIN_PAGE_CHARS = 20
+# At least this fraction of the glyphs must be letters or digits.
+_MIN_ALPHANUMERIC_RATIO = 0.5
+_CID_PATTERN = re.compile(r"\(cid:\d+\)")
+_INSANE_CATEGORIES = frozenset({"Cc", "Cf", "Cn", "Co", "Cs"})
+
+
+@dataclass(frozen=True)
+class TextLayerQuality:
+    pages: int
+    pages_with_text: int
+    characters: int
+    sane_characters: int
+    alphanumeric_characters: int
+
+    @property
+    def coverage(self) -> float:
+        return self.pages_with_text / self.pages if self.pages else 0.0
+
+    @property
+    def characters_per_page(self) -> float:
+        return self.characters / self.pages if self.pages else 0.0
+
+    @property
+    def sane_ratio(self) -> float:
+        return self.sane_characters / self.characters if self.characters else 0.0
+
+    @property
+    def alphanumeric_ratio(self) -> float:
+        if not self.characters:
+            return 0.0
+        return self.alphanumeric_characters / self.characters
+
+    @property
+    def acceptable(self) -> bool:
+        return (
+            self.coverage >= MIN_COVERAGE
+            and self.characters_per_page >= MIN_CHARS_PER_PAGE
+            and self.sane_ratio >= MIN_SANE_RATIO
+            and self.alphanumeric_ratio >= _MIN_ALPHANUMERIC_RATIO
+        )
+
+
+def _glyphs(text: str) -> tuple[list[str], int]:
+    """Non-blank characters of ``text`` and its number of ``(cid:NN)`` codes."""
+    cid_glyphs = len(_CID_PATTERN.findall(text))
+    glyphs = [char for char in _CID_PATTERN.sub("", text) if not char.isspace()]
+    return glyphs, cid_glyphs
+
+
+def page_has_text(text: str) -> bool:
+    """Whether an extracted page carries text rather than being a scan or blank."""
+    glyphs, cid_glyphs = _glyphs(text)
+    return len(glyphs) + cid_glyphs >= _MIN_PAGE_CHARS
+
+
+def assess_text_layer(pages: list[str]) -> TextLayerQuality:
+    """Measure how trustworthy the extracted text of each page is."""
+    pages_with_text = characters = sane = alphanumeric = 0
+    for text in pages:
+        glyphs, cid_glyphs = _glyphs(text)
+        if len(glyphs) + cid_glyphs >= _MIN_PAGE_CHARS:
+            pages_with_text += 1
+
+        characters += len(glyphs) + cid_glyphs
+        for char in glyphs:
+            if char == "\ufffd" or unicodedata.category(char) in _INSANE_CATEGORIES:
+                continue
+            sane += 1
+            alphanumeric += char.isalnum()
+
+    return TextLayerQuality(
+        pages=len(pages),
+        pages_with_text=pages_with_text,
+        characters=characters,
+        sane_characters=sane,
+        alphanumeric_characters=alphanumeric,
+    )
+
+
+def _page_text(page: Any) -> str:
+    try:
+        # Layout mode keeps table columns aligned, which the classifiers use.
+        return page.extract_text(extraction_mode="layout")
+    except (PyPdfError, ValueError, KeyError, TypeError):
+        return page.extract_text()
+
+
+def extract_pages(source: Any) -> list[str] | None:
+    """Text of every page of a PDF, or None when it cannot be read locally.
+
+    Args:
+        source: A binary stream over the PDF (a file, ``BytesIO`` or ``mmap``)
+    """
+    if PdfReader is None:
+        return None
+    try:
+        reader = PdfReader(source)
+        if reader.is_encrypted:
+            return None
+        return [_page_text(page) for page in reader.pages]
+    except (PyPdfError, ValueError, KeyError, TypeError, OSError):
+        return None
+
+
+def pages_to_markdown(pages: list[str]) -> str:
+    """Markdown with one section per page, without the file's path."""
+    sections = [
+        f"## Página {number}\n\n{text.strip()}"
+        for number, text in enumerate(pages, start=1)
+    ]
+    return "\n\n".join(sections) + "\n"
+
+
+def text_layer_available() -> bool:
+    """True when local extraction is enabled and pypdf is installed."""
+    return TEXT_LAYER_ENABLED and PdfReader is not None
+
+
+def extract_text_pages(
+    source: Any,
+) -> tuple[list[str | None] | None, TextLayerQuality | None]:
+    """Text of every page of the PDF, if its text layer is good enough.
+
+    Returns:
+        The text of each page, None for pages without text that need OCR (None
+        when the whole document needs OCR), and the measured quality (None
+        when the text layer could not be read at all)
+    """
+    if not text_layer_available():
+        return None, None
+
+    pages = extract_pages(source)
+    if not pages:
+        return None, None
+
+    quality = assess_text_layer(pages)
+    if not quality.acceptable:
+        return None, quality
+    return [text if page_has_text(text) else None for text in pages], quality
+
+
+__all__ = [
+    "TEXT_LAYER_ENABLED",
+    "TextLayerQuality",
+    "assess_text_layer",
+    "extract_pages",
+    "extract_text_pages",
+    "page_has_text",
+    "pages_to_markdown",
+    "text_layer_available",
+]
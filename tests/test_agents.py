@@ -0,0 +1,179 @@
+import asyncio
+import json
+
+import pytest
+from google.genai import errors as genai_errors
+
+from agentic_document_classifier import agents, prompts, routing, text_layer
+from agentic_document_classifier.checkpoints import (
+    MemoryCheckpointStore,
+    set_checkpoint_store,
+)
+from agentic_document_classifier.metrics import (
+    MetricsCollector,
+    add_metrics_hook,
+    remove_metrics_hook,
+)
+from agentic_document_classifier.models import (
+    DocumentGroup,
+    ErrorOutput,
+    TriageOutput,
+)
+
+IDENTIFIER = "0123abcd"
+GROUPS = frozenset({DocumentGroup.DOCUMENTOS_BANCARIOS, DocumentGroup.DOCUMENTOS_RH})
+
+
+def stage_keys() -> dict[str, str]:
+    return {
+        "ocr": agents._ocr_checkpoint_key(IDENTIFIER),
+        "triage": agents._triage_checkpoint_key(IDENTIFIER),
+        "specialist": agents._specialist_checkpoint_key(
+            IDENTIFIER, DocumentGroup.DOCUMENTOS_RH
+        ),
+        "single_pass": agents._single_pass_checkpoint_key(IDENTIFIER, GROUPS),
+    }
+
+
+def test_stage_keys_are_distinct_and_stable():
+    keys = stage_keys()
+
+    assert len(set(keys.values())) == len(keys)
+    assert keys["ocr"].startswith(f"{IDENTIFIER}_step_1_")
+    assert keys["ocr"].endswith(".md")
+    assert keys["triage"].startswith(f"{IDENTIFIER}_step_2_")
+    assert stage_keys() == keys
+
+
+@pytest.mark.parametrize("stage", ["ocr", "triage", "specialist", "single_pass"])
+def test_a_routing_policy_change_invalidates_the_stage(stage, monkeypatch):
+    before = stage_keys()
+    monkeypatch.setattr(
+        routing, "MODEL_POLICY", {stage: ("gemini-2.5-flash-lite", "gemini-2.5-pro")}
+    )
+
+    after = stage_keys()
+
+    assert [name for name in before if before[name] != after[name]] == [stage]
+
+
+@pytest.mark.parametrize(
+    ("setting", "stages"),
+    [
+        ("TRIAGE_CONTENT_TOKENS", ["triage"]),
+        ("SPECIALIST_CONTENT_TOKENS", ["specialist", "single_pass"]),
+    ],
+)
+def test_a_content_budget_change_invalidates_its_stages(setting, stages, monkeypatch):
+    before = stage_keys()
+    monkeypatch.setattr(agents, setting, 1000)
+
+    after = stage_keys()
+
+    assert [name for name in before if before[name] != after[name]] == stages
+
+
+def test_a_prompt_change_invalidates_the_stages_using_it(monkeypatch):
+    before = stage_keys()
+    name, digest = "triage_prompt", prompts.prompt_hash("triage_prompt")
+    original = prompts._load_entry
+
+    def edited(prompt_name: str) -> tuple[str, str]:
+        content, prompt_digest = original(prompt_name)
+        return content, "edited" if prompt_name == name else prompt_digest
+
+    monkeypatch.setattr(prompts, "_load_entry", edited)
+
+    after = stage_keys()
+
+    assert digest != prompts.prompt_hash(name)
+    assert [stage for stage in before if before[stage] != after[stage]] == [
+        "triage",
+        "single_pass",
+    ]
+
+
+TRIAGE = {
+    "localizacao_ficheiro": "documento.pdf",
+    "grupo_documento": "OUTROS_DOCUMENTOS",
+    "numero_documento": "ACTA-7",
+    "data_emissao": "2024-03-01",
+    "notas_triagem": "Acta de reunião.",
+}
+LINE = "Acta da reuniao do conselho de administracao numero 7 de 1 de Marco de 2024"
+
+
+@pytest.fixture
+def offline(monkeypatch):
+    """A memory checkpoint store, a local text layer and a canned triage answer."""
+    calls: list[str] = []
+
+    async def agenerate(system_prompt, user_message, response_model, model):
+        calls.append(response_model.__name__)
+        if "falha" in user_message:
+            raise genai_errors.APIError(
+                400, {"error": {"code": 400, "message": "bad request"}}
+            )
+        return json.dumps(TRIAGE)
+
+    set_checkpoint_store(MemoryCheckpointStore())
+    monkeypatch.setattr(text_layer, "MIN_CHARS_PER_PAGE", 40)
+    monkeypatch.setattr(agents, "_agenerate_structured_payload", agenerate)
+    yield calls
+    set_checkpoint_store(None)
+
+
+def test_async_pipeline_classifies_and_reuses_checkpoints(make_pdf, offline):
+    path = make_pdf([LINE, LINE])
+
+    first = asyncio.run(agents.aclassify_document(path))
+    second = asyncio.run(agents.aclassify_document(path))
+
+    assert isinstance(first, TriageOutput)
+    assert first.grupo_documento is DocumentGroup.OUTROS_DOCUMENTOS
+    assert LINE in first.conteudo
+    assert second == first
+    assert offline == ["TriageResponse"]
+
+
+def test_async_pipeline_reports_errors_as_results(make_pdf, offline, tmp_path):
+    failing = make_pdf([LINE.replace("Acta", "falha")], "falha.pdf")
+    missing = str(tmp_path / "nao-existe.pdf")
+
+    results = asyncio.run(agents.aclassify_many([failing, missing]))
+
+    assert [type(result) for result in results] == [ErrorOutput, ErrorOutput]
+    assert "bad request" in results[0].erro
+    assert results[1].erro == f"File not found: {missing}"
+
+
+def test_aclassify_many_bounds_concurrency_and_keeps_order(monkeypatch):
+    running = 0
+    peak = 0
+
+    async def aclassify_document(path: str) -> str:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return path
+
+    monkeypatch.setattr(agents, "aclassify_document", aclassify_document)
+    collector = MetricsCollector()
+    add_metrics_hook(collector)
+    try:
+        paths = [f"{index}.pdf" for index in range(10)]
+        results = asyncio.run(agents.aclassify_many(paths, max_concurrency=3))
+    finally:
+        remove_metrics_hook(collector)
+
+    assert results == paths
+    assert peak == 3
+    # Documents beyond the first slots wait for one.
+    assert max(metrics.queue_wait for metrics in collector.drain()) > 0.01
+
+
+def test_aclassify_many_needs_a_slot():
+    with pytest.raises(ValueError, match="max_concurrency"):
+        asyncio.run(agents.aclassify_many(["a.pdf"], max_concurrency=0))
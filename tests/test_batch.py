@@ -0,0 +1,149 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from agentic_document_classifier import batch
+from agentic_document_classifier.batch import (
+    BatchBackend,
+    BatchRequest,
+    BatchResult,
+    classify_batch,
+)
+from agentic_document_classifier.checkpoints import (
+    MemoryCheckpointStore,
+    set_checkpoint_store,
+)
+from agentic_document_classifier.models import (
+    DocumentGroup,
+    ErrorOutput,
+    TriageOutput,
+)
+
+TRIAGE = {
+    "localizacao_ficheiro": "documento.pdf",
+    "grupo_documento": "OUTROS_DOCUMENTOS",
+    "numero_documento": "ACTA-7",
+    "data_emissao": "2024-03-01",
+    "notas_triagem": "Acta de reunião.",
+}
+
+
+class FakeBackend(BatchBackend):
+    """Answers every request of a job at once; ``answer`` decides each result."""
+
+    def __init__(self, answer) -> None:
+        self.answer = answer
+        self.jobs: dict[str, list[BatchRequest]] = {}
+        self.phases: list[str] = []
+        self.uploads: list[str] = []
+        self.deleted: list[str] = []
+
+    def submit(self, model, requests, display_name):
+        name = f"batches/{len(self.jobs)}"
+        self.jobs[name] = requests
+        self.phases.append(display_name.removeprefix("agentic-classifier-"))
+        return name
+
+    def poll(self, job_name):
+        return "JOB_STATE_SUCCEEDED"
+
+    def results(self, job_name):
+        phase = self.phases[int(job_name.split("/")[1])]
+        return [self.answer(phase, request) for request in self.jobs[job_name]]
+
+    def upload(self, path: Path, mime_type: str) -> str:
+        self.uploads.append(f"files/{path.name}")
+        return self.uploads[-1]
+
+    def delete_upload(self, uri: str) -> None:
+        self.deleted.append(uri)
+
+
+def answers(phase: str, request: BatchRequest) -> BatchResult:
+    if phase == "ocr":
+        return BatchResult(request.key, text="# Acta\n\nReunião do conselho.")
+    if phase == "single-pass":
+        return BatchResult(request.key, text=json.dumps({"resultado": TRIAGE}))
+    return BatchResult(request.key, text=json.dumps(TRIAGE))
+
+
+@pytest.fixture(autouse=True)
+def store():
+    store = MemoryCheckpointStore()
+    set_checkpoint_store(store)
+    yield store
+    set_checkpoint_store(None)
+
+
+@pytest.fixture
+def scans(make_pdf) -> list[str]:
+    # Pages without text always go to OCR.
+    return [make_pdf([None], "a.pdf"), make_pdf([None, None], "b.pdf")]
+
+
+def test_steps_run_as_jobs_and_uploads_are_deleted(scans, monkeypatch):
+    monkeypatch.setattr(batch, "_inline_pdf_size", lambda document: 1 << 30)
+    backend = FakeBackend(answers)
+
+    results = classify_batch(scans + scans[:1], backend, poll_interval=0)
+
+    assert backend.phases == ["ocr", "triage"]
+    assert [len(requests) for requests in backend.jobs.values()] == [2, 2]
+    assert backend.deleted == backend.uploads == ["files/a.pdf", "files/b.pdf"]
+    assert all(isinstance(result, TriageOutput) for result in results)
+    assert [result.localizacao_ficheiro for result in results] == scans + scans[:1]
+    assert results[0].conteudo == "# Acta\n\nReunião do conselho."
+
+
+def test_a_second_run_reuses_the_checkpoints(scans):
+    _ = classify_batch(scans, FakeBackend(answers), poll_interval=0)
+    backend = FakeBackend(answers)
+
+    results = classify_batch(scans, backend, poll_interval=0)
+
+    assert backend.phases == []
+    assert all(isinstance(result, TriageOutput) for result in results)
+
+
+def failing_triage(phase: str, request: BatchRequest) -> BatchResult:
+    if phase == "triage":
+        return BatchResult(request.key, error="RESOURCE_EXHAUSTED")
+    return answers(phase, request)
+
+
+def test_failed_requests_are_classified_online(scans, monkeypatch):
+    online: list[str] = []
+
+    async def aclassify_many(paths):
+        online.extend(paths)
+        return [ErrorOutput(localizacao_ficheiro=path, erro="online") for path in paths]
+
+    monkeypatch.setattr(batch, "aclassify_many", aclassify_many)
+
+    results = classify_batch(scans, FakeBackend(failing_triage), poll_interval=0)
+
+    assert online == scans
+    assert [result.erro for result in results] == ["online", "online"]
+
+
+def test_failed_requests_are_reported_without_the_fallback(scans):
+    results = classify_batch(
+        scans, FakeBackend(failing_triage), poll_interval=0, online_fallback=False
+    )
+
+    assert all(isinstance(result, ErrorOutput) for result in results)
+    assert "RESOURCE_EXHAUSTED" in results[0].erro
+
+
+def test_single_pass_groups_replace_the_triage_job(scans, monkeypatch):
+    monkeypatch.setattr(
+        batch, "SINGLE_PASS_GROUPS", frozenset({DocumentGroup.DOCUMENTOS_RH})
+    )
+    backend = FakeBackend(answers)
+
+    results = classify_batch(scans, backend, poll_interval=0)
+
+    assert backend.phases == ["ocr", "single-pass"]
+    assert all(isinstance(result, TriageOutput) for result in results)
+    assert results[1].conteudo == "# Acta\n\nReunião do conselho."
@@ -0,0 +1,203 @@
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from agentic_document_classifier import checkpoints
+from agentic_document_classifier.checkpoints import (
+    CheckpointStore,
+    DirectoryCheckpointStore,
+    MemoryCheckpointStore,
+    SQLiteCheckpointStore,
+    create_checkpoint_store,
+)
+
+BACKENDS = ["directory", "sqlite", "memory"]
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = time.time()
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> Clock:
+    fake = Clock()
+    monkeypatch.setattr(checkpoints.time, "time", fake)
+    return fake
+
+
+def make_store(backend: str, tmp_path, **limits) -> CheckpointStore:
+    location = tmp_path / ("store.sqlite3" if backend == "sqlite" else "store")
+    return create_checkpoint_store(backend, location, **limits)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_round_trip_and_stats(backend, tmp_path):
+    store = make_store(backend, tmp_path)
+
+    assert store.get("a") is None
+    store.put("a", "conteúdo")
+    store.put("a", "conteúdo novo")
+
+    assert store.get("a") == "conteúdo novo"
+    assert list(store.keys()) == ["a"]
+    assert (store.stats.hits, store.stats.misses, store.stats.writes) == (1, 1, 2)
+
+    store.delete("a")
+    assert store.get("a") is None
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_expired_entries_are_not_returned(backend, tmp_path, clock):
+    store = make_store(backend, tmp_path, ttl_seconds=60)
+    store.put("a", "x")
+    if backend == "directory":
+        os.utime(tmp_path / "store" / "a", (clock.now, clock.now))
+
+    clock.advance(30)
+    assert store.get("a") == "x"
+
+    clock.advance(31)
+    assert store.get("a") is None
+    assert "a" not in list(store.keys())
+    assert store.stats.evictions == 1
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_expired_entries_are_swept_on_write(backend, tmp_path, clock, monkeypatch):
+    monkeypatch.setattr(checkpoints, "_SWEEP_INTERVAL", 2)
+    store = make_store(backend, tmp_path, ttl_seconds=60)
+    store.put("old", "x")
+    if backend == "directory":
+        # Files written next get the real modification time.
+        os.utime(tmp_path / "store" / "old", (clock.now - 61, clock.now - 61))
+    else:
+        clock.advance(61)
+    store.put("new", "y")
+
+    assert sorted(store.keys()) == ["new"]
+    assert store.stats.evictions == 1
+
+
+def test_memory_store_evicts_least_recently_used(clock):
+    store = MemoryCheckpointStore(max_bytes=25)
+    store.put("a", "a" * 10)
+    store.put("b", "b" * 10)
+    assert store.get("a") is not None
+
+    store.put("c", "c" * 10)
+
+    assert sorted(store.keys()) == ["a", "c"]
+    assert store.stats.evictions == 1
+
+
+def test_sqlite_store_evicts_least_recently_read(tmp_path, clock):
+    store = SQLiteCheckpointStore(tmp_path / "store.sqlite3", max_bytes=25)
+    store.put("a", "a" * 10)
+    clock.advance(1)
+    store.put("b", "b" * 10)
+    clock.advance(1)
+    assert store.get("a") is not None
+    clock.advance(1)
+
+    store.put("c", "c" * 10)
+
+    assert sorted(store.keys()) == ["a", "c"]
+
+
+def test_directory_store_evicts_least_recently_read(tmp_path):
+    store = DirectoryCheckpointStore(tmp_path, max_bytes=25)
+    store.put("a", "a" * 10)
+    store.put("b", "b" * 10)
+    now = time.time()
+    os.utime(tmp_path / "a", (now - 20, now - 20))
+    os.utime(tmp_path / "b", (now - 10, now - 10))
+    assert store.get("a") is not None
+
+    store.put("c", "c" * 10)
+
+    assert sorted(store.keys()) == ["a", "c"]
+    assert store.stats.evictions == 1
+
+
+def test_directory_store_reads_do_not_extend_the_ttl(tmp_path):
+    store = DirectoryCheckpointStore(tmp_path, ttl_seconds=60)
+    store.put("a", "x")
+    now = time.time()
+    os.utime(tmp_path / "a", (now - 50, now - 50))
+
+    assert store.get("a") == "x"
+    assert (tmp_path / "a").stat().st_mtime == pytest.approx(now - 50)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_overwrites_are_counted_once(backend, tmp_path):
+    store = make_store(backend, tmp_path, max_bytes=25)
+    store.put("a", "a" * 10)
+    for _ in range(5):
+        store.put("b", "b" * 10)
+
+    assert sorted(store.keys()) == ["a", "b"]
+    assert store.stats.evictions == 0
+
+
+def test_sqlite_store_keeps_a_running_total(tmp_path):
+    path = tmp_path / "store.sqlite3"
+    store = SQLiteCheckpointStore(path)
+    store.put("a", "a" * 10)
+    store.put("a", "a" * 4)
+    store.put("b", "b" * 7)
+    store.delete("b")
+
+    with sqlite3.connect(path) as connection:
+        (total,) = connection.execute("SELECT total FROM checkpoint_size").fetchone()
+    assert total == 4
+
+
+def test_directory_store_survives_concurrent_writers(tmp_path):
+    store = DirectoryCheckpointStore(tmp_path, max_bytes=500)
+
+    def write(worker: int) -> None:
+        for index in range(50):
+            store.put(f"key-{worker}-{index % 10}", "x" * 10)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(write, range(8)))
+
+    assert len(list(store.keys())) * 10 <= 500
+    assert store._total_bytes == sum(
+        (tmp_path / key).stat().st_size for key in store.keys()
+    )
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_eviction_frees_space_below_the_cap(backend, tmp_path):
+    store = make_store(backend, tmp_path, max_bytes=100)
+    for index in range(12):
+        store.put(f"key-{index:02d}", "x" * 10)
+
+    total = sum(len(store.get(key) or "") for key in list(store.keys()))
+    assert total <= 100
+    assert store.get("key-11") == "x" * 10
+
+
+def test_directory_store_ignores_partial_writes(tmp_path):
+    store = DirectoryCheckpointStore(tmp_path)
+    store.put("a", "x")
+    (tmp_path / ".tmp-abc.part").write_text("partial")
+
+    assert list(store.keys()) == ["a"]
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError, match="Unknown checkpoint backend"):
+        _ = create_checkpoint_store("redis")
@@ -0,0 +1,71 @@
+from pydantic import BaseModel, Field
+
+from agentic_document_classifier.content_budget import (
+    schema_vocabulary,
+    specialist_excerpt,
+    triage_excerpt,
+)
+from agentic_document_classifier.rate_limit import estimate_text_tokens
+
+MARKER = "caracteres omitidos"
+
+
+class Invoice(BaseModel):
+    numero_contribuinte: str = Field(description="NIF do emitente, quando presente")
+    valor_iliquido: float
+
+
+def document(pages: int) -> str:
+    return "\n\n".join(
+        f"## Página {page}\n\n" + f"Texto corrido da página {page}. " * 20
+        for page in range(1, pages + 1)
+    )
+
+
+def test_content_within_the_budget_is_unchanged():
+    markdown = document(3)
+
+    assert triage_excerpt(markdown, budget=10_000) == markdown
+    assert specialist_excerpt(markdown, Invoice, budget=10_000) == markdown
+
+
+def test_a_zero_budget_disables_the_excerpt():
+    markdown = document(50)
+
+    assert triage_excerpt(markdown, budget=0) == markdown
+    assert specialist_excerpt(markdown, Invoice, budget=0) == markdown
+
+
+def test_triage_excerpt_keeps_head_and_tail_within_the_budget():
+    markdown = document(50)
+
+    excerpt = triage_excerpt(markdown, budget=1_000)
+
+    assert estimate_text_tokens(excerpt) <= 1_000
+    assert excerpt.startswith("## Página 1\n")
+    assert excerpt.endswith("Texto corrido da página 50. ")
+    # Head, samples of the middle and tail are separated by markers.
+    assert excerpt.count(MARKER) > 1
+
+
+def test_specialist_excerpt_keeps_blocks_with_schema_terms():
+    relevant = "Número de contribuinte do emitente: 5417000000"
+    markdown = document(30).replace(
+        "## Página 20\n\n", f"## Página 20\n\n{relevant}\n\n"
+    )
+
+    excerpt = specialist_excerpt(markdown, Invoice, budget=800)
+
+    assert estimate_text_tokens(excerpt) <= 800
+    assert excerpt.startswith("## Página 1\n")
+    assert relevant in excerpt
+    assert MARKER in excerpt
+
+
+def test_schema_vocabulary_drops_short_words_and_stopwords():
+    vocabulary = schema_vocabulary(Invoice)
+
+    assert {"NUMERO", "CONTRIBUINTE", "EMITENTE", "ILIQUIDO"} <= vocabulary
+    assert "QUANDO" not in vocabulary
+    assert "PRESENTE" not in vocabulary
+    assert "NIF" not in vocabulary
@@ -0,0 +1,194 @@
+import datetime
+import threading
+
+import pytest
+from google.genai import errors as genai_errors
+from google.genai import types as genai_types
+
+from agentic_document_classifier import rate_limit
+from agentic_document_classifier.context_cache import (
+    PromptContextCache,
+    is_missing_cache_error,
+    minimum_cache_tokens,
+)
+
+MODEL = "gemini-2.5-flash"
+PROMPT = "És um classificador de documentos. " * 200
+
+
+class FakeCaches:
+    """The ``client.caches`` API, shared by every client like the real service."""
+
+    def __init__(self) -> None:
+        self.stored: list[genai_types.CachedContent] = []
+        self.calls: list[str] = []
+        self.failures: list[Exception] = []
+        self.block: dict[str, threading.Event] = {}
+
+    def _expiry(self, seconds: float) -> datetime.datetime:
+        return datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(
+            seconds=seconds
+        )
+
+    def list(self) -> list[genai_types.CachedContent]:
+        self.calls.append("list")
+        return list(self.stored)
+
+    def create(self, model, config) -> genai_types.CachedContent:
+        self.calls.append("create")
+        if config.display_name in self.block:
+            _ = self.block[config.display_name].wait(5)
+        if self.failures:
+            raise self.failures.pop(0)
+        cached = genai_types.CachedContent(
+            name=f"cachedContents/{len(self.stored)}",
+            display_name=config.display_name,
+            model=f"models/{model}",
+            expire_time=self._expiry(float(config.ttl.rstrip("s"))),
+        )
+        self.stored.append(cached)
+        return cached
+
+    def update(self, name, config) -> genai_types.CachedContent:
+        self.calls.append("update")
+        if self.failures:
+            raise self.failures.pop(0)
+        cached = next(cached for cached in self.stored if cached.name == name)
+        cached.expire_time = self._expiry(float(config.ttl.rstrip("s")))
+        return cached
+
+
+class FakeClient:
+    def __init__(self, caches: FakeCaches) -> None:
+        self.caches = caches
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(rate_limit, "backoff_delay", lambda attempt, after=None: 0)
+    monkeypatch.setattr(rate_limit, "get_rate_limiter", lambda: None)
+
+
+@pytest.fixture
+def caches() -> FakeCaches:
+    return FakeCaches()
+
+
+@pytest.fixture
+def client(caches) -> FakeClient:
+    return FakeClient(caches)
+
+
+@pytest.fixture
+def make_cache(tmp_path):
+    def make(**options) -> PromptContextCache:
+        return PromptContextCache(lock_directory=tmp_path / "locks", **options)
+
+    return make
+
+
+def api_error(code: int, message: str) -> genai_errors.APIError:
+    return genai_errors.APIError(code, {"error": {"code": code, "message": message}})
+
+
+def test_minimum_size_depends_on_the_model():
+    assert minimum_cache_tokens("gemini-2.5-pro") == 4096
+    assert minimum_cache_tokens("gemini-2.5-flash") == 1024
+
+
+def test_small_prompts_are_sent_inline(make_cache, client, caches):
+    cache = make_cache()
+
+    assert cache.cached_content_name(client, MODEL, "Converte em markdown.") is None
+    assert cache.cached_content_name(client, "gemini-2.5-pro", PROMPT) is None
+    assert caches.calls == []
+
+
+def test_a_cache_is_created_once_and_reused(make_cache, client, caches):
+    cache = make_cache()
+
+    first = cache.cached_content_name(client, MODEL, PROMPT)
+    second = cache.cached_content_name(client, MODEL, PROMPT)
+
+    assert first == second == "cachedContents/0"
+    assert caches.calls == ["list", "create"]
+
+
+def test_other_processes_reuse_the_first_cache(make_cache, client, caches):
+    workers = [make_cache() for _ in range(4)]
+    names: list[str | None] = []
+
+    threads = [
+        threading.Thread(
+            target=lambda cache=cache: names.append(
+                cache.cached_content_name(client, MODEL, PROMPT)
+            )
+        )
+        for cache in workers
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert names == ["cachedContents/0"] * 4
+    assert caches.calls.count("create") == 1
+
+
+def test_a_slow_create_does_not_hold_up_other_prompts(make_cache, client, caches):
+    cache = make_cache()
+    release = threading.Event()
+    caches.block[cache._display_name(MODEL, PROMPT)] = release
+    slow = threading.Thread(
+        target=cache.cached_content_name, args=(client, MODEL, PROMPT)
+    )
+    slow.start()
+
+    try:
+        other = cache.cached_content_name(client, MODEL, PROMPT + "outro")
+    finally:
+        release.set()
+        slow.join()
+
+    assert other is not None
+    assert caches.calls.count("create") == 2
+
+
+def test_expiring_caches_are_refreshed_through_the_retry_layer(
+    make_cache, client, caches
+):
+    cache = make_cache(ttl_seconds=100)
+    _ = cache.cached_content_name(client, MODEL, PROMPT)
+    entry = next(iter(cache._entries.values()))
+    entry.expires_at -= 90
+    caches.failures.append(api_error(503, "unavailable"))
+
+    assert cache.cached_content_name(client, MODEL, PROMPT) == "cachedContents/0"
+    assert caches.calls == ["list", "create", "update", "update"]
+
+
+def test_failed_creates_back_off(make_cache, client, caches):
+    cache = make_cache()
+    caches.failures.append(api_error(400, "Cached content is too small"))
+
+    assert cache.cached_content_name(client, MODEL, PROMPT) is None
+    assert cache.cached_content_name(client, MODEL, PROMPT) is None
+    assert caches.calls.count("create") == 1
+
+
+def test_invalidated_caches_are_looked_up_again(make_cache, client, caches):
+    cache = make_cache()
+    _ = cache.cached_content_name(client, MODEL, PROMPT)
+    caches.stored.clear()
+
+    cache.invalidate(MODEL, PROMPT)
+
+    assert cache.cached_content_name(client, MODEL, PROMPT) == "cachedContents/0"
+    assert caches.calls.count("create") == 2
+
+
+def test_missing_cache_errors():
+    assert is_missing_cache_error(api_error(404, "CachedContent not found"))
+    assert is_missing_cache_error(api_error(403, "Permission denied on cached content"))
+    assert not is_missing_cache_error(api_error(400, "Invalid schema"))
+    assert not is_missing_cache_error(api_error(500, "cache backend unavailable"))
@@ -0,0 +1,58 @@
+from pydantic import BaseModel
+
+from agentic_document_classifier.dedup import (
+    gemini_calls_for,
+    group_duplicates,
+    result_for_path,
+)
+from agentic_document_classifier.metrics import DocumentMetrics, StageMetrics
+
+
+class Result(BaseModel):
+    localizacao_ficheiro: str
+    total: float
+
+
+def test_group_duplicates_keeps_the_first_path_of_each_group():
+    duplicates = group_duplicates(
+        [("a.pdf", "x"), ("b.pdf", "y"), ("c/a.pdf", "x"), ("d.pdf", "x")]
+    )
+
+    assert duplicates.representatives == ["a.pdf", "b.pdf"]
+    assert duplicates.duplicate_count == 2
+    assert duplicates.copies_of("a.pdf") == ["a.pdf", "c/a.pdf", "d.pdf"]
+    assert duplicates.copies_of("b.pdf") == ["b.pdf"]
+    assert duplicates.representative_of("d.pdf") == "a.pdf"
+    assert duplicates.representative_of("b.pdf") == "b.pdf"
+
+
+def test_result_for_path_rewrites_the_location_of_copies():
+    result = Result(localizacao_ficheiro="a.pdf", total=10.0)
+
+    assert result_for_path(result, "a.pdf") is result
+    copy = result_for_path(result, "c/a.pdf")
+    assert copy == Result(localizacao_ficheiro="c/a.pdf", total=10.0)
+    assert result.localizacao_ficheiro == "a.pdf"
+
+
+def test_result_for_path_leaves_results_without_a_location():
+    class Plain(BaseModel):
+        total: float
+
+    result = Plain(total=1.0)
+
+    assert result_for_path(result, "b.pdf") is result
+
+
+def test_gemini_calls_for_counts_the_calls_of_every_stage():
+    metrics = DocumentMetrics(
+        "a.pdf",
+        stages=[
+            StageMetrics("a.pdf", "ocr", calls=3),
+            StageMetrics("a.pdf", "triage", checkpoint_hit=True),
+            StageMetrics("a.pdf", "specialist", calls=2),
+        ],
+    )
+
+    assert gemini_calls_for(metrics) == 5
+    assert gemini_calls_for(None) == 0
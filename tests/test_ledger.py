@@ -0,0 +1,134 @@
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+from agentic_document_classifier import ledger as ledger_module
+from agentic_document_classifier.ledger import JobLedger, worker_id
+
+
+@pytest.fixture
+def ledger(tmp_path) -> JobLedger:
+    return JobLedger(tmp_path / "jobs.sqlite3", lease_seconds=60, max_attempts=2)
+
+
+def dead_worker() -> str:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    _ = process.wait()
+    return f"{socket.gethostname()}:{process.pid}"
+
+
+def test_jobs_are_claimed_once_in_order(ledger):
+    run_id = ledger.create_run(["a.pdf", "b.pdf"])
+
+    first = ledger.claim(run_id, "w1")
+    second = ledger.claim(run_id, "w2")
+
+    assert (first.path, first.worker, first.attempts) == ("a.pdf", "w1", 1)
+    assert (second.path, second.worker) == ("b.pdf", "w2")
+    assert ledger.claim(run_id, "w3") is None
+    assert ledger.counts(run_id)["ocr"] == 2
+
+
+def test_complete_records_the_result(ledger):
+    run_id = ledger.create_run(["a.pdf"], run_id="run-1")
+    job = ledger.claim(run_id, worker_id())
+
+    assert ledger.has_run("run-1")
+    assert ledger.advance(job, "triage")
+    assert ledger.complete(job, "BankingOutput", '{"grupo": "x"}')
+
+    (stored,) = ledger.jobs(run_id)
+    assert (stored.state, stored.result_model, stored.result) == (
+        "done",
+        "BankingOutput",
+        '{"grupo": "x"}',
+    )
+    assert ledger.counts(run_id)["done"] == 1
+
+
+def test_advance_rejects_final_states(ledger):
+    run_id = ledger.create_run(["a.pdf"])
+    job = ledger.claim(run_id)
+
+    with pytest.raises(ValueError, match="in-progress"):
+        _ = ledger.advance(job, "done")
+
+
+def test_recover_leaves_live_leases_alone(ledger):
+    run_id = ledger.create_run(["a.pdf"])
+    _ = ledger.claim(run_id, worker_id())
+
+    assert ledger.recover(run_id) == 0
+    assert ledger.claim(run_id) is None
+
+
+def test_expired_lease_is_reclaimed_and_recorded_once(ledger, monkeypatch):
+    run_id = ledger.create_run(["a.pdf"])
+    slow = ledger.claim(run_id, worker_id())
+
+    later = time.time() + 61
+    monkeypatch.setattr(ledger_module.time, "time", lambda: later)
+    assert ledger.recover(run_id) == 1
+    fast = ledger.claim(run_id, "other-host:1")
+
+    assert fast.attempts == 2
+    assert ledger.complete(fast, "HrOutput", "{}")
+    # The slow worker lost its lease: its late result is dropped.
+    assert not ledger.complete(slow, "HrOutput", '{"late": true}')
+    assert not ledger.advance(slow, "specialist")
+    (stored,) = ledger.jobs(run_id)
+    assert (stored.worker, stored.result) == ("other-host:1", "{}")
+
+
+def test_jobs_of_dead_workers_are_recovered(ledger):
+    run_id = ledger.create_run(["a.pdf", "b.pdf"])
+    _ = ledger.claim(run_id, dead_worker())
+    _ = ledger.claim(run_id, worker_id())
+
+    assert ledger.recover(run_id) == 1
+    assert ledger.claim(run_id).path == "a.pdf"
+
+
+def test_failed_jobs_are_retried_up_to_max_attempts(ledger):
+    run_id = ledger.create_run(["a.pdf"])
+
+    job = ledger.claim(run_id, worker_id())
+    assert ledger.fail(job, "Connection refused")
+    assert ledger.recover(run_id) == 1
+
+    job = ledger.claim(run_id, worker_id())
+    assert job.attempts == 2
+    assert ledger.fail(job, "Connection refused")
+    assert ledger.recover(run_id) == 0
+
+    (stored,) = ledger.jobs(run_id)
+    assert (stored.state, stored.error) == ("error", "Connection refused")
+
+
+def test_keep_alive_holds_the_lease_through_a_slow_stage(tmp_path):
+    ledger = JobLedger(tmp_path / "jobs.sqlite3", lease_seconds=0.3)
+    run_id = ledger.create_run(["a.pdf"])
+    job = ledger.claim(run_id, worker_id())
+
+    with ledger.keep_alive(job):
+        time.sleep(0.8)
+        assert ledger.recover(run_id) == 0
+
+    time.sleep(0.4)
+    assert ledger.recover(run_id) == 1
+
+
+def test_heartbeat_fails_once_the_job_is_reclaimed(ledger, monkeypatch):
+    run_id = ledger.create_run(["a.pdf"])
+    job = ledger.claim(run_id, worker_id())
+    assert ledger.heartbeat(job)
+
+    later = time.time() + 61
+    monkeypatch.setattr(ledger_module.time, "time", lambda: later)
+    assert ledger.recover(run_id) == 1
+    _ = ledger.claim(run_id, "other-host:1")
+
+    assert not ledger.heartbeat(job)
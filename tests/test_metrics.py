@@ -0,0 +1,65 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+from agentic_document_classifier.metrics import (
+    PrometheusTextfileExporter,
+    record_retry,
+    record_usage,
+    record_wait,
+    track_document,
+    track_stage,
+)
+
+
+def usage(prompt: int, output: int) -> SimpleNamespace:
+    return SimpleNamespace(
+        usage_metadata=SimpleNamespace(
+            prompt_token_count=prompt,
+            cached_content_token_count=0,
+            candidates_token_count=output,
+            thoughts_token_count=0,
+            total_token_count=prompt + output,
+        )
+    )
+
+
+def test_threads_of_one_stage_add_up():
+    def call() -> None:
+        for _ in range(500):
+            record_retry()
+            record_wait(0.001)
+            record_usage(usage(10, 2), "gemini-2.5-flash")
+
+    with track_document("a.pdf"), track_stage("ocr") as stage:
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            # Chunk threads run in a copy of the caller's context.
+            futures = [
+                executor.submit(contextvars.copy_context().run, call) for _ in range(8)
+            ]
+            for future in futures:
+                future.result()
+
+    assert (stage.retries, stage.calls, stage.total_tokens) == (4000, 4000, 48000)
+    assert stage.rate_limit_wait == pytest.approx(4.0)
+
+
+def test_stage_and_document_waits_are_exported_separately(tmp_path):
+    exporter = PrometheusTextfileExporter(tmp_path / "metrics.prom")
+
+    with track_document("a.pdf", queue_wait=2.5) as document:
+        with track_stage("triage"):
+            record_wait(0.5)
+    for stage in document.stages:
+        exporter.on_stage_end(stage)
+    exporter.on_document_end(document)
+
+    content = (tmp_path / "metrics.prom").read_text()
+    assert "agentic_classifier_document_queue_seconds_total 2.5" in content
+    assert (
+        'agentic_classifier_stage_rate_limit_wait_seconds_total{stage="triage"} 0.5'
+        in content
+    )
+    assert document.stages[0].to_dict()["rate_limit_wait"] == 0.5
@@ -0,0 +1,93 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from pypdf import PdfReader
+
+from agentic_document_classifier import page_split
+from agentic_document_classifier.page_split import split_pages, split_pdf
+
+
+@pytest.fixture(autouse=True)
+def split_from_three_pages(monkeypatch):
+    monkeypatch.setattr(page_split, "SPLIT_MIN_PAGES", 3)
+
+
+@pytest.fixture
+def pdf(make_pdf):
+    def open_pdf(pages: list[str | None], name: str = "documento.pdf") -> io.BytesIO:
+        with open(make_pdf(pages, name), "rb") as source:
+            return io.BytesIO(source.read())
+
+    return open_pdf
+
+
+def pages(count: int) -> list[str | None]:
+    return [f"Pagina {number} do extracto" for number in range(1, count + 1)]
+
+
+def test_short_documents_are_not_split(pdf):
+    assert split_pdf(pdf(pages(2))) is None
+
+
+def test_unreadable_documents_are_not_split():
+    assert split_pdf(io.BytesIO(b"not a pdf")) is None
+
+
+def test_chunks_cover_every_page_in_order(pdf):
+    chunks = split_pdf(pdf(pages(5)), chunk_pages=2)
+
+    assert chunks is not None
+    assert [(chunk.first_page, chunk.last_page) for chunk in chunks] == [
+        (1, 2),
+        (3, 4),
+        (5, 5),
+    ]
+    assert [chunk.pages for chunk in chunks] == [2, 2, 1]
+
+
+def test_written_chunks_hold_their_pages(pdf):
+    source = pdf(pages(4))
+    chunks = split_pdf(source, chunk_pages=3)
+    assert chunks is not None
+
+    written = PdfReader(io.BytesIO(chunks[1].write()))
+
+    assert len(written.pages) == 1
+    assert "Pagina 4" in written.pages[0].extract_text()
+
+
+def test_digests_depend_on_page_content_only(pdf):
+    first = split_pdf(pdf(pages(3)))
+    # Same pages after a different first page.
+    second = split_pdf(pdf(["Capa"] + pages(3)[1:], "outro.pdf"))
+    assert first is not None and second is not None
+
+    assert first[0].digest != second[0].digest
+    assert [chunk.digest for chunk in first[1:]] == [
+        chunk.digest for chunk in second[1:]
+    ]
+
+
+def test_split_pages_ignores_the_minimum_length(pdf):
+    chunks = split_pages(pdf(pages(2)), [2])
+
+    assert chunks is not None
+    (chunk,) = chunks
+    assert (chunk.first_page, chunk.last_page) == (2, 2)
+    assert "Pagina 2" in PdfReader(io.BytesIO(chunk.write())).pages[0].extract_text()
+
+
+def test_split_pages_rejects_missing_pages(pdf):
+    assert split_pages(pdf(pages(2)), [3]) is None
+
+
+def test_chunks_can_be_written_from_several_threads(pdf):
+    chunks = split_pdf(pdf(pages(8)))
+    assert chunks is not None
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        written = list(executor.map(lambda chunk: chunk.write(), chunks))
+
+    texts = [PdfReader(io.BytesIO(data)).pages[0].extract_text() for data in written]
+    assert texts == pages(8)
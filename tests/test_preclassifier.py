@@ -0,0 +1,215 @@
+import json
+
+import pytest
+
+from agentic_document_classifier import preclassifier
+from agentic_document_classifier.checkpoints import MemoryCheckpointStore
+from agentic_document_classifier.models import DocumentGroup
+from agentic_document_classifier.preclassifier import (
+    NaiveBayesModel,
+    Prediction,
+    labelled_examples,
+    preclassify,
+    predict,
+    rule_prediction,
+)
+
+STATEMENT = """
+# Extracto de Conta
+
+Banco BAI, IBAN AO06 0040 0000 1234 5678 9012 3
+
+| Data | Movimentos | Saldo |
+| --- | --- | --- |
+| 02-01-2024 | Transferência | 1.000,00 |
+"""
+
+PAYROLL = """
+# Folha de Remunerações
+
+| Trabalhador | Categoria profissional | Salário base | Segurança Social |
+| --- | --- | --- | --- |
+| João | Técnico | 250.000,00 | 7.500,00 |
+"""
+
+
+def test_a_title_with_supporting_keywords_is_confident():
+    prediction = rule_prediction(STATEMENT)
+
+    assert prediction is not None
+    assert prediction.group is DocumentGroup.DOCUMENTOS_BANCARIOS
+    assert prediction.confidence >= 0.9
+    assert prediction.evidence[0] == "EXTRACTO DE CONTA"
+
+
+def test_weak_keywords_alone_predict_nothing():
+    # Generic banking words appear in invoices, payslips and customs files.
+    markdown = "Pagamento por transferência: Banco BFA, IBAN, saldo, ordenante."
+
+    assert rule_prediction(markdown) is None
+
+
+def test_a_title_needs_supporting_keywords():
+    # A strong match alone only ties with the null class.
+    assert rule_prediction("Comprovativo de Transferência") is None
+
+    prediction = rule_prediction("Comprovativo de Transferência, ordenante")
+    assert prediction is not None
+    assert prediction.confidence == pytest.approx(0.685, abs=0.005)
+
+
+def test_no_matches_predict_nothing():
+    assert rule_prediction("Acta da reunião do conselho de administração") is None
+
+
+def test_competing_groups_lower_the_confidence():
+    alone = rule_prediction(STATEMENT)
+    mixed = rule_prediction(STATEMENT + "\nFolha de Remunerações, trabalhadores")
+
+    assert mixed is not None and alone is not None
+    assert mixed.confidence < alone.confidence
+
+
+def test_accents_and_case_are_ignored():
+    prediction = rule_prediction("FOLHA DE REMUNERAÇÕES\ntrabalhadores, salário base")
+
+    assert prediction is not None
+    assert prediction.group is DocumentGroup.DOCUMENTOS_RH
+
+
+def test_triage_notes_mention_source_and_confidence():
+    notes = Prediction(
+        DocumentGroup.DOCUMENTOS_RH, 0.934, "rules", ("FOLHA",)
+    ).triage_notes()
+
+    assert "regras" in notes
+    assert "0.93" in notes
+    assert "FOLHA" in notes
+
+
+def training_examples() -> list[tuple[str, DocumentGroup]]:
+    return [
+        (STATEMENT, DocumentGroup.DOCUMENTOS_BANCARIOS),
+        (STATEMENT.replace("BAI", "BFA"), DocumentGroup.DOCUMENTOS_BANCARIOS),
+        (PAYROLL, DocumentGroup.DOCUMENTOS_RH),
+        (PAYROLL.replace("João", "Maria"), DocumentGroup.DOCUMENTOS_RH),
+    ]
+
+
+def test_naive_bayes_learns_and_round_trips(tmp_path):
+    model = NaiveBayesModel.fit(training_examples())
+    path = tmp_path / "model.json"
+    model.save(path)
+    loaded = NaiveBayesModel.load(path)
+
+    for candidate in (model, loaded):
+        prediction = candidate.predict(PAYROLL.replace("João", "Ana"))
+        assert prediction is not None
+        assert prediction.group is DocumentGroup.DOCUMENTOS_RH
+        assert prediction.source == "model"
+    assert loaded.predict("palavras nunca vistas") is None
+
+
+def test_naive_bayes_rejects_unknown_versions(tmp_path):
+    path = tmp_path / "model.json"
+    path.write_text(json.dumps({"version": 2, "groups": {}}))
+
+    with pytest.raises(ValueError, match="Unsupported"):
+        _ = NaiveBayesModel.load(path)
+
+
+def test_naive_bayes_needs_examples():
+    with pytest.raises(ValueError, match="No training examples"):
+        _ = NaiveBayesModel.fit([])
+
+
+class FixedModel:
+    def __init__(self, group: DocumentGroup, confidence: float) -> None:
+        self.prediction = Prediction(group, confidence, "model")
+
+    def predict(self, markdown: str) -> Prediction:
+        return self.prediction
+
+
+def test_predict_takes_the_more_confident_of_agreeing_sources():
+    model = FixedModel(DocumentGroup.DOCUMENTOS_BANCARIOS, 0.999)
+
+    prediction = predict(STATEMENT, model)  # type: ignore[arg-type]
+
+    assert prediction is not None
+    assert (prediction.source, prediction.confidence) == ("model", 0.999)
+
+
+def test_predict_returns_nothing_when_sources_disagree():
+    model = FixedModel(DocumentGroup.DOCUMENTOS_RH, 0.999)
+
+    assert predict(STATEMENT, model) is None  # type: ignore[arg-type]
+
+
+def test_preclassify_is_off_by_default(monkeypatch):
+    monkeypatch.setattr(preclassifier, "LOCAL_TRIAGE", False)
+    assert preclassify(STATEMENT) is None
+
+    monkeypatch.setattr(preclassifier, "LOCAL_TRIAGE", True)
+    monkeypatch.setattr(preclassifier, "LOCAL_TRIAGE_MODEL", None)
+    monkeypatch.setattr(preclassifier, "LOCAL_TRIAGE_THRESHOLD", 0.9)
+    assert preclassify(STATEMENT) is not None
+    assert preclassify("Comprovativo de Transferência, ordenante") is None
+
+
+def test_labelled_examples_pair_triage_with_ocr_checkpoints():
+    store = MemoryCheckpointStore()
+    store.put("abc_step_1.md", STATEMENT)
+    store.put(
+        "abc_step_2.json", json.dumps({"grupo_documento": "DOCUMENTOS_BANCARIOS"})
+    )
+    store.put("def_step_2.json", json.dumps({"grupo_documento": "DOCUMENTOS_RH"}))
+    store.put("ghi_step_1.md", PAYROLL)
+    store.put("ghi_step_2.json", json.dumps({"grupo_documento": "INVALIDO"}))
+
+    assert list(labelled_examples(store)) == [
+        ("abc", STATEMENT, DocumentGroup.DOCUMENTOS_BANCARIOS)
+    ]
+
+
+def test_the_model_alone_never_skips_triage():
+    model = FixedModel(DocumentGroup.DOCUMENTOS_RH, 0.999)
+
+    assert predict("Relatório anual de actividades", model) is None  # type: ignore[arg-type]
+
+
+def test_naive_bayes_confidence_does_not_saturate_on_long_documents():
+    model = NaiveBayesModel.fit(training_examples())
+    long_payroll = PAYROLL + "\n".join(
+        "| João | Técnico | 250.000,00 | 7.500,00 |" for _ in range(200)
+    )
+
+    prediction = model.predict(long_payroll)
+
+    assert prediction is not None
+    assert prediction.group is DocumentGroup.DOCUMENTOS_RH
+    assert prediction.confidence < 0.99
+
+
+def test_settlement_notes_are_a_fiscal_rule_only():
+    fiscal = [
+        group
+        for group, rules in preclassifier._RULES.items()
+        if any("LIQUIDACAO" in pattern for pattern, _ in rules)
+    ]
+
+    assert fiscal == [DocumentGroup.DOCUMENTOS_FISCAIS]
+
+
+def test_labelled_examples_accept_any_version_of_the_stage_keys():
+    store = MemoryCheckpointStore()
+    store.put("abc_step_1_0f1e2d3c4b5a6978.md", STATEMENT)
+    store.put(
+        "abc_step_2_8796a5b4c3d2e1f0.json",
+        json.dumps({"grupo_documento": "DOCUMENTOS_BANCARIOS"}),
+    )
+    store.put("pages-abc_step_1_0f1e2d3c4b5a6978.md", PAYROLL)
+
+    assert list(labelled_examples(store)) == [
+        ("abc", STATEMENT, DocumentGroup.DOCUMENTOS_BANCARIOS)
+    ]
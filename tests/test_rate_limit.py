@@ -0,0 +1,146 @@
+import asyncio
+import threading
+
+import httpx
+import pytest
+from google.genai import errors as genai_errors
+
+from agentic_document_classifier import rate_limit
+from agentic_document_classifier.rate_limit import (
+    SharedRateLimiter,
+    acall_with_retry,
+    backoff_delay,
+    call_with_retry,
+    estimate_pdf_tokens,
+    estimate_text_tokens,
+    retry_after_seconds,
+)
+
+
+def api_error(code: int, retry_delay: str | None = None) -> genai_errors.APIError:
+    details = [{"retryDelay": retry_delay}] if retry_delay else []
+    return genai_errors.APIError(
+        code, {"error": {"code": code, "message": "erro", "details": details}}
+    )
+
+
+class FailingCall:
+    def __init__(self, *errors: Exception) -> None:
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self) -> str:
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(rate_limit, "backoff_delay", lambda attempt, after=None: 0)
+    monkeypatch.setattr(rate_limit, "get_rate_limiter", lambda: None)
+
+
+@pytest.fixture
+def limiter(tmp_path) -> SharedRateLimiter:
+    return SharedRateLimiter(60, 0, state_file=tmp_path / "state.json")
+
+
+def test_token_estimates():
+    assert estimate_text_tokens("a" * 40, "b" * 40) == 21
+    assert estimate_pdf_tokens(b"/Type /Page\n/Type /Pages /Type/Page") == 516
+    assert estimate_pdf_tokens(b"") == 258
+
+
+def test_retry_after_from_api_details():
+    assert retry_after_seconds(api_error(429, "7s")) == 7.0
+    assert retry_after_seconds(api_error(429)) is None
+
+
+def test_backoff_delay_honours_retry_after():
+    assert 0 <= backoff_delay(3) <= 8
+    assert backoff_delay(0, retry_after=30) == 30
+
+
+def test_reserve_waits_once_the_bucket_is_empty(limiter):
+    waits = [limiter.reserve(0) for _ in range(61)]
+
+    assert waits[:60] == [0.0] * 60
+    assert waits[60] == pytest.approx(1.0, abs=0.05)
+
+
+def test_parallel_throttles_halve_the_rate_once(limiter):
+    _ = limiter.reserve(0)
+    sent_at = rate_limit.time.time()
+
+    for _ in range(4):
+        limiter.throttled(None, sent_at)
+    assert limiter._last_factor == 0.5
+
+    # A request sent after the decrease may lower it again.
+    limiter.throttled(None, rate_limit.time.time())
+    assert limiter._last_factor == 0.25
+
+
+def test_success_recovers_the_rate(limiter):
+    limiter.throttled(None, rate_limit.time.time())
+    assert limiter.recovering
+
+    for _ in range(30):
+        limiter.succeeded()
+
+    assert not limiter.recovering
+
+
+def test_transient_errors_are_retried():
+    call = FailingCall(api_error(503), httpx.ConnectError("recusado"))
+
+    assert call_with_retry(call) == "ok"
+    assert call.calls == 3
+
+
+def test_client_errors_are_not_retried():
+    call = FailingCall(api_error(400))
+
+    with pytest.raises(genai_errors.APIError):
+        _ = call_with_retry(call)
+    assert call.calls == 1
+
+
+def test_retries_are_bounded(monkeypatch):
+    monkeypatch.setattr(rate_limit, "MAX_RETRIES", 2)
+    call = FailingCall(*[api_error(503)] * 5)
+
+    with pytest.raises(genai_errors.APIError):
+        _ = call_with_retry(call)
+    assert call.calls == 3
+
+
+def test_throttling_lowers_the_shared_rate(monkeypatch, limiter):
+    monkeypatch.setattr(rate_limit, "get_rate_limiter", lambda: limiter)
+
+    assert call_with_retry(FailingCall(api_error(429))) == "ok"
+
+    assert limiter.recovering
+
+
+def test_async_calls_use_the_limiter_off_the_event_loop(monkeypatch, limiter):
+    threads: list[threading.Thread] = []
+    reserve = limiter.reserve
+
+    def recording_reserve(tokens: int) -> float:
+        threads.append(threading.current_thread())
+        return reserve(tokens)
+
+    monkeypatch.setattr(limiter, "reserve", recording_reserve)
+    monkeypatch.setattr(rate_limit, "get_rate_limiter", lambda: limiter)
+    failing = FailingCall(api_error(429))
+
+    async def call() -> str:
+        return failing()
+
+    assert asyncio.run(acall_with_retry(call, 100)) == "ok"
+    assert failing.calls == 2
+    assert threads and threading.main_thread() not in threads
+    assert limiter.recovering
@@ -0,0 +1,119 @@
+import json
+from typing import Literal
+
+import pytest
+from pydantic import BaseModel, ValidationError
+
+from agentic_document_classifier.models import DocumentGroup
+from agentic_document_classifier.repair import (
+    _complete_prefix,
+    closest_value,
+    repair_enum_values,
+    repair_json,
+    validation_error_summary,
+)
+
+
+class Line(BaseModel):
+    moeda: Literal["AOA", "USD", "EUR"]
+
+
+class Answer(BaseModel):
+    grupo_documento: DocumentGroup
+    linhas: list[Line] = []
+
+
+@pytest.mark.parametrize(
+    ("text", "expected"),
+    [
+        ('{"a": 1}', '{"a": 1}'),
+        # A number at the very end may have lost digits.
+        ('{"a": 1, "b": [1, 2', '{"a": 1, "b": [1]}'),
+        ('{"a": 1, "b": [1, 2 ', '{"a": 1, "b": [1, 2]}'),
+        ('{"a": "texto cort', '{"a": "texto cort"}'),
+        ('{"a": 1, "b": 12', '{"a": 1}'),
+        ('{"a": 1, "b": tr', '{"a": 1}'),
+        ('{"a": 1, "incomplet', '{"a": 1}'),
+        ('{"a": 1, "b":', '{"a": 1}'),
+        ('{"a": [1, 2,], }', '{"a": [1, 2]}'),
+        ('{"a": "x\\', '{"a": "x"}'),
+        ('[{"a": 1}, {"b": "x"', '[{"a": 1}, {"b": "x"}]'),
+    ],
+)
+def test_complete_prefix(text, expected):
+    completed = _complete_prefix(text)
+
+    assert json.loads(completed) == json.loads(expected)
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        '```json\n{"a": 1}\n```',
+        'Aqui está o resultado:\n{"a": 1}\nEspero que ajude.',
+        '{"a": 1,}',
+        '```\n{"a": 1, "b',
+    ],
+)
+def test_repair_json(payload):
+    assert repair_json(payload) == {"a": 1}
+
+
+def test_repair_json_without_a_value():
+    with pytest.raises(ValueError, match="No JSON value"):
+        _ = repair_json("Não consegui ler o documento.")
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [
+        ("DOCUMENTOS_BANCARIOS", "DOCUMENTOS_BANCARIOS"),
+        ("Documentos Bancários", "DOCUMENTOS_BANCARIOS"),
+        ("documentos-bancarios", "DOCUMENTOS_BANCARIOS"),
+        ("DOCUMENTOS_BANCARIO", "DOCUMENTOS_BANCARIOS"),
+        ("EXTRACTO", None),
+        (3, None),
+    ],
+)
+def test_closest_value(value, expected):
+    allowed = [group.value for group in DocumentGroup]
+
+    assert closest_value(value, allowed) == expected
+
+
+def test_repair_enum_values_fixes_near_misses_in_place():
+    data = {
+        "grupo_documento": "Documentos Aduaneiros",
+        "linhas": [{"moeda": "usd"}, {"moeda": "AOA"}],
+    }
+    with pytest.raises(ValidationError) as raised:
+        _ = Answer.model_validate(data)
+
+    assert repair_enum_values(data, raised.value)
+    answer = Answer.model_validate(data)
+    assert answer.grupo_documento is DocumentGroup.DOCUMENTOS_ADUANEIROS
+    assert [line.moeda for line in answer.linhas] == ["USD", "AOA"]
+
+
+def test_repair_enum_values_leaves_unrelated_values():
+    data = {"grupo_documento": "FACTURA"}
+    with pytest.raises(ValidationError) as raised:
+        _ = Answer.model_validate(data)
+
+    assert not repair_enum_values(data, raised.value)
+    assert data == {"grupo_documento": "FACTURA"}
+
+
+def test_validation_error_summary():
+    with pytest.raises(ValidationError) as raised:
+        _ = Answer.model_validate(
+            {"grupo_documento": "X" * 100, "linhas": [{"moeda": "GBP"}]}
+        )
+
+    lines = validation_error_summary(raised.value).splitlines()
+    assert lines[0].startswith("- grupo_documento: ")
+    assert "..." in lines[0]
+    assert lines[1].startswith("- linhas.0.moeda: ")
+
+    _, more = validation_error_summary(raised.value, limit=1).splitlines()
+    assert more == "- ... e mais 1 erros"
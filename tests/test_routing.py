@@ -0,0 +1,129 @@
+import pytest
+from google.genai import errors as genai_errors
+from pydantic import BaseModel
+
+from agentic_document_classifier import agents, routing
+from agentic_document_classifier.metrics import track_stage
+from agentic_document_classifier.models import DocumentGroup
+from agentic_document_classifier.routing import (
+    model_tiers,
+    parse_model_policy,
+    policy_key,
+)
+
+
+class Answer(BaseModel):
+    value: int
+
+
+def test_policy_entries_are_parsed_into_chains():
+    policy = parse_model_policy(
+        " triage=flash-lite > flash ,DOCUMENTOS_RH=pro,, specialist=flash"
+    )
+
+    assert policy == {
+        "triage": ("flash-lite", "flash"),
+        "DOCUMENTOS_RH": ("pro",),
+        "specialist": ("flash",),
+    }
+
+
+@pytest.mark.parametrize(
+    "policy", ["triage", "triage=", "ocr=>", "classify=pro", "OUTROS_DOCUMENTOS=pro"]
+)
+def test_invalid_policies_are_rejected(policy):
+    with pytest.raises(ValueError, match="GEMINI_MODEL_POLICY"):
+        _ = parse_model_policy(policy)
+
+
+def test_groups_override_the_specialist_stage(monkeypatch):
+    monkeypatch.setattr(
+        routing,
+        "MODEL_POLICY",
+        {"specialist": ("flash",), "DOCUMENTOS_RH": ("flash-lite", "pro")},
+    )
+
+    assert model_tiers("specialist", DocumentGroup.DOCUMENTOS_RH) == (
+        "flash-lite",
+        "pro",
+    )
+    assert model_tiers("specialist", DocumentGroup.DOCUMENTOS_FISCAIS) == ("flash",)
+    assert model_tiers("triage") == (routing.DEFAULT_MODEL_NAME,)
+    assert policy_key(("flash-lite", "pro")) == "flash-lite>pro"
+
+
+@pytest.fixture
+def answers(monkeypatch):
+    """Replace the Gemini call with canned answers per model."""
+    calls: list[str] = []
+    canned: dict[str, str | Exception] = {}
+
+    def generate(system_prompt, user_message, response_model, model):
+        calls.append(model)
+        answer = canned[model]
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    monkeypatch.setattr(agents, "_generate_structured_payload", generate)
+    monkeypatch.setattr(agents, "REASK_BUDGET", 1)
+    return canned, calls
+
+
+def test_unusable_answers_escalate_to_the_next_model(answers):
+    canned, calls = answers
+    canned.update({"lite": "sem JSON", "pro": '{"value": 7}'})
+
+    with track_stage("triage") as stage:
+        result, payload = agents._invoke_structured_model(
+            "prompt", "documento", Answer, ("lite", "pro")
+        )
+
+    assert result == Answer(value=7)
+    assert payload == '{"value": 7}'
+    # The cheap model is asked again once before escalating.
+    assert calls == ["lite", "lite", "pro"]
+    assert (stage.escalations, stage.reasks) == (1, 1)
+
+
+def test_repairable_answers_do_not_escalate(answers):
+    canned, calls = answers
+    canned.update({"lite": '```json\n{"value": 3,}\n```', "pro": '{"value": 7}'})
+
+    with track_stage("triage") as stage:
+        result, payload = agents._invoke_structured_model(
+            "prompt", "documento", Answer, ("lite", "pro")
+        )
+
+    assert result == Answer(value=3)
+    assert payload == '{"value": 3}'
+    assert calls == ["lite"]
+    assert (stage.escalations, stage.repairs) == (0, 1)
+
+
+def test_api_errors_never_escalate(answers):
+    canned, calls = answers
+    canned.update(
+        {
+            "lite": genai_errors.APIError(
+                400, {"error": {"code": 400, "message": "bad request"}}
+            ),
+            "pro": '{"value": 7}',
+        }
+    )
+
+    with pytest.raises(genai_errors.APIError):
+        _ = agents._invoke_structured_model(
+            "prompt", "documento", Answer, ("lite", "pro")
+        )
+    assert calls == ["lite"]
+
+
+def test_the_last_models_error_is_reported(answers):
+    canned, _ = answers
+    canned.update({"lite": "", "pro": '{"value": "sete"}'})
+
+    with pytest.raises(RuntimeError, match="Answer"):
+        _ = agents._invoke_structured_model(
+            "prompt", "documento", Answer, ("lite", "pro")
+        )
@@ -0,0 +1,94 @@
+import json
+import sys
+
+import pytest
+from google.genai import types as genai_types
+from pydantic import BaseModel
+
+from agentic_document_classifier import schemas
+from agentic_document_classifier.models import TriageResponse
+from agentic_document_classifier.schemas import (
+    response_schema,
+    write_response_schemas,
+)
+
+
+class Answer(BaseModel):
+    value: int
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    monkeypatch.setattr(schemas, "_SCHEMAS", {})
+    monkeypatch.setattr(schemas, "SCHEMA_DIRECTORY", None)
+
+
+def test_schemas_are_converted_once(monkeypatch):
+    converted: list[type[BaseModel]] = []
+    original = schemas.t_schema
+
+    def t_schema(client, model):
+        converted.append(model)
+        return original(client, model)
+
+    monkeypatch.setattr(schemas, "t_schema", t_schema)
+
+    first = response_schema(TriageResponse)
+
+    assert isinstance(first, genai_types.Schema)
+    assert response_schema(TriageResponse) is first
+    assert converted == [TriageResponse]
+
+
+def test_the_class_is_passed_without_the_sdk_conversion(monkeypatch):
+    monkeypatch.setattr(schemas, "t_schema", None)
+
+    assert response_schema(Answer) is Answer
+
+    with pytest.raises(RuntimeError, match="no schema conversion"):
+        _ = write_response_schemas("unused", [Answer])
+
+
+def test_a_conversion_without_a_schema_is_an_error(monkeypatch):
+    monkeypatch.setattr(schemas, "t_schema", lambda client, model: None)
+
+    with pytest.raises(ValueError, match="Answer"):
+        _ = response_schema(Answer)
+
+
+def test_written_schemas_are_loaded_instead_of_converted(tmp_path, monkeypatch):
+    expected = schemas._convert(TriageResponse)
+    [path] = write_response_schemas(tmp_path, [TriageResponse])
+    monkeypatch.setattr(schemas, "SCHEMA_DIRECTORY", str(tmp_path))
+    monkeypatch.setattr(schemas, "t_schema", None)
+
+    assert path == tmp_path / "TriageResponse.json"
+    assert response_schema(TriageResponse) == expected
+
+
+def test_schemas_of_other_sources_are_ignored(tmp_path, monkeypatch):
+    [path] = write_response_schemas(tmp_path, [TriageResponse])
+    stored = json.loads(path.read_text(encoding="utf-8"))
+    _ = path.write_text(json.dumps({**stored, "fingerprint": "0" * 16}))
+    monkeypatch.setattr(schemas, "SCHEMA_DIRECTORY", str(tmp_path))
+    monkeypatch.setattr(schemas, "t_schema", None)
+
+    assert response_schema(TriageResponse) is TriageResponse
+
+
+def test_runtime_models_are_never_loaded(tmp_path, monkeypatch):
+    # Models built outside `models` are not covered by the fingerprint.
+    _ = (tmp_path / "Answer.json").write_text("{}")
+    monkeypatch.setattr(schemas, "SCHEMA_DIRECTORY", str(tmp_path))
+
+    assert schemas._load_schema(Answer) is None
+
+
+def test_the_command_writes_every_output_model(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(sys, "argv", ["schemas", str(tmp_path)])
+
+    schemas.main()
+
+    written = capsys.readouterr().out.split()
+    assert len(written) == len(schemas.output_models())
+    assert str(tmp_path / "TriageResponse.json") in written
@@ -0,0 +1,102 @@
+import http.client
+import json
+import os
+import socket
+import threading
+
+import pytest
+
+from agentic_document_classifier.cli import serve
+from agentic_document_classifier.metrics import DocumentMetrics
+from agentic_document_classifier.models import ErrorOutput
+
+
+def fake_classify(job: tuple[str, float]) -> tuple[str, ErrorOutput, DocumentMetrics]:
+    filename, _ = job
+    if filename == "crash.pdf":
+        os._exit(1)
+    result = ErrorOutput(localizacao_ficheiro=filename, erro="fake")
+    return filename, result, DocumentMetrics(filename)
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(serve, "_warm_worker", lambda: None)
+    monkeypatch.setattr(serve, "_classify_with_metrics", fake_classify)
+    service = serve.ClassificationService(2, max_pending=3)
+    yield service
+    service.close()
+
+
+def drain(results, count: int) -> dict[str, object]:
+    return dict(results.get(timeout=30) for _ in range(count))
+
+
+def test_results_arrive_and_pending_drops(service):
+    results = service.submit(["a.pdf", "b.pdf"])
+
+    received = drain(results, 2)
+
+    assert sorted(received) == ["a.pdf", "b.pdf"]
+    assert service.pending == 0
+    assert service.queue_depth()["completed"] == 2
+
+
+def test_submissions_beyond_max_pending_are_refused(service):
+    assert service.submit(["a.pdf", "b.pdf", "c.pdf", "d.pdf"]) is None
+    assert service.pending == 0
+
+
+def test_a_dead_worker_fails_its_files_and_the_pool_is_replaced(service):
+    results = service.submit(["crash.pdf"])
+
+    received = drain(results, 1)
+
+    assert received == {"crash.pdf": None}
+    assert service.pending == 0
+    assert service.failed == 1
+
+    received = drain(service.submit(["a.pdf"]), 1)
+    assert isinstance(received["a.pdf"], ErrorOutput)
+
+
+def test_classify_streams_one_line_per_file(service):
+    server = serve._TCPServer(("127.0.0.1", 0), service, verbose=False, token="s3")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        connection = http.client.HTTPConnection("127.0.0.1", server.server_address[1])
+        body = json.dumps({"files": ["a.pdf", "b.pdf"]})
+
+        connection.request("POST", "/classify", body)
+        assert connection.getresponse().status == 401
+
+        connection = http.client.HTTPConnection("127.0.0.1", server.server_address[1])
+        connection.request("POST", "/classify", body, {"Authorization": "Bearer s3"})
+        response = connection.getresponse()
+        lines = [json.loads(line) for line in response.read().splitlines()]
+
+        assert response.status == 200
+        assert sorted(line["localizacao_ficheiro"] for line in lines) == [
+            "a.pdf",
+            "b.pdf",
+        ]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_a_live_socket_is_not_taken_over(tmp_path):
+    path = str(tmp_path / "serve.sock")
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen()
+    try:
+        with pytest.raises(OSError, match="running instance"):
+            serve._remove_stale_socket(path)
+        assert os.path.exists(path)
+    finally:
+        listener.close()
+
+    # Closed without unlinking, as after a crash: the file is stale.
+    serve._remove_stale_socket(path)
+    assert not os.path.exists(path)
@@ -0,0 +1,126 @@
+import asyncio
+import io
+from pathlib import Path
+
+import pytest
+
+from agentic_document_classifier import agents, text_layer
+from agentic_document_classifier.metrics import track_document, track_stage
+from agentic_document_classifier.text_layer import (
+    assess_text_layer,
+    extract_text_pages,
+    page_has_text,
+    pages_to_markdown,
+)
+
+LINE = "Extracto de conta BAI numero 0040 0000 saldo disponivel 1.000,00 AOA"
+
+
+@pytest.fixture(autouse=True)
+def short_pages(monkeypatch):
+    monkeypatch.setattr(text_layer, "MIN_CHARS_PER_PAGE", 40)
+
+
+def test_quality_of_a_digital_text_layer():
+    quality = assess_text_layer([LINE, LINE, ""])
+
+    assert (quality.pages, quality.pages_with_text) == (3, 2)
+    assert quality.coverage == pytest.approx(2 / 3)
+    assert quality.sane_ratio == 1.0
+
+
+def test_unmapped_glyphs_fail_the_check():
+    quality = assess_text_layer(["(cid:12)(cid:40)(cid:7)" * 20])
+
+    assert quality.sane_ratio == 0.0
+    assert not quality.acceptable
+
+
+def test_short_stamps_do_not_count_as_text():
+    assert page_has_text(LINE)
+    assert not page_has_text("Página 3 de 5")
+    assert not page_has_text("   \n ")
+
+
+def test_pages_to_markdown_leaves_the_path_out():
+    markdown = pages_to_markdown(["primeira", "segunda"])
+
+    assert markdown == "## Página 1\n\nprimeira\n\n## Página 2\n\nsegunda\n"
+    assert "Localização" not in markdown
+
+
+def test_pages_without_text_are_reported_for_ocr(make_pdf):
+    path = make_pdf([LINE] * 9 + [None])
+
+    with open(path, "rb") as source:
+        pages, quality = extract_text_pages(source)
+
+    assert quality is not None and quality.acceptable
+    assert pages is not None
+    assert pages[:9] == [LINE] * 9
+    assert pages[9] is None
+
+
+def test_scans_need_ocr_as_a_whole(make_pdf):
+    path = make_pdf([LINE, None, None, None])
+
+    with open(path, "rb") as source:
+        pages, quality = extract_text_pages(source)
+
+    assert pages is None
+    assert quality is not None and quality.coverage == 0.25
+
+
+def test_unreadable_files_need_ocr():
+    assert extract_text_pages(io.BytesIO(b"not a pdf")) == (None, None)
+
+
+def test_ocr_step_converts_only_the_pages_without_text(make_pdf, monkeypatch):
+    converted: list[int] = []
+
+    def fake_ocr_chunk(original_path: Path, chunk) -> str:
+        converted.append(chunk.first_page)
+        assert chunk.write().startswith(b"%PDF")
+        return f"página digitalizada {chunk.first_page}"
+
+    monkeypatch.setattr(agents, "_ocr_chunk", fake_ocr_chunk)
+    path = make_pdf([LINE] * 9 + [None])
+
+    with (
+        track_document(path),
+        track_stage("ocr") as stage,
+        agents._PdfDocument(Path(path)) as document,
+    ):
+        markdown = agents._text_layer_markdown(document)
+
+    assert converted == [10]
+    assert markdown is not None
+    assert markdown.endswith("## Página 10\n\npágina digitalizada 10\n")
+    assert markdown.count(LINE) == 9
+    assert path not in markdown
+    assert not stage.local_result
+
+
+def test_complete_text_layers_skip_gemini(make_pdf, monkeypatch):
+    monkeypatch.setattr(agents, "_ocr_chunk", None)
+    path = make_pdf([LINE] * 3)
+
+    with track_stage("ocr") as stage, agents._PdfDocument(Path(path)) as document:
+        markdown = agents._text_layer_markdown(document)
+
+    assert markdown == pages_to_markdown([LINE] * 3)
+    assert stage.local_result
+
+
+def test_async_ocr_step_converts_only_the_pages_without_text(make_pdf, monkeypatch):
+    async def fake_aocr_chunk(original_path: Path, chunk) -> str:
+        return f"página digitalizada {chunk.first_page}"
+
+    monkeypatch.setattr(agents, "_aocr_chunk", fake_aocr_chunk)
+    path = make_pdf([None] + [LINE] * 9)
+
+    with agents._PdfDocument(Path(path)) as document:
+        markdown = asyncio.run(agents._atext_layer_markdown(document))
+
+    assert markdown is not None
+    assert markdown.startswith("## Página 1\n\npágina digitalizada 1\n\n## Página 2")